@@ -10,6 +10,7 @@ from django.contrib.auth.models import User
 from models import Agenda, AgendaVote
 from apis.resources.base import BaseResource
 from mks.models import Member, Party
+from laws.models import Vote, VoteAction
 
 from operator import itemgetter
 
@@ -86,6 +87,7 @@ class AgendaResource(BaseResource):
         include_absolute_url = True
         excludes = ['is_public']
         list_fields = ['name', 'id', 'description', 'public_owner_name']
+        conditional_models = (AgendaVote, Vote, VoteAction, Member, Party)
 
     def dehydrate_members(self, bundle):
         rangesString = bundle.request.GET.get('ranges',None)
@@ -15,8 +15,11 @@ from django.core.cache import cache
 from django.views.decorators.csrf import ensure_csrf_cookie
 from django.utils.decorators import method_decorator
 
+from actstream.models import Follow
 from hashnav import DetailView, ListView
 from mks.models import Member, Party
+from laws.models import Bill, Vote, VoteAction
+from committees.models import CommitteeMeeting
 
 from forms import (EditAgendaForm, AddAgendaForm, VoteLinkingFormSet,
                    MeetingLinkingFormSet)
@@ -24,7 +27,7 @@ from models import Agenda, AgendaVote, AgendaMeeting, AgendaBill
 
 import queries
 
-from auxiliary.mixins import GetMoreView
+from auxiliary.mixins import GetMoreView, ConditionalDetailMixin
 
 logger = logging.getLogger("open-knesset.agendas.views")
 
@@ -75,8 +78,10 @@ class AgendaListView(ListView):
         return context
 
 
-class AgendaDetailView(DetailView):
+class AgendaDetailView(ConditionalDetailMixin, DetailView):
     model = Agenda
+    conditional_models = (AgendaVote, AgendaBill, AgendaMeeting, Vote, VoteAction, Bill, CommitteeMeeting,
+                          Member, Party, Follow)
 
     INITIAL = 4
 
@@ -1,14 +1,23 @@
 import csv
+from functools import wraps
 
 from django.conf import settings
+from django.core.paginator import InvalidPage
+from django.db.models.query import QuerySet
 from django.http import HttpResponse
 from tastypie.cache import SimpleCache
+from tastypie.exceptions import BadRequest
+from tastypie.paginator import Paginator
 from tastypie.resources import ModelResource, Resource
 from tastypie.throttle import CacheThrottle
 from tastypie.serializers import Serializer
 
 import ujson
 import StringIO
+import urllib
+
+from auxiliary.conditional import conditional_response, get_validators
+from hashnav.keyset import KeysetPaginator, KeysetPage
 
 # are we using DummyCache ?
 _cache = getattr(settings, 'CACHES', {})
@@ -71,6 +80,63 @@ class IterJSONAndCSVSerializer(Serializer):
         return response
 
 
+class KeysetResourcePaginator(Paginator):
+    """
+    Links the next and previous pages with keyset cursors (see
+    hashnav.keyset) instead of offsets, and caches the total count.
+    """
+
+    def _cursor_uri(self, limit, cursor):
+        if self.resource_uri is None or cursor is None:
+            return None
+        if hasattr(self.request_data, 'copy'):
+            params = self.request_data.copy()
+        else:
+            params = dict(self.request_data)
+        for key in ('limit', 'offset', 'cursor'):
+            if key in params:
+                del params[key]
+        params['limit'] = limit
+        params['cursor'] = cursor
+        if hasattr(params, 'urlencode'):
+            return '%s?%s' % (self.resource_uri, params.urlencode())
+        return '%s?%s' % (self.resource_uri, urllib.urlencode(params))
+
+    def page(self):
+        limit = self.get_limit()
+        cursor = self.request_data.get('cursor')
+        if not limit or not isinstance(self.objects, QuerySet):
+            return super(KeysetResourcePaginator, self).page()
+        paginator = KeysetPaginator(self.objects, limit)
+        if paginator.ordering is None:
+            return super(KeysetResourcePaginator, self).page()
+
+        if cursor:
+            try:
+                page = paginator.cursor_page(cursor)
+            except InvalidPage:
+                raise BadRequest("Invalid cursor '%s' provided." % cursor)
+            offset = (page.number - 1) * limit
+            previous_uri = self._cursor_uri(limit, page.previous_cursor)
+        else:
+            offset = self.get_offset()
+            objects = list(paginator.object_list[offset:offset + limit + 1])
+            page = KeysetPage(objects[:limit], offset / limit + 1, paginator,
+                              has_next=len(objects) > limit, has_previous=offset > 0)
+            previous_uri = self.get_previous(limit, offset)
+
+        return {
+            self.collection_name: page.object_list,
+            'meta': {
+                'offset': offset,
+                'limit': limit,
+                'total_count': paginator.count,
+                'previous': previous_uri,
+                'next': self._cursor_uri(limit, page.next_cursor),
+            },
+        }
+
+
 class BaseNonModelResource(Resource):
 
     """Base resource for implementing Non model base api calls"""
@@ -87,11 +153,25 @@ class BaseNonModelResource(Resource):
             self.determine_format(request))
 
 
+def conditional(method):
+    """answers a GET of the resource with a 304 if it did not change, see BaseResource"""
+    @wraps(method)
+    def wrapper(self, request, **kwargs):
+        return conditional_response(request, self.get_conditional_validators(request, **kwargs),
+                                    lambda: method(self, request, **kwargs))
+
+    return wrapper
+
+
 class BaseResource(ModelResource):
 
     """Adds to Meta the following options:
 
     * ``list_fields``: The fields to display in resources listing
+    * ``conditional_models``: Makes the resource conditional (see
+      auxiliary.conditional). The list and the detail of an object are sent
+      with an ETag, and a request which has it gets a 304 unless the object
+      (the model, for the list) or any of these models changed
 
     For list mode, on may add to ``extra_fields`` to GET params to get
     addtional comma separated field in case one need more fields than those
@@ -101,7 +181,7 @@ class BaseResource(ModelResource):
     """
 
     class Meta(BaseNonModelResource.Meta):
-        pass
+        paginator_class = KeysetResourcePaginator
 
     def create_response(self, request, *args, **kwargs):
         return IterJSONAndCSVSerializer.modify_response(
@@ -134,6 +214,18 @@ class BaseResource(ModelResource):
 
         return fields
 
+    def get_conditional_validators(self, request, **kwargs):
+        models = getattr(self._meta, 'conditional_models', None)
+        if models is None:
+            return None
+        return get_validators(request, self._meta.object_class, kwargs.get('pk'), models,
+                              extra=(self.determine_format(request),))
+
+    @conditional
+    def get_detail(self, request, **kwargs):
+        return super(BaseResource, self).get_detail(request, **kwargs)
+
+    @conditional
     def get_list(self, request, **kwargs):
         """
         Returns a serialized list of resources.
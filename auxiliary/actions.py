@@ -0,0 +1,158 @@
+"""
+Buffered activity stream writes.
+
+send_action has the same arguments as actstream's action.send. Outside of
+buffer_actions it is action.send; inside, the actions are kept in a thread
+local buffer (identical actor, verb, target and action object tuples once)
+and written with one bulk insert when the outermost buffer_actions exits
+without an exception. ActionBufferMiddleware buffers the actions of a request.
+
+With settings.ACTION_QUEUE set the buffer is written to the QueuedAction
+table instead, which the flush_action_queue command moves to the activity
+stream in batches.
+"""
+from collections import OrderedDict
+from contextlib import contextmanager
+import logging
+import threading
+
+from actstream import action
+from actstream.models import Action
+from django.conf import settings
+from django.contrib.contenttypes.models import ContentType
+from django.db import transaction
+from django.dispatch import Signal
+from django.utils.timezone import now
+
+from auxiliary.conditional import touch
+
+logger = logging.getLogger("open-knesset.auxiliary.actions")
+
+# the fields shared by Action and QueuedAction
+ACTION_FIELDS = ('actor_content_type', 'actor_object_id', 'verb', 'description',
+                 'target_content_type', 'target_object_id',
+                 'action_object_content_type', 'action_object_object_id',
+                 'timestamp', 'public')
+
+_buffer_state = threading.local()
+
+actions_written = Signal(providing_args=['actions'])
+
+
+def _get_buffer():
+    return getattr(_buffer_state, 'actions', None)
+
+
+def _object_key(obj):
+    if obj is None:
+        return None, None
+    return ContentType.objects.get_for_model(obj).id, unicode(obj.pk)
+
+
+def send_action(actor, verb, target=None, action_object=None, description=None, timestamp=None,
+                public=True):
+    actions = _get_buffer()
+    if actions is None:
+        kwargs = dict((name, value) for name, value in (
+            ('target', target), ('action_object', action_object),
+            ('description', description), ('timestamp', timestamp)) if value is not None)
+        action.send(actor, verb=verb, public=public, **kwargs)
+        return
+    actor_content_type_id, actor_object_id = _object_key(actor)
+    target_content_type_id, target_object_id = _object_key(target)
+    action_object_content_type_id, action_object_object_id = _object_key(action_object)
+    key = (actor_content_type_id, actor_object_id, unicode(verb), target_content_type_id, target_object_id,
+           action_object_content_type_id, action_object_object_id)
+    if key not in actions:
+        actions[key] = {
+            'actor_content_type_id': actor_content_type_id,
+            'actor_object_id': actor_object_id,
+            'verb': unicode(verb),
+            'description': description,
+            'target_content_type_id': target_content_type_id,
+            'target_object_id': target_object_id,
+            'action_object_content_type_id': action_object_content_type_id,
+            'action_object_object_id': action_object_object_id,
+            'timestamp': timestamp or now(),
+            'public': bool(public),
+        }
+
+
+def write_actions(actions):
+    """
+    writes actions (dicts of the attnames of ACTION_FIELDS) to the activity
+    stream, or to the queue if settings.ACTION_QUEUE is set
+    """
+    if getattr(settings, 'ACTION_QUEUE', False):
+        from auxiliary.models import QueuedAction
+        model = QueuedAction
+    else:
+        model = Action
+    model.objects.bulk_create([model(**fields) for fields in actions])
+    if model is Action:
+        touch(Action)
+        actions_written.send(sender=Action, actions=actions)
+
+
+def _write_buffer():
+    actions = _buffer_state.actions.values()
+    _buffer_state.actions = None
+    write_actions(actions)
+
+
+@contextmanager
+def buffer_actions():
+    """buffers the send_action calls in the context, see the module docstring"""
+    if _get_buffer() is not None:
+        yield
+        return
+    _buffer_state.actions = OrderedDict()
+    try:
+        yield
+    except:
+        _buffer_state.actions = None
+        raise
+    _write_buffer()
+
+
+def flush_action_queue(batch_size=1000):
+    """moves the queued actions to the activity stream, returns the number of actions moved"""
+    from auxiliary.models import QueuedAction
+    attnames = [Action._meta.get_field(name).attname for name in ACTION_FIELDS]
+    moved = 0
+    while True:
+        with transaction.atomic():
+            queued = list(QueuedAction.objects.order_by('id').values_list('id', *ACTION_FIELDS)[:batch_size])
+            if not queued:
+                return moved
+            actions = [dict(zip(attnames, row[1:])) for row in queued]
+            Action.objects.bulk_create([Action(**fields) for fields in actions])
+            QueuedAction.objects.filter(id__lte=queued[-1][0]).delete()
+            actions_written.send(sender=Action, actions=actions)
+        touch(Action)
+        moved += len(queued)
+
+
+class ActionBufferMiddleware(object):
+    """writes the actions sent while handling a request in one insert"""
+
+    def process_request(self, request):
+        # drops whatever a previous request on this thread left behind
+        _buffer_state.actions = OrderedDict()
+        request._action_buffer = True
+
+    def process_response(self, request, response):
+        if getattr(request, '_action_buffer', False):
+            request._action_buffer = False
+            try:
+                _write_buffer()
+            except Exception:
+                # the request's own changes are already committed, losing
+                # its activity stream entries should not fail it
+                logger.exception('failed to write the actions of %s' % request.path)
+        return response
+
+    def process_exception(self, request, exception):
+        if getattr(request, '_action_buffer', False):
+            request._action_buffer = False
+            _buffer_state.actions = None
@@ -1,7 +1,6 @@
 # -*- coding: utf-8 -*-
 
 from django.contrib import admin
-from django.contrib.flatpages.admin import FlatPage, FlatPageAdmin as DjangoFlatPageAdmin
 
 from .models import Tidbit
 
@@ -14,15 +13,3 @@ class TidibitAdmin(admin.ModelAdmin):
 
 
 admin.site.register(Tidbit, TidibitAdmin)
-
-
-class FlatPageAdmin(DjangoFlatPageAdmin):
-    def save_model(self, request, obj, form, change):
-        super(FlatPageAdmin, self).save_model(request, obj, form, change)
-        from django.core.cache import cache
-        from knesset.utils import get_cache_key
-        cache.delete('flatpage_block_%s' % get_cache_key(obj.url))
-
-
-admin.site.unregister(FlatPage)
-admin.site.register(FlatPage, FlatPageAdmin)
@@ -0,0 +1,77 @@
+"""
+Query budget benchmarks of the main pages, api endpoints and management
+commands (see scenarios.py), run by the benchmark command on a test db
+filled with a synthetic dataset (see dataset.py).
+
+Every scenario runs twice, with an empty cache and then with the cache its
+first run filled, recording the number of queries, their time and the wall
+time of each run. A scenario fails if it does not respond with a 200, or
+if its first run makes more queries than its budget in budgets.json. The
+budgets are the queries measured by a --record-budgets run on the reference
+database, a scenario without one is not checked.
+"""
+import json
+import os
+import time
+
+from django.core.cache import cache
+from django.db import connection
+from django.test.client import Client
+from django.test.utils import CaptureQueriesContext
+
+from scenarios import get_scenarios
+
+BUDGETS_FILE = os.path.join(os.path.dirname(__file__), 'budgets.json')
+
+
+def load_budgets(filename=BUDGETS_FILE):
+    """{scenario name: maximal number of queries}"""
+    with open(filename) as f:
+        return json.load(f)
+
+
+def save_budgets(results, filename=BUDGETS_FILE):
+    """stores the queries of the scenarios which passed as their budgets"""
+    budgets = load_budgets(filename) if os.path.exists(filename) else {}
+    budgets.update((result['name'], result['cold']['queries']) for result in results if not result['error'])
+    with open(filename, 'w') as f:
+        json.dump(budgets, f, indent=4, sort_keys=True)
+        f.write('\n')
+
+
+def measure(run, client):
+    """runs the scenario, returns (the response, the measures of the run)"""
+    with CaptureQueriesContext(connection) as queries:
+        start = time.time()
+        response = run(client)
+        wall_time = time.time() - start
+    return response, {
+        'queries': len(queries),
+        'sql_time': round(sum(float(query['time']) for query in queries.captured_queries), 4),
+        'wall_time': round(wall_time, 4),
+    }
+
+
+def run_scenario(scenario, client, budget=None):
+    name, kind, target, run = scenario
+    result = {'name': name, 'kind': kind, 'target': target, 'budget': budget, 'error': None}
+    try:
+        cache.clear()
+        for run_name in ('cold', 'warm'):
+            response, result[run_name] = measure(run, client)
+            if response is not None and response.status_code != 200:
+                result['error'] = 'status %d' % response.status_code
+                break
+    except Exception as e:
+        result['error'] = '%s: %s' % (type(e).__name__, e)
+    if result['error'] is None and budget is not None and result['cold']['queries'] > budget:
+        result['error'] = '%d queries, over the budget of %d' % (result['cold']['queries'], budget)
+    return result
+
+
+def run_benchmarks(dataset, budgets=None, names=None):
+    """runs the scenarios (those with the names, if given), returns their results"""
+    budgets = budgets or {}
+    client = Client()
+    return [run_scenario(scenario, client, budgets.get(scenario[0]))
+            for scenario in get_scenarios(dataset) if not names or scenario[0] in names]
@@ -0,0 +1,246 @@
+# encoding: utf-8
+"""
+A synthetic dataset for the benchmarks, shaped like the real one: knessets
+of 120 members in a dozen parties, thousands of plenum votes in which every
+member votes, bills with proposers and votes, agendas, and committees whose
+protocols have up to thousands of parts.
+
+The rows with listeners are saved one by one in a bulk_import, so their
+derived rows are made by the listeners and batch handlers syncdata uses. The big tables
+(vote actions, protocol parts, tagged items) are bulk inserted.
+"""
+import datetime
+import random
+
+from django.contrib.auth.models import User
+from django.contrib.contenttypes.models import ContentType
+from django.db import transaction
+from tagging.models import Tag, TaggedItem
+
+from agendas.models import Agenda, AgendaVote
+from committees.enums import CommitteeTypes
+from committees.models import Committee, CommitteeMeeting, ProtocolPart, ProtocolPartsMetadata
+from knesset.utils import bulk_import
+from laws.enums import BillStages
+from laws.models import Bill, Vote, VoteAction
+from mks.models import Knesset, Party, Member, Membership
+
+SCALES = {
+    'small': dict(knessets=1, members=20, parties=4, votes=40, bills=30, committees=2, meetings=4,
+                  parts=20, long_protocol_parts=300, agendas=2, agenda_votes=20, tags=10),
+    'default': dict(knessets=2, members=120, parties=12, votes=3000, bills=600, committees=12, meetings=15,
+                    parts=60, long_protocol_parts=3000, agendas=6, agenda_votes=300, tags=100),
+    'large': dict(knessets=3, members=120, parties=14, votes=10000, bills=2000, committees=20, meetings=40,
+                  parts=100, long_protocol_parts=8000, agendas=15, agenda_votes=1000, tags=300),
+}
+
+# days of a knesset term
+TERM_DAYS = 4 * 365
+
+WORDS = (u'חוק', u'הצעת', u'תיקון', u'הכנסת', u'ועדה', u'תקציב', u'בריאות', u'חינוך', u'תחבורה', u'דיור',
+         u'ביטחון', u'רווחה', u'מסים', u'סביבה', u'עבודה', u'משפט', u'תקשורת', u'חקלאות', u'אנרגיה', u'מים')
+
+BILL_STAGES = (BillStages.PROPOSED, BillStages.PRE_APPROVED, BillStages.IN_COMMITTEE, BillStages.FIRST_VOTE,
+               BillStages.APPROVED, BillStages.FAILED_PRE_APPROVAL)
+
+VOTE_ACTION_TYPES = ((u'for', 45), (u'against', 30), (u'abstain', 5), (None, 20))
+
+
+class Dataset(object):
+    """the generated objects the scenarios look at"""
+
+    def __init__(self, scale):
+        self.scale = scale
+        self.knesset = None
+        self.members = []
+        self.parties = []
+        self.votes = []
+        self.bills = []
+        self.committees = []
+        self.meetings = []
+        self.long_meeting = None
+        self.agendas = []
+        self.user = None
+
+    def counts(self):
+        return dict((model._meta.object_name, model.objects.count()) for model in (
+            Knesset, Party, Member, Vote, VoteAction, Bill, Committee, CommitteeMeeting, ProtocolPart,
+            Agenda, AgendaVote, TaggedItem))
+
+
+class _Generator(object):
+
+    def __init__(self, sizes, seed):
+        self.sizes = sizes
+        self.random = random.Random(seed)
+
+    def text(self, words):
+        return u' '.join(self.random.choice(WORDS) for i in range(words))
+
+    def weighted(self, choices):
+        n = self.random.randint(1, sum(weight for choice, weight in choices))
+        for choice, weight in choices:
+            n -= weight
+            if n <= 0:
+                return choice
+
+    def knessets(self, dataset):
+        """the knessets with their parties and members, returns {knesset number: [members]}"""
+        sizes = self.sizes
+        today = datetime.date.today()
+        knesset_members = {}
+        member_id = 0
+        for number in range(1, sizes['knessets'] + 1):
+            start_date = today - datetime.timedelta(days=TERM_DAYS * (sizes['knessets'] - number) + TERM_DAYS / 2)
+            is_current = number == sizes['knessets']
+            knesset = Knesset.objects.create(
+                number=number, start_date=start_date,
+                end_date=None if is_current else start_date + datetime.timedelta(days=TERM_DAYS))
+            parties = []
+            for i in range(sizes['parties']):
+                seats = sizes['members'] / sizes['parties']
+                parties.append(Party.objects.create(
+                    name=u'%s %d' % (self.text(2), i), knesset=knesset, start_date=start_date,
+                    is_coalition=i < sizes['parties'] / 2, number_of_seats=seats, number_of_members=seats))
+            members = []
+            for i in range(sizes['members']):
+                member_id += 1
+                party = parties[i % len(parties)]
+                member = Member(id=member_id, name=u'%s %d' % (self.text(2), member_id), current_party=party,
+                                start_date=start_date, is_current=is_current,
+                                gender=self.random.choice(('M', 'F')),
+                                average_weekly_presence_hours=self.random.uniform(5, 40))
+                member.save()
+                members.append(member)
+            Membership.objects.bulk_create([
+                Membership(member=member, party=member.current_party, start_date=start_date)
+                for member in members])
+            knesset_members[number] = members
+            if is_current:
+                dataset.knesset = knesset
+                dataset.parties = parties
+                dataset.members = members
+        return knesset_members
+
+    def votes(self, dataset, knesset_members):
+        """the plenum votes of all the knessets, with the actions of their members"""
+        sizes = self.sizes
+        votes_per_knesset = sizes['votes'] / sizes['knessets']
+        actions = []
+        for number, members in sorted(knesset_members.items()):
+            knesset = Knesset.objects.get(number=number)
+            days = ((knesset.end_date or datetime.date.today()) - knesset.start_date).days - 1
+            for i in range(votes_per_knesset):
+                time = datetime.datetime.combine(
+                    knesset.start_date + datetime.timedelta(days=i * days / votes_per_knesset),
+                    datetime.time(10 + i % 8, i % 60))
+                vote_actions = []
+                for member in members:
+                    action_type = self.weighted(VOTE_ACTION_TYPES)
+                    if action_type is not None:
+                        vote_actions.append((member, action_type))
+                counts = dict((action_type, len([a for a in vote_actions if a[1] == action_type]))
+                              for action_type in (u'for', u'against', u'abstain'))
+                vote = Vote(title=u'%s %d' % (self.text(6), i), time=time, time_string=time.strftime('%d/%m/%Y'),
+                            meeting_number=i / 10, vote_number=i % 10, summary=self.text(30),
+                            importance=self.random.random(), controversy=self.random.randint(0, 100),
+                            votes_count=len(vote_actions), for_votes_count=counts[u'for'],
+                            against_votes_count=counts[u'against'], abstain_votes_count=counts[u'abstain'])
+                vote.save()
+                if number == sizes['knessets']:
+                    dataset.votes.append(vote)
+                actions.extend(VoteAction(vote=vote, member=member, party=member.current_party, type=action_type,
+                                          against_party=self.random.random() < 0.05)
+                               for member, action_type in vote_actions)
+        VoteAction.objects.bulk_create(actions, batch_size=1000)
+
+    def bills(self, dataset):
+        votes = list(dataset.votes)
+        self.random.shuffle(votes)
+        for i in range(self.sizes['bills']):
+            stage = self.random.choice(BILL_STAGES)
+            bill = Bill(title=u'%s %d' % (self.text(5), i), stage=stage,
+                        stage_date=dataset.knesset.start_date + datetime.timedelta(days=i % TERM_DAYS / 2),
+                        popular_name=self.text(2) if i % 5 == 0 else u'')
+            if stage in (BillStages.FIRST_VOTE, BillStages.APPROVED) and votes:
+                bill.first_vote = votes.pop()
+            if stage == BillStages.APPROVED and votes:
+                bill.approval_vote = votes.pop()
+            bill.save()
+            bill.proposers.add(*self.random.sample(dataset.members, self.random.randint(1, 4)))
+            if stage != BillStages.PROPOSED:
+                bill.pre_votes.add(self.random.choice(dataset.votes))
+            dataset.bills.append(bill)
+
+    def committees(self, dataset):
+        sizes = self.sizes
+        for i in range(sizes['committees']):
+            committee = Committee.objects.create(name=u'%s %d' % (self.text(2), i), type=CommitteeTypes.committee,
+                                                 description=self.text(20))
+            members = self.random.sample(dataset.members, min(len(dataset.members), 15))
+            committee.members.add(*members)
+            committee.chairpersons.add(members[0])
+            dataset.committees.append(committee)
+            for j in range(sizes['meetings']):
+                date = datetime.date.today() - datetime.timedelta(days=7 * j + i)
+                meeting = CommitteeMeeting.objects.create(
+                    committee=committee, date=date, date_string=date.strftime('%d/%m/%Y'),
+                    datetime=datetime.datetime.combine(date, datetime.time(10)),
+                    topics=self.text(8), protocol_text=self.text(50))
+                meeting.mks_attended.add(*self.random.sample(members, self.random.randint(3, len(members))))
+                dataset.meetings.append(meeting)
+        # the first meeting gets a long protocol
+        dataset.long_meeting = dataset.meetings[0]
+
+    def protocol_parts(self, dataset):
+        for meeting in dataset.meetings:
+            count = self.sizes['long_protocol_parts'] if meeting == dataset.long_meeting else self.sizes['parts']
+            speakers = list(meeting.mks_attended.all())
+            ProtocolPart.objects.bulk_create([
+                ProtocolPart(meeting=meeting, order=order, header=self.random.choice(speakers).name,
+                             body=self.text(self.random.randint(5, 80)), type='speech')
+                for order in range(count)], batch_size=1000)
+            ProtocolPartsMetadata.objects.update_for_meeting(meeting)
+
+    def agendas(self, dataset):
+        for i in range(self.sizes['agendas']):
+            agenda = Agenda.objects.create(name=u'%s %d' % (self.text(2), i), public_owner_name=self.text(2),
+                                           description=self.text(20), is_public=True)
+            agenda.editors.add(dataset.user)
+            AgendaVote.objects.bulk_create([
+                AgendaVote(agenda=agenda, vote=vote, score=self.random.choice((-1.0, -0.5, 0.5, 1.0)),
+                           importance=self.random.choice((0.3, 0.6, 1.0)), reasoning=self.text(10))
+                for vote in self.random.sample(dataset.votes, min(len(dataset.votes),
+                                                                  self.sizes['agenda_votes']))])
+            dataset.agendas.append(agenda)
+        AgendaVote.objects.compute_all()
+
+    def tags(self, dataset):
+        Tag.objects.bulk_create([Tag(name=u'%s %d' % (self.text(1), i)) for i in range(self.sizes['tags'])])
+        tags = list(Tag.objects.all())
+        items = []
+        for objects in (dataset.votes, dataset.bills, dataset.meetings):
+            content_type = ContentType.objects.get_for_model(objects[0])
+            for obj in objects:
+                items.extend(TaggedItem(tag=tag, content_type=content_type, object_id=obj.pk)
+                             for tag in self.random.sample(tags, self.random.randint(0, 3)))
+        TaggedItem.objects.bulk_create(items, batch_size=1000)
+
+
+def generate(scale='default', seed=0):
+    """fills the (empty) db with a dataset of the scale (see SCALES), returns its Dataset"""
+    generator = _Generator(SCALES[scale], seed)
+    dataset = Dataset(scale)
+    with transaction.atomic():
+        # outside of the bulk import, so its profile is created
+        dataset.user = User.objects.create_user('benchmark', 'benchmark@example.com', 'benchmark')
+        with bulk_import():
+            knesset_members = generator.knessets(dataset)
+            generator.votes(dataset, knesset_members)
+            generator.bills(dataset)
+            generator.committees(dataset)
+        generator.protocol_parts(dataset)
+        generator.agendas(dataset)
+        generator.tags(dataset)
+    Knesset.objects._current_knesset = None
+    return dataset
@@ -0,0 +1,82 @@
+"""
+The benchmarked pages, api endpoints and management commands. Each scenario
+is a (name, kind, target, run) tuple, run gets a test Client and returns
+the response (None for a command).
+"""
+import json
+import shutil
+import tempfile
+from StringIO import StringIO
+
+from django.conf import settings
+from django.core.management import call_command
+from django.core.urlresolvers import reverse
+
+from knesset.sitemap import write_sitemap_files
+
+
+def _api_url(resource_name, pk=None):
+    kwargs = {'api_name': 'v2', 'resource_name': resource_name}
+    if pk is None:
+        return reverse('api_dispatch_list', kwargs=kwargs) + '?format=json'
+    kwargs['pk'] = pk
+    return reverse('api_dispatch_detail', kwargs=kwargs) + '?format=json'
+
+
+def _page(name, url):
+    return name, 'page', url, lambda client: client.get(url)
+
+
+def _api(name, url):
+    return name, 'api', url, lambda client: client.get(url)
+
+
+def _command(name, *args):
+    def run(client):
+        call_command(name, *args, verbosity=0, stdout=StringIO())
+
+    return 'command-%s' % name, 'command', name, run
+
+
+def _write_sitemap(client):
+    directory = tempfile.mkdtemp()
+    try:
+        write_sitemap_files(directory, settings.MEDIA_URL, force=True)
+    finally:
+        shutil.rmtree(directory)
+
+
+def get_scenarios(dataset):
+    member = dataset.members[0]
+    vote = dataset.votes[len(dataset.votes) / 2]
+    bill = dataset.bills[0]
+    meeting = dataset.long_meeting
+    last_page = len(json.loads(meeting.parts_metadata.page_boundaries))
+    return [
+        _page('main', reverse('main')),
+        _page('member-list', reverse('member-stats', kwargs={'stat_type': 'abc'})),
+        _page('member-detail', reverse('member-detail', args=[member.id])),
+        _page('party-detail', reverse('party-detail', args=[member.current_party_id])),
+        _page('vote-list', reverse('vote-list')),
+        _page('vote-detail', reverse('vote-detail', args=[vote.id])),
+        _page('bill-list', reverse('bill-list')),
+        _page('bill-detail', reverse('bill-detail', args=[bill.id])),
+        _page('committee-list', reverse('committee-list')),
+        _page('committee-detail', reverse('committee-detail', args=[meeting.committee_id])),
+        _page('committee-meeting', reverse('committee-meeting', args=[meeting.id])),
+        _page('committee-meeting-last-page', reverse('committee-meeting', args=[meeting.id]) + '?page=%d' % last_page),
+        _page('agenda-list', reverse('agenda-list')),
+        _page('agenda-detail', reverse('agenda-detail', args=[dataset.agendas[0].id])),
+        _api('api-member-list', _api_url('member')),
+        _api('api-member-detail', _api_url('member', member.id)),
+        _api('api-party-list', _api_url('party')),
+        _api('api-vote-list', _api_url('vote')),
+        _api('api-vote-detail', _api_url('vote', vote.id)),
+        _api('api-bill-list', _api_url('bill')),
+        _api('api-bill-detail', _api_url('bill', bill.id)),
+        _api('api-committeemeeting-detail', _api_url('committeemeeting', meeting.id)),
+        _api('api-agenda-detail', _api_url('agenda', dataset.agendas[0].id)),
+        _command('rebuild_committee_attendance'),
+        _command('recalc_mks_bill_stats'),
+        ('command-write-sitemap', 'command', 'write_sitemap_files', _write_sitemap),
+    ]
@@ -0,0 +1,244 @@
+"""
+Conditional GET for the pages and api resources built from the db.
+
+track_changes connects the signals of models so every save, delete and m2m
+change of them stores a new "last changed" time, for the model and for the
+changed objects, in the cache (in a bulk import once, when it ends). It is
+called from the listeners of the apps, so every process writing to the db
+keeps the times. Writes which don't send signals (bulk_create, queryset
+updates) call touch themselves. track_related_changes keeps only the times
+of the objects a change is shown with, for the site-wide tables (comments,
+tags, links...) whose every change should not change every page.
+
+A time touched in a transaction is written again once it is committed (by
+the next touch out of a transaction, by TouchAfterCommitMiddleware at the
+end of a request, or when the process exits), so a page read by another
+request before the commit is not kept as the version of the committed data.
+
+A view depending on those models answers with an ETag made of their times,
+its own object's time, the url, the language and the logged in user (and a
+Last-Modified of the newest time). A request which already has that version
+gets a 304 before the object is fetched or anything is rendered.
+"""
+import atexit
+import math
+import threading
+import time
+import hashlib
+
+from django.contrib.contenttypes.models import ContentType
+from django.contrib.messages import get_messages
+from django.core.cache import cache
+from django.db import connection
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.http import HttpResponseNotModified
+from django.utils.cache import patch_vary_headers
+from django.utils.http import http_date, parse_etags, parse_http_date_safe
+from django.utils.translation import get_language
+
+from knesset.utils import defer_during_bulk_import
+
+MODEL_CHANGED_KEY = 'changed_%s'
+OBJECT_CHANGED_KEY = 'changed_%s_%s'
+
+# labels of the models whose changes are tracked
+_tracked = set()
+
+# the keys touched in the current transaction of the thread
+_uncommitted = threading.local()
+
+
+def _label(model):
+    return '%s.%s' % (model._meta.app_label, model._meta.model_name)
+
+
+def _in_transaction():
+    return connection.in_atomic_block or (connection.connection is not None and not connection.autocommit)
+
+
+def _write(keys):
+    if _in_transaction():
+        _uncommitted.__dict__.setdefault('keys', set()).update(keys)
+    else:
+        keys.update(_uncommitted.__dict__.pop('keys', ()))
+    cache.set_many(dict.fromkeys(keys, time.time()), None)
+
+
+def touch(model, pks=()):
+    """stores a new last changed time for the model, and for its objects with the given pks"""
+    label = _label(model)
+    keys = set([MODEL_CHANGED_KEY % label])
+    keys.update(OBJECT_CHANGED_KEY % (label, pk) for pk in pks)
+    _write(keys)
+
+
+def touch_objects(model, pks):
+    """stores a new last changed time for the objects of the model with the given pks, but not for the model"""
+    label = _label(model)
+    keys = set(OBJECT_CHANGED_KEY % (label, pk) for pk in pks)
+    if keys:
+        _write(keys)
+
+
+def touch_committed():
+    """writes again the times touched in a transaction which has been committed since"""
+    if getattr(_uncommitted, 'keys', None) and not _in_transaction():
+        cache.set_many(dict.fromkeys(_uncommitted.__dict__.pop('keys'), time.time()), None)
+
+atexit.register(touch_committed)
+
+
+class TouchAfterCommitMiddleware(object):
+    """writes again the times the request touched in its transactions"""
+
+    def process_response(self, request, response):
+        touch_committed()
+        return response
+
+
+def _changed_objects(kwargs):
+    """[(model, pks)] changed by the kwargs of a post_save, post_delete or m2m_changed signal"""
+    instance = kwargs['instance']
+    if kwargs['signal'] is not m2m_changed:
+        return [(kwargs['sender'], [instance.pk])]
+    if not kwargs['action'].startswith('post_'):
+        return []
+    return [(type(instance), [instance.pk]), (kwargs['model'], kwargs['pk_set'] or [])]
+
+
+def touch_changed(signals):
+    """the batch handler of the tracked changes of a bulk import"""
+    changed = {}
+    for kwargs in signals:
+        for model, pks in _changed_objects(kwargs):
+            changed.setdefault(model, set()).update(pks)
+    for model, pks in changed.items():
+        touch(model, pks)
+
+
+@defer_during_bulk_import(touch_changed, droppable=False)
+def handle_tracked_change(sender, **kwargs):
+    touch_changed([dict(kwargs, sender=sender)])
+
+
+def track_changes(*models):
+    """keeps the last changed times of the models, see the module docstring"""
+    for model in models:
+        label = _label(model)
+        _tracked.add(label)
+        post_save.connect(handle_tracked_change, sender=model, dispatch_uid='track_changes_%s' % label)
+        post_delete.connect(handle_tracked_change, sender=model, dispatch_uid='track_changes_%s' % label)
+        for field in model._meta.many_to_many:
+            m2m_changed.connect(handle_tracked_change, sender=field.rel.through,
+                                dispatch_uid='track_changes_%s_%s' % (label, field.name))
+
+
+def track_related_changes(model, related):
+    """
+    Keeps the last changed times of the objects the objects of the model are
+    shown with: related gets a saved or deleted object of the model and
+    returns the [(model, pk)] of those objects. Their models' times are not
+    changed, so a page of an object depends on such a model through its own
+    object's time rather than through its conditional models.
+    """
+    def touch_related(signals):
+        changed = {}
+        for kwargs in signals:
+            for related_model, pk in related(kwargs['instance']):
+                changed.setdefault(related_model, set()).add(pk)
+        for related_model, pks in changed.items():
+            touch_objects(related_model, pks)
+
+    @defer_during_bulk_import(touch_related, droppable=False)
+    def handle_related_change(sender, instance, **kwargs):
+        touch_related([{'instance': instance}])
+
+    dispatch_uid = 'track_related_changes_%s_%s' % (_label(model), related.__name__)
+    post_save.connect(handle_related_change, sender=model, weak=False, dispatch_uid=dispatch_uid)
+    post_delete.connect(handle_related_change, sender=model, weak=False, dispatch_uid=dispatch_uid)
+
+
+def content_object(object_id_field):
+    """the related function of track_related_changes for a model with a generic relation to its object"""
+    def related(instance):
+        model = ContentType.objects.get_for_id(instance.content_type_id).model_class()
+        return [(model, getattr(instance, object_id_field))] if model is not None else []
+    related.__name__ = 'content_object'
+    return related
+
+
+def is_tracked(model):
+    return _label(model) in _tracked
+
+
+def get_versions(model, pk=None, models=()):
+    """
+    Returns the last changed times of the object of the model with the pk (of
+    the model, if pk is None) and of the models. Unknown times are started
+    now, so a version which was lost from the cache is a new version.
+    """
+    keys = [MODEL_CHANGED_KEY % _label(m) for m in models]
+    if pk is None:
+        keys.insert(0, MODEL_CHANGED_KEY % _label(model))
+    else:
+        keys.insert(0, OBJECT_CHANGED_KEY % (_label(model), pk))
+    times = cache.get_many(keys)
+    missing = dict((key, time.time()) for key in keys if times.get(key) is None)
+    if missing:
+        cache.set_many(missing, None)
+        times.update(missing)
+    return [times[key] for key in keys]
+
+
+def get_validators(request, model, pk=None, models=(), extra=()):
+    """
+    Returns the (etag, last modified) of the response to the request, which
+    depends on the object of the model with the pk and on the models, or None
+    if the response can't be conditional: not all the models are tracked, or
+    it has messages to show.
+    """
+    if request.method not in ('GET', 'HEAD'):
+        return None
+    if not all(is_tracked(m) for m in (model,) + tuple(models)):
+        return None
+    if len(get_messages(request)):
+        return None
+    versions = get_versions(model, pk, models)
+    user = request.user.pk if request.user.is_authenticated() else None
+    etag = hashlib.md5(repr((request.get_host(), request.get_full_path(), get_language(), user,
+                             versions, extra))).hexdigest()
+    return etag, int(math.ceil(max(versions)))
+
+
+def not_modified(request, etag, last_modified):
+    """True if the request is conditional, and already has the version with the etag"""
+    if_none_match = request.META.get('HTTP_IF_NONE_MATCH')
+    if if_none_match:
+        etags = parse_etags(if_none_match)
+        return etag in etags or '*' in etags
+    if_modified_since = parse_http_date_safe(request.META.get('HTTP_IF_MODIFIED_SINCE', ''))
+    return bool(if_modified_since and last_modified and last_modified <= if_modified_since)
+
+
+def set_validators(response, etag, last_modified):
+    response['ETag'] = '"%s"' % etag
+    if last_modified:
+        response['Last-Modified'] = http_date(last_modified)
+    # the etag depends on the logged in user
+    patch_vary_headers(response, ('Cookie',))
+    return response
+
+
+def conditional_response(request, validators, get_response):
+    """returns a 304 for a request which has the validators' version, else get_response()"""
+    if validators is None:
+        return get_response()
+    etag, last_modified = validators
+    if not_modified(request, etag, last_modified):
+        response = HttpResponseNotModified()
+    else:
+        response = get_response()
+        if response.status_code != 200:
+            return response
+    return set_validators(response, etag, last_modified)
+
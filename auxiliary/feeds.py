@@ -1,7 +1,72 @@
+import calendar
+import hashlib
+
+from django.conf import settings
 from django.contrib.syndication.views import Feed
-from django.utils.translation import ugettext as _
+from django.core.cache import cache
+from django.core.exceptions import ObjectDoesNotExist
+from django.http import Http404, HttpResponse, HttpResponseNotModified
+from django.utils.http import http_date
+from django.utils.translation import ugettext as _, get_language
 from actstream.models import Action
 
+from auxiliary.conditional import not_modified
+
+
+class CachedFeed(Feed):
+    """
+    A feed whose rendered output is cached, keyed on the ids and timestamps
+    (version_fields) of its items, so a request costs one query of a few
+    columns while the items don't change. The feed is sent with an ETag (and
+    a Last-Modified of the newest timestamp_field), and conditional requests
+    which already have it get a 304.
+
+    Subclasses return an unsliced queryset from items_queryset. The feed
+    instance is shared by all the requests, so per request parameters must be
+    returned from get_object, which passes them to the other methods as obj.
+    """
+    items_limit = 20
+    version_fields = ('id',)
+    timestamp_field = None
+
+    def items_queryset(self, obj):
+        raise NotImplementedError
+
+    def items(self, obj):
+        return self.items_queryset(obj)[:self.items_limit]
+
+    def get_version(self, obj):
+        fields = self.version_fields + ((self.timestamp_field,) if self.timestamp_field else ())
+        return list(self.items_queryset(obj).prefetch_related(None).values_list(*fields)[:self.items_limit])
+
+    def __call__(self, request, *args, **kwargs):
+        try:
+            obj = self.get_object(request, *args, **kwargs)
+        except ObjectDoesNotExist:
+            raise Http404('Feed object does not exist.')
+        version = self.get_version(obj)
+        etag = hashlib.md5(repr((request.get_host(), request.get_full_path(), get_language(), version))).hexdigest()
+        last_modified = None
+        if self.timestamp_field and version:
+            last_modified = max(calendar.timegm(row[-1].utctimetuple()) for row in version)
+        if request.method in ('GET', 'HEAD') and not_modified(request, etag, last_modified):
+            response = HttpResponseNotModified()
+        else:
+            cache_key = 'feed_%s' % etag
+            cached = cache.get(cache_key)
+            if cached is None:
+                feedgen = self.get_feed(obj, request)
+                response = HttpResponse(content_type=feedgen.mime_type)
+                feedgen.write(response, 'utf-8')
+                cache.set(cache_key, (response.content, feedgen.mime_type), settings.LONG_CACHE_TIME)
+            else:
+                content, mime_type = cached
+                response = HttpResponse(content, content_type=mime_type)
+        response['ETag'] = '"%s"' % etag
+        if last_modified:
+            response['Last-Modified'] = http_date(last_modified)
+        return response
+
 def main_actions():
     """
     Actions used for main view latests actions and for /feeds/main
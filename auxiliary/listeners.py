@@ -0,0 +1,31 @@
+from actstream.models import Action, Follow
+from annotatetext.models import Annotation
+from django.contrib.comments.models import Comment
+from django.contrib.flatpages.models import FlatPage
+from django.db.models.signals import post_delete, post_save
+from tagging.models import TaggedItem
+from voting.models import Vote as UserVote
+
+from auxiliary.conditional import content_object, track_changes, track_related_changes
+from knesset.context import invalidate_flatpages
+from links.models import Link
+from persons.models import Person, Role
+from video.models import Video
+
+
+def handle_flatpage_change(sender, instance, **kwargs):
+    invalidate_flatpages()
+
+
+post_save.connect(handle_flatpage_change, sender=FlatPage)
+post_delete.connect(handle_flatpage_change, sender=FlatPage)
+
+# the models of other apps (and of apps without listeners) the conditional views depend on
+track_changes(Action, Follow, Comment, TaggedItem, Annotation, Link, Video, UserVote, Person, Role)
+
+# and the objects they are shown with, for the pages which depend on them through those objects
+track_related_changes(Comment, content_object('object_pk'))
+track_related_changes(TaggedItem, content_object('object_id'))
+track_related_changes(Follow, content_object('object_id'))
+track_related_changes(Link, content_object('object_pk'))
+track_related_changes(Video, content_object('object_pk'))
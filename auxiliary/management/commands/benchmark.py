@@ -0,0 +1,75 @@
+import json
+import time
+from optparse import make_option
+
+from django.core.management.base import NoArgsCommand, CommandError
+from django.db import connection
+from django.test.utils import setup_test_environment, teardown_test_environment
+from south.management.commands import patch_for_test_db_setup
+
+from auxiliary.benchmark import load_budgets, save_budgets, run_benchmarks
+from auxiliary.benchmark.dataset import SCALES, generate
+
+
+class Command(NoArgsCommand):
+    help = ("Fills a test database with a synthetic dataset, measures the queries and time of the main pages, "
+            "api endpoints and management commands, and fails if a query budget is exceeded")
+
+    option_list = NoArgsCommand.option_list + (
+        make_option('--scale', action='store', dest='scale', default='default', choices=sorted(SCALES),
+                    help='size of the dataset: %s' % ', '.join(sorted(SCALES))),
+        make_option('--seed', action='store', type='int', dest='seed', default=0,
+                    help='seed of the generated dataset'),
+        make_option('--output', action='store', dest='output', default='benchmark-report.json',
+                    help='file name of the json report'),
+        make_option('--only', action='store', dest='only', default='',
+                    help='comma separated names of the scenarios to run'),
+        make_option('--record-budgets', action='store_true', dest='record_budgets', default=False,
+                    help='store the measured queries as the budgets of the scenarios'),
+    )
+
+    def handle_noargs(self, **options):
+        verbosity = int(options.get('verbosity', 1))
+        names = [name for name in options['only'].split(',') if name]
+        setup_test_environment()
+        patch_for_test_db_setup()
+        old_name = connection.creation.create_test_db(verbosity, autoclobber=True)
+        try:
+            start = time.time()
+            dataset = generate(options['scale'], options['seed'])
+            generation_time = time.time() - start
+            if verbosity > 0:
+                self.stdout.write('generated the %s dataset in %.1f seconds\n' % (options['scale'], generation_time))
+            # recording measures the scenarios without the budgets they replace
+            budgets = None if options['record_budgets'] else load_budgets()
+            results = run_benchmarks(dataset, budgets, names)
+            counts = dataset.counts()
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity)
+            teardown_test_environment()
+
+        failures = [result for result in results if result['error']]
+        with open(options['output'], 'w') as f:
+            json.dump({
+                'database': connection.vendor,
+                'scale': options['scale'],
+                'seed': options['seed'],
+                'dataset': counts,
+                'generation_time': round(generation_time, 2),
+                'results': results,
+                'failures': [result['name'] for result in failures],
+            }, f, indent=2)
+        if verbosity > 0:
+            for result in results:
+                self.stdout.write('%-40s %s\n' % (result['name'], result['error'] or '%(queries)d queries, '
+                                                  '%(sql_time).3fs sql, %(wall_time).3fs' % result['cold']))
+            self.stdout.write('report written to %s\n' % options['output'])
+        unbudgeted = [result['name'] for result in results if result['budget'] is None]
+        if unbudgeted and not options['record_budgets']:
+            self.stderr.write('%d scenarios have no budget and were not checked (%s), record their budgets with '
+                              '--record-budgets on the reference database\n' % (len(unbudgeted), ', '.join(unbudgeted)))
+        if options['record_budgets']:
+            save_budgets(results)
+        if failures:
+            raise CommandError('%d scenarios failed: %s' % (
+                len(failures), ', '.join('%s (%s)' % (result['name'], result['error']) for result in failures)))
@@ -0,0 +1,19 @@
+from optparse import make_option
+
+from django.core.management.base import NoArgsCommand
+
+from auxiliary.actions import flush_action_queue
+
+
+class Command(NoArgsCommand):
+    help = "Moves the actions queued by the action buffer (see settings.ACTION_QUEUE) to the activity stream"
+
+    option_list = NoArgsCommand.option_list + (
+        make_option('--batch-size', action='store', type='int', dest='batch_size', default=1000,
+                    help='number of actions moved in each transaction'),
+    )
+
+    def handle_noargs(self, **options):
+        moved = flush_action_queue(options['batch_size'])
+        if int(options.get('verbosity', 1)) > 0:
+            self.stdout.write('moved %d actions\n' % moved)
@@ -0,0 +1,15 @@
+from django.core.management.commands import loaddata
+
+from knesset.utils import bulk_import
+
+
+class Command(loaddata.Command):
+    """
+    Django's loaddata, in a non-deferring bulk_import so the listeners decorated with
+    disable_for_loaddata are not called for the m2m relations of the fixtures
+    either (those signals have no raw flag).
+    """
+
+    def handle(self, *fixture_labels, **options):
+        with bulk_import(deferred=False):
+            return super(Command, self).handle(*fixture_labels, **options)
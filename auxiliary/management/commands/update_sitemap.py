@@ -1,15 +1,20 @@
-from django.core.management.base import NoArgsCommand
-from django.http import HttpRequest
-from django.contrib.sitemaps.views import sitemap
-from knesset.sitemap import sitemaps
+from optparse import make_option
+
 from django.conf import settings
-import os
+from django.core.management.base import NoArgsCommand
+
+from knesset.sitemap import write_sitemap_files
+
 
 class Command(NoArgsCommand):
+    help = "Writes the gzipped sitemap files of the sections which changed, and the sitemap index"
+
+    option_list = NoArgsCommand.option_list + (
+        make_option('--force', action='store_true', dest='force', default=False,
+                    help='write all the sections, even if they did not change'),
+    )
+
     def handle_noargs(self, **options):
-        h = HttpRequest()
-        s = sitemap(h, sitemaps=sitemaps)
-        f = open(os.path.join(settings.MEDIA_ROOT,
-                              'sitemap.xml'),'wt')
-        f.write(s.content)
-        f.close()
+        written = write_sitemap_files(settings.MEDIA_ROOT, settings.MEDIA_URL, force=options['force'])
+        if int(options.get('verbosity', 1)) > 0:
+            self.stdout.write('wrote sections: %s\n' % (', '.join(written) or 'none'))
@@ -5,6 +5,9 @@ from django.http import HttpResponse, Http404
 from django.views.generic import ListView
 from django.views.generic.list import BaseListView
 
+from auxiliary.conditional import conditional_response, get_validators
+from hashnav.keyset import KeysetPage
+
 
 class GetMoreView(ListView):
     """A base view for feeding data to 'get more...' type of links
@@ -19,6 +22,9 @@ class GetMoreView(ListView):
     We'll paginate the response. Since Get More link targets may already have
     initial data, we'll look for `initial` GET param, and take it into
     consideration, completing to page size.
+
+    With keyset pagination (see hashnav.keyset) the result has the "cursor"
+    of the next page instead of the "total".
     """
 
     def get_context_data(self, **kwargs):
@@ -45,10 +51,14 @@ class GetMoreView(ListView):
 
         result = {
             'content': tmpl_response.content,
-            'total': context['paginator'].num_pages,
             'current': page.number,
             'has_next': page.has_next(),
         }
+        if isinstance(page, KeysetPage):
+            # the next page is requested with its cursor, the list is not counted
+            result['cursor'] = page.next_cursor
+        else:
+            result['total'] = context['paginator'].num_pages
 
         return HttpResponse(json.dumps(result, ensure_ascii=False),
                             content_type='application/json')
@@ -112,4 +122,23 @@ class CsvView(BaseListView):
         When Excel opens a CSV file, it assumes the encoding is ASCII. The BOM
         directs it to decode the file with utf-8.
         """
-        fileobj.write('\xef\xbb\xbf')
\ No newline at end of file
+        fileobj.write('\xef\xbb\xbf')
+
+
+class ConditionalDetailMixin(object):
+    """
+    Conditional GET for a DetailView, which depends on its object (looked up
+    by pk) and on any change of the conditional_models (see
+    auxiliary.conditional). The models must be tracked for the view to be
+    conditional.
+    """
+    conditional_models = ()
+
+    def get_conditional_validators(self):
+        model = self.model or self.queryset.model
+        return get_validators(self.request, model, self.kwargs.get(self.pk_url_kwarg),
+                              self.conditional_models)
+
+    def get(self, request, *args, **kwargs):
+        return conditional_response(request, self.get_conditional_validators(),
+                                    lambda: super(ConditionalDetailMixin, self).get(request, *args, **kwargs))
@@ -97,6 +97,51 @@ class TagKeyphrase(models.Model):
     def __unicode__(self):
         return u"%s - %s" % (self.tag, self.phrase)
 
+
+class TagUsageManager(models.Manager):
+    def add_item(self, tag_id):
+        """counts a new item of the tag, returns whether it is the tag's first item"""
+        if self.filter(tag=tag_id).update(items=models.F('items') + 1):
+            return False
+        self.create(tag_id=tag_id, items=1)
+        return True
+
+    def remove_item(self, tag_id):
+        """counts a removed item of the tag, returns whether it was the tag's last item"""
+        if self.filter(tag=tag_id, items__gt=1).update(items=models.F('items') - 1):
+            return False
+        self.filter(tag=tag_id).delete()
+        return True
+
+
+class TagUsage(models.Model):
+    """
+    The number of tagged items of a used tag, kept by the TaggedItem
+    listeners so they know when a tag gets its first item or loses its last
+    one without counting its items
+    """
+    tag = models.OneToOneField(Tag, primary_key=True, related_name='usage')
+    items = models.PositiveIntegerField(default=0)
+
+    objects = TagUsageManager()
+
+
+class QueuedAction(models.Model):
+    """
+    An activity stream action waiting to be moved to the stream by the
+    flush_action_queue command, see auxiliary.actions
+    """
+    actor_content_type = models.ForeignKey(ContentType, related_name='+')
+    actor_object_id = models.CharField(max_length=255)
+    verb = models.CharField(max_length=255)
+    description = models.TextField(blank=True, null=True)
+    target_content_type = models.ForeignKey(ContentType, related_name='+', blank=True, null=True)
+    target_object_id = models.CharField(max_length=255, blank=True, null=True)
+    action_object_content_type = models.ForeignKey(ContentType, related_name='+', blank=True, null=True)
+    action_object_object_id = models.CharField(max_length=255, blank=True, null=True)
+    timestamp = models.DateTimeField()
+    public = models.BooleanField(default=True)
+
 # The following commented code is a part of an attempt to auto-tag
 # that wasn't successful enough, mostly because a lot of interesting
 # tags don't have enough training data.
@@ -164,3 +209,6 @@ class TagKeyphrase(models.Model):
 #                    print token.encode('utf8')
 #                    print t, t in o.tags
 #                    print token_objs
+
+
+from listeners import *
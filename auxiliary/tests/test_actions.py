@@ -0,0 +1,61 @@
+import datetime
+
+from actstream.models import Action
+from django.http import HttpResponse
+from django.test.client import RequestFactory
+from django.test.testcases import TestCase
+from django.test.utils import override_settings
+
+from auxiliary import actions
+from auxiliary.actions import ActionBufferMiddleware, buffer_actions, flush_action_queue, send_action
+from auxiliary.models import QueuedAction
+from mks.models import Member
+from laws.models import Vote
+
+
+class ActionBufferTest(TestCase):
+    def setUp(self):
+        self.mk = Member.objects.create(name='mk 1')
+        self.vote = Vote.objects.create(title='vote 1', time=datetime.datetime.now())
+
+    def test_buffered_actions_are_written_once(self):
+        with buffer_actions():
+            for i in range(3):
+                send_action(self.mk, verb='voted', target=self.vote, description=str(i))
+            send_action(self.mk, verb='posted')
+            self.assertEqual(Action.objects.count(), 0)
+        self.assertEqual(Action.objects.count(), 2)
+        self.assertEqual(Action.objects.get(verb='voted').description, '0')
+
+    def test_actions_are_dropped_on_error(self):
+        with self.assertRaises(ValueError):
+            with buffer_actions():
+                send_action(self.mk, verb='voted', target=self.vote)
+                raise ValueError()
+        self.assertEqual(Action.objects.count(), 0)
+
+    @override_settings(ACTION_QUEUE=True)
+    def test_queue(self):
+        with buffer_actions():
+            send_action(self.mk, verb='voted', target=self.vote)
+        self.assertEqual(Action.objects.count(), 0)
+        self.assertEqual(flush_action_queue(), 1)
+        self.assertFalse(QueuedAction.objects.exists())
+        action = Action.objects.get()
+        self.assertEqual((action.actor, action.verb, action.target), (self.mk, 'voted', self.vote))
+
+    def test_middleware_write_errors_do_not_fail_the_request(self):
+        def failing_write_actions(actions):
+            raise ValueError()
+        middleware = ActionBufferMiddleware()
+        request = RequestFactory().get('/')
+        response = HttpResponse()
+        middleware.process_request(request)
+        send_action(self.mk, verb='voted', target=self.vote)
+        write_actions = actions.write_actions
+        actions.write_actions = failing_write_actions
+        try:
+            self.assertIs(middleware.process_response(request, response), response)
+        finally:
+            actions.write_actions = write_actions
+        self.assertEqual(Action.objects.count(), 0)
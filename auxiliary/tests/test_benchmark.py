@@ -0,0 +1,33 @@
+from django.test import TestCase
+
+from auxiliary.benchmark import run_benchmarks
+from auxiliary.benchmark.dataset import SCALES, generate
+from laws.models import Vote, VoteAction
+from mks.models import Member
+
+NAMES = ('vote-detail', 'api-vote-list', 'command-rebuild_committee_attendance')
+
+
+class BenchmarkTest(TestCase):
+    def setUp(self):
+        self.dataset = generate('small')
+
+    def test_dataset(self):
+        sizes = SCALES['small']
+        self.assertEqual(Member.objects.count(), sizes['members'] * sizes['knessets'])
+        self.assertEqual(Vote.objects.count(), sizes['votes'])
+        self.assertTrue(VoteAction.objects.exists())
+        self.assertEqual(self.dataset.long_meeting.parts.count(), sizes['long_protocol_parts'])
+
+    def test_scenarios(self):
+        results = run_benchmarks(self.dataset, names=NAMES)
+        self.assertEqual([result['name'] for result in results], list(NAMES))
+        for result in results:
+            self.assertIsNone(result['error'], result)
+            for run in ('cold', 'warm'):
+                self.assertEqual(set(result[run]), set(['queries', 'sql_time', 'wall_time']))
+            self.assertGreater(result['cold']['queries'], 0)
+
+    def test_budget_exceeded(self):
+        results = run_benchmarks(self.dataset, budgets={'vote-detail': 0}, names=['vote-detail'])
+        self.assertIn('over the budget of 0', results[0]['error'])
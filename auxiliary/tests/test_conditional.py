@@ -0,0 +1,103 @@
+import datetime
+import time
+
+from django.contrib.auth.models import User
+from django.core.cache import get_cache
+from django.core.urlresolvers import reverse
+from django.test import TestCase
+
+from agendas.models import Agenda
+from auxiliary import conditional
+from links.models import Link
+from mks.models import Knesset, Party, Member
+
+
+class ConditionalDetailTest(TestCase):
+    def setUp(self):
+        # the tests run with a dummy cache
+        self.cache = get_cache('django.core.cache.backends.locmem.LocMemCache', LOCATION='conditional-test')
+        self.original_cache = conditional.cache
+        conditional.cache = self.cache
+        conditional._uncommitted.__dict__.pop('keys', None)
+        self.knesset = Knesset.objects.create(number=1, start_date=datetime.date.today() - datetime.timedelta(10))
+        self.party_1 = Party.objects.create(name='party 1', knesset=self.knesset)
+        self.party_2 = Party.objects.create(name='party 2', knesset=self.knesset)
+        self.url = reverse('party-detail', args=[self.party_1.id])
+
+    def tearDown(self):
+        conditional.cache = self.original_cache
+        self.cache.clear()
+
+    def assertNotModified(self, etag, **extra):
+        res = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag, **extra)
+        self.assertEqual(res.status_code, 304)
+        self.assertEqual(res['ETag'], etag)
+
+    def assertModified(self, etag, **extra):
+        res = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag, **extra)
+        self.assertEqual(res.status_code, 200)
+        self.assertNotEqual(res['ETag'], etag)
+        return res['ETag']
+
+    def test_touches_in_a_transaction_are_written_again_after_it(self):
+        # the test runs in a transaction
+        conditional.touch(Party, [self.party_1.id])
+        key = conditional.OBJECT_CHANGED_KEY % ('mks.party', self.party_1.id)
+        touched = self.cache.get(key)
+        conditional.touch_committed()
+        self.assertEqual(self.cache.get(key), touched)
+        in_transaction = conditional._in_transaction
+        conditional._in_transaction = lambda: False
+        try:
+            time.sleep(0.01)
+            conditional.touch_committed()
+        finally:
+            conditional._in_transaction = in_transaction
+        self.assertGreater(self.cache.get(key), touched)
+
+    def test_related_changes_touch_only_their_objects(self):
+        versions = lambda party: conditional.get_versions(Party, party.id, [Party])
+        party_1, party_2 = versions(self.party_1), versions(self.party_2)
+        time.sleep(0.01)
+        Link.objects.create(content_object=self.party_1, url='http://example.com', title='link', link_type=None)
+        changed = versions(self.party_1)
+        self.assertGreater(changed[0], party_1[0])
+        # not a change of the parties' model
+        self.assertEqual(changed[1], party_1[1])
+        self.assertEqual(versions(self.party_2), party_2)
+
+    def test_unchanged_page_is_not_modified(self):
+        res = self.client.get(self.url)
+        self.assertEqual(res.status_code, 200)
+        self.assertNotModified(res['ETag'])
+        self.assertNotModified(res['ETag'], HTTP_IF_MODIFIED_SINCE=res['Last-Modified'])
+        res = self.client.get(self.url, HTTP_IF_MODIFIED_SINCE=res['Last-Modified'])
+        self.assertEqual(res.status_code, 304)
+
+    def test_object_and_dependencies_changes(self):
+        etag = self.client.get(self.url)['ETag']
+        # another party is not a dependency of the page
+        self.party_2.name = 'party 2 changed'
+        self.party_2.save()
+        self.assertNotModified(etag)
+        self.party_1.name = 'party 1 changed'
+        self.party_1.save()
+        etag = self.assertModified(etag)
+        Member.objects.create(name='mk', current_party=self.party_1)
+        etag = self.assertModified(etag)
+        agenda = Agenda.objects.create(name='agenda')
+        etag = self.assertModified(etag)
+        agenda.editors.add(User.objects.create_user('editor', 'editor@example.com', 'editor'))
+        self.assertModified(etag)
+
+    def test_lost_versions_are_new_versions(self):
+        etag = self.client.get(self.url)['ETag']
+        self.cache.clear()
+        self.assertModified(etag)
+
+    def test_logged_in_users_have_their_own_version(self):
+        etag = self.client.get(self.url)['ETag']
+        User.objects.create_user('jacob', 'jacob@example.com', 'JKM')
+        self.assertTrue(self.client.login(username='jacob', password='JKM'))
+        etag = self.assertModified(etag)
+        self.assertNotModified(etag)
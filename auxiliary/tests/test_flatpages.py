@@ -0,0 +1,27 @@
+from django.contrib.flatpages.models import FlatPage
+from django.test import TestCase
+from django.test.client import RequestFactory
+
+from knesset import context
+
+
+class FlatpagesContextTest(TestCase):
+    def setUp(self):
+        self.page = FlatPage.objects.create(url='/about/page/', title='page', content='content')
+
+    def tearDown(self):
+        # the rolled back flatpages are not in the db anymore
+        context.invalidate_flatpages()
+
+    def test_processor(self):
+        res = context.processor(RequestFactory().get('/about/page/'))
+        self.assertEqual(res['flatpage']['title'], 'page')
+        self.assertEqual(context.processor(RequestFactory().get('/about/'))['flatpage'], None)
+
+    def test_changed_flatpages_are_loaded(self):
+        context.get_flatpages()
+        self.page.title = 'changed'
+        self.page.save()
+        self.assertEqual(context.get_flatpages()['/about/page/']['title'], 'changed')
+        self.page.delete()
+        self.assertNotIn('/about/page/', context.get_flatpages())
@@ -1,8 +1,17 @@
 # -*- coding: utf-8 -*
+import datetime
+import gzip
+import os
+import shutil
+import tempfile
+
 from django.core.urlresolvers import reverse
 from django.test.testcases import TestCase
 
-from knesset.sitemap import sitemaps
+from knesset import sitemap
+from knesset.sitemap import sitemaps, sitemap_sections, write_sitemap_files
+from laws.models import Vote
+from mks.models import Knesset, Member
 
 
 class SiteMapTest(TestCase):
@@ -15,4 +24,59 @@ class SiteMapTest(TestCase):
         for s in sitemaps.keys():
             res = self.client.get(reverse('sitemaps', kwargs={'section': s}))
             self.assertEqual(res.status_code, 200, 'sitemap %s returned %d' %
-                             (s, res.status_code))
\ No newline at end of file
+                             (s, res.status_code))
+
+class SitemapFilesTest(TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.knesset = Knesset.objects.create(number=1, start_date=datetime.date.today() - datetime.timedelta(10))
+        self.mk = Member.objects.create(name=u'מ"כ אחד')
+        self.vote_1 = Vote.objects.create(title='vote 1', time=datetime.datetime(2015, 1, 1))
+        self.vote_2 = Vote.objects.create(title='vote 2', time=datetime.datetime(2015, 2, 1))
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def _read_section(self, name, number=1):
+        f = gzip.open(os.path.join(self.directory, 'sitemap-%s-%d.xml.gz' % (name, number)))
+        try:
+            return f.read().decode('utf8')
+        finally:
+            f.close()
+
+    def test_write_sitemap_files(self):
+        written = write_sitemap_files(self.directory, '/media/')
+        self.assertEqual(written, sorted(sitemap_sections))
+        index = open(os.path.join(self.directory, 'sitemap.xml')).read()
+        self.assertIn('/media/sitemap-votes-1.xml.gz</loc><lastmod>2015-02-01</lastmod>', index)
+        self.assertNotIn('sitemap-bills-1.xml.gz', index)
+        votes = self._read_section('votes')
+        self.assertIn(u'%s</loc><lastmod>2015-01-01</lastmod>' % self.vote_1.get_absolute_url(), votes)
+        self.assertIn(self.mk.get_absolute_url(), self._read_section('members'))
+
+    def test_only_changed_sections_are_written(self):
+        write_sitemap_files(self.directory, '/media/')
+        self.assertEqual(write_sitemap_files(self.directory, '/media/'), [])
+        Vote.objects.create(title='vote 3', time=datetime.datetime(2015, 3, 1))
+        self.assertEqual(write_sitemap_files(self.directory, '/media/'), ['votes'])
+        self.assertIn('2015-03-01', self._read_section('votes'))
+        # changes which keep the number of rows and the latest lastmod
+        self.mk.name = 'renamed mk'
+        self.mk.save()
+        self.assertEqual(write_sitemap_files(self.directory, '/media/'), ['members'])
+        self.assertIn(self.mk.get_absolute_url(), self._read_section('members'))
+        Vote.objects.filter(id=self.vote_1.id).update(time=datetime.datetime(2015, 1, 2))
+        self.assertEqual(write_sitemap_files(self.directory, '/media/'), ['votes'])
+        self.assertEqual(write_sitemap_files(self.directory, '/media/', force=True), sorted(sitemap_sections))
+
+    def test_sections_are_split(self):
+        limit = sitemap.SITEMAP_FILE_LIMIT
+        sitemap.SITEMAP_FILE_LIMIT = 1
+        try:
+            write_sitemap_files(self.directory, '/media/')
+            self.assertIn(self.vote_2.get_absolute_url(), self._read_section('votes', 2))
+            self.vote_2.delete()
+            write_sitemap_files(self.directory, '/media/')
+            self.assertFalse(os.path.exists(os.path.join(self.directory, 'sitemap-votes-2.xml.gz')))
+        finally:
+            sitemap.SITEMAP_FILE_LIMIT = limit
@@ -9,6 +9,7 @@ from models import Committee, CommitteeMeeting, Topic, ProtocolPart
 from links.models import Link
 from django.utils.translation import ugettext_lazy as _
 from mks.utils import get_all_mk_names
+from persons.speakers import SpeakerResolver
 import logging
 
 logger = logging.getLogger(__name__)
@@ -91,15 +92,17 @@ class CommitteeMeetingAdmin(ImportExportModelAdmin):
 
     def redownload_and_reparse_protocol(self, request, qs):
         mks, mk_names = get_all_mk_names()
+        speakers = SpeakerResolver()
         for meeting in qs:
-            meeting.reparse_protocol(mks=mks, mk_names=mk_names)
+            meeting.reparse_protocol(mks=mks, mk_names=mk_names, speakers=speakers)
         self.message_user(request, "successfully redownloaded & reparsed %s meetings" % qs.count())
 
     def reparse_protocol(self, request, qs):
         mks, mk_names = get_all_mk_names()
+        speakers = SpeakerResolver()
         for meeting in qs:
             logger.debug('reparsing meeting %s' % meeting.pk)
-            meeting.reparse_protocol(redownload=False, mks=mks, mk_names=mk_names)
+            meeting.reparse_protocol(redownload=False, mks=mks, mk_names=mk_names, speakers=speakers)
         self.message_user(request, "successfully reparsed %s meetings" % qs.count())
 
     def update_metadata_from_dataservice(self, request, qs):
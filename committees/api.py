@@ -6,6 +6,7 @@ from tastypie.constants import ALL, ALL_WITH_RELATIONS
 
 from apis.resources.base import BaseResource
 from models import Committee, CommitteeMeeting, ProtocolPart
+from mks.models import Member
 from mks.api import MemberResource
 
 
@@ -63,6 +64,7 @@ class CommitteeMeetingResource(BaseResource):
             'committee': ALL_WITH_RELATIONS
         }
         limit = 500
+        conditional_models = (Committee, Member)
 
 
 class ProtocolPartResource(BaseResource):
@@ -1,14 +1,20 @@
-from django.db.models.signals import post_save,m2m_changed, pre_delete
+from django.db.models import Q
+from django.db.models.signals import post_save,m2m_changed, pre_delete, post_delete, pre_save
 from django.contrib.comments.signals import comment_was_posted
 from django.contrib.comments.models import Comment
 from django.contrib.contenttypes.models import ContentType
 from planet.models import Feed, Post
-from actstream import action, follow
+from tagging.models import Tag, TaggedItem
+from actstream import follow
+from auxiliary.actions import buffer_actions, send_action
+from auxiliary.conditional import touch, track_changes, track_related_changes
 from actstream.models import Action, Follow
 from annotatetext.models import Annotation
-from knesset.utils import disable_for_loaddata
+from knesset.utils import disable_for_loaddata, defer_during_bulk_import
+from links.models import Link
 from mks.models import Member
-from models import CommitteeMeeting, Topic
+from models import (Committee, CommitteeMeeting, ProtocolPart, ProtocolPartsMetadata, Topic, CommitteeAttendance,
+                    month_start, invalidate_committee_detail)
 
 cm_ct = None
 member_ct = None
@@ -25,34 +31,47 @@ def get_ct():
     user_ct = ContentType.objects.get(app_label="auth", model="user")
     annotation_ct = ContentType.objects.get(app_label="annotatetext", model="annotation")
 
-@disable_for_loaddata
-def handle_cm_save(sender, created, instance, **kwargs):
+def record_attendance(meeting_member_ids):
+    """creates the missing 'attended' actions of (meeting id, member id) pairs, checking them in one query"""
+    meeting_member_ids = set(meeting_member_ids)
+    if not meeting_member_ids:
+        return
     if not cm_ct:
         get_ct()
-    for m in instance.mks_attended.all():
-        if Action.objects.filter(actor_object_id=m.id,
-                                 actor_content_type=member_ct,
-                                 verb='attended',
-                                 target_object_id=instance.id,
-                                 target_content_type=cm_ct).count()==0:
-            action.send(m, verb='attended', target=instance, description='committee meeting', timestamp=instance.date)
+    meeting_ids = set(meeting_id for meeting_id, member_id in meeting_member_ids)
+    existing = set((int(meeting_id), int(member_id)) for meeting_id, member_id in Action.objects.filter(
+        actor_content_type=member_ct, verb='attended', target_content_type=cm_ct,
+        target_object_id__in=meeting_ids).values_list('target_object_id', 'actor_object_id'))
+    missing = sorted(meeting_member_ids - existing)
+    meetings = CommitteeMeeting.objects.in_bulk(set(meeting_id for meeting_id, member_id in missing))
+    members = Member.objects.in_bulk(set(member_id for meeting_id, member_id in missing))
+    with buffer_actions():
+        for meeting_id, member_id in missing:
+            meeting = meetings[meeting_id]
+            send_action(members[member_id], verb='attended', target=meeting, description='committee meeting',
+                        timestamp=meeting.date)
+
+def handle_cm_saves(signals):
+    meeting_ids = set(kwargs['instance'].id for kwargs in signals)
+    record_attendance(CommitteeMeeting.mks_attended.through.objects.filter(
+        committeemeeting__in=meeting_ids).values_list('committeemeeting', 'member'))
+
+def record_committee_presences(signals):
+    record_attendance((kwargs['instance'].id, mk_id) for kwargs in signals if kwargs['action'] == "post_add"
+                      for mk_id in kwargs['pk_set'])
+
+@defer_during_bulk_import(handle_cm_saves)
+@disable_for_loaddata
+def handle_cm_save(sender, created, instance, **kwargs):
+    record_attendance((instance.id, member_id) for member_id in instance.mks_attended.values_list('id', flat=True))
 post_save.connect(handle_cm_save, sender=CommitteeMeeting)
 
+@defer_during_bulk_import(record_committee_presences)
 @disable_for_loaddata
 def record_committee_presence(**kwargs):
-    if not member_ct:
-        get_ct()
     if kwargs['action'] != "post_add":
         return
-    meeting = kwargs['instance']
-    for mk_id in kwargs['pk_set']:
-        m = Member.objects.get(pk=mk_id)
-        if Action.objects.filter(actor_object_id=m.id,
-                                 actor_content_type=member_ct,
-                                 verb='attended',
-                                 target_object_id=meeting.id,
-                                 target_content_type=cm_ct).count()==0:
-            action.send(m, verb='attended', target=meeting, description='committee meeting', timestamp=meeting.date)
+    record_attendance((kwargs['instance'].id, mk_id) for mk_id in kwargs['pk_set'])
 m2m_changed.connect(record_committee_presence, sender=CommitteeMeeting.mks_attended.through)
 
 @disable_for_loaddata
@@ -66,7 +85,7 @@ def handle_annotation_save(sender, created, instance, **kwargs):
                 verb='annotation-added',
                 target_object_id=instance.id,
                 target_content_type=annotation_ct).count()==0:
-            action.send(instance.content_object.meeting, verb='annotation-added',
+            send_action(instance.content_object.meeting, verb='annotation-added',
                         target=instance, description=unicode(instance.flag_value))
         if Action.objects.filter(
                 actor_object_id=instance.user.id,
@@ -74,7 +93,7 @@ def handle_annotation_save(sender, created, instance, **kwargs):
                 verb='annotated',
                 target_object_id=instance.id,
                 target_content_type=annotation_ct).count()==0:
-            action.send(instance.user, verb='annotated',
+            send_action(instance.user, verb='annotated',
                         target=instance, description=unicode(instance.flag_value))
 
         if Follow.objects.filter(user=instance.user,
@@ -86,7 +105,7 @@ post_save.connect(handle_annotation_save, sender=Annotation)
 
 @disable_for_loaddata
 def handle_comment_save(sender, comment, request, **kwargs):
-    action.send(comment.content_object, verb='comment-added', target=comment,
+    send_action(comment.content_object, verb='comment-added', target=comment,
             description=comment.comment)
     follow(request.user, comment.content_object)
 comment_was_posted.connect(handle_comment_save)
@@ -95,3 +114,185 @@ def delete_related_activities(sender, instance, **kwargs):
     Action.objects.filter(target_object_id=instance.id, verb__in=('annotated', 'comment-added')).delete()
 pre_delete.connect(delete_related_activities, sender=Annotation)
 pre_delete.connect(delete_related_activities, sender=Comment)
+
+def _attended_meeting_ids(kwargs):
+    """the ids of the meetings whose attendance was changed by an mks_attended m2m_changed signal"""
+    if kwargs['action'] not in ('post_add', 'post_remove', 'post_clear'):
+        return []
+    if not kwargs['reverse']:
+        return [kwargs['instance'].id]
+    if kwargs['action'] == 'post_clear':
+        return getattr(kwargs['instance'], '_cleared_meeting_ids', [])
+    return kwargs['pk_set']
+
+def remember_cleared_meetings(sender, instance, action, reverse, **kwargs):
+    """the meetings of a member are not known after they were cleared"""
+    if action == 'pre_clear' and reverse:
+        instance._cleared_meeting_ids = list(instance.committee_meetings.values_list('id', flat=True))
+m2m_changed.connect(remember_cleared_meetings, sender=CommitteeMeeting.mks_attended.through)
+
+def update_attendances(signals):
+    meeting_ids = set()
+    for kwargs in signals:
+        meeting_ids.update(_attended_meeting_ids(kwargs))
+    CommitteeAttendance.objects.update_for_meetings(meeting_ids)
+
+@defer_during_bulk_import(update_attendances, droppable=False)
+def update_attendance(**kwargs):
+    meeting_ids = _attended_meeting_ids(kwargs)
+    if meeting_ids:
+        CommitteeAttendance.objects.update_for_meetings(meeting_ids)
+m2m_changed.connect(update_attendance, sender=CommitteeMeeting.mks_attended.through)
+
+def remember_meeting_month(sender, instance, **kwargs):
+    """the (committee id, month) of a meeting before it is saved, [] for a new meeting"""
+    instance._previous_committee_months = []
+    if instance.pk is not None:
+        instance._previous_committee_months = [
+            (committee_id, month_start(meeting_date)) for committee_id, meeting_date
+            in CommitteeMeeting.objects.filter(pk=instance.pk).values_list('committee', 'date')]
+pre_save.connect(remember_meeting_month, sender=CommitteeMeeting)
+
+def _moved_meeting_months(instance):
+    """the previous and the new (committee id, month) of a meeting which was moved to another committee or month"""
+    committee_month = (instance.committee_id, month_start(instance.date))
+    previous = getattr(instance, '_previous_committee_months', [])
+    if not previous or previous == [committee_month]:
+        return []
+    return previous + [committee_month]
+
+def update_moved_meetings_attendance(signals):
+    committee_months = set()
+    for kwargs in signals:
+        committee_months.update(_moved_meeting_months(kwargs['instance']))
+    CommitteeAttendance.objects.rebuild(committee_months)
+
+@defer_during_bulk_import(update_moved_meetings_attendance, droppable=False)
+def update_moved_meeting_attendance(sender, instance, **kwargs):
+    """the attendance of a meeting is counted in its committee and month"""
+    committee_months = _moved_meeting_months(instance)
+    if committee_months:
+        CommitteeAttendance.objects.rebuild(committee_months)
+post_save.connect(update_moved_meeting_attendance, sender=CommitteeMeeting)
+
+def update_deleted_meeting_attendance(sender, instance, **kwargs):
+    CommitteeAttendance.objects.rebuild([(instance.committee_id, month_start(instance.date))])
+post_delete.connect(update_deleted_meeting_attendance, sender=CommitteeMeeting)
+
+def invalidate_meetings_committees(signals):
+    invalidate_committee_detail(kwargs['instance'].committee_id for kwargs in signals)
+
+@defer_during_bulk_import(invalidate_meetings_committees, droppable=False)
+def invalidate_meeting_committee(sender, instance, **kwargs):
+    invalidate_committee_detail([instance.committee_id])
+post_save.connect(invalidate_meeting_committee, sender=CommitteeMeeting)
+
+def invalidate_member_committees(sender, instance, action, reverse, pk_set, **kwargs):
+    """the members, chairpersons and replacements of a committee changed"""
+    if reverse and action == 'pre_clear':
+        # the committees of a member are not known after they were cleared
+        committee_ids = sender.objects.filter(member=instance).values_list('committee', flat=True)
+    elif action in ('post_add', 'post_remove') or (action == 'post_clear' and not reverse):
+        committee_ids = pk_set if reverse else [instance.id]
+    else:
+        return
+    invalidate_committee_detail(committee_ids)
+for through in (Committee.members.through, Committee.chairpersons.through, Committee.replacements.through):
+    m2m_changed.connect(invalidate_member_committees, sender=through)
+
+def invalidate_annotation_committee(sender, instance, **kwargs):
+    if instance.content_type_id == ContentType.objects.get_for_model(ProtocolPart).id:
+        invalidate_committee_detail(ProtocolPart.objects.filter(id=instance.object_id).values_list(
+            'meeting__committee', flat=True))
+post_save.connect(invalidate_annotation_committee, sender=Annotation)
+post_delete.connect(invalidate_annotation_committee, sender=Annotation)
+
+def invalidate_members_committees(member_ids):
+    """the page of a committee shows its members with their links"""
+    member_ids = set(member_ids)
+    if member_ids:
+        invalidate_committee_detail(Committee.objects.filter(
+            Q(members__in=member_ids) | Q(chairpersons__in=member_ids) | Q(replacements__in=member_ids)
+        ).values_list('id', flat=True).distinct())
+
+def invalidate_saved_members_committees(signals):
+    invalidate_members_committees(kwargs['instance'].id for kwargs in signals)
+
+@defer_during_bulk_import(invalidate_saved_members_committees, droppable=False)
+def invalidate_member_committees_detail(sender, instance, **kwargs):
+    invalidate_members_committees([instance.id])
+post_save.connect(invalidate_member_committees_detail, sender=Member)
+# the committees of a deleted member are not known after its delete
+pre_delete.connect(invalidate_member_committees_detail, sender=Member)
+
+def _links_member_ids(links):
+    if not member_ct:
+        get_ct()
+    return [int(link.object_pk) for link in links if link.content_type_id == member_ct.id]
+
+def invalidate_saved_links_committees(signals):
+    invalidate_members_committees(_links_member_ids(kwargs['instance'] for kwargs in signals))
+
+@defer_during_bulk_import(invalidate_saved_links_committees, droppable=False)
+def invalidate_link_committees_detail(sender, instance, **kwargs):
+    invalidate_members_committees(_links_member_ids([instance]))
+post_save.connect(invalidate_link_committees_detail, sender=Link)
+post_delete.connect(invalidate_link_committees_detail, sender=Link)
+
+def invalidate_tag_occurrences(sender, instance, **kwargs):
+    """
+    the tags suggested for the protocols are the used tags, see
+    ok_tag.tag_suggestions. raw saves are counted too, so the tag usage
+    counts fixtures.
+    """
+    from auxiliary.models import TagUsage
+    from ok_tag import tag_suggestions
+    if sender is TaggedItem:
+        # only the first and the last items of a tag change the used tags
+        if kwargs.get('created') is False:
+            return
+        if kwargs.get('created'):
+            first_or_last = TagUsage.objects.add_item(instance.tag_id)
+        else:
+            first_or_last = TagUsage.objects.remove_item(instance.tag_id)
+        if not first_or_last:
+            return
+    tag_suggestions._all_tags_names = []
+    ProtocolPartsMetadata.objects.invalidate_tag_occurrences()
+    touch(ProtocolPartsMetadata)
+post_save.connect(invalidate_tag_occurrences, sender=Tag)
+post_delete.connect(invalidate_tag_occurrences, sender=Tag)
+post_save.connect(invalidate_tag_occurrences, sender=TaggedItem)
+post_delete.connect(invalidate_tag_occurrences, sender=TaggedItem)
+
+def touch_parts_meetings(signals):
+    touch(CommitteeMeeting, set(kwargs['instance'].meeting_id for kwargs in signals))
+
+@defer_during_bulk_import(touch_parts_meetings, droppable=False)
+def touch_part_meeting(sender, instance, **kwargs):
+    """the parts are shown on their meeting's page, which depends on its change time"""
+    touch(CommitteeMeeting, [instance.meeting_id])
+post_save.connect(touch_part_meeting, sender=ProtocolPart)
+post_delete.connect(touch_part_meeting, sender=ProtocolPart)
+
+def refresh_parts_metadata(signals):
+    ProtocolPartsMetadata.objects.refresh(set(kwargs['instance'].meeting_id for kwargs in signals))
+
+@defer_during_bulk_import(refresh_parts_metadata, droppable=False)
+@disable_for_loaddata
+def refresh_part_metadata(sender, instance, **kwargs):
+    """the page boundaries and speaker colors of the meeting depend on all of its parts"""
+    ProtocolPartsMetadata.objects.refresh([instance.meeting_id])
+post_save.connect(refresh_part_metadata, sender=ProtocolPart)
+post_delete.connect(refresh_part_metadata, sender=ProtocolPart)
+
+# the changes of protocol parts are tracked by their meetings, see touch_part_meeting
+track_changes(Committee, CommitteeMeeting, ProtocolPartsMetadata, Topic)
+
+def annotated_meetings(annotation):
+    """the meeting of an annotated protocol part"""
+    if annotation.content_type_id != ContentType.objects.get_for_model(ProtocolPart).id:
+        return []
+    return [(CommitteeMeeting, meeting_id) for meeting_id in
+            ProtocolPart.objects.filter(pk=annotation.object_id).values_list('meeting_id', flat=True)]
+track_related_changes(Annotation, annotated_meetings)
@@ -0,0 +1,12 @@
+from django.core.management.base import NoArgsCommand
+
+from committees.models import CommitteeAttendance
+
+
+class Command(NoArgsCommand):
+    help = "Recounts the committee attendance table from the meetings' attending members"
+
+    def handle_noargs(self, **options):
+        CommitteeAttendance.objects.rebuild()
+        if int(options.get('verbosity', 1)) > 0:
+            self.stdout.write('%d attendance rows\n' % CommitteeAttendance.objects.count())
@@ -1,12 +1,19 @@
 # encoding: utf-8
 import re
+import json
+import hashlib
 import logging
+import colorsys
+import operator
+from collections import defaultdict
 from datetime import datetime, timedelta, date
-from django.db import models
+from django.db import models, transaction
+from django.db.models import Sum
 from django.db.models.query_utils import Q
 from django.utils.translation import ugettext_lazy as _, ugettext
 from django.utils.text import Truncator
 from django.contrib.contenttypes import generic
+from django.contrib.contenttypes.models import ContentType
 from django.contrib.auth.models import User
 from django.core.cache import cache
 from django.utils.functional import cached_property
@@ -14,6 +21,7 @@ from django.conf import settings
 from tagging.models import Tag, TaggedItem
 from djangoratings.fields import RatingField
 
+from auxiliary.conditional import touch
 from committees.enums import CommitteeTypes
 from events.models import Event
 from links.models import Link
@@ -21,14 +29,32 @@ from mks.models import Knesset
 from lobbyists.models import LobbyistCorporation
 from itertools import groupby
 from hebrew_numbers import gematria_to_int
+from knesset.utils import bulk_import
 
 from knesset_data_django.committees import members_extended
 
 COMMITTEE_PROTOCOL_PAGINATE_BY = 120
 
+PLENUM_VOTE_LINK_TITLE = u'לדיון בישיבת המליאה'
+
 logger = logging.getLogger("open-knesset.committees.models")
 
+# the cached part of the committee page context, by committee id and show_member_presence
+COMMITTEE_DETAIL_CACHE_KEY = 'committee_detail_%d_%d'
+
+
+def invalidate_committee_detail(committee_ids):
+    """drops the cached page context (see CommitteeDetailView) of the given committees"""
+    cache.delete_many([COMMITTEE_DETAIL_CACHE_KEY % (committee_id, show_member_presence)
+                       for committee_id in set(committee_ids) for show_member_presence in (False, True)])
+
 
+def get_protocol_text_hash(protocol_text):
+    if not protocol_text:
+        return None
+    if isinstance(protocol_text, unicode):
+        protocol_text = protocol_text.encode('utf8')
+    return hashlib.sha1(protocol_text).hexdigest()
 
 
 class Committee(models.Model):
@@ -123,8 +149,7 @@ class Committee(models.Model):
     def recent_meetings(self, limit=10, do_limit=True):
         relevant_meetings = self.meetings.all().order_by('-date')
         if do_limit:
-            more_available = relevant_meetings.count() > limit
-            return relevant_meetings[:limit], more_available
+            return _limit(relevant_meetings, limit)
         else:
             return relevant_meetings
 
@@ -133,28 +158,33 @@ class Committee(models.Model):
         relevant_events = self.events.filter(when__gt=current_date).order_by(
             'when')
         if do_limit:
-            more_available = relevant_events.count() > limit
-            return relevant_events[:limit], more_available
+            return _limit(relevant_events, limit)
         else:
             return relevant_events
 
     def protocol_not_yet_published_meetings(self, end_date, limit=10,
                                             do_limit=True):
-        start_date = self.meetings.all().order_by(
-            '-date').first().date + timedelta(days=1) \
-            if self.meetings.count() > 0 \
+        last_meeting_date = self.meetings.order_by('-date').values_list(
+            'date', flat=True).first()
+        start_date = last_meeting_date + timedelta(days=1) \
+            if last_meeting_date is not None \
             else datetime.now()
         relevant_events = self.events.filter(when__gt=start_date,
                                              when__lte=end_date).order_by(
             '-when')
 
         if do_limit:
-            more_available = relevant_events.count() > limit
-            return relevant_events[:limit], more_available
+            return _limit(relevant_events, limit)
         else:
             return relevant_events
 
 
+def _limit(queryset, limit):
+    """returns (the first limit objects, whether there are more) with one query"""
+    objects = list(queryset[:limit + 1])
+    return objects[:limit], len(objects) > limit
+
+
 not_header = re.compile(
     r'(^אני )|((אלה|אלו|יבוא|מאלה|ייאמר|אומר|אומרת|נאמר|כך|הבאים|הבאות):$)|(\(.\))|(\(\d+\))|(\d\.)'.decode(
         'utf8'))
@@ -190,6 +220,66 @@ class CommitteeMeetingManager(models.Manager):
 
         return qs.select_related('committee')
 
+    def plenum_meeting_numbers(self, meetings):
+        """
+        Returns {meeting id: plenum meeting number} for the given plenum meetings,
+        parsed from the first protocol part mentioning the meeting (ישיבה)
+        """
+        first_parts = {}
+        for meeting_id, part_id in ProtocolPart.objects.filter(
+                meeting__in=meetings, body__contains=u'ישיבה').order_by(
+                'meeting', 'order', 'id').values_list('meeting', 'id').iterator():
+            first_parts.setdefault(meeting_id, part_id)
+        numbers = {}
+        for meeting_id, body in ProtocolPart.objects.filter(
+                id__in=first_parts.values()).values_list('meeting', 'body'):
+            r = re.search(u'ישיבה (.*)$', body)
+            if r:
+                number = gematria_to_int(r.groups()[0])
+                if number:
+                    numbers[meeting_id] = number
+        return numbers
+
+    def plenum_link_votes(self, meetings):
+        """
+        Links the votes of the given plenum meetings to the protocol parts
+        announcing them. All the vote headers are parsed in one pass, and only
+        the missing links are created. Returns the number of links created.
+        """
+        from laws.models import Vote
+        meetings = dict((meeting.pk, meeting) for meeting in meetings)
+        meeting_numbers = self.plenum_meeting_numbers(meetings.keys())
+        # (plenum meeting number, vote number) -> protocol part urls
+        part_urls = {}
+        for meeting_id, order, header in ProtocolPart.objects.filter(
+                meeting__in=meeting_numbers.keys(), header__contains=u'הצבעה').values_list(
+                'meeting', 'order', 'header').iterator():
+            r = re.search(r' (\d+)$', header)
+            if r:
+                url = get_protocol_part_url(meetings[meeting_id], order)
+                part_urls.setdefault((meeting_numbers[meeting_id], int(r.groups()[0])), []).append(url)
+        if not part_urls:
+            return 0
+
+        vote_urls = {}
+        for vote_id, meeting_number, vote_number in Vote.objects.filter(
+                meeting_number__in=set(meeting_numbers.values())).values_list(
+                'id', 'meeting_number', 'vote_number').iterator():
+            urls = part_urls.get((meeting_number, vote_number))
+            if urls:
+                vote_urls[unicode(vote_id)] = urls
+
+        vote_ct = ContentType.objects.get_for_model(Vote)
+        existing = set(Link.objects.filter(content_type=vote_ct, object_pk__in=vote_urls.keys()).values_list(
+            'object_pk', 'url'))
+        missing = set((vote_pk, url) for vote_pk, urls in vote_urls.items() for url in urls) - existing
+        Link.objects.bulk_create([Link(content_type=vote_ct, object_pk=vote_pk, url=url,
+                                       title=PLENUM_VOTE_LINK_TITLE)
+                                  for vote_pk, url in missing])
+        if missing:
+            touch(Link)
+        return len(missing)
+
 
 class CommitteesMeetingsOnlyManager(CommitteeMeetingManager):
     def get_queryset(self):
@@ -211,6 +301,9 @@ class CommitteeMeeting(models.Model):
     protocol_text_update_date = models.DateField(blank=True, null=True)
     # the date the protocol parts were last parsed and saved
     protocol_parts_update_date = models.DateField(blank=True, null=True)
+    # hash of the protocol text, compared with the hash of the parsed text
+    # in ProtocolPartsMetadata to find protocols which need to be parsed
+    protocol_text_hash = models.CharField(max_length=40, blank=True, null=True)
     topics = models.TextField(null=True, blank=True)
     src_url = models.URLField(max_length=1024, null=True, blank=True)
     tagged_items = generic.GenericRelation(TaggedItem,
@@ -271,19 +364,48 @@ class CommitteeMeeting(models.Model):
     tags = property(_get_tags, _set_tags)
 
     def save(self, **kwargs):
+        self.protocol_text_hash = get_protocol_text_hash(self.protocol_text)
         super(CommitteeMeeting, self).save(**kwargs)
 
-    def create_protocol_parts(self, delete_existing=False, mks=None, mk_names=None):
+    def create_protocol_parts(self, delete_existing=False, mks=None, mk_names=None, speakers=None):
+        """
+        Creates the protocol parts with knesset_data_django, and assigns their
+        speakers in one pass of speakers, a persons.speakers.SpeakerResolver.
+        Pass the same speakers when parsing many meetings so the persons are
+        loaded only once.
+        """
         from knesset_data_django.committees.meetings import create_protocol_parts
-        create_protocol_parts(self, delete_existing, mks, mk_names)
+        # the meeting is touched once, see committees.listeners.touch_part_meeting
+        with bulk_import():
+            create_protocol_parts(self, delete_existing, mks, mk_names)
+        self._protocol_parts_created(speakers)
+
+    def _protocol_parts_created(self, speakers=None):
+        if self.pk is None:
+            # deleted by the parser as a duplicate of another meeting
+            return
+        if speakers is None:
+            from persons.speakers import SpeakerResolver
+            speakers = SpeakerResolver()
+        speakers.assign_speakers(self)
+        ProtocolPartsMetadata.objects.update_for_meeting(self)
+        # the parts were created without signals
+        touch(CommitteeMeeting, [self.pk])
 
     def redownload_protocol(self):
         from knesset_data_django.committees.meetings import redownload_protocol
         redownload_protocol(self)
 
-    def reparse_protocol(self, redownload=True, mks=None, mk_names=None):
-        from knesset_data_django.committees.meetings import reparse_protocol
-        reparse_protocol(self, redownload, mks, mk_names)
+    def reparse_protocol(self, redownload=True, mks=None, mk_names=None, speakers=None):
+        from knesset_data_django.committees.meetings import find_attending_members, parse_for_existing_meeting
+        if redownload:
+            self.redownload_protocol()
+        if self.committee.type == 'plenum':
+            # parses with create_protocol_parts
+            parse_for_existing_meeting(self)
+        else:
+            self.create_protocol_parts(delete_existing=True, speakers=speakers)
+            find_attending_members(self, mks, mk_names)
 
     def update_from_dataservice(self, dataservice_object=None):
         # TODO: obviousely broken, not sure what was here originaly and where it moved
@@ -312,33 +434,10 @@ class CommitteeMeeting(models.Model):
 
     @property
     def plenum_meeting_number(self):
-        res = None
-        parts = self.parts.filter(body__contains=u'ישיבה')
-        if parts.count() > 0:
-            r = re.search(u'ישיבה (.*)$', self.parts.filter(
-                body__contains=u'ישיבה').first().body)
-            if r:
-                res = gematria_to_int(r.groups()[0])
-        return res
+        return CommitteeMeeting.objects.plenum_meeting_numbers([self]).get(self.pk)
 
     def plenum_link_votes(self):
-        from laws.models import Vote
-        if self.plenum_meeting_number:
-            for vote in Vote.objects.filter(
-                    meeting_number=self.plenum_meeting_number):
-                for part in self.parts.filter(header__contains=u'הצבעה'):
-                    r = re.search(r' (\d+)$', part.header)
-                    if r and vote.vote_number == int(r.groups()[0]):
-                        url = part.get_absolute_url()
-                        Link.objects.get_or_create(
-                            object_pk=vote.pk,
-                            content_type=ContentType.objects.get_for_model(
-                                Vote),
-                            url=url,
-                            defaults={
-                                'title': u'לדיון בישיבת המליאה'
-                            }
-                        )
+        return CommitteeMeeting.objects.plenum_link_votes([self])
 
     def get_bg_material(self):
         """
@@ -404,6 +503,159 @@ class CommitteeMeetingAttendee(models.Model):
     additional_information = models.TextField(null=True,blank=True)
 
 
+def month_start(d):
+    return date(d.year, d.month, 1)
+
+
+def _next_month(month):
+    return date(month.year + month.month / 12, month.month % 12 + 1, 1)
+
+
+class CommitteeAttendanceManager(models.Manager):
+
+    def _count(self, meetings):
+        """{(committee id, month, member id): count} of the attendance in the meetings"""
+        counts = defaultdict(int)
+        meeting_months = {}
+        for meeting_id, committee_id, meeting_date, member_id in CommitteeMeeting.mks_attended.through.objects.filter(
+                committeemeeting__in=meetings).values_list(
+                'committeemeeting', 'committeemeeting__committee', 'committeemeeting__date', 'member').iterator():
+            month = month_start(meeting_date)
+            counts[(committee_id, month, member_id)] += 1
+            meeting_months[meeting_id] = (committee_id, month)
+        for committee_id, month in meeting_months.values():
+            counts[(committee_id, month, None)] += 1
+        return counts
+
+    @transaction.atomic
+    def rebuild(self, committee_months=None):
+        """Recounts the attendance in the given (committee id, month) pairs, or in all the meetings"""
+        meetings = CommitteeMeeting.objects.all()
+        rows = self.all()
+        if committee_months is not None:
+            committee_months = set(committee_months)
+            if not committee_months:
+                return
+            meetings = meetings.filter(reduce(operator.or_, [
+                Q(committee=committee_id, date__gte=month, date__lt=_next_month(month))
+                for committee_id, month in committee_months]))
+            rows = rows.filter(reduce(operator.or_, [
+                Q(committee=committee_id, month=month) for committee_id, month in committee_months]))
+        rows.delete()
+        if committee_months is None:
+            invalidate_committee_detail(Committee.objects.values_list('id', flat=True))
+        else:
+            invalidate_committee_detail(committee_id for committee_id, month in committee_months)
+        self.bulk_create([CommitteeAttendance(committee_id=committee_id, month=month, member_id=member_id,
+                                              meetings=count)
+                          for (committee_id, month, member_id), count in self._count(meetings).items()],
+                         batch_size=1000)
+
+    def update_for_meetings(self, meeting_ids):
+        self.rebuild((committee_id, month_start(meeting_date)) for committee_id, meeting_date
+                     in CommitteeMeeting.objects.filter(id__in=meeting_ids).values_list('committee', 'date'))
+
+    def counts(self, committees, from_date, member_ids=None):
+        """
+        Returns {committee id: {member id: [meetings attended since from_date, this year]}}
+        with one query, member id None counting the meetings anyone attended.
+        Whole months are counted, from the month of from_date.
+        """
+        from_month = month_start(from_date)
+        year_start = date.today().replace(month=1, day=1)
+        rows = self.filter(committee__in=committees, month__gte=min(from_month, year_start))
+        if member_ids is not None:
+            rows = rows.filter(Q(member__in=member_ids) | Q(member=None))
+        counts = defaultdict(lambda: defaultdict(lambda: [0, 0]))
+        for committee_id, member_id, month, meetings in rows.values_list('committee', 'member', 'month', 'meetings'):
+            count = counts[committee_id][member_id]
+            if month >= from_month:
+                count[0] += meetings
+            if month >= year_start:
+                count[1] += meetings
+        return counts
+
+    def member_totals(self, from_date, by_committee=False):
+        """
+        Returns {member id: meetings attended since the month of from_date},
+        or {(member id, committee id): meetings} if by_committee is given
+        """
+        fields = ('member', 'committee') if by_committee else ('member',)
+        rows = self.filter(month__gte=month_start(from_date)).exclude(member=None).order_by().values_list(
+            *fields).annotate(Sum('meetings'))
+        return dict((row[:-1] if by_committee else row[0], row[-1]) for row in rows)
+
+
+class CommitteeAttendance(models.Model):
+    """
+    The number of meetings of a committee a member attended in a month,
+    maintained from CommitteeMeeting.mks_attended (see committees.listeners).
+    The row without a member counts the meetings anyone attended.
+    Rebuild with the rebuild_committee_attendance command.
+    """
+    committee = models.ForeignKey(Committee, related_name='attendance')
+    member = models.ForeignKey('mks.Member', related_name='committee_attendance', null=True, blank=True)
+    month = models.DateField()
+    meetings = models.PositiveIntegerField(default=0)
+
+    objects = CommitteeAttendanceManager()
+
+    class Meta:
+        unique_together = ('committee', 'member', 'month')
+
+    def __unicode__(self):
+        return u'%s %s %s: %d' % (self.committee, self.member, self.month, self.meetings)
+
+
+def _percentage(count, total):
+    return 100 * count / total if total else 0
+
+
+def members_by_presence(committee, ids=None, from_date=None, current_only=False):
+    """
+    Returns the members of the committee (or the members with the given ids)
+    sorted by their presence percentage, counted by CommitteeAttendance since
+    from_date (the current knesset by default, also counting this year then).
+    """
+    include_this_year = from_date is None
+    if from_date is None:
+        from_date = Knesset.objects.current_knesset().start_date
+    members = list(members_extended(committee, current_only, ids))
+    counts = CommitteeAttendance.objects.counts([committee], from_date, [m.id for m in members])[committee.id]
+    total, year_total = counts[None]
+    for member in members:
+        count, year_count = counts[member.id]
+        member.meetings_percentage = _percentage(count, total)
+        if include_this_year:
+            member.meetings_percentage_year = _percentage(year_count, year_total)
+    return sorted(members, key=lambda x: x.meetings_percentage, reverse=True)
+
+
+def member_presence(member, committees, from_date=None):
+    """{committee id: presence percentage} of the member in the current knesset (or since from_date)"""
+    if from_date is None:
+        from_date = Knesset.objects.current_knesset().start_date
+    counts = CommitteeAttendance.objects.counts(committees, from_date, [member.id])
+    return dict((committee.id, _percentage(counts[committee.id][member.id][0], counts[committee.id][None][0]))
+                for committee in committees)
+
+
+def get_protocol_part_url(meeting, order):
+    """url of the protocol part with the given order, without loading the part"""
+    if order == 1:
+        return meeting.get_absolute_url()
+    else:
+        page_num = 1 + (order - 1) / COMMITTEE_PROTOCOL_PAGINATE_BY
+        if page_num == 1:  # this is on first page
+            return "%s#speech-%d-%d" % (meeting.get_absolute_url(),
+                                        meeting.id, order)
+        else:
+            return "%s?page=%d#speech-%d-%d" % (
+                meeting.get_absolute_url(),
+                page_num,
+                meeting.id, order)
+
+
 class ProtocolPartManager(models.Manager):
     def list(self):
         return self.order_by("order")
@@ -425,24 +677,136 @@ class ProtocolPart(models.Model):
         ordering = ('order', 'id')
 
     def get_absolute_url(self):
-        if self.order == 1:
-            return self.meeting.get_absolute_url()
-        else:
-            page_num = 1 + (self.order - 1) / COMMITTEE_PROTOCOL_PAGINATE_BY
-            if page_num == 1:  # this is on first page
-                return "%s#speech-%d-%d" % (self.meeting.get_absolute_url(),
-                                            self.meeting.id, self.order)
-            else:
-                return "%s?page=%d#speech-%d-%d" % (
-                    self.meeting.get_absolute_url(),
-                    page_num,
-                    self.meeting.id, self.order)
+        return get_protocol_part_url(self.meeting, self.order)
 
     def __unicode__(self):
         return "%s %s: %s" % (self.meeting.committee.name, self.header,
                               self.body)
 
 
+def count_tag_occurrences(meeting, bodies):
+    """{tag name: number of occurrences} in the topics of the meeting and the bodies of its parts"""
+    from ok_tag.tag_suggestions import count_tags_in_texts, used_tags_names
+    return count_tags_in_texts([meeting.topics] + list(bodies), used_tags_names())
+
+
+def _protocol_layout(parts):
+    """
+    Returns the json page boundaries and speaker colors of the protocol
+    parts, a list of (order, header, speaker mk id) in the protocol order.
+    """
+    page_boundaries = [order for i, (order, header, mk) in enumerate(parts)
+                       if i % COMMITTEE_PROTOCOL_PAGINATE_BY == 0]
+
+    speakers = sorted(set((header, mk) for order, header, mk in parts),
+                      key=lambda (header, mk): (mk is not None, mk))
+    speaker_colors = {}
+    for i, (header, mk) in enumerate(speakers):
+        (r, g, b) = colorsys.hsv_to_rgb(float(i) / len(speakers),
+                                        0.5 if mk else 0.3, 255)
+        speaker_colors[header] = 'rgb(%i, %i, %i)' % (r, g, b)
+    return json.dumps(page_boundaries), json.dumps(speaker_colors)
+
+
+class ProtocolPartsMetadataManager(models.Manager):
+    def update_for_meeting(self, meeting):
+        """
+        (Re)calculates the protocol metadata of the meeting from its parts.
+        This is the only place where all the parts of a meeting are loaded.
+        """
+        parts = list(meeting.parts.order_by('order', 'id').values_list(
+            'order', 'header', 'speaker__mk', 'body'))
+
+        tag_occurrences = count_tag_occurrences(
+            meeting, [body for order, header, mk, body in parts])
+
+        metadata, created = self.get_or_create(meeting=meeting)
+        metadata.protocol_text_hash = get_protocol_text_hash(meeting.protocol_text)
+        metadata.parts_count = len(parts)
+        metadata.page_boundaries, metadata.speaker_colors = _protocol_layout(
+            [part[:3] for part in parts])
+        metadata.tag_occurrences = json.dumps(tag_occurrences)
+        metadata.save()
+        return metadata
+
+    def refresh(self, meeting_ids):
+        """
+        Recalculates the existing metadata of the meetings after their parts
+        were changed one by one. The part bodies are not loaded, the tag
+        occurrences are counted again when the meeting page is next viewed.
+        """
+        # updated in place, the meeting may be in the middle of its deletion
+        for metadata_id, meeting_id in self.filter(meeting__in=meeting_ids).values_list('id', 'meeting'):
+            parts = list(ProtocolPart.objects.filter(meeting=meeting_id)
+                         .order_by('order', 'id')
+                         .values_list('order', 'header', 'speaker__mk'))
+            page_boundaries, speaker_colors = _protocol_layout(parts)
+            self.filter(id=metadata_id).update(
+                parts_count=len(parts), page_boundaries=page_boundaries,
+                speaker_colors=speaker_colors, tag_occurrences='',
+                updated=datetime.now())
+
+    def invalidate_tag_occurrences(self):
+        """
+        The tags which can be suggested changed, the occurrences of every
+        meeting are counted again when its page is next viewed
+        """
+        self.exclude(tag_occurrences='').update(tag_occurrences='')
+
+    def for_meeting(self, meeting):
+        """
+        Returns the metadata of the meeting, calculating it if the parts were
+        created before the metadata was introduced.
+        """
+        try:
+            return self.get(meeting=meeting)
+        except ProtocolPartsMetadata.DoesNotExist:
+            return self.update_for_meeting(meeting)
+
+
+class ProtocolPartsMetadata(models.Model):
+    """
+    Data derived from the protocol parts of a meeting, calculated when the
+    parts are created so the meeting page can render a single page of the
+    protocol without loading all of its parts.
+    """
+    meeting = models.OneToOneField(CommitteeMeeting, related_name='parts_metadata')
+    # hash of the protocol text the parts were created from
+    protocol_text_hash = models.CharField(max_length=40, blank=True, null=True)
+    parts_count = models.IntegerField(default=0)
+    # json list of the order of the first part in each protocol page
+    page_boundaries = models.TextField(default='[]')
+    # json dict of part header -> css color
+    speaker_colors = models.TextField(default='{}')
+    # json dict of tag name -> number of occurrences in the protocol, empty
+    # when the tags changed since it was counted
+    tag_occurrences = models.TextField(default='{}')
+    updated = models.DateTimeField(auto_now=True)
+
+    objects = ProtocolPartsMetadataManager()
+
+    def __unicode__(self):
+        return u'%s (%d parts)' % (self.meeting, self.parts_count)
+
+    def get_tag_occurrences(self):
+        """{tag name: number of occurrences}, counted again if the tags changed since"""
+        if not self.tag_occurrences:
+            self.tag_occurrences = json.dumps(count_tag_occurrences(
+                self.meeting, self.meeting.parts.values_list('body', flat=True).iterator()))
+            self.save(update_fields=['tag_occurrences'])
+        return json.loads(self.tag_occurrences)
+
+    def page_range(self, page_number):
+        """
+        Returns a (first order, next page first order) tuple of the parts in
+        the given page. next page first order is None for the last page.
+        """
+        boundaries = json.loads(self.page_boundaries)
+        first_order = boundaries[page_number - 1]
+        next_first_order = boundaries[page_number] if page_number < len(boundaries) else None
+        return first_order, next_first_order
+
+
 TOPIC_PUBLISHED, TOPIC_FLAGGED, TOPIC_REJECTED, \
 TOPIC_ACCEPTED, TOPIC_APPEAL, TOPIC_DELETED = range(6)
 PUBLIC_TOPIC_STATUS = (TOPIC_PUBLISHED, TOPIC_ACCEPTED)
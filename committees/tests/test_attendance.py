@@ -0,0 +1,56 @@
+from datetime import date, timedelta
+
+from django.test import TestCase
+
+from committees.models import Committee, CommitteeAttendance, members_by_presence, member_presence, month_start
+from mks.models import Member, Knesset
+
+
+class CommitteeAttendanceTest(TestCase):
+    def setUp(self):
+        self.knesset = Knesset.objects.create(number=1, start_date=date.today() - timedelta(days=400))
+        self.committee = Committee.objects.create(name='c1')
+        self.mk_1 = Member.objects.create(name='mk 1')
+        self.mk_2 = Member.objects.create(name='mk 2')
+        self.committee.members.add(self.mk_1, self.mk_2)
+        self.meeting_1 = self.committee.meetings.create(date=date.today())
+        self.meeting_2 = self.committee.meetings.create(date=date.today())
+
+    def attendance(self):
+        return sorted(CommitteeAttendance.objects.values_list('member', 'meetings'))
+
+    def test_attendance_is_maintained(self):
+        self.meeting_1.mks_attended.add(self.mk_1, self.mk_2)
+        self.meeting_2.mks_attended.add(self.mk_1)
+        self.assertEqual(self.attendance(), [(None, 2), (self.mk_1.id, 2), (self.mk_2.id, 1)])
+        self.mk_1.committee_meetings.clear()
+        self.assertEqual(self.attendance(), [(None, 1), (self.mk_2.id, 1)])
+        self.meeting_1.delete()
+        self.assertEqual(self.attendance(), [])
+
+    def test_attendance_follows_moved_meetings(self):
+        self.meeting_1.mks_attended.add(self.mk_1)
+        other_committee = Committee.objects.create(name='c2')
+        self.meeting_1.committee = other_committee
+        self.meeting_1.save()
+        self.assertEqual(sorted(CommitteeAttendance.objects.values_list('committee', 'member', 'meetings')),
+                         [(other_committee.id, None, 1), (other_committee.id, self.mk_1.id, 1)])
+        self.meeting_1.date -= timedelta(days=40)
+        self.meeting_1.save()
+        self.assertEqual(list(CommitteeAttendance.objects.values_list('month', flat=True).distinct()),
+                         [month_start(self.meeting_1.date)])
+
+    def test_rebuild(self):
+        self.meeting_1.mks_attended.add(self.mk_1, self.mk_2)
+        attendance = self.attendance()
+        CommitteeAttendance.objects.all().delete()
+        CommitteeAttendance.objects.rebuild()
+        self.assertEqual(self.attendance(), attendance)
+
+    def test_presence(self):
+        self.meeting_1.mks_attended.add(self.mk_1, self.mk_2)
+        self.meeting_2.mks_attended.add(self.mk_1)
+        members = members_by_presence(self.committee)
+        self.assertEqual([(m, m.meetings_percentage, m.meetings_percentage_year) for m in members],
+                         [(self.mk_1, 100, 100), (self.mk_2, 50, 50)])
+        self.assertEqual(member_presence(self.mk_2, [self.committee]), {self.committee.id: 50})
@@ -0,0 +1,59 @@
+from datetime import datetime
+
+from actstream.models import Action
+from django.test import TestCase
+
+from committees.models import Committee
+from knesset.utils import bulk_import
+from laws.models import MemberVotingStatistics
+from mks.models import Member
+from persons.models import Person
+
+
+class BulkImportTest(TestCase):
+    def setUp(self):
+        self.committee = Committee.objects.create(name='c1')
+        self.meeting = self.committee.meetings.create(date=datetime.now(), topics='django')
+        self.mk_1 = Member.objects.create(name='mk 1')
+        self.mk_2 = Member.objects.create(name='mk 2')
+
+    def test_attendance_actions_are_deferred(self):
+        attended = Action.objects.filter(verb='attended')
+        with bulk_import():
+            self.meeting.mks_attended.add(self.mk_1)
+            self.meeting.mks_attended.add(self.mk_2)
+            self.meeting.save()
+            self.assertEqual(attended.count(), 0)
+        self.assertEqual(set(attended.values_list('actor_object_id', flat=True)),
+                         set([str(self.mk_1.id), str(self.mk_2.id)]))
+
+    def test_deferred_work_is_dropped(self):
+        with bulk_import(deferred=False):
+            self.meeting.mks_attended.add(self.mk_1)
+        self.assertEqual(Action.objects.filter(verb='attended').count(), 0)
+        self.meeting.mks_attended.add(self.mk_2)
+        self.assertEqual(Action.objects.filter(verb='attended').count(), 1)
+
+    def test_member_persons_are_synced(self):
+        with bulk_import():
+            mk = Member.objects.create(name='mk 3')
+            self.mk_1.name = 'mk 1 renamed'
+            self.mk_1.save()
+            self.assertFalse(Person.objects.filter(mk=mk).exists())
+        self.assertEqual(Person.objects.get(mk=mk).name, 'mk 3')
+        self.assertEqual(Person.objects.get(mk=self.mk_1).name, 'mk 1 renamed')
+
+    def test_plain_listeners_are_called(self):
+        with bulk_import():
+            mk = Member.objects.create(name='mk 3')
+        self.assertTrue(MemberVotingStatistics.objects.filter(member=mk).exists())
+
+    def test_deferred_work_is_done_when_the_import_fails(self):
+        attended = Action.objects.filter(verb='attended')
+        try:
+            with bulk_import():
+                self.meeting.mks_attended.add(self.mk_1)
+                raise ValueError('the source file is broken')
+        except ValueError:
+            pass
+        self.assertEqual(list(attended.values_list('actor_object_id', flat=True)), [str(self.mk_1.id)])
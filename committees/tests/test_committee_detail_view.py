@@ -5,6 +5,7 @@ from django.conf import settings
 from django.core.urlresolvers import reverse
 from django.contrib.auth.models import User, Group, Permission
 from django.contrib.contenttypes.models import ContentType
+from django.core.cache import get_cache
 
 from waffle import testutils as waffle_testutils
 from tagging.models import Tag, TaggedItem
@@ -13,7 +14,9 @@ from waffle import testutils as waffle_testutils
 from committees.tests.base import BaseCommitteeTestCase
 from laws.models import Bill
 from mks.models import Member, Knesset
+from committees import models as committees_models, views as committees_views
 from committees.models import Committee, CommitteeMeeting, Topic
+from links.models import Link
 
 just_id = lambda x: x.id
 APP = 'committees'
@@ -203,3 +206,62 @@ I have a deadline''')
 
         self.verify_presence_data_in_response(res,
                                               is_expected_in_response=False)
+
+
+class CommitteeDetailCacheTest(BaseCommitteeTestCase):
+    def setUp(self):
+        super(CommitteeDetailCacheTest, self).setUp()
+        # the tests run with a dummy cache
+        self.cache = get_cache('django.core.cache.backends.locmem.LocMemCache',
+                               LOCATION='committee-detail-cache-test')
+        self.original_caches = committees_views.cache, committees_models.cache
+        committees_views.cache = committees_models.cache = self.cache
+        self.knesset = Knesset.objects.create(number=1, start_date=datetime.today() - timedelta(days=1))
+        self.committee = Committee.objects.create(name='c1')
+        self.mk_1 = Member.objects.create(name='mk 1')
+        self.mk_2 = Member.objects.create(name='mk 2')
+        self.committee.members.add(self.mk_1)
+        self.meeting_1 = self.committee.meetings.create(date=datetime.now() - timedelta(days=2),
+                                                        topics='django', protocol_text='m1')
+
+    def tearDown(self):
+        committees_views.cache, committees_models.cache = self.original_caches
+        self.cache.clear()
+        super(CommitteeDetailCacheTest, self).tearDown()
+
+    def test_new_meeting_invalidates_cached_page(self):
+        res = self.client.get(self.committee.get_absolute_url())
+        self.assertEqual(map(just_id, res.context['meetings_list']), [self.meeting_1.id])
+        meeting_2 = self.committee.meetings.create(date=datetime.now() - timedelta(days=1),
+                                                   topics='python', protocol_text='m2')
+        res = self.client.get(self.committee.get_absolute_url())
+        self.assertEqual(map(just_id, res.context['meetings_list']), [meeting_2.id, self.meeting_1.id])
+
+    def test_member_changes_invalidate_cached_page(self):
+        res = self.client.get(self.committee.get_absolute_url())
+        self.verify_expected_members_in_context(res, [self.mk_1.id])
+        self.mk_2.committees.add(self.committee)
+        res = self.client.get(self.committee.get_absolute_url())
+        self.verify_expected_members_in_context(res, [self.mk_1.id, self.mk_2.id])
+        self.mk_1.committees.clear()
+        res = self.client.get(self.committee.get_absolute_url())
+        self.verify_expected_members_in_context(res, [self.mk_2.id])
+
+    def test_members_links(self):
+        link = Link.objects.create(url='http://www.example.com/', title='example', content_object=self.mk_1)
+        res = self.client.get(self.committee.get_absolute_url())
+        self.assertEqual(res.context['members'][0].cached_links, [link])
+
+    def test_member_and_link_changes_invalidate_cached_page(self):
+        res = self.client.get(self.committee.get_absolute_url())
+        self.assertEqual(res.context['members'][0].cached_links, [])
+        link = Link.objects.create(url='http://www.example.com/', title='example', content_object=self.mk_1)
+        res = self.client.get(self.committee.get_absolute_url())
+        self.assertEqual(res.context['members'][0].cached_links, [link])
+        link.delete()
+        res = self.client.get(self.committee.get_absolute_url())
+        self.assertEqual(res.context['members'][0].cached_links, [])
+        self.mk_1.name = 'renamed mk'
+        self.mk_1.save()
+        res = self.client.get(self.committee.get_absolute_url())
+        self.assertEqual(res.context['members'][0].name, 'renamed mk')
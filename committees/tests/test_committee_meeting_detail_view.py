@@ -1,3 +1,4 @@
+import json
 import unittest
 from datetime import datetime, timedelta
 
@@ -11,7 +12,9 @@ from django.core.urlresolvers import reverse
 from tagging.models import Tag
 from waffle import testutils as waffle_testutils
 
-from committees.models import Committee
+import committees.models
+from auxiliary.models import TagUsage
+from committees.models import Committee, ProtocolPartsMetadata
 from committees.tests.base import BaseCommitteeTestCase
 from laws.models import Bill
 from mks.models import Member, Knesset
@@ -337,3 +340,66 @@ I have a deadline''')
         self.assertFalse(res.context['show_member_presence'],
                          msg="context property 'show_member_presence'"
                              " was not set to False.")
+
+    def test_protocol_parts_metadata_created_with_parts(self):
+        metadata = ProtocolPartsMetadata.objects.get(meeting=self.meeting_1)
+        self.assertEqual(metadata.parts_count, 2)
+        first_part = self.meeting_1.parts.list()[0]
+        self.assertEqual(metadata.page_range(1), (first_part.order, None))
+
+    def test_protocol_parts_metadata_follows_part_changes(self):
+        part = self.meeting_1.parts.list()[0]
+        part.header = u'jacob kaplan-moss'
+        part.save()
+        metadata = ProtocolPartsMetadata.objects.get(meeting=self.meeting_1)
+        self.assertEqual(set(json.loads(metadata.speaker_colors).keys()),
+                         set([u'jacob kaplan-moss', u'adrian']))
+        part.delete()
+        metadata = ProtocolPartsMetadata.objects.get(meeting=self.meeting_1)
+        self.assertEqual(metadata.parts_count, 1)
+        self.assertEqual(json.loads(metadata.speaker_colors).keys(), [u'adrian'])
+
+    def test_meeting_protocol_page_context(self):
+        res = self.client.get(self.meeting_1.get_absolute_url())
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual([part.header for part in res.context['parts']],
+                         [u'jacob', u'adrian'])
+        self.assertEqual(res.context['paginator'].count, 2)
+        self.assertEqual(set(res.context['colors'].keys()),
+                         set([u'jacob', u'adrian']))
+
+    def test_meeting_protocol_page_parts_lengths(self):
+        paginate_by = committees.models.COMMITTEE_PROTOCOL_PAGINATE_BY
+        committees.models.COMMITTEE_PROTOCOL_PAGINATE_BY = 1
+        try:
+            ProtocolPartsMetadata.objects.update_for_meeting(self.meeting_1)
+            res = self.client.get(self.meeting_1.get_absolute_url(), {'page': 2})
+        finally:
+            committees.models.COMMITTEE_PROTOCOL_PAGINATE_BY = paginate_by
+        part = self.meeting_1.parts.list()[1]
+        self.assertEqual(json.loads(res.context['parts_lengths']), {unicode(part.id): len(part.body)})
+
+    def test_tag_suggestions_follow_new_tags(self):
+        res = self.client.get(self.meeting_1.get_absolute_url())
+        self.assertEqual(res.context['tag_suggestions'], [])
+        # a tag is suggested once it is used
+        Tag.objects.add_tag(self.meeting_2, 'perfectionist')
+        self.assertEqual(ProtocolPartsMetadata.objects.get(meeting=self.meeting_1).tag_occurrences, '')
+        res = self.client.get(self.meeting_1.get_absolute_url())
+        self.assertEqual(res.context['tag_suggestions'], [(u'perfectionist', 1)])
+
+    def test_tag_usage_counts_the_tagged_items(self):
+        Tag.objects.add_tag(self.meeting_1, 'perfectionist')
+        Tag.objects.add_tag(self.meeting_2, 'perfectionist')
+        tag = Tag.objects.get(name='perfectionist')
+        self.assertEqual(TagUsage.objects.get(tag=tag).items, 2)
+        Tag.objects.update_tags(self.meeting_1, '')
+        self.assertEqual(TagUsage.objects.get(tag=tag).items, 1)
+        Tag.objects.update_tags(self.meeting_2, '')
+        self.assertFalse(TagUsage.objects.filter(tag=tag).exists())
+
+    def test_meeting_protocol_invalid_page(self):
+        res = self.client.get(self.meeting_1.get_absolute_url(), {'page': 5})
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(res.context['parts'], [])
+        self.assertTrue(res.context['invalid_page'])
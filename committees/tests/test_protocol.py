@@ -1,7 +1,11 @@
+# encoding: utf-8
 from django.test.testcases import TestCase
 from knesset_data.dataservice.committees import CommitteeMeetingProtocol as DataserviceCommitteeMeetingProtocol
 import os
 from mixins import CommitteesTestsMixin
+from committees.models import CommitteeMeeting, ProtocolPart
+from hebrew_numbers import gematria_to_int
+from datetime import datetime
 
 
 class TestProtocol(TestCase, CommitteesTestsMixin):
@@ -18,3 +22,40 @@ class TestProtocol(TestCase, CommitteesTestsMixin):
                 meeting.protocol_text = protocol.text
                 meeting.create_protocol_parts(delete_existing=True)
                 self.assertEqual(meeting.parts.all()[139].body[-5:], '12:45')  # meeting adjourned at 12:45
+
+
+class TestProtocolChanges(TestCase, CommitteesTestsMixin):
+
+    def test_only_changed_protocols_are_parsed(self):
+        from plenum.management.commands.parse_plenum_protocols_subcommands.parse import get_meetings_to_parse
+        meeting = self.get_committee_meeting()
+        meetings = CommitteeMeeting.objects.filter(pk=meeting.pk)
+        meeting.protocol_text = u'jacob:\nI am a perfectionist'
+        meeting.save()
+        self.assertEqual(get_meetings_to_parse(meetings), [meeting.pk])
+        meeting.create_protocol_parts(delete_existing=True)
+        self.assertEqual(get_meetings_to_parse(meetings), [])
+        meeting.protocol_text = u'adrian:\nI have a deadline'
+        meeting.save()
+        self.assertEqual(get_meetings_to_parse(meetings), [meeting.pk])
+
+
+class TestPlenumLinkVotes(TestCase, CommitteesTestsMixin):
+
+    def test_votes_are_linked_once(self):
+        from laws.models import Vote
+        from links.models import Link
+        plenum = self.get_committee(u'מליאה')
+        plenum.type = 'plenum'
+        plenum.save()
+        meeting = self.get_committee_meeting(plenum)
+        ProtocolPart.objects.create(meeting=meeting, order=1, header=u'', body=u'ישיבה מ"ב')
+        part = ProtocolPart.objects.create(meeting=meeting, order=2, header=u"הצבעה מס' 3", body=u'')
+        ProtocolPart.objects.create(meeting=meeting, order=3, header=u"הצבעה מס' 4", body=u'')
+        vote = Vote.objects.create(time=datetime(2016, 2, 22), title=u'vote 3',
+                                   meeting_number=gematria_to_int(u'מ"ב'), vote_number=3)
+        self.assertEqual(meeting.plenum_meeting_number, gematria_to_int(u'מ"ב'))
+        self.assertEqual(CommitteeMeeting.objects.plenum_link_votes([meeting]), 1)
+        self.assertEqual(CommitteeMeeting.objects.plenum_link_votes([meeting]), 0)
+        self.assertEqual(list(Link.objects.for_model(vote).values_list('url', flat=True)),
+                         [part.get_absolute_url()])
@@ -1,8 +1,6 @@
 # -*- coding: utf-8 -*
-import colorsys
 import datetime
 import difflib
-import itertools
 import json
 import logging
 import re
@@ -10,12 +8,14 @@ import re
 import waffle
 
 import tagging
-from actstream import action
+from auxiliary.actions import send_action
+from django.conf import settings
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
 from django.contrib.contenttypes.models import ContentType
 from django.core.cache import cache
 from django.core.exceptions import ObjectDoesNotExist
+from django.core.paginator import Paginator, Page, InvalidPage
 from django.core.urlresolvers import reverse
 from django.db.models import Q
 from django.http import (HttpResponse, HttpResponseRedirect, Http404,
@@ -30,9 +30,10 @@ from tagging.models import TaggedItem, Tag
 
 import models
 import ok_tag.tag_suggestions
-from auxiliary.mixins import GetMoreView
+from auxiliary.mixins import GetMoreView, ConditionalDetailMixin
 from forms import EditTopicForm, LinksFormset
 from hashnav import method_decorator as hashnav_method_decorator
+from hashnav.keyset import KeysetPaginationMixin
 from knesset.utils import clean_string_no_quotes
 from laws.models import Bill, PrivateProposal
 from links.models import Link
@@ -40,9 +41,9 @@ from lobbyists.models import Lobbyist
 from mks.models import Member
 from mks.utils import get_all_mk_names
 from mmm.models import Document
-from models import Committee, CommitteeMeeting, Topic
+from models import (Committee, CommitteeMeeting, ProtocolPartsMetadata, Topic,
+                    members_by_presence)
 from ok_tag.views import BaseTagMemberListView
-from knesset_data_django.committees import members_by_presence
 
 logger = logging.getLogger("open-knesset.committees.views")
 
@@ -81,10 +82,6 @@ class TopicsMoreView(GetMoreView):
 
 class CommitteeDetailView(DetailView):
     model = Committee
-    queryset = Committee.objects.prefetch_related('members', 'chairpersons',
-                                                  'replacements', 'events',
-                                                  'meetings', ).all()
-    view_cache_key = 'committee_detail_%d'
     SEE_ALL_THRESHOLD = 10
 
     def get_context_data(self, *args, **kwargs):
@@ -93,56 +90,93 @@ class CommitteeDetailView(DetailView):
         cm.sorted_mmm_documents = cm.mmm_documents.order_by(
             '-publication_date')[:self.SEE_ALL_THRESHOLD]
 
-        cached_context = cache.get(self.view_cache_key % cm.id, {})
-        if not cached_context:
-            self._build_context_data(cached_context, cm)
-            # cache.set('committee_detail_%d' % cm.id, cached_context,
-            #           settings.LONG_CACHE_TIME)
+        show_member_presence = waffle.flag_is_active(self.request, 'show_member_presence')
+        cache_key = models.COMMITTEE_DETAIL_CACHE_KEY % (cm.id, show_member_presence)
+        cached_context = cache.get(cache_key)
+        if cached_context is None:
+            cached_context = self._build_context_data(cm, show_member_presence)
+            cache.set(cache_key, cached_context, settings.LONG_CACHE_TIME)
         context.update(cached_context)
 
+        # these depend on the current time, so they are not cached
+        future_meetings, more_future_meetings_available = cm.future_meetings(
+            limit=self.SEE_ALL_THRESHOLD)
+        context['future_meetings_list'] = future_meetings
+        context[
+            'more_future_meetings_available'] = more_future_meetings_available
+        cur_date = datetime.datetime.now()
+        not_yet_published_meetings, more_unpublished_available = cm.protocol_not_yet_published_meetings(
+            end_date=cur_date, limit=self.SEE_ALL_THRESHOLD)
+        context[
+            'protocol_not_yet_published_list'] = not_yet_published_meetings
+        context[
+            'more_unpublished_available'] = more_unpublished_available
+        if waffle.flag_is_active(self.request, 'show_committee_topics'):
+            context['topics'] = list(cm.topic_set.summary()[:5])
+
         return context
 
-    def _build_context_data(self, cached_context, cm):
-        cached_context['chairpersons'] = cm.chairpersons.all()
-        cached_context['replacements'] = cm.replacements.all()
+    def _build_context_data(self, cm, show_member_presence):
+        """
+        The context which only changes with the committee's members, meetings
+        and annotations, cached until they change (see committees.listeners)
+        """
+        cached_context = {}
+        cached_context['chairpersons'] = list(cm.chairpersons.all())
+        cached_context['replacements'] = list(cm.replacements.all())
 
-        if waffle.flag_is_active(self.request, 'show_member_presence'):
-            cached_context['show_member_presence'] = True
+        cached_context['show_member_presence'] = show_member_presence
+        if show_member_presence:
             members = members_by_presence(cm, current_only=True)
         else:
-            cached_context['show_member_presence'] = False
-            members = cm.members_by_name(current_only=True)
+            members = list(cm.members_by_name(current_only=True))
 
-        links = list(Link.objects.for_model(Member))
-        links_by_member = {}
-        for k, g in itertools.groupby(links, lambda x: x.object_pk):
-            links_by_member[str(k)] = list(g)
+        links_by_member = Link.objects.for_objects(members)
         for member in members:
-            member.cached_links = links_by_member.get(str(member.pk), [])
+            member.cached_links = links_by_member.get(unicode(member.pk), [])
         cached_context['members'] = members
         recent_meetings, more_meetings_available = cm.recent_meetings(
             limit=self.SEE_ALL_THRESHOLD)
         cached_context['meetings_list'] = recent_meetings
         cached_context['more_meetings_available'] = more_meetings_available
-        future_meetings, more_future_meetings_available = cm.future_meetings(
-            limit=self.SEE_ALL_THRESHOLD)
-        cached_context['future_meetings_list'] = future_meetings
-        cached_context[
-            'more_future_meetings_available'] = more_future_meetings_available
-        cur_date = datetime.datetime.now()
-        not_yet_published_meetings, more_unpublished_available = cm.protocol_not_yet_published_meetings(
-            end_date=cur_date, limit=self.SEE_ALL_THRESHOLD)
-        cached_context[
-            'protocol_not_yet_published_list'] = not_yet_published_meetings
-        cached_context[
-            'more_unpublished_available'] = more_unpublished_available
-        cached_context['annotations'] = cm.annotations.order_by('-timestamp')
-        if waffle.flag_is_active(self.request, 'show_committee_topics'):
-            cached_context['topics'] = cm.topic_set.summary()[:5]
-
-
-class MeetingDetailView(DetailView):
+        annotations = list(cm.annotations.order_by('-timestamp')[:5])
+        for annotation in annotations:
+            # fetched now, so they are cached with the annotations
+            annotation.content_object
+        cached_context['annotations'] = annotations
+        return cached_context
+
+
+class ProtocolPartsPaginator(Paginator):
+    """
+    Paginates the protocol parts of a meeting using the precalculated
+    ProtocolPartsMetadata, so a page is fetched by a range of part orders
+    instead of counting all parts and slicing with an offset.
+    """
+
+    def __init__(self, meeting, parts_metadata):
+        super(ProtocolPartsPaginator, self).__init__(
+            meeting.parts.list().select_related('speaker__mk'),
+            models.COMMITTEE_PROTOCOL_PAGINATE_BY)
+        self.parts_metadata = parts_metadata
+        self._count = parts_metadata.parts_count
+
+    def page(self, number):
+        number = self.validate_number(number)
+        if not self.count:
+            return Page([], number, self)
+        first_order, next_first_order = self.parts_metadata.page_range(number)
+        parts = self.object_list.filter(order__gte=first_order)
+        if next_first_order is not None:
+            parts = parts.filter(order__lt=next_first_order)
+        return Page(list(parts), number, self)
+
+
+class MeetingDetailView(ConditionalDetailMixin, DetailView):
     model = CommitteeMeeting
+    # the presence of the members is counted from the other meetings
+    # its comments, tags and annotations touch the meeting, see auxiliary.conditional.track_related_changes
+    conditional_models = (CommitteeMeeting, ProtocolPartsMetadata, Topic, Member, Bill)
 
     _action_handlers = {
         'bill': '_handle_bill_update',
@@ -171,9 +205,7 @@ class MeetingDetailView(DetailView):
         slug = self.kwargs.get(self.slug_url_kwarg, None)
         if pk is not None:
             # Double prefetch since prefetch does not work over filter
-            queryset = queryset.filter(pk=pk).prefetch_related('parts',
-                                                               'parts__speaker__mk',
-                                                               'lobbyists_mentioned',
+            queryset = queryset.filter(pk=pk).prefetch_related('lobbyists_mentioned',
                                                                'mks_attended',
                                                                'mks_attended__current_party',
                                                                'committee__members',
@@ -206,14 +238,7 @@ class MeetingDetailView(DetailView):
     def get_context_data(self, *args, **kwargs):
         context = super(MeetingDetailView, self).get_context_data(**kwargs)
         cm = context['object']
-        colors = {}
-        speakers = cm.parts.order_by('speaker__mk').values_list('header',
-                                                                'speaker__mk').distinct()
-        n = speakers.count()
-        for (i, (p, mk)) in enumerate(speakers):
-            (r, g, b) = colorsys.hsv_to_rgb(float(i) / n, 0.5 if mk else 0.3,
-                                            255)
-            colors[p] = 'rgb(%i, %i, %i)' % (r, g, b)
+        parts_metadata = models.ProtocolPartsMetadata.objects.for_meeting(cm)
         context['title'] = _('%(committee)s meeting on %(date)s') % {
             'committee': cm.committee.name,
             'date': cm.date_string}
@@ -222,11 +247,11 @@ class MeetingDetailView(DetailView):
         page = self.request.GET.get('page', None)
         if page:
             context['description'] += _(' page %(page)s') % {'page': page}
-        context['colors'] = colors
-        parts_lengths = {}
-        for part in cm.parts.all():
-            parts_lengths[part.id] = len(part.body)
-        context['parts_lengths'] = json.dumps(parts_lengths)
+        context['colors'] = json.loads(parts_metadata.speaker_colors)
+        context.update(self._paginate_parts(cm, parts_metadata))
+        # only the parts of the page can be annotated
+        context['parts_lengths'] = json.dumps(dict((part.id, len(part.body or ''))
+                                                   for part in context['parts']))
         context['paginate_by'] = models.COMMITTEE_PROTOCOL_PAGINATE_BY
 
         if cm.committee.type != 'plenum' and \
@@ -237,22 +262,18 @@ class MeetingDetailView(DetailView):
             members = members_by_presence(cm.committee, ids=meeting_members_ids)
             context['show_member_presence'] = True
         else:
-            members = cm.mks_attended.order_by('name')
+            members = list(cm.mks_attended.order_by('name'))
             context['show_member_presence'] = False
 
-        links = list(Link.objects.for_model(Member))
-        links_by_member = {}
-        for k, g in itertools.groupby(links, lambda x: x.object_pk):
-            links_by_member[str(k)] = list(g)
+        links_by_member = Link.objects.for_objects(members)
         for member in members:
-            member.cached_links = links_by_member.get(str(member.pk), [])
+            member.cached_links = links_by_member.get(unicode(member.pk), [])
         context['members'] = members
 
-        meeting_text = [cm.topics] + [part.body for part in cm.parts.all()]
         context[
-            'tag_suggestions'] = ok_tag.tag_suggestions.extract_suggested_tags(
+            'tag_suggestions'] = ok_tag.tag_suggestions.sort_suggested_tags(
             cm.tags,
-            meeting_text)
+            parts_metadata.get_tag_occurrences())
 
         context['mentioned_lobbyists'] = cm.main_lobbyists_mentioned
         context[
@@ -260,6 +281,20 @@ class MeetingDetailView(DetailView):
 
         return context
 
+    def _paginate_parts(self, cm, parts_metadata):
+        """
+        Returns the context of the current protocol page, in the same form
+        as the autopaginate template tag, loading only the parts of the page
+        """
+        paginator = ProtocolPartsPaginator(cm, parts_metadata)
+        try:
+            page_obj = paginator.page(getattr(self.request, 'page', 1))
+        except InvalidPage:
+            return {'parts': [], 'invalid_page': True}
+        return {'parts': page_obj.object_list,
+                'paginator': paginator,
+                'page_obj': page_obj}
+
     def _resolve_committee_meeting_description(self, committee_meeting):
         description = _('%(committee)s meeting on %(date)s on topic %(topic)s') \
                       % {'committee': committee_meeting.committee.name,
@@ -332,7 +367,7 @@ class MeetingDetailView(DetailView):
             raise Http404()
         cm.mks_attended.remove(mk)
         cm.save()  # just to signal, so the attended Action gets created.
-        action.send(request.user,
+        send_action(request.user,
                     verb='removed-mk-to-cm',
                     description=cm,
                     target=mk,
@@ -356,7 +391,7 @@ class MeetingDetailView(DetailView):
             raise Http404()
         cm.mks_attended.add(mk)
         cm.save()  # just to signal, so the attended Action gets created.
-        action.send(request.user,
+        send_action(request.user,
                     verb='added-mk-to-cm',
                     description=cm,
                     target=mk,
@@ -386,7 +421,7 @@ class MeetingDetailView(DetailView):
             else:  # otherwise, assume its first cms.
                 bill.first_committee_meetings.add(cm)
         bill.update_stage()
-        action.send(request.user, verb='added-bill-to-cm',
+        send_action(request.user, verb='added-bill-to-cm',
                     description=cm,
                     target=bill,
                     timestamp=datetime.datetime.now())
@@ -509,7 +544,7 @@ def delete_topic(request, pk):
         raise Http404
 
 
-class MeetingsListView(ListView):
+class MeetingsListView(KeysetPaginationMixin, ListView):
     allow_empty = False
     paginate_by = 20
 
@@ -0,0 +1,276 @@
+"""
+Keyset ("seek") pagination.
+
+Instead of an OFFSET, a page following a cursor is selected with a WHERE on
+the ordering columns of the row the cursor points at, so deep pages cost
+the same as the first one. Cursors are opaque signed tokens holding the
+ordering values of that row and the page number (for the page widget).
+
+Counts are cached for a while, the page widget can live with an
+approximate number of pages.
+"""
+import hashlib
+import operator
+
+from django.core import signing
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.core.paginator import Paginator, Page, InvalidPage
+from django.db import connections
+from django.db.models import Q
+from django.db.models.fields import FieldDoesNotExist
+from django.db.models.query import QuerySet
+from django.db.models.sql.datastructures import EmptyResultSet
+from django.http import Http404
+from django.utils.encoding import smart_str
+
+CURSOR_SALT = 'hashnav.keyset'
+
+# seconds the count of a paginated queryset is cached
+APPROXIMATE_COUNT_TIMEOUT = 60 * 10
+
+
+class InvalidCursor(InvalidPage):
+    pass
+
+
+def _get_field(model, lookup):
+    """the model field the lookup points at, or None if it is not a plain field"""
+    if lookup == 'pk':
+        return model._meta.pk
+    names = lookup.split('__')
+    for i, name in enumerate(names):
+        try:
+            field = model._meta.get_field(name)
+        except FieldDoesNotExist:
+            return None
+        if i < len(names) - 1:
+            if not field.rel:
+                return None
+            model = field.rel.to
+    # ordering by a relation means ordering by the related model's ordering
+    return None if field.rel else field
+
+
+def get_ordering(queryset):
+    """
+    Returns the ordering of the queryset as a list of (lookup, field, descending),
+    ending with the primary key so the order is total.
+    Returns None if the queryset is ordered by something other than model fields.
+    """
+    query = queryset.query
+    if query.extra_order_by:
+        return None
+    if query.order_by:
+        names = query.order_by
+    elif query.default_ordering:
+        names = queryset.model._meta.ordering
+    else:
+        names = []
+    ordering = []
+    for name in names:
+        if not isinstance(name, basestring) or name == '?' or '.' in name:
+            return None
+        descending = name.startswith('-')
+        lookup = name.lstrip('-')
+        field = _get_field(queryset.model, lookup)
+        if field is None:
+            return None
+        ordering.append((lookup, field, descending != (not query.standard_ordering)))
+    if not any(field.primary_key for lookup, field, descending in ordering):
+        descending = ordering[-1][2] if ordering else False
+        ordering.append(('pk', queryset.model._meta.pk, descending))
+    return ordering
+
+
+def order_queryset(queryset, ordering):
+    queryset = queryset.order_by(*[('-' if descending else '') + lookup
+                                   for lookup, field, descending in ordering])
+    queryset.query.standard_ordering = True
+    return queryset
+
+
+def _get_value(obj, lookup):
+    if lookup == 'pk':
+        return obj.pk
+    for name in lookup.split('__'):
+        obj = getattr(obj, name)
+    return obj
+
+
+def _dump_value(value):
+    if hasattr(value, 'isoformat'):
+        return value.isoformat()
+    if value is None or isinstance(value, (int, long, float, basestring)):
+        return value
+    return unicode(value)
+
+
+def _nulls_largest(queryset):
+    """whether the db of the queryset orders NULL after all the other values (as postgresql does)"""
+    return connections[queryset.db].vendor in ('postgresql', 'oracle')
+
+
+def _equal(lookup, value):
+    if value is None:
+        return Q(**{'%s__isnull' % lookup: True})
+    return Q(**{lookup: value})
+
+
+def _beyond(lookup, value, greater, nulls_largest):
+    """
+    the rows whose value is greater (or smaller) than the given value, where
+    NULL is the largest value or the smallest. None if there are no such rows.
+    """
+    if value is None:
+        if greater == nulls_largest:
+            return None
+        return Q(**{'%s__isnull' % lookup: False})
+    condition = Q(**{'%s__%s' % (lookup, 'gt' if greater else 'lt'): value})
+    if greater == nulls_largest:
+        condition |= Q(**{'%s__isnull' % lookup: True})
+    return condition
+
+
+def _seek_filter(ordering, values, backwards, nulls_largest=False):
+    """rows after (or before) the row with the given ordering values"""
+    conditions = []
+    for i, (lookup, field, descending) in enumerate(ordering):
+        beyond = _beyond(lookup, values[i], descending == backwards, nulls_largest)
+        if beyond is not None:
+            conditions.append(reduce(operator.and_, [_equal(ordering[j][0], values[j]) for j in range(i)], beyond))
+    return reduce(operator.or_, conditions)
+
+
+class KeysetPage(Page):
+    """A page which knows if it has neighbours without counting, and links to them with cursors"""
+
+    def __init__(self, object_list, number, paginator, has_next=None, has_previous=None):
+        super(KeysetPage, self).__init__(object_list, number, paginator)
+        self._has_next = has_next
+        self._has_previous = has_previous
+
+    def has_next(self):
+        if self._has_next is None:
+            return super(KeysetPage, self).has_next()
+        return self._has_next
+
+    def has_previous(self):
+        if self._has_previous is None:
+            return super(KeysetPage, self).has_previous()
+        return self._has_previous
+
+    def next_page_number(self):
+        return self.number + 1
+
+    def previous_page_number(self):
+        return self.number - 1
+
+    @property
+    def next_cursor(self):
+        if self.has_next() and self.object_list:
+            return self.paginator.get_cursor(self.object_list[-1], self.number + 1)
+
+    @property
+    def previous_cursor(self):
+        if self.has_previous() and self.object_list:
+            return self.paginator.get_cursor(self.object_list[0], self.number - 1, backwards=True)
+
+
+class KeysetPaginator(Paginator):
+    """
+    A Paginator with cached counts, which also returns pages following a
+    cursor (see KeysetPage.next_cursor) and the last page without an OFFSET.
+    Querysets not ordered by model fields are paginated by OFFSET only.
+    """
+
+    def __init__(self, object_list, per_page, orphans=0, allow_empty_first_page=True):
+        self.ordering = get_ordering(object_list) if isinstance(object_list, QuerySet) else None
+        if self.ordering is not None:
+            object_list = order_queryset(object_list, self.ordering)
+        super(KeysetPaginator, self).__init__(object_list, per_page, orphans, allow_empty_first_page)
+
+    def _get_count(self):
+        if self._count is None and isinstance(self.object_list, QuerySet):
+            try:
+                key = 'hashnav.count.%s' % hashlib.md5(smart_str(self.object_list.query)).hexdigest()
+            except EmptyResultSet:
+                self._count = 0
+                return self._count
+            self._count = cache.get(key)
+            if self._count is None:
+                self._count = self.object_list.count()
+                cache.set(key, self._count, APPROXIMATE_COUNT_TIMEOUT)
+        return super(KeysetPaginator, self)._get_count()
+    count = property(_get_count)
+
+    def _get_page(self, object_list, number, paginator):
+        return KeysetPage(list(object_list), number, paginator)
+
+    def get_cursor(self, obj, number, backwards=False):
+        if self.ordering is None:
+            return None
+        values = [_get_value(obj, lookup) for lookup, field, descending in self.ordering]
+        return signing.dumps({'v': map(_dump_value, values), 'n': number, 'b': backwards},
+                             salt=CURSOR_SALT, compress=True)
+
+    def cursor_page(self, cursor):
+        if self.ordering is None:
+            raise InvalidCursor('This list can not be paginated with a cursor')
+        try:
+            data = signing.loads(cursor, salt=CURSOR_SALT)
+            if len(data['v']) != len(self.ordering):
+                raise InvalidCursor('That cursor is not for this list')
+            values = [None if value is None else field.to_python(value) for (lookup, field, descending), value
+                      in zip(self.ordering, data['v'])]
+            number, backwards = int(data['n']), bool(data['b'])
+        except (signing.BadSignature, KeyError, TypeError, ValueError, ValidationError):
+            raise InvalidCursor('That cursor is not valid')
+        queryset = self.object_list.filter(
+            _seek_filter(self.ordering, values, backwards, _nulls_largest(self.object_list)))
+        if backwards:
+            queryset = queryset.reverse()
+        objects = list(queryset[:self.per_page + 1])
+        more = len(objects) > self.per_page
+        objects = objects[:self.per_page]
+        if backwards:
+            objects.reverse()
+            return KeysetPage(objects, number, self, has_next=True, has_previous=more)
+        return KeysetPage(objects, number, self, has_next=more, has_previous=True)
+
+    def last_page(self):
+        if self.ordering is None:
+            return self.page(self.num_pages)
+        # the rows after the previous full pages, so none of them is repeated
+        last_page_size = self.count - (self.num_pages - 1) * self.per_page
+        objects = list(self.object_list.reverse()[:last_page_size])
+        objects.reverse()
+        return KeysetPage(objects, self.num_pages, self, has_next=False, has_previous=self.num_pages > 1)
+
+    def request_page(self, cursor=None, page=1):
+        """returns the page for a cursor, or a page number (which may be 'last')"""
+        if cursor:
+            return self.cursor_page(cursor)
+        if page == 'last':
+            return self.last_page()
+        try:
+            number = int(page)
+        except (TypeError, ValueError):
+            raise InvalidPage("Page is not 'last', nor can it be converted to an int.")
+        return self.page(number)
+
+
+class KeysetPaginationMixin(object):
+    """Keyset pagination for django's generic ListView"""
+    paginator_class = KeysetPaginator
+
+    def paginate_queryset(self, queryset, page_size):
+        paginator = self.get_paginator(
+            queryset, page_size, orphans=self.get_paginate_orphans(),
+            allow_empty_first_page=self.get_allow_empty())
+        page = self.kwargs.get(self.page_kwarg) or self.request.GET.get(self.page_kwarg) or 1
+        try:
+            page = paginator.request_page(self.request.GET.get('cursor'), page)
+        except InvalidPage as e:
+            raise Http404('Invalid page (%s): %s' % (page, e))
+        return (paginator, page, page.object_list, page.has_other_pages())
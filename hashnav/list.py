@@ -1,8 +1,9 @@
-from django.core.paginator import Paginator, InvalidPage
+from django.core.paginator import InvalidPage
 from django.core.exceptions import ImproperlyConfigured
 from django.http import Http404
 from django.utils.encoding import smart_str
 from base import View
+from keyset import KeysetPaginator
 
 class ListView(View):
     """
@@ -69,23 +70,17 @@ class ListView(View):
             self.page = None
             self.items = self.items
         else:
-            paginator = Paginator(self.items, paginate_by, allow_empty_first_page=allow_empty)
-            # page_descriptor can be either a page number or 'last'
+            paginator = KeysetPaginator(self.items, paginate_by, allow_empty_first_page=allow_empty)
+            # page_descriptor can be either a page number or 'last',
+            # a cursor of a neighbour page is used instead when given
             page_descriptor = getattr(self, 'page', self.request.GET.get('page', 1))
-            try:
-                page_number = int(page_descriptor)
-            except ValueError:
-                if page_descriptor == 'last':
-                    page_number = paginator.num_pages
-                else:
-                    raise Http404("Page is not 'last', nor can it be converted to an int.")
             try:
                 self.paginator = paginator
-                self.page = paginator.page(page_number)
+                self.page = paginator.request_page(self.request.GET.get('cursor'), page_descriptor)
                 self.items = self.page.object_list
 
-            except InvalidPage:
-                raise Http404('Invalid page (%s)' % page_number)
+            except InvalidPage as e:
+                raise Http404('Invalid page (%s): %s' % (page_descriptor, e))
 
     def get_template_names(self, suffix='list'):
         """
@@ -1,22 +1,57 @@
+import time
+import uuid
+
 from django.conf import settings
+from django.core.cache import cache
 
-d = {'debug': getattr(settings, 'LOCAL_DEV', False)}
+# the version of the flatpages, changed whenever one of them is saved or deleted
+FLATPAGES_VERSION_KEY = 'flatpages_version'
 
+# seconds a process uses its flatpages before checking their version
+FLATPAGES_VERSION_CHECK_INTERVAL = 60
 
-def processor(request):
+# (version, time of the last version check, {url: page}), replaced as a whole
+_flatpages = (None, 0, {})
+
+
+def _load_flatpages():
     from django.contrib.flatpages.models import FlatPage
-    from django.core.cache import cache
-    from knesset.utils import get_cache_key
-    cache_key = get_cache_key(request.path)
-    page = cache.get('flatpage_block_%s' % cache_key)
-    if not page:
-        qs = FlatPage.objects.filter(url=request.path)
-        if qs.exists():
-            page = qs.values('title', 'content', 'template_name')[0]
-        else:
-            page = 'NO PAGE'
-        cache.set('flatpage_block_%s' % cache_key, page, 86400)
-    d.update({
-        'flatpage': page if page and page != 'NO PAGE' else None
-    })
-    return d
+    pages = {}
+    for url, title, content, template_name in FlatPage.objects.order_by('id').values_list(
+            'url', 'title', 'content', 'template_name'):
+        pages.setdefault(url, {'title': title, 'content': content, 'template_name': template_name})
+    return pages
+
+
+def get_flatpages():
+    """
+    Returns {url: page} of all the flatpages, loaded once per process and
+    loaded again when their version changes (see invalidate_flatpages)
+    """
+    global _flatpages
+    version, checked, pages = _flatpages
+    now = time.time()
+    if version is not None and now - checked < FLATPAGES_VERSION_CHECK_INTERVAL:
+        return pages
+    current_version = cache.get(FLATPAGES_VERSION_KEY)
+    if current_version is None:
+        current_version = uuid.uuid4().hex
+        cache.set(FLATPAGES_VERSION_KEY, current_version, None)
+    if current_version != version:
+        pages = _load_flatpages()
+    _flatpages = (current_version, now, pages)
+    return pages
+
+
+def invalidate_flatpages():
+    """makes all the processes load the flatpages again"""
+    global _flatpages
+    cache.set(FLATPAGES_VERSION_KEY, uuid.uuid4().hex, None)
+    _flatpages = (None, 0, {})
+
+
+def processor(request):
+    return {
+        'debug': getattr(settings, 'LOCAL_DEV', False),
+        'flatpage': get_flatpages().get(request.path),
+    }
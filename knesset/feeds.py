@@ -1,18 +1,19 @@
 from django.utils.translation import ugettext as _
-from django.contrib.syndication.views import Feed
 from django.contrib.comments.models import Comment
 from django.shortcuts import get_object_or_404
 from annotatetext.models import Annotation
+from auxiliary.feeds import CachedFeed
 from laws.models import Vote, Bill
 from knesset.utils import main_actions
 
-class Comments(Feed):
+class Comments(CachedFeed):
     title = "%s | %s" %(_("Open Knesset"), _("Comments feed"))
     link = "/comments/"
     description = "Comments on Open Knesset website"
+    timestamp_field = 'submit_date'
 
-    def items(self):
-        return Comment.objects.order_by('-submit_date')[:20]
+    def items_queryset(self, obj):
+        return Comment.objects.order_by('-submit_date')
 
     def item_description(self, item):
         n = 1000
@@ -20,34 +21,35 @@ class Comments(Feed):
             return "%s: %s..." % (item.name, item.comment[:n])
         return "%s: %s" % (item.name, item.comment)
 
-class Votes(Feed):
+class Votes(CachedFeed):
     title = "%s | %s" %(_("Open Knesset"), _("Votes feed"))
     link = "/votes/"
     description = "Votes on Open Knesset website"
+    timestamp_field = 'time'
 
-    def items(self):
-        return Vote.objects.order_by('-time')[:20]
+    def items_queryset(self, obj):
+        return Vote.objects.order_by('-time')
 
 
-class Bills(Feed):
+class Bills(CachedFeed):
     title = "%s | %s" %(_("Open Knesset"), _("Bills feed"))
     link = "/bills/"
     description = "Bills on Open Knesset website"
+    version_fields = ('id', 'stage', 'stage_date')
 
-    def get_object (self, request, *args, **kwargs):
+    def get_object(self, request, *args, **kwargs):
+        """the requested stages"""
         stages = request.GET.get('stages', False)
-        #TODO: there's probably a re-entrancy issue with self.stages
-        self.stages = stages.split(',') if stages else False
-        return super(Bills,self).get_object(request, *args, **kwargs)
+        return stages.split(',') if stages else []
 
-    def items(self):
+    def items_queryset(self, stages):
         bills = Bill.objects.order_by('-id')
-        if self.stages:
-            bills = bills.filter(stage__in = self.stages)
-        return bills[:20]
+        if stages:
+            bills = bills.filter(stage__in=stages)
+        return bills
 
 
-class MainActionsFeed(Feed):
+class MainActionsFeed(CachedFeed):
     '''
     A feed for each action presented on the main view.
     '''
@@ -55,9 +57,11 @@ class MainActionsFeed(Feed):
     title = _('Main activity feed')
     link = '/'
     description = _('Main activity feed for the whole site, same as presented on the main page')
+    timestamp_field = 'timestamp'
 
-    def items(self):
-        return main_actions()[:20]
+    def items_queryset(self, obj):
+        # the targets are prefetched, with a query per content type
+        return main_actions()
 
     def item_title(self, item):
         title = _(item.verb)
@@ -79,13 +83,14 @@ class MainActionsFeed(Feed):
             return getattr(target, 'url')
         return '/'
 
-class Annotations(Feed):
+class Annotations(CachedFeed):
     title = "%s | %s %s" %(_("Open Knesset"), _("Annotations"), _("feed"))
     link = "/committees/"
     description = "Annotations on Committees Protocols"
+    timestamp_field = 'timestamp'
 
-    def items(self):
-        return Annotation.objects.order_by('-timestamp')[:20]
+    def items_queryset(self, obj):
+        return Annotation.objects.select_related('user').order_by('-timestamp')
 
     def item_title(self, item):
         return "%s: %s" % (unicode(item.flag_value), item.comment)
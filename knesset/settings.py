@@ -86,6 +86,8 @@ MIDDLEWARE_CLASSES = (
     'django.middleware.csrf.CsrfViewMiddleware',
     'pagination.middleware.PaginationMiddleware',
     'waffle.middleware.WaffleMiddleware',
+    'auxiliary.conditional.TouchAfterCommitMiddleware',
+    'auxiliary.actions.ActionBufferMiddleware',
     # make sure to keep the DebugToolbarMiddleware last
     # 'debug_toolbar.middleware.DebugToolbarMiddleware',
 )
@@ -281,6 +283,10 @@ CACHES = {
 
 LONG_CACHE_TIME = 18000  # 5 hours
 
+# write the buffered activity stream actions to a queue table, which the
+# flush_action_queue command (run periodically) moves to the stream
+ACTION_QUEUE = False
+
 ANNOTATETEXT_FLAGS = (
     gettext('Statement'),
     gettext('Funny :-)'),
@@ -1,4 +1,13 @@
+import datetime
+import gzip
+import hashlib
+import json
+import os
+from xml.sax.saxutils import escape
+
 from django.contrib.sitemaps import Sitemap
+from django.contrib.sites.models import Site
+from django.core.urlresolvers import reverse
 from tagging.models import Tag
 from mks.models import Member, Party
 from laws.models import Vote, Bill
@@ -98,3 +107,242 @@ sitemaps = {
     'agendas': AgendaSitemap,
     'index': IndexPagesSitemap,
 }
+
+
+# The sitemap files written by the update_sitemap command. Each section is
+# read with values_list().iterator() (no model instances) and streamed into
+# gzipped files of at most SITEMAP_FILE_LIMIT urls, listed in a sitemap index.
+# A section is written again only when its fingerprint (the number of its rows
+# and a hash of the values its urls are made of) changed since the last run,
+# see write_sitemap_files.
+
+SITEMAP_FILE_LIMIT = 50000
+
+SITEMAP_INDEX_FILENAME = 'sitemap.xml'
+SITEMAP_STATE_FILENAME = 'sitemap-state.json'
+
+
+class SitemapSection(object):
+    """
+    The urls of a Sitemap's items, read with values_list. The location of a
+    row is the url_name page of its first field, the id.
+    """
+    sitemap = None
+    url_name = None
+    # the values_list fields passed to location, and the timestamp field used as lastmod
+    fields = ('id',)
+    lastmod_field = None
+
+    @property
+    def changefreq(self):
+        return self.sitemap.changefreq
+
+    @property
+    def priority(self):
+        return self.sitemap.priority
+
+    def queryset(self):
+        return self.sitemap().items()
+
+    def location(self, row):
+        return reverse(self.url_name, args=[str(row[0])])
+
+    def rows(self):
+        fields = self.fields + ((self.lastmod_field,) if self.lastmod_field else ())
+        return self.queryset().order_by('id').values_list(*fields).iterator()
+
+    def urls(self):
+        """(location, lastmod) of the section urls"""
+        for row in self.rows():
+            yield self.location(row), row[len(self.fields)] if self.lastmod_field else None
+
+    def fingerprint(self):
+        # reading the rows is cheap next to writing them, and catches any change of the urls
+        count = 0
+        digest = hashlib.md5()
+        for row in self.rows():
+            digest.update(repr(row))
+            count += 1
+        return [count, digest.hexdigest()]
+
+
+class MemberSection(SitemapSection):
+    sitemap = MemberSitemap
+    fields = ('id', 'name')
+
+    def location(self, row):
+        return Member(id=row[0], name=row[1]).get_absolute_url()
+
+
+class BillSection(SitemapSection):
+    sitemap = BillSitemap
+    url_name = 'bill-detail'
+    lastmod_field = 'stage_date'
+
+
+class PartySection(SitemapSection):
+    sitemap = PartySitemap
+    url_name = 'party-detail'
+
+
+class VoteSection(SitemapSection):
+    sitemap = VoteSitemap
+    url_name = 'vote-detail'
+    lastmod_field = 'time'
+
+
+class CommitteeSection(SitemapSection):
+    sitemap = CommitteeSitemap
+    fields = ('id', 'type')
+
+    def location(self, row):
+        return Committee(id=row[0], type=row[1]).get_absolute_url()
+
+
+class CommitteeMeetingSection(SitemapSection):
+    sitemap = CommitteeMeetingSitemap
+    fields = ('id', 'committee__type')
+    lastmod_field = 'date'
+
+    def location(self, row):
+        return reverse('plenum-meeting' if row[1] == 'plenum' else 'committee-meeting', args=[str(row[0])])
+
+
+class AgendaSection(SitemapSection):
+    sitemap = AgendaSitemap
+    url_name = 'agenda-detail'
+
+
+class IndexPagesSection(SitemapSection):
+    sitemap = IndexPagesSitemap
+
+    def urls(self):
+        return ((location, None) for location in self.sitemap().items())
+
+    def fingerprint(self):
+        return list(self.sitemap().items())
+
+
+sitemap_sections = {
+    'members': MemberSection,
+    'bills': BillSection,
+    'parties': PartySection,
+    'votes': VoteSection,
+    'committees': CommitteeSection,
+    'committees_meetings': CommitteeMeetingSection,
+    'agendas': AgendaSection,
+    'index': IndexPagesSection,
+}
+
+
+def _lastmod(value):
+    if isinstance(value, datetime.datetime):
+        value = value.date()
+    return value.isoformat()
+
+
+def _replace_file(filename, data):
+    tmp_filename = filename + '.tmp'
+    with open(tmp_filename, 'wb') as f:
+        f.write(data)
+    os.rename(tmp_filename, filename)
+
+
+class _SectionWriter(object):
+    """streams the urls of a section into gzipped sitemap files"""
+
+    def __init__(self, directory, name, section, domain):
+        self.directory = directory
+        self.name = name
+        self.section = section
+        self.domain = domain
+        self.filenames = []
+        self.lastmods = []
+        self._file = None
+
+    def _open(self):
+        filename = 'sitemap-%s-%d.xml.gz' % (self.name, len(self.filenames) + 1)
+        self.filenames.append(filename)
+        self.lastmods.append(None)
+        self._count = 0
+        self._file = gzip.GzipFile(os.path.join(self.directory, filename + '.tmp'), 'wb')
+        self._file.write('<?xml version="1.0" encoding="UTF-8"?>\n'
+                         '<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">\n')
+
+    def _close(self):
+        self._file.write('</urlset>\n')
+        self._file.close()
+        self._file = None
+        filename = os.path.join(self.directory, self.filenames[-1])
+        os.rename(filename + '.tmp', filename)
+
+    def write(self):
+        for location, lastmod in self.section.urls():
+            if self._file is None or self._count == SITEMAP_FILE_LIMIT:
+                if self._file is not None:
+                    self._close()
+                self._open()
+            url = [u'<url><loc>http://%s%s</loc>' % (self.domain, escape(location))]
+            if lastmod is not None:
+                url.append(u'<lastmod>%s</lastmod>' % _lastmod(lastmod))
+                if self.lastmods[-1] is None or _lastmod(lastmod) > self.lastmods[-1]:
+                    self.lastmods[-1] = _lastmod(lastmod)
+            url.append(u'<changefreq>%s</changefreq><priority>%s</priority></url>\n' % (
+                self.section.changefreq, self.section.priority))
+            self._file.write(u''.join(url).encode('utf8'))
+            self._count += 1
+        if self._file is not None:
+            self._close()
+
+
+def write_sitemap_files(directory, media_url, sections=None, force=False, domain=None):
+    """
+    Writes the sitemap files of the changed sections (or of all of them with
+    force) and the sitemap index into directory, whose files are served from
+    media_url. Returns the names of the sections which were written.
+    """
+    if sections is None:
+        sections = sitemap_sections
+    if domain is None:
+        domain = Site.objects.get_current().domain
+    state_filename = os.path.join(directory, SITEMAP_STATE_FILENAME)
+    state = {}
+    if os.path.exists(state_filename):
+        with open(state_filename) as f:
+            try:
+                state = json.load(f)
+            except ValueError:
+                # a broken state only means that all the sections are written again
+                state = {}
+    written = []
+    new_state = {}
+    for name in sorted(sections):
+        section = sections[name]()
+        fingerprint = section.fingerprint()
+        previous = state.get(name)
+        if (not force and previous is not None and previous['fingerprint'] == fingerprint and
+                all(os.path.exists(os.path.join(directory, filename)) for filename in previous['files'])):
+            new_state[name] = previous
+            continue
+        writer = _SectionWriter(directory, name, section, domain)
+        writer.write()
+        new_state[name] = {'fingerprint': fingerprint, 'files': writer.filenames, 'lastmods': writer.lastmods}
+        written.append(name)
+    # the files of sections which shrank or were removed
+    current_files = set(filename for section_state in new_state.values() for filename in section_state['files'])
+    for section_state in state.values():
+        for filename in section_state['files']:
+            if filename not in current_files and os.path.exists(os.path.join(directory, filename)):
+                os.remove(os.path.join(directory, filename))
+    index = ['<?xml version="1.0" encoding="UTF-8"?>\n'
+             '<sitemapindex xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">\n']
+    for name in sorted(new_state):
+        for filename, lastmod in zip(new_state[name]['files'], new_state[name]['lastmods']):
+            index.append('<sitemap><loc>http://%s%s%s</loc>' % (domain, media_url, filename))
+            if lastmod is not None:
+                index.append('<lastmod>%s</lastmod>' % lastmod)
+            index.append('</sitemap>\n')
+    index.append('</sitemapindex>\n')
+    _replace_file(os.path.join(directory, SITEMAP_INDEX_FILENAME), ''.join(index))
+    _replace_file(state_filename, json.dumps(new_state))
+    return written
@@ -97,20 +97,97 @@ try:
     from functools import wraps
 except ImportError:
     from django.utils.functional import wraps
-import inspect
+from collections import OrderedDict
+from contextlib import contextmanager
+import logging
+import threading
+
+logger = logging.getLogger("open-knesset.utils")
+
+_bulk_import_state = threading.local()
+
+
+def in_bulk_import():
+    return getattr(_bulk_import_state, 'depth', 0) > 0
+
+
+def loading_fixtures():
+    """whether in a bulk_import which does not defer signals, as when loading fixtures"""
+    return in_bulk_import() and not _bulk_import_state.deferred
+
+
+@contextmanager
+def bulk_import(deferred=True):
+    """
+    The signals of handlers decorated with defer_during_bulk_import are
+    collected in this thread while in the context, and passed to their batch
+    handlers when the outermost context exits - also when it exits with an
+    exception, as the rows written before it are kept. If deferred is False
+    (as when loading fixtures) the droppable ones are dropped, and handlers
+    decorated with disable_for_loaddata are not called.
+
+        with bulk_import():
+            for row in rows:
+                VoteAction.objects.create(...)
+    """
+    state = _bulk_import_state
+    depth = getattr(state, 'depth', 0)
+    if depth == 0:
+        state.deferred = deferred
+        state.pending = OrderedDict()
+    state.depth = depth + 1
+    failed = True
+    try:
+        yield
+        failed = False
+    finally:
+        state.depth = depth
+        if depth == 0:
+            pending, state.pending = state.pending, None
+            for batch_handler, signals in pending.items():
+                if not failed:
+                    batch_handler(signals)
+                    continue
+                # do not hide the exception the import failed with
+                try:
+                    batch_handler(signals)
+                except Exception:
+                    logger.exception('%s failed after a failed bulk import' % batch_handler.__name__)
 
 
 def disable_for_loaddata(signal_handler):
+    """the handler is not called for raw saves and while loading fixtures"""
     @wraps(signal_handler)
     def wrapper(*args, **kwargs):
-        for fr in inspect.stack():
-            if inspect.getmodulename(fr[1]) in ('loaddata', 'sync_dev'):
-                return
+        if kwargs.get('raw') or loading_fixtures():
+            return
         signal_handler(*args, **kwargs)
 
     return wrapper
 
 
+def defer_during_bulk_import(batch_handler, droppable=True):
+    """
+    In a bulk_import the handler is not called, instead the kwargs of its
+    signals are collected and batch_handler is called once with their list
+    when the import ends. Raw saves are passed on to the handler.
+    Handlers maintaining derived data (rather than recording activity)
+    should not be droppable.
+    """
+    def decorator(signal_handler):
+        @wraps(signal_handler)
+        def wrapper(*args, **kwargs):
+            if in_bulk_import() and not kwargs.get('raw'):
+                if _bulk_import_state.deferred or not droppable:
+                    _bulk_import_state.pending.setdefault(batch_handler, []).append(kwargs)
+                return
+            signal_handler(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
 class RequestFactory(Client):
     """
     Class that lets you create mock Request objects for use in testing.
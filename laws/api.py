@@ -13,6 +13,9 @@ from apis.resources.base import BaseResource
 
 from mks.api import MemberResource
 
+from tagging.models import TaggedItem
+from agendas.models import Agenda, AgendaBill, AgendaVote, UserSuggestedVote
+from mks.models import Member
 from models import Law, Bill, Vote, VoteAction, PrivateProposal
 
 from simple.management.commands.syncdata_globals import p_explanation
@@ -63,6 +66,8 @@ class VoteResource(BaseResource):
             'importance', 'controversy', 'against_party ', 'against_coalition',
             'against_opposition', 'against_own_bill',
         ]
+        excludes = ['cached_bill_ids']
+        conditional_models = (VoteAction, Member, Agenda, AgendaVote, TaggedItem)
         filtering = dict(tag=('exact'),
                          member=ALL,
                          member_for=ALL,
@@ -169,6 +174,7 @@ class BillResource(BaseResource):
         ]
         include_absolute_url = True
         limit = 20
+        conditional_models = (Member, Vote, PrivateProposal, Agenda, AgendaBill, UserSuggestedVote, TaggedItem)
 
     explanation = fields.CharField()
     legal_code = fields.CharField()
@@ -1,6 +1,9 @@
 # encoding: utf-8
 import datetime
+import os
 
 STANDS_FOR_THRESHOLD = 0.66
 FIRST_KNESSET_START = datetime.date(1948, 5, 13)
-CONVERT_TO_DISCUSSION_HEADERS = ('להעביר את הנושא'.decode('utf8'), 'העברת הנושא'.decode('utf8'))
\ No newline at end of file
+CONVERT_TO_DISCUSSION_HEADERS = ('להעביר את הנושא'.decode('utf8'), 'העברת הנושא'.decode('utf8'))
+# storage path of the columnar votes snapshot, see laws/vote_snapshot.py
+VOTES_SNAPSHOT_FILENAME = os.path.join('snapshots', 'votes.npz')
@@ -1,17 +1,18 @@
 from django.utils.translation import ugettext as _
-from django.contrib.syndication.views import Feed
 from django.shortcuts import get_object_or_404
 from django.core.urlresolvers import reverse
+from auxiliary.feeds import CachedFeed
 from models import Vote, Bill
 
-class Votes(Feed):
+class Votes(CachedFeed):
     title = _("Knesset Votes feed")
     author_name = _("Open Knesset")
     # link = reverse('votes-feed')
     description = "Votes on Open Knesset website"
+    timestamp_field = 'time'
 
-    def items(self):
-        return Vote.objects.order_by('-time')[:20]
+    def items_queryset(self, obj):
+        return Vote.objects.order_by('-time')
 
     def item_title(self, item):
         return item.title
@@ -19,9 +20,10 @@ class Votes(Feed):
     def item_description(self, item):
         return item.summary
 
-class Bills(Feed):
+class Bills(CachedFeed):
     title = _("Knesset Bills feed")
     description = _("Bills from the Open Knesset site")
+    version_fields = ('id', 'stage', 'stage_date')
 
     def author_name(self):
         return _("Open Knesset")
@@ -29,18 +31,15 @@ class Bills(Feed):
     def link(self):
         return reverse('bills-feed')
 
-    def get_object (self, request):
-        ''' Not really getting the object here, just storing the requested 
-            stages. 
+    def get_object(self, request):
+        ''' Not really getting the object here, just returning the requested
+            stages, which are passed to items_queryset.
         '''
-        # BUG: there's probably reentrancy issues when one from this
-        #      class is trying to serve 2 requests at almost the same time
         stages = request.GET.get('stage', False)
-        self.stages = stages.split(',') if stages else False
-        return None
+        return stages.split(',') if stages else []
 
-    def items(self):
+    def items_queryset(self, stages):
         bills = Bill.objects.order_by('-id')
-        if self.stages:
-            bills = bills.filter(stage__in = self.stages)
-        return bills[:20]
+        if stages:
+            bills = bills.filter(stage__in=stages)
+        return bills
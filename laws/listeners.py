@@ -1,16 +1,19 @@
 # encoding: utf-8
-from django.db.models.signals import m2m_changed, post_save
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete, pre_save
 from django.contrib.contenttypes.models import ContentType
-from actstream import action
+from auxiliary.actions import buffer_actions, send_action
+from auxiliary.conditional import track_changes, track_related_changes
 from actstream.models import Action
 from tagging.models import TaggedItem
 
-from knesset.utils import cannonize, disable_for_loaddata
+from knesset.utils import cannonize, disable_for_loaddata, defer_during_bulk_import
 from laws.models.bill import Bill
+from laws.models.bill_budget_estimation import BillBudgetEstimation
 from laws.models.candidate_list_model_statistics import CandidateListVotingStatistics
 from laws.models.member_voting_statistics import MemberVotingStatistics
 from laws.models.party_voting_statistics import PartyVotingStatistics
-from laws.models.proposal import PrivateProposal
+from laws.models.proposal import PrivateProposal, KnessetProposal, GovProposal
+from laws.models.vote import Vote, invalidate_vote_detail
 from laws.models.vote_action import VoteAction
 from mks.models import Member, Party
 
@@ -27,22 +30,32 @@ def record_bill_proposal(**kwargs):
         verb = 'proposed'
     else:
         verb = 'joined'
-    for mk_id in kwargs['pk_set']:
-        if Action.objects.filter(actor_object_id=mk_id, actor_content_type=member_ct, verb=verb,
-                                 target_object_id=proposal.id,
-                                 target_content_type=private_proposal_ct).count() == 0:
-            mk = Member.objects.get(pk=mk_id)
-            action.send(mk, verb=verb, target=proposal, timestamp=proposal.date)
+    existing = set(int(mk_id) for mk_id in Action.objects.filter(
+        actor_content_type=member_ct, verb=verb, target_object_id=proposal.id,
+        target_content_type=private_proposal_ct).values_list('actor_object_id', flat=True))
+    with buffer_actions():
+        for mk in Member.objects.filter(pk__in=set(kwargs['pk_set']) - existing):
+            send_action(mk, verb=verb, target=proposal, timestamp=proposal.date)
 
 
 m2m_changed.connect(record_bill_proposal, sender=PrivateProposal.proposers.through)
 m2m_changed.connect(record_bill_proposal, sender=PrivateProposal.joiners.through)  # same code handles both events
 
 
+def record_vote_actions(signals):
+    """records the vote actions created in a bulk import, loading them in one query"""
+    vote_action_ids = [kwargs['instance'].id for kwargs in signals if kwargs['created']]
+    with buffer_actions():
+        for vote_action in VoteAction.objects.filter(id__in=vote_action_ids).select_related(
+                'member', 'vote').order_by('id'):
+            record_vote_action(VoteAction, True, vote_action)
+
+
+@defer_during_bulk_import(record_vote_actions)
 @disable_for_loaddata
 def record_vote_action(sender, created, instance, **kwargs):
     if created:
-        action.send(instance.member, verb='voted',
+        send_action(instance.member, verb='voted',
                     description=instance.get_type_display(),
                     target=instance.vote,
                     timestamp=instance.vote.time)
@@ -84,4 +97,126 @@ def add_tags_to_bill_related_objects(sender, instance, **kwargs):
     for ti in TaggedItem.objects.filter(content_type=bill_ct, object_id=instance.id):
         add_tags_to_related_objects(sender, ti, **kwargs)
 
-post_save.connect(add_tags_to_bill_related_objects, sender=Bill)
\ No newline at end of file
+post_save.connect(add_tags_to_bill_related_objects, sender=Bill)
+
+def _moves_vote(kwargs):
+    """whether a vote post_save adds the vote or changes its time, which changes the neighbours around it"""
+    instance = kwargs['instance']
+    return kwargs['created'] or getattr(instance, '_previous_times', None) != [instance.time]
+
+
+def update_votes_neighbours(signals):
+    if any(kwargs['signal'] is post_delete or _moves_vote(kwargs) for kwargs in signals):
+        invalidate_vote_detail(Vote.objects.update_neighbours())
+
+
+def remember_vote_time(sender, instance, **kwargs):
+    """the time of a vote before it is saved, [] for a new vote"""
+    instance._previous_times = []
+    if instance.pk is not None:
+        instance._previous_times = list(Vote.objects.filter(pk=instance.pk).values_list('time', flat=True))
+
+
+pre_save.connect(remember_vote_time, sender=Vote)
+
+
+@defer_during_bulk_import(update_votes_neighbours, droppable=False)
+def update_vote_neighbours(sender, instance, **kwargs):
+    """
+    relinks the saved vote and the votes around it when it is new or its time
+    changed, raw saves (loaddata) included, so the votes of a fixture are
+    linked one by one as they load
+    """
+    changed = []
+    if _moves_vote(dict(kwargs, instance=instance)):
+        changed = Vote.objects.relink_neighbours(instance)
+        if instance.id in changed:
+            instance.previous_vote_id, instance.next_vote_id = Vote.objects.neighbour_ids(instance)
+    if kwargs.get('raw'):
+        # the bills of a fixture might have loaded before their votes
+        changed += Vote.objects.update_bill_ids([instance.id])
+    invalidate_vote_detail(changed + [instance.id])
+
+
+post_save.connect(update_vote_neighbours, sender=Vote)
+
+
+@defer_during_bulk_import(update_votes_neighbours, droppable=False)
+def relink_deleted_vote_neighbours(sender, instance, **kwargs):
+    invalidate_vote_detail(Vote.objects.relink_neighbours(instance))
+
+
+post_delete.connect(relink_deleted_vote_neighbours, sender=Vote)
+
+
+def invalidate_vote_action_vote(sender, instance, **kwargs):
+    invalidate_vote_detail([instance.vote_id])
+
+
+post_save.connect(invalidate_vote_action_vote, sender=VoteAction)
+post_delete.connect(invalidate_vote_action_vote, sender=VoteAction)
+
+
+def _bill_vote_ids(kwargs):
+    """the votes whose bills were changed by a Bill signal, before and after the change"""
+    if 'action' in kwargs:
+        # pre_votes m2m_changed
+        if not kwargs['action'].startswith('post_'):
+            return []
+        if kwargs['reverse']:
+            return [kwargs['instance'].id]
+        if kwargs['action'] == 'post_clear':
+            return getattr(kwargs['instance'], '_cleared_pre_vote_ids', [])
+        return kwargs['pk_set']
+    instance = kwargs['instance']
+    return getattr(instance, '_previous_vote_ids', []) + [instance.approval_vote_id, instance.first_vote_id]
+
+
+def update_bills_vote_ids(signals):
+    vote_ids = set()
+    for kwargs in signals:
+        vote_ids.update(_bill_vote_ids(kwargs))
+    invalidate_vote_detail(Vote.objects.update_bill_ids(vote_ids))
+
+
+def remember_bill_votes(sender, instance, **kwargs):
+    """the votes of a bill before it is saved or deleted, they might lose it"""
+    instance._previous_vote_ids = []
+    if instance.pk is not None:
+        for approval_vote_id, first_vote_id in Bill.objects.filter(pk=instance.pk).values_list(
+                'approval_vote', 'first_vote'):
+            instance._previous_vote_ids = [approval_vote_id, first_vote_id]
+        if kwargs.get('signal') == pre_delete:
+            instance._previous_vote_ids.extend(instance.pre_votes.values_list('id', flat=True))
+
+
+pre_save.connect(remember_bill_votes, sender=Bill)
+pre_delete.connect(remember_bill_votes, sender=Bill)
+
+
+def remember_cleared_pre_votes(sender, instance, action, reverse, **kwargs):
+    if action == 'pre_clear' and not reverse:
+        instance._cleared_pre_vote_ids = list(instance.pre_votes.values_list('id', flat=True))
+
+
+m2m_changed.connect(remember_cleared_pre_votes, sender=Bill.pre_votes.through)
+
+
+@defer_during_bulk_import(update_bills_vote_ids, droppable=False)
+def update_bill_vote_ids(**kwargs):
+    """raw saves (loaddata) included, like update_vote_neighbours"""
+    invalidate_vote_detail(Vote.objects.update_bill_ids(_bill_vote_ids(kwargs)))
+
+
+post_save.connect(update_bill_vote_ids, sender=Bill)
+post_delete.connect(update_bill_vote_ids, sender=Bill)
+m2m_changed.connect(update_bill_vote_ids, sender=Bill.pre_votes.through)
+
+track_changes(Bill, BillBudgetEstimation, Vote, VoteAction, PrivateProposal, KnessetProposal, GovProposal)
+
+
+def vote_action_member(vote_action):
+    return [(Member, vote_action.member_id)]
+
+
+track_related_changes(VoteAction, vote_action_member)
@@ -0,0 +1,27 @@
+# encoding: utf-8
+from logging import getLogger
+from optparse import make_option
+
+from django.core.management.base import BaseCommand
+
+from laws.constants import VOTES_SNAPSHOT_FILENAME
+from laws.vote_snapshot import update_snapshot
+
+logger = getLogger(__name__)
+
+
+class Command(BaseCommand):
+
+    help = "Updates the columnar (numpy .npz) snapshot of votes, vote actions, members and parties in media"
+
+    option_list = BaseCommand.option_list + (
+        make_option(
+            '--full', action='store_true', dest='full', default=False,
+            help='Rebuild the snapshot from scratch instead of merging the new and changed votes into it'
+        ),
+    )
+
+    def handle(self, *args, **options):
+        num_votes, num_updated = update_snapshot(full=options['full'])
+        logger.info(u'Added {0} votes to {1}, exported {2} changed votes again'.format(
+            num_votes, VOTES_SNAPSHOT_FILENAME, num_updated))
@@ -1,21 +1,23 @@
 # encoding: utf-8
 import logging
 import random
-from datetime import date
+from datetime import date, datetime, time
 
 import voting
 import waffle
-from actstream import Follow, Action, action
+from actstream import Follow, Action
 from django.conf import settings
 from django.contrib.comments.models import Comment
 from django.contrib.contenttypes.models import ContentType
 from django.core.cache import cache
-from django.db import models
+from django.db import models, transaction
+from django.db.models.query import QuerySet
 from django.db.utils import IntegrityError
 from django.utils.translation import ugettext_lazy as _
 from tagging.models import TaggedItem, Tag
 from tagging.utils import get_tag
 
+from auxiliary.conditional import touch
 from knesset.utils import slugify_name
 from laws.constants import FIRST_KNESSET_START, CONVERT_TO_DISCUSSION_HEADERS
 from laws.enums import BillStages
@@ -128,6 +130,58 @@ class BillManager(models.Manager):
     def _get_private_proposals_for_member_for_date_range(self, member, date_range):
         return PrivateProposal.objects.filter(date__range=date_range, proposers=member)
 
+    @transaction.atomic
+    def generate_activity_streams(self, bills):
+        """
+        Updates the activity streams of the given bills (a queryset or a list).
+        The wanted actions are compared with the stored ones, and only the
+        difference is deleted / bulk inserted, so unchanged actions keep their ids.
+        Returns a (created, deleted) tuple with the number of actions.
+        """
+        if isinstance(bills, QuerySet):
+            bills = bills.select_related('first_vote', 'approval_vote').prefetch_related(
+                'proposals', 'pre_votes', 'gov_decisions',
+                'first_committee_meetings__committee', 'second_committee_meetings__committee')
+        bills = list(bills)
+        if not bills:
+            return 0, 0
+        bill_ct = ContentType.objects.get_for_model(self.model)
+
+        # (actor id, verb, target content type id, target id) -> (timestamp, description)
+        wanted = {}
+        for bill in bills:
+            for verb, target, timestamp, description in bill.activity_stream_actions():
+                if not isinstance(timestamp, datetime):
+                    timestamp = datetime.combine(timestamp, time())
+                if description is not None:
+                    description = unicode(description)
+                key = (unicode(bill.pk), verb, ContentType.objects.get_for_model(target).pk, unicode(target.pk))
+                wanted[key] = (timestamp, description)
+
+        stale = []
+        existing = Action.objects.filter(actor_content_type=bill_ct,
+                                         actor_object_id__in=[unicode(bill.pk) for bill in bills])
+        for row in existing.values_list('id', 'actor_object_id', 'verb', 'target_content_type',
+                                        'target_object_id', 'timestamp', 'description').iterator():
+            key, values = row[1:5], row[5:]
+            if wanted.get(key) == values:
+                # already stored, a duplicate of this row will not match anymore
+                del wanted[key]
+            else:
+                stale.append(row[0])
+        if stale:
+            Action.objects.filter(id__in=stale).delete()
+
+        Action.objects.bulk_create([
+            Action(actor_content_type=bill_ct, actor_object_id=actor_id, verb=verb,
+                   target_content_type_id=target_ct_id, target_object_id=target_id,
+                   timestamp=timestamp, description=description, public=True)
+            for (actor_id, verb, target_ct_id, target_id), (timestamp, description) in wanted.items()],
+            batch_size=500)
+        if wanted or stale:
+            touch(Action)
+        return len(wanted), len(stale)
+
 
 class Bill(models.Model):
     title = models.CharField(max_length=1000)
@@ -191,7 +245,7 @@ class Bill(models.Model):
 
     tags = property(_get_tags, _set_tags)
 
-    def merge(self, another_bill):
+    def merge(self, another_bill, generate_stream=True):
         """Merges another_bill into self, and delete another_bill"""
         if not self.id:
             logger.debug('trying to merge into a bill with id=None, title=%s',
@@ -273,9 +327,9 @@ class Bill(models.Model):
             except IntegrityError:  # same user already estimated self
                 pass
         another_bill.delete()
-        self.update_stage()
+        self.update_stage(generate_stream=generate_stream)
 
-    def update_votes(self):
+    def update_votes(self, generate_stream=True):
         used_votes = []  # ids of votes already assigned 'roles', so we won't match a vote in 2 places
         gp = GovProposal.objects.filter(bill=self)
         if gp:
@@ -314,14 +368,16 @@ class Bill(models.Model):
                             self.first_vote = this_v
 
                         used_votes.append(this_v.id)
-        self.update_stage()
+        self.update_stage(generate_stream=generate_stream)
 
-    def update_stage(self, force_update=False):
+    def update_stage(self, force_update=False, generate_stream=True):
         """
         Updates the stage for this bill according to all current data
         force_update - assume current stage is wrong, and force
         recalculation. default is False, so we assume current status is OK,
         and only look for updates.
+        generate_stream - regenerate the activity stream. callers updating
+        many bills pass False and use BillManager.generate_activity_streams.
         """
         if not self.stage_date or force_update:  # might be empty if bill is new
             self.stage_date = FIRST_KNESSET_START
@@ -387,12 +443,19 @@ class Bill(models.Model):
                 self.stage = BillStages.PROPOSED
                 self.stage_date = pp.date
         self.save()
-        self.generate_activity_stream()
+        if generate_stream:
+            self.generate_activity_stream()
 
     def generate_activity_stream(self):
         ''' create an activity stream based on the data stored in self '''
+        Bill.objects.generate_activity_streams([self])
 
-        Action.objects.stream_for_actor(self).delete()
+    def activity_stream_actions(self):
+        """
+        Returns the (verb, target, timestamp, description) of every action
+        the activity stream of this bill should have
+        """
+        actions = []
         ps = list(self.proposals.all())
         try:
             ps.append(self.gov_proposal)
@@ -400,13 +463,11 @@ class Bill(models.Model):
             pass
 
         for p in ps:
-            action.send(self, verb='was-proposed', target=p,
-                        timestamp=p.date, description=p.title)
+            actions.append(('was-proposed', p, p.date, p.title))
 
         try:
             p = self.knesset_proposal
-            action.send(self, verb='was-knesset-proposed', target=p,
-                        timestamp=p.date, description=p.title)
+            actions.append(('was-knesset-proposed', p, p.date, p.title))
         except KnessetProposal.DoesNotExist:
             pass
 
@@ -416,31 +477,26 @@ class Bill(models.Model):
                 if v.title.find(h) >= 0:  # converted to discussion
                     discussion = True
             if discussion:
-                action.send(self, verb='was-converted-to-discussion', target=v,
-                            timestamp=v.time)
+                actions.append(('was-converted-to-discussion', v, v.time, None))
             else:
-                action.send(self, verb='was-pre-voted', target=v,
-                            timestamp=v.time, description=v.passed)
+                actions.append(('was-pre-voted', v, v.time, v.passed))
 
         if self.first_vote:
-            action.send(self, verb='was-first-voted', target=self.first_vote,
-                        timestamp=self.first_vote.time, description=self.first_vote.passed)
+            actions.append(('was-first-voted', self.first_vote, self.first_vote.time, self.first_vote.passed))
 
         if self.approval_vote:
-            action.send(self, verb='was-approval-voted', target=self.approval_vote,
-                        timestamp=self.approval_vote.time, description=self.approval_vote.passed)
+            actions.append(('was-approval-voted', self.approval_vote, self.approval_vote.time,
+                            self.approval_vote.passed))
 
         for cm in self.first_committee_meetings.all():
-            action.send(self, verb='was-discussed-1', target=cm,
-                        timestamp=cm.date, description=cm.committee.name)
+            actions.append(('was-discussed-1', cm, cm.date, cm.committee.name))
 
         for cm in self.second_committee_meetings.all():
-            action.send(self, verb='was-discussed-2', target=cm,
-                        timestamp=cm.date, description=cm.committee.name)
+            actions.append(('was-discussed-2', cm, cm.date, cm.committee.name))
 
         for g in self.gov_decisions.all():
-            action.send(self, verb='was-voted-on-gov', target=g,
-                        timestamp=g.date, description=str(g.stand))
+            actions.append(('was-voted-on-gov', g, g.date, str(g.stand)))
+        return actions
 
     @property
     def frozen(self):
@@ -4,7 +4,9 @@ import traceback
 from datetime import timedelta
 
 from django.contrib.contenttypes import generic
+from django.core.cache import cache
 from django.db import models
+from django.db.models import Q
 from django.utils.translation import ugettext_lazy as _
 from tagging.models import TaggedItem, Tag
 
@@ -21,6 +23,18 @@ import logging
 
 logger = logging.getLogger("open-knesset.laws.models")
 
+# the cached context of the vote page, by vote id
+VOTE_DETAIL_CACHE_KEY = 'vote_detail_%d'
+
+
+def invalidate_vote_detail(vote_ids):
+    """drops the cached page context (see VoteDetailView) of the given votes"""
+    cache.delete_many([VOTE_DETAIL_CACHE_KEY % vote_id for vote_id in set(vote_ids)])
+
+
+def _parse_ids(ids):
+    return [int(x) for x in ids.split(',') if x]
+
 
 class VoteManager(models.Manager):
     # TODO: add i18n to the types so we'd have
@@ -71,6 +85,70 @@ class VoteManager(models.Manager):
                 bills_first__isnull=False).exclude(bill_approved__isnull=False)
         return qs
 
+    def neighbour_ids(self, vote):
+        """the ids of the votes get_previous_by_time and get_next_by_time return for vote"""
+        previous_ids = self.filter(Q(time__lt=vote.time) | Q(time=vote.time, id__lt=vote.id)).order_by(
+            '-time', '-id').values_list('id', flat=True)[:1]
+        next_ids = self.filter(Q(time__gt=vote.time) | Q(time=vote.time, id__gt=vote.id)).order_by(
+            'time', 'id').values_list('id', flat=True)[:1]
+        return (previous_ids[0] if previous_ids else None), (next_ids[0] if next_ids else None)
+
+    def update_neighbours(self):
+        """
+        Sets previous_vote and next_vote of all the votes, reading the votes in
+        one query and updating only the ones whose neighbours changed.
+        Returns the ids of the updated votes.
+        """
+        rows = list(self.order_by('time', 'id').values_list('id', 'previous_vote', 'next_vote'))
+        changed = []
+        for i, (vote_id, previous_id, next_id) in enumerate(rows):
+            new_previous_id = rows[i - 1][0] if i > 0 else None
+            new_next_id = rows[i + 1][0] if i + 1 < len(rows) else None
+            if (previous_id, next_id) != (new_previous_id, new_next_id):
+                self.filter(id=vote_id).update(previous_vote=new_previous_id, next_vote=new_next_id)
+                changed.append(vote_id)
+        return changed
+
+    def relink_neighbours(self, vote):
+        """
+        Sets previous_vote and next_vote of the votes whose neighbours change
+        when the vote is added, moved or deleted - the vote, the votes it was
+        linked to and its neighbours now. Returns the ids of the updated votes.
+        """
+        vote_ids = set([vote.id, vote.previous_vote_id, vote.next_vote_id])
+        vote_ids.update(self.filter(Q(previous_vote=vote.id) | Q(next_vote=vote.id)).values_list('id', flat=True))
+        vote_ids.update(self.neighbour_ids(vote))
+        vote_ids.discard(None)
+        changed = []
+        for other in self.filter(id__in=vote_ids).only('id', 'time', 'previous_vote', 'next_vote'):
+            neighbour_ids = self.neighbour_ids(other)
+            if neighbour_ids != (other.previous_vote_id, other.next_vote_id):
+                self.filter(id=other.id).update(previous_vote=neighbour_ids[0], next_vote=neighbour_ids[1])
+                changed.append(other.id)
+        return changed
+
+    def update_bill_ids(self, vote_ids):
+        """
+        Sets cached_bill_ids of the given votes - the bills they are a pre,
+        approval or first vote of - with three queries, updating only the
+        votes whose bills changed. Returns the ids of the updated votes.
+        """
+        vote_ids = set(vote_id for vote_id in vote_ids if vote_id is not None)
+        if not vote_ids:
+            return []
+        bill_ids = dict((vote_id, []) for vote_id in vote_ids)
+        for field in ('pre_votes', 'approval_vote', 'first_vote'):
+            for vote_id, bill_id in Bill.objects.filter(**{field + '__in': vote_ids}).values_list(field, 'id'):
+                if bill_id not in bill_ids[vote_id]:
+                    bill_ids[vote_id].append(bill_id)
+        changed = []
+        for vote_id, cached_bill_ids in self.filter(id__in=vote_ids).values_list('id', 'cached_bill_ids'):
+            new_cached_bill_ids = ','.join(str(bill_id) for bill_id in bill_ids[vote_id])
+            if cached_bill_ids != new_cached_bill_ids:
+                self.filter(id=vote_id).update(cached_bill_ids=new_cached_bill_ids)
+                changed.append(vote_id)
+        return changed
+
 
 class Vote(models.Model):
     meeting_number = models.IntegerField(null=True, blank=True)
@@ -101,6 +179,13 @@ class Vote(models.Model):
                                            object_id_field="object_id",
                                            content_type_field="content_type")
 
+    # maintained by laws.listeners, see VoteManager.update_neighbours and update_bill_ids
+    previous_vote = models.ForeignKey('self', related_name='+', null=True, blank=True, editable=False,
+                                      on_delete=models.SET_NULL)
+    next_vote = models.ForeignKey('self', related_name='+', null=True, blank=True, editable=False,
+                                  on_delete=models.SET_NULL)
+    cached_bill_ids = models.CommaSeparatedIntegerField(max_length=1000, blank=True, editable=False)
+
     objects = VoteManager()
 
     class Meta:
@@ -150,6 +235,16 @@ class Vote(models.Model):
 
     full_text_link.allow_tags = True
 
+    @property
+    def bill_ids(self):
+        """the ids of the bills this vote is a pre, approval or first vote of"""
+        return _parse_ids(self.cached_bill_ids)
+
+    def related_bills(self):
+        """the bills of bill_ids, in their order, with one query"""
+        bills = Bill.objects.in_bulk(self.bill_ids)
+        return [bills[bill_id] for bill_id in self.bill_ids if bill_id in bills]
+
     def bills(self):
         """Return a list of all bills related to this vote"""
         result = list(self.bills_pre_votes.all())
@@ -116,29 +116,43 @@ def selection(page_obj, paginator, request):
 @register.inclusion_tag('laws/_paginator.html')
 def pagination(page_obj, paginator, request):
     """ includes links to previous/next page, and other pages if needed """
-    base_link = '&'.join(["%s=%s" % (k, v) for (k, v) in request.GET.items() if k != 'page'])
+    base_link = '&'.join(["%s=%s" % (k, v) for (k, v) in request.GET.items() if k not in ('page', 'cursor')])
+
+    # neighbour pages and the last page are reached with keyset queries
+    # (see hashnav.keyset) when possible, instead of deep offsets
+    next_cursor = getattr(page_obj, 'next_cursor', None)
+    previous_cursor = getattr(page_obj, 'previous_cursor', None)
+
+    def page_link(x):
+        if x == page_obj.number + 1 and next_cursor:
+            return "?%s&cursor=%s" % (base_link, next_cursor)
+        if x == page_obj.number - 1 and previous_cursor:
+            return "?%s&cursor=%s" % (base_link, previous_cursor)
+        if x == paginator.num_pages and x > 1:
+            return "?%s&page=last" % base_link
+        return "?%s&page=%d" % (base_link, x)
+
     if paginator.num_pages <= 10:
-        show_pages = [[x, "?%s&page=%d" % (base_link, x), False] for x in range(1, paginator.num_pages + 1)]
-        show_pages[page_obj.number - 1][2] = True
+        show_pages = [[x, page_link(x), False] for x in range(1, paginator.num_pages + 1)]
     else:
         if page_obj.number <= 5:
-            show_pages = [[x, "?%s&page=%d" % (base_link, x), False] for x in range(1, page_obj.number + 3)]
-            last_pages = [[x, "?%s&page=%d" % (base_link, x), False] for x in
+            show_pages = [[x, page_link(x), False] for x in range(1, page_obj.number + 3)]
+            last_pages = [[x, page_link(x), False] for x in
                           range(paginator.num_pages - 1, paginator.num_pages + 1)]
         elif page_obj.number >= paginator.num_pages - 5:
-            show_pages = [[x, "?%s&page=%d" % (base_link, x), False] for x in
+            show_pages = [[x, page_link(x), False] for x in
                           range(page_obj.number - 2, paginator.num_pages + 1)]
-            first_pages = [[x, "?%s&page=%d" % (base_link, x), False] for x in range(1, 3)]
+            first_pages = [[x, page_link(x), False] for x in range(1, 3)]
         else:
-            first_pages = [[x, "?%s&page=%d" % (base_link, x), False] for x in range(1, 3)]
-            last_pages = [[x, "?%s&page=%d" % (base_link, x), False] for x in
+            first_pages = [[x, page_link(x), False] for x in range(1, 3)]
+            last_pages = [[x, page_link(x), False] for x in
                           range(paginator.num_pages - 1, paginator.num_pages + 1)]
-            show_pages = [[x, "?%s&page=%d" % (base_link, x), False] for x in
+            show_pages = [[x, page_link(x), False] for x in
                           range(page_obj.number - 2, page_obj.number + 3)]
 
-        for i in show_pages:
-            if i[0] == page_obj.number:
-                i[2] = True
+    for i in show_pages:
+        if i[0] == page_obj.number:
+            i[2] = True
 
     return locals()
 
@@ -32,6 +32,21 @@ class BillStreamTest(TestCase):
         s = Action.objects.stream_for_actor(self.bill)
         self.assertEqual(s.count(), 3)
 
+    def testRegenerateKeepsUnchangedActions(self):
+        self.bill.generate_activity_stream()
+        action_ids = set(Action.objects.stream_for_actor(self.bill).values_list('id', flat=True))
+        self.bill.generate_activity_stream()
+        self.assertEqual(set(Action.objects.stream_for_actor(self.bill).values_list('id', flat=True)),
+                         action_ids)
+
+    def testRegenerateRemovesStaleActions(self):
+        self.bill.generate_activity_stream()
+        self.bill.pre_votes.remove(self.vote_1)
+        created, deleted = Bill.objects.generate_activity_streams([self.bill])
+        self.assertEqual((created, deleted), (0, 1))
+        self.assertEqual(set(Action.objects.stream_for_actor(self.bill).values_list('verb', flat=True)),
+                         set(['was-knesset-proposed', 'was-first-voted']))
+
     def tearDown(self):
         self.bill.pre_votes.all().delete()
         self.vote_1.delete()
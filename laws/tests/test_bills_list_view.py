@@ -9,6 +9,7 @@ from django.core.urlresolvers import reverse
 from django.test import TestCase
 from tagging.models import Tag
 
+from hashnav.keyset import KeysetPaginator
 from laws.models import Vote, Bill, KnessetProposal, Law, PrivateProposal
 
 from mks.models import Knesset, Member
@@ -66,6 +67,49 @@ class BillListViewsTest(TestCase):
         self.assertEqual(map(just_id, object_list),
                          [self.bill_3.id, self.bill_2.id, self.bill_1.id])
 
+    def test_bill_list_keyset_pagination(self):
+        paginator = KeysetPaginator(Bill.objects.all(), 1)
+        page = paginator.page(1)
+        self.assertEqual(map(just_id, page.object_list), [self.bill_3.id])
+        page = paginator.cursor_page(page.next_cursor)
+        self.assertEqual((page.number, map(just_id, page.object_list)), (2, [self.bill_2.id]))
+        page = paginator.cursor_page(page.next_cursor)
+        self.assertEqual(map(just_id, page.object_list), [self.bill_1.id])
+        self.assertFalse(page.has_next())
+        page = paginator.cursor_page(page.previous_cursor)
+        self.assertEqual((page.number, map(just_id, page.object_list)), (2, [self.bill_2.id]))
+        self.assertEqual(map(just_id, paginator.last_page().object_list), [self.bill_1.id])
+
+    def test_bill_list_keyset_last_page_is_partial(self):
+        paginator = KeysetPaginator(Bill.objects.all(), 2)
+        page = paginator.last_page()
+        self.assertEqual((page.number, map(just_id, page.object_list)), (2, [self.bill_1.id]))
+        self.assertEqual(map(just_id, paginator.cursor_page(page.previous_cursor).object_list),
+                         [self.bill_3.id, self.bill_2.id])
+
+    def test_bill_list_keyset_pagination_with_null_stage_dates(self):
+        bill_4 = Bill.objects.create(stage='1', title='bill 4')
+        bill_5 = Bill.objects.create(stage='1', title='bill 5')
+        Bill.objects.filter(id__in=[self.bill_2.id, bill_4.id, bill_5.id]).update(stage_date=None)
+        expected = map(just_id, Bill.objects.all())
+        paginator = KeysetPaginator(Bill.objects.all(), 1)
+        page = paginator.page(1)
+        walked = map(just_id, page.object_list)
+        while page.has_next():
+            page = paginator.cursor_page(page.next_cursor)
+            walked.extend(map(just_id, page.object_list))
+        self.assertEqual(walked, expected)
+        self.assertEqual(page.number, len(expected))
+        walked = map(just_id, page.object_list)
+        while page.has_previous():
+            page = paginator.cursor_page(page.previous_cursor)
+            walked[:0] = map(just_id, page.object_list)
+        self.assertEqual(walked, expected)
+
+    def test_bill_list_invalid_cursor(self):
+        res = self.client.get(reverse('bill-list'), {'cursor': 'not-a-cursor'})
+        self.assertEqual(res.status_code, 404)
+
     def test_bills_are_filtered_by_stage(self):
         res = self.client.get(reverse('bill-list'), {'stage': 'all'})
         object_list = res.context['object_list']
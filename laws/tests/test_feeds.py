@@ -0,0 +1,36 @@
+from datetime import datetime
+
+from django.core.urlresolvers import reverse
+from django.test import TestCase
+
+from laws.models import Vote, Bill
+
+
+class FeedsTest(TestCase):
+    def setUp(self):
+        self.vote_1 = Vote.objects.create(time=datetime(2015, 1, 1), title='vote 1')
+        self.bill_1 = Bill.objects.create(stage='1', title='bill 1')
+        self.bill_2 = Bill.objects.create(stage='2', title='bill 2')
+
+    def test_bills_feed_stages(self):
+        res = self.client.get(reverse('bills-feed'), {'stage': '2'})
+        self.assertEqual(res.status_code, 200)
+        self.assertIn('bill 2', res.content)
+        self.assertNotIn('bill 1', res.content)
+        # the stages of one request don't leak to the next one
+        res = self.client.get(reverse('bills-feed'))
+        self.assertIn('bill 1', res.content)
+        self.assertIn('bill 2', res.content)
+
+    def test_votes_feed_conditional_get(self):
+        res = self.client.get(reverse('votes-feed'))
+        self.assertEqual(res.status_code, 200)
+        res = self.client.get(reverse('votes-feed'), HTTP_IF_NONE_MATCH=res['ETag'])
+        self.assertEqual(res.status_code, 304)
+        res = self.client.get(reverse('votes-feed'), HTTP_IF_MODIFIED_SINCE=res['Last-Modified'])
+        self.assertEqual(res.status_code, 304)
+        etag = res['ETag']
+        Vote.objects.create(time=datetime(2015, 2, 1), title='vote 2')
+        res = self.client.get(reverse('votes-feed'), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(res.status_code, 200)
+        self.assertIn('vote 2', res.content)
@@ -0,0 +1,92 @@
+# encoding: utf-8
+import unittest
+from datetime import datetime, date
+
+from django.core.files.storage import default_storage
+from django.test import TestCase
+
+from laws.models import Vote, VoteAction
+from mks.models import Member, Party, Knesset
+
+try:
+    import numpy
+    from laws import vote_snapshot
+except ImportError:
+    numpy = None
+
+
+@unittest.skipUnless(numpy, 'numpy is required for the votes snapshot')
+class VoteSnapshotTest(TestCase):
+    def setUp(self):
+        self.knesset = Knesset.objects.create(number=1, start_date=date(2000, 1, 1))
+        self.party = Party.objects.create(name='party 1', knesset=self.knesset)
+        self.mk_1 = Member.objects.create(name='mk 1', current_party=self.party)
+        self.mk_2 = Member.objects.create(name='mk 2', current_party=self.party)
+        self.vote_1 = Vote.objects.create(time=datetime(2001, 9, 11), title='vote 1')
+        self.vote_2 = Vote.objects.create(time=datetime(2001, 9, 12), title='vote 1')
+        VoteAction.objects.create(vote=self.vote_1, member=self.mk_1, party=self.party,
+                                  type='for', against_coalition=True)
+        VoteAction.objects.create(vote=self.vote_2, member=self.mk_2, party=self.party,
+                                  type='against')
+
+    def test_build_vote_arrays(self):
+        arrays = vote_snapshot.build_vote_arrays()
+        self.assertEqual(list(arrays['votes_id']), [self.vote_1.id, self.vote_2.id])
+        self.assertEqual(list(arrays['votes_title_codes']), [0, 0])
+        self.assertEqual(list(arrays['votes_title_labels']), [u'vote 1'])
+        self.assertEqual(list(arrays['actions_member_id']), [self.mk_1.id, self.mk_2.id])
+        self.assertEqual(list(arrays['actions_type']),
+                         [vote_snapshot.ACTION_TYPES.index('for'),
+                          vote_snapshot.ACTION_TYPES.index('against')])
+        self.assertEqual(list(arrays['actions_flags']), [2, 0])
+
+    def test_build_vote_arrays_since(self):
+        arrays = vote_snapshot.build_vote_arrays(since_vote_id=self.vote_1.id,
+                                                 title_labels=[u'other vote'])
+        self.assertEqual(list(arrays['votes_id']), [self.vote_2.id])
+        self.assertEqual(list(arrays['votes_title_codes']), [1])
+        self.assertEqual(list(arrays['actions_vote_id']), [self.vote_2.id])
+
+    def test_chunks(self):
+        original = vote_snapshot.CHUNK_SIZE
+        vote_snapshot.CHUNK_SIZE = 1
+        try:
+            arrays = vote_snapshot.build_vote_arrays()
+        finally:
+            vote_snapshot.CHUNK_SIZE = original
+        self.assertEqual(list(arrays['votes_id']), [self.vote_1.id, self.vote_2.id])
+        self.assertEqual(list(arrays['actions_vote_id']), [self.vote_1.id, self.vote_2.id])
+        self.assertEqual(list(arrays['votes_title_labels']), [u'vote 1'])
+
+    def test_changed_votes(self):
+        previous = vote_snapshot.build_vote_arrays()
+        self.assertEqual(vote_snapshot.changed_vote_ids(previous), set())
+        # a corrected action of an older vote
+        VoteAction.objects.filter(vote=self.vote_1).update(type='against')
+        self.assertEqual(vote_snapshot.changed_vote_ids(previous), set([self.vote_1.id]))
+        previous = vote_snapshot.build_vote_arrays()
+        # an action added to an older vote
+        VoteAction.objects.create(vote=self.vote_1, member=self.mk_2, party=self.party, type='for')
+        self.assertEqual(vote_snapshot.changed_vote_ids(previous), set([self.vote_1.id]))
+        previous = vote_snapshot.build_vote_arrays()
+        self.vote_2.delete()
+        self.assertEqual(vote_snapshot.changed_vote_ids(previous), set([self.vote_2.id]))
+
+    def test_update_snapshot(self):
+        filename = 'test-votes-snapshot.npz'
+        try:
+            self.assertEqual(vote_snapshot.update_snapshot(filename, full=True), (2, 0))
+            vote_3 = Vote.objects.create(time=datetime(2001, 9, 13), title='vote 3')
+            VoteAction.objects.filter(vote=self.vote_1).update(type='abstain')
+            self.assertEqual(vote_snapshot.update_snapshot(filename), (1, 1))
+            arrays = vote_snapshot.load_snapshot(filename)
+            self.assertEqual(list(arrays['votes_id']), [self.vote_1.id, self.vote_2.id, vote_3.id])
+            self.assertEqual(list(arrays['actions_vote_id']), [self.vote_1.id, self.vote_2.id])
+            self.assertEqual(list(arrays['actions_type']),
+                             [vote_snapshot.ACTION_TYPES.index('abstain'),
+                              vote_snapshot.ACTION_TYPES.index('against')])
+            self.assertEqual(list(arrays['votes_title_labels'][arrays['votes_title_codes']]),
+                             [u'vote 1', u'vote 1', u'vote 3'])
+        finally:
+            if default_storage.exists(filename):
+                default_storage.delete(filename)
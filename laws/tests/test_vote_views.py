@@ -62,6 +62,49 @@ class VoteViewsTest(TestCase):
                                 'laws/vote_detail.html')
         self.assertEqual(res.context['vote'].id, self.vote_1.id)
 
+    def testVoteDetailNeighboursAndBills(self):
+        res = self.client.get(reverse('vote-detail', kwargs={'pk': self.vote_1.id}))
+        self.assertEqual(res.context['next_v'], self.vote_2.get_absolute_url())
+        self.assertEqual(res.context['prev_v'], None)
+        self.assertEqual(res.context['bills'], [])
+        vote_3 = Vote.objects.create(time=datetime(2010, 1, 1), title='vote 3')
+        self.bill_1.pre_votes.add(self.vote_1)
+        self.bill_2.approval_vote = self.vote_1
+        self.bill_2.save()
+        res = self.client.get(reverse('vote-detail', kwargs={'pk': self.vote_1.id}))
+        self.assertEqual(res.context['next_v'], vote_3.get_absolute_url())
+        self.assertEqual(map(just_id, res.context['bills']), [self.bill_1.id, self.bill_2.id])
+        vote_3.delete()
+        self.assertEqual(Vote.objects.get(id=self.vote_2.id).previous_vote_id, self.vote_1.id)
+
+    def test_vote_neighbours_are_relinked_locally(self):
+        votes = [Vote.objects.create(time=datetime(2030, 1, i + 1), title='vote %d' % i) for i in range(3)]
+        self.assertEqual(Vote.objects.get(id=votes[1].id).next_vote_id, votes[2].id)
+        # moving a vote relinks the votes it left and the votes it moved to
+        votes[0].time = datetime(2030, 1, 5)
+        votes[0].save()
+        self.assertEqual((votes[0].previous_vote_id, votes[0].next_vote_id), (votes[2].id, None))
+        self.assertEqual(Vote.objects.get(id=votes[1].id).next_vote_id, votes[2].id)
+        votes[1].delete()
+        self.assertEqual(Vote.objects.get(id=votes[2].id).next_vote_id, votes[0].id)
+        # the same links a full relink sets
+        self.assertEqual(Vote.objects.update_neighbours(), [])
+
+    def test_vote_neighbours_are_relinked_when_the_time_changes(self):
+        vote = Vote.objects.create(time=datetime(2030, 1, 1), title='vote')
+        relinked = []
+        relink_neighbours = Vote.objects.relink_neighbours
+        Vote.objects.relink_neighbours = lambda vote: relinked.append(vote.id) or relink_neighbours(vote)
+        try:
+            vote.title = 'renamed vote'
+            vote.save()
+            self.assertEqual(relinked, [])
+            vote.time = datetime(2030, 1, 2)
+            vote.save()
+            self.assertEqual(relinked, [vote.id])
+        finally:
+            del Vote.objects.relink_neighbours
+
     def test_attach_bill_as_pre(self):
         self.assertTrue(self.client.login(username='jacob', password='JKM'))
         res = self.client.post(reverse('vote-detail',
@@ -4,7 +4,7 @@ from django.utils.translation import ugettext
 from django.views.generic import RedirectView
 from models import Vote, Bill
 from views import (
-    VoteListView, VoteCsvView, VoteDetailView, VoteTagsView,
+    VoteListView, VoteCsvView, VoteSnapshotView, VoteDetailView, VoteTagsView,
     BillListView, BillCsvView, BillDetailView, BillTagsView,
     bill_unbind_vote, bill_unbind_committee_meeting, bill_unbind_knesset_proposal,
     bill_auto_complete,
@@ -56,6 +56,7 @@ lawsurlpatterns = patterns(
         bill_detail_view, name='bill-detail-with-slug'),
     url(r'^vote/$', vote_list_view, name='vote-list'),
     url(r'^vote/csv/$', VoteCsvView.as_view()),
+    url(r'^vote/snapshot/$', VoteSnapshotView.as_view(), name='vote-snapshot'),
     url(r'^vote/tag/$', vote_tags_cloud, name='vote-tags-cloud'),
     url(r'^vote/rss/$', feeds.Votes(), name='votes-feed'),
     url(r'^vote/tag/(?P<tag>.*)/$', VoteTagsView.as_view(), name='vote-tag'),
@@ -6,11 +6,12 @@ import os
 import difflib
 import logging
 
-import itertools
 import tagging
 import voting
-from actstream import action
+from auxiliary.actions import send_action
+from django.conf import settings
 from django.contrib.auth.decorators import login_required
+from django.core.cache import cache
 from django.core.exceptions import ObjectDoesNotExist
 from django.core.urlresolvers import reverse
 from django.db import DatabaseError
@@ -22,19 +23,26 @@ from django.template import RequestContext
 from django.utils.decorators import method_decorator
 from django.utils.translation import ugettext_lazy, ugettext as _
 from django.views.decorators.csrf import ensure_csrf_cookie
+from django.views.generic import RedirectView
+from django.core.files.storage import default_storage
 from django.db.models import Q
 from tagging.models import Tag, TaggedItem
+from actstream.models import Action, Follow
+from django.contrib.comments.models import Comment
 
-from agendas.models import Agenda, UserSuggestedVote, Link
+from agendas.models import Agenda, AgendaBill, AgendaVote, UserSuggestedVote, Link
+from laws.constants import VOTES_SNAPSHOT_FILENAME
 from laws.vote_choices import BILL_STAGE_CHOICES
 from ok_tag.views import BaseTagMemberListView
-from auxiliary.mixins import CsvView
+from auxiliary.mixins import CsvView, ConditionalDetailMixin
 from forms import VoteSelectForm, BillSelectForm, BudgetEstimateForm
 from forms import AttachBillFromVoteForm
 from hashnav import DetailView, ListView as HashnavListView
 from knesset.utils import notify_responsible_adult
-from mks.models import Member, Knesset
-from models import Bill, BillBudgetEstimation, Vote, KnessetProposal, VoteAction
+from mks.models import Member, Knesset, Party
+from models import (Bill, BillBudgetEstimation, Vote, PrivateProposal, KnessetProposal, GovProposal,
+                    VoteAction)
+from laws.models.vote import VOTE_DETAIL_CACHE_KEY
 from committees.models import CommitteeMeeting
 
 logger = logging.getLogger("open-knesset.laws.views")
@@ -340,9 +348,12 @@ class BillCsvView(CsvView):
         return self.community_meeting_gen(obj, attr)
 
 
-class BillDetailView(DetailView):
+class BillDetailView(ConditionalDetailMixin, DetailView):
     allowed_methods = ['get', 'post']
     model = Bill
+    conditional_models = (Vote, VoteAction, Member, PrivateProposal, KnessetProposal, GovProposal,
+                          BillBudgetEstimation, voting.models.Vote, Agenda, AgendaBill, CommitteeMeeting,
+                          Action, Comment, TaggedItem, Follow, Link)
 
     @method_decorator(ensure_csrf_cookie)
     def dispatch(self, *args, **kwargs):
@@ -383,14 +394,11 @@ class BillDetailView(DetailView):
         proposers = proposers.select_related('current_party')
         extra_proposers = extra_proposers.select_related('current_party')
 
-        links = list(Link.objects.for_model(Member))
-        links_by_member = {}
-        for k, g in itertools.groupby(links, lambda x: x.object_pk):
-            links_by_member[str(k)] = list(g)
+        links_by_member = Link.objects.for_objects(list(proposers) + list(extra_proposers))
         for proposer in proposers:
-            proposer.cached_links = links_by_member.get(str(proposer.pk), [])
+            proposer.cached_links = links_by_member.get(unicode(proposer.pk), [])
         for proposer in extra_proposers:
-            proposer.cached_links = links_by_member.get(str(proposer.pk), [])
+            proposer.cached_links = links_by_member.get(unicode(proposer.pk), [])
         context['proposers'] = proposers
         context['extra_proposers'] = extra_proposers
         votes = voting.models.Vote.objects.get_object_votes(bill)
@@ -498,7 +506,7 @@ class BillDetailView(DetailView):
             else:
                 return self.render_post_error(request, bill, _('Invalid vote type'), vote=vote)
             bill.update_stage()
-            action.send(request.user, verb='added-vote-to-bill',
+            send_action(request.user, verb='added-vote-to-bill',
                         description=vote,
                         target=bill,
                         timestamp=datetime.datetime.now())
@@ -810,48 +818,35 @@ class VoteCsvView(CsvView):
         return Vote.objects.filter_and_order(**options)
 
 
-class VoteDetailView(DetailView):
+class VoteSnapshotView(RedirectView):
+    """Redirects to the columnar votes snapshot created by export_votes_snapshot"""
+    permanent = False
+
+    def get_redirect_url(self, **kwargs):
+        if not default_storage.exists(VOTES_SNAPSHOT_FILENAME):
+            raise Http404
+        return default_storage.url(VOTES_SNAPSHOT_FILENAME)
+
+
+class VoteDetailView(ConditionalDetailMixin, DetailView):
     model = Vote
+    # the neighbours of a vote change with the other votes
+    conditional_models = (Vote, VoteAction, Bill, Member, Party, Agenda, AgendaVote, UserSuggestedVote,
+                          Action, Comment, TaggedItem, Follow, Link)
     template_resource_name = 'vote'
 
     def get_context_data(self, *args, **kwargs):
         context = super(VoteDetailView, self).get_context_data(*args, **kwargs)
         vote = context['vote']
 
-        related_bills = list(vote.bills_pre_votes.all())
-        if Bill.objects.filter(approval_vote=vote).count() > 0:
-            related_bills.append(vote.bill_approved)
-        if Bill.objects.filter(first_vote=vote).count() > 0:
-            related_bills.extend(vote.bills_first.all())
-
-        for_votes = vote.for_votes().select_related('member',
-                                                    'member__current_party')
-        against_votes = vote.against_votes().select_related('member',
-                                                            'member__current_party')
-        abstain_votes = vote.abstain_votes().select_related('member',
-                                                            'member__current_party')
-
-        try:
-            next_v = vote.get_next_by_time()
-            next_v = next_v.get_absolute_url()
-        except Vote.DoesNotExist:
-            next_v = None
-        try:
-            prev_v = vote.get_previous_by_time()
-            prev_v = prev_v.get_absolute_url()
-        except Vote.DoesNotExist:
-            prev_v = None
-
-        c = {'title': vote.title,
-             'bills': related_bills,
-             'for_votes': for_votes,
-             'against_votes': against_votes,
-             'abstain_votes': abstain_votes,
-             'next_v': next_v,
-             'prev_v': prev_v,
-             'tags': vote.tags,
-             }
-        context.update(c)
+        cache_key = VOTE_DETAIL_CACHE_KEY % vote.id
+        cached_context = cache.get(cache_key)
+        if cached_context is None:
+            cached_context = self._build_context_data(vote)
+            cache.set(cache_key, cached_context, settings.LONG_CACHE_TIME)
+        context.update(cached_context)
+        context['title'] = vote.title
+        context['tags'] = vote.tags
 
         # Add bill form
         if 'bill_form' in kwargs:
@@ -861,6 +856,22 @@ class VoteDetailView(DetailView):
 
         return context
 
+    def _build_context_data(self, vote):
+        """
+        The context which only changes with the vote actions, bills and
+        neighbours of the vote, cached until they change (see laws.listeners)
+        """
+        votes_by_type = {'for': [], 'against': [], 'abstain': []}
+        for vote_action in vote.actions.select_related('member', 'member__current_party').order_by('id'):
+            votes_by_type.setdefault(vote_action.type, []).append(vote_action)
+        return {'bills': vote.related_bills(),
+                'for_votes': votes_by_type['for'],
+                'against_votes': votes_by_type['against'],
+                'abstain_votes': votes_by_type['abstain'],
+                'next_v': reverse('vote-detail', args=[str(vote.next_vote_id)]) if vote.next_vote_id else None,
+                'prev_v': reverse('vote-detail', args=[str(vote.previous_vote_id)]) if vote.previous_vote_id else None,
+                }
+
     @method_decorator(login_required)
     def post(self, request, *args, **kwargs):
         object_id = kwargs['pk']
@@ -0,0 +1,302 @@
+# encoding: utf-8
+"""
+Columnar snapshot of the votes data for analytics consumers.
+
+The snapshot is a single NumPy .npz file holding one array per
+column, sorted by vote id. It is not compressed so its members can be read
+in place (e.g. memory mapped after extracting them), without inflating them:
+
+* votes_*     - one row per Vote
+* actions_*   - one row per VoteAction, the action type is int coded
+                (see ACTION_TYPES) and the against_* flags are packed
+                into a bitmask (see ACTION_FLAGS)
+* members_*   - one row per Member
+* parties_*   - one row per Party
+
+Repeating strings are dictionary encoded: a <name>_codes int array holds
+indexes into the matching <name>_labels array.
+
+Load it with::
+
+    snapshot = numpy.load('votes.npz')
+    titles = snapshot['votes_title_labels'][snapshot['votes_title_codes']]
+"""
+from io import BytesIO
+
+import numpy as np
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db.models import Count, Max, Min, Sum
+
+from laws.constants import VOTES_SNAPSHOT_FILENAME
+from laws.enums import VOTE_ACTION_TYPE_CHOICES
+from laws.models import Vote, VoteAction
+from mks.models import Member, Party
+
+SNAPSHOT_FORMAT_VERSION = 1
+
+ACTION_TYPES = [action_type for action_type, title in VOTE_ACTION_TYPE_CHOICES]
+
+ACTION_FLAGS = ('against_party', 'against_coalition', 'against_opposition',
+                'against_own_bill')
+
+# used for missing values in the int columns
+NULL_INT = -1
+
+VOTE_COLUMNS = ('votes_id', 'votes_time', 'votes_meeting_number',
+                'votes_vote_number', 'votes_for_count', 'votes_against_count',
+                'votes_abstain_count', 'votes_type_codes', 'votes_title_codes')
+
+ACTION_COLUMNS = ('actions_vote_id', 'actions_member_id', 'actions_party_id',
+                  'actions_type', 'actions_flags')
+
+
+# votes per query, the rows of a query and their actions are the only rows
+# held in memory while the arrays are built
+CHUNK_SIZE = 500
+
+VOTE_FIELDS = ('id', 'time', 'meeting_number', 'vote_number', 'for_votes_count',
+               'against_votes_count', 'abstain_votes_count', 'vote_type', 'title')
+
+ACTION_FIELDS = ('vote_id', 'member_id', 'party_id', 'type') + ACTION_FLAGS
+
+
+def _int_array(values, dtype=np.int32):
+    return np.array([NULL_INT if v is None else v for v in values], dtype=dtype)
+
+
+def _int_column(rows, index, dtype=np.int32):
+    return np.fromiter((NULL_INT if row[index] is None else row[index] for row in rows),
+                       dtype=dtype, count=len(rows))
+
+
+def _encode(values, labels, index):
+    """codes of the values, new values are appended to labels and index"""
+    codes = []
+    for value in values:
+        value = value or u''
+        if value not in index:
+            index[value] = len(labels)
+            labels.append(value)
+        codes.append(index[value])
+    return np.array(codes, dtype=np.int32)
+
+
+def dictionary_encode(values, labels=None):
+    """
+    Returns (codes, labels) for the given strings.
+    Existing labels are kept in place, so codes of a previous snapshot
+    stay valid when new labels are appended.
+    """
+    labels = list(labels) if labels is not None else []
+    index = dict((label, i) for i, label in enumerate(labels))
+    codes = _encode(values, labels, index)
+    return codes, np.array(labels, dtype=np.unicode_)
+
+
+def _empty_vote_arrays():
+    arrays = dict((column, np.array([], dtype=np.int32))
+                  for column in VOTE_COLUMNS + ACTION_COLUMNS)
+    arrays['votes_time'] = np.array([], dtype='datetime64[s]')
+    arrays['actions_type'] = np.array([], dtype=np.int8)
+    arrays['actions_flags'] = np.array([], dtype=np.uint8)
+    arrays['votes_type_labels'] = np.array([], dtype=np.unicode_)
+    arrays['votes_title_labels'] = np.array([], dtype=np.unicode_)
+    return arrays
+
+
+def _vote_chunks(since_vote_id=None, vote_ids=None):
+    """filters of the votes in chunks of up to CHUNK_SIZE consecutive ids"""
+    if vote_ids is not None:
+        vote_ids = sorted(vote_ids)
+        for i in range(0, len(vote_ids), CHUNK_SIZE):
+            yield {'id__in': vote_ids[i:i + CHUNK_SIZE]}
+        return
+    votes = Vote.objects.all()
+    if since_vote_id is not None:
+        votes = votes.filter(id__gt=since_vote_id)
+    bounds = votes.aggregate(Min('id'), Max('id'))
+    if bounds['id__min'] is None:
+        return
+    for start in range(bounds['id__min'], bounds['id__max'] + 1, CHUNK_SIZE):
+        yield {'id__gte': start, 'id__lt': start + CHUNK_SIZE}
+
+
+def build_vote_arrays(since_vote_id=None, type_labels=None, title_labels=None, vote_ids=None):
+    """
+    Returns the votes and actions columns for the votes with the vote_ids, or
+    all votes with id greater than since_vote_id (or all votes). The rows are
+    read with values_list in chunks of votes, and every chunk is converted to
+    arrays before the next one is read, so the model instances are never
+    built and the tables are never held as python tuples.
+    """
+    type_codes = dict((action_type, i) for i, action_type in enumerate(ACTION_TYPES))
+    type_labels = list(type_labels) if type_labels is not None else []
+    title_labels = list(title_labels) if title_labels is not None else []
+    type_index = dict((label, i) for i, label in enumerate(type_labels))
+    title_index = dict((label, i) for i, label in enumerate(title_labels))
+
+    chunks = dict((column, []) for column in VOTE_COLUMNS + ACTION_COLUMNS)
+    for chunk in _vote_chunks(since_vote_id, vote_ids):
+        rows = list(Vote.objects.filter(**chunk).order_by('id').values_list(*VOTE_FIELDS))
+        chunks['votes_id'].append(_int_column(rows, 0))
+        chunks['votes_time'].append(np.array([row[1] for row in rows], dtype='datetime64[s]'))
+        for column, index in (('votes_meeting_number', 2), ('votes_vote_number', 3), ('votes_for_count', 4),
+                              ('votes_against_count', 5), ('votes_abstain_count', 6)):
+            chunks[column].append(_int_column(rows, index))
+        chunks['votes_type_codes'].append(_encode((row[7] for row in rows), type_labels, type_index))
+        chunks['votes_title_codes'].append(_encode((row[8] for row in rows), title_labels, title_index))
+
+        action_filter = dict(('vote__' + key, value) for key, value in chunk.items())
+        rows = list(VoteAction.objects.filter(**action_filter).order_by('vote', 'id').values_list(*ACTION_FIELDS))
+        for column, index in (('actions_vote_id', 0), ('actions_member_id', 1), ('actions_party_id', 2)):
+            chunks[column].append(_int_column(rows, index))
+        chunks['actions_type'].append(np.fromiter(
+            (NULL_INT if type_codes.get(row[3]) is None else type_codes[row[3]] for row in rows),
+            dtype=np.int8, count=len(rows)))
+        chunks['actions_flags'].append(np.fromiter(
+            (sum(1 << bit for bit, flag in enumerate(row[4:]) if flag) for row in rows),
+            dtype=np.uint8, count=len(rows)))
+
+    arrays = _empty_vote_arrays()
+    for column, arrays_of_chunks in chunks.items():
+        if arrays_of_chunks:
+            arrays[column] = np.concatenate(arrays_of_chunks)
+    arrays['votes_type_labels'] = np.array(type_labels, dtype=np.unicode_)
+    arrays['votes_title_labels'] = np.array(title_labels, dtype=np.unicode_)
+    return arrays
+
+
+def _actions_fingerprints(arrays):
+    """{(vote id, type code, flags): (number of actions, sum of their member ids)} of the snapshot actions"""
+    # the type code (from -1) and the flags (4 bits) fit in the low 8 bits of the keys
+    keys = ((arrays['actions_vote_id'].astype(np.int64) << 8) |
+            ((arrays['actions_type'].astype(np.int64) + 1) << 4) | arrays['actions_flags'])
+    keys, groups = np.unique(keys, return_inverse=True)
+    counts = np.bincount(groups)
+    members_sums = np.bincount(groups, weights=np.maximum(arrays['actions_member_id'], 0))
+    return dict(((int(key >> 8), int((key >> 4) & 0xf) - 1, int(key & 0xf)), (int(count), int(members_sum)))
+                for key, count, members_sum in zip(keys, counts, members_sums))
+
+
+def changed_vote_ids(previous):
+    """
+    The ids of the votes of the previous snapshot whose actions were added,
+    deleted or changed since, or which were deleted. The actions are compared
+    by their number and the sum of their member ids for every type and flags,
+    which the db groups for all the votes in one query.
+    """
+    if not len(previous['votes_id']):
+        return set()
+    last_vote_id = int(previous['votes_id'][-1])
+    type_codes = dict((action_type, i) for i, action_type in enumerate(ACTION_TYPES))
+    current = {}
+    for row in VoteAction.objects.filter(vote__lte=last_vote_id).order_by().values(
+            'vote', 'type', *ACTION_FLAGS).annotate(actions=Count('id'), members_sum=Sum('member')):
+        type_code = NULL_INT if type_codes.get(row['type']) is None else type_codes[row['type']]
+        flags = sum(1 << bit for bit, flag in enumerate(ACTION_FLAGS) if row[flag])
+        key = (row['vote'], type_code, flags)
+        count, members_sum = current.get(key, (0, 0))
+        current[key] = (count + row['actions'], members_sum + (row['members_sum'] or 0))
+    snapshotted = _actions_fingerprints(previous)
+    changed = set(key[0] for key in set(current) | set(snapshotted) if current.get(key) != snapshotted.get(key))
+    existing = set(Vote.objects.filter(id__lte=last_vote_id).values_list('id', flat=True))
+    changed.update(set(previous['votes_id'].tolist()) - existing)
+    return changed
+
+
+def build_member_arrays():
+    """Members and parties are small, so they are always exported in full"""
+    arrays = {}
+    members = list(Member.objects.order_by('id').values_list(
+        'id', 'name', 'current_party_id', 'is_current'))
+    columns = zip(*members) if members else [()] * 4
+    arrays['members_id'] = _int_array(columns[0])
+    arrays['members_name'] = np.array(columns[1], dtype=np.unicode_)
+    arrays['members_current_party_id'] = _int_array(columns[2])
+    arrays['members_is_current'] = np.array(columns[3], dtype=np.bool_)
+
+    parties = list(Party.objects.order_by('id').values_list(
+        'id', 'name', 'knesset_id', 'is_coalition'))
+    columns = zip(*parties) if parties else [()] * 4
+    arrays['parties_id'] = _int_array(columns[0])
+    arrays['parties_name'] = np.array(columns[1], dtype=np.unicode_)
+    arrays['parties_knesset_id'] = _int_array(columns[2])
+    arrays['parties_is_coalition'] = np.array(columns[3], dtype=np.bool_)
+    return arrays
+
+
+def load_snapshot(filename=VOTES_SNAPSHOT_FILENAME):
+    """Returns the arrays of an existing snapshot, or None"""
+    if not default_storage.exists(filename):
+        return None
+    with default_storage.open(filename) as f:
+        snapshot = np.load(BytesIO(f.read()))
+        arrays = dict((name, snapshot[name]) for name in snapshot.files)
+    if int(arrays.get('format_version', 0)) != SNAPSHOT_FORMAT_VERSION:
+        return None
+    return arrays
+
+
+def _remove_votes(arrays, vote_ids):
+    """the arrays without the rows of the votes with the ids"""
+    arrays = dict(arrays)
+    keep_votes = ~np.in1d(arrays['votes_id'], list(vote_ids))
+    keep_actions = ~np.in1d(arrays['actions_vote_id'], list(vote_ids))
+    for column in VOTE_COLUMNS:
+        arrays[column] = arrays[column][keep_votes]
+    for column in ACTION_COLUMNS:
+        arrays[column] = arrays[column][keep_actions]
+    return arrays
+
+
+def update_snapshot(filename=VOTES_SNAPSHOT_FILENAME, full=False):
+    """
+    Writes the snapshot to the default storage.
+    Unless full is given, only votes newer than the last vote of the
+    existing snapshot, and the older votes whose actions changed (see
+    changed_vote_ids), are queried and merged into it.
+    Returns the (number of votes added, number of votes exported again).
+    """
+    previous = None if full else load_snapshot(filename)
+    if previous is None:
+        previous = _empty_vote_arrays()
+    since_vote_id = int(previous['votes_id'][-1]) if len(previous['votes_id']) else None
+    changed = changed_vote_ids(previous)
+    if changed:
+        previous = _remove_votes(previous, changed)
+
+    new = build_vote_arrays(since_vote_id,
+                            type_labels=previous['votes_type_labels'],
+                            title_labels=previous['votes_title_labels'])
+    # deleted votes are not found again
+    updated = build_vote_arrays(vote_ids=changed,
+                                type_labels=new['votes_type_labels'],
+                                title_labels=new['votes_title_labels']) if changed else None
+    arrays = {}
+    for column in VOTE_COLUMNS + ACTION_COLUMNS:
+        arrays[column] = np.concatenate([previous[column], new[column]] +
+                                        ([updated[column]] if updated is not None else []))
+    if updated is not None:
+        # the votes exported again are put back in their place, a stable sort
+        # keeps the actions of every vote in their order
+        votes_order = np.argsort(arrays['votes_id'], kind='mergesort')
+        actions_order = np.argsort(arrays['actions_vote_id'], kind='mergesort')
+        for column in VOTE_COLUMNS:
+            arrays[column] = arrays[column][votes_order]
+        for column in ACTION_COLUMNS:
+            arrays[column] = arrays[column][actions_order]
+    labels = new if updated is None else updated
+    arrays['votes_type_labels'] = labels['votes_type_labels']
+    arrays['votes_title_labels'] = labels['votes_title_labels']
+    arrays['actions_type_labels'] = np.array(ACTION_TYPES, dtype=np.unicode_)
+    arrays['actions_flags_labels'] = np.array(ACTION_FLAGS, dtype=np.unicode_)
+    arrays['format_version'] = np.array(SNAPSHOT_FORMAT_VERSION)
+    arrays.update(build_member_arrays())
+
+    output = BytesIO()
+    np.savez(output, **arrays)
+    if default_storage.exists(filename):
+        default_storage.delete(filename)
+    default_storage.save(filename, ContentFile(output.getvalue()))
+    return len(new['votes_id']), 0 if updated is None else len(updated['votes_id'])
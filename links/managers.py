@@ -16,3 +16,17 @@ class LinksManager(models.Manager):
         if isinstance(model, models.Model):
             qs = qs.filter(object_pk=force_unicode(model._get_pk_val()))
         return qs
+
+    def for_objects(self, objects):
+        """
+        Returns {object pk (as unicode): [links]} of the links of the given
+        model instances (all of the same model), fetched with one query.
+        """
+        objects = list(objects)
+        if not objects:
+            return {}
+        links = {}
+        for link in self.for_model(objects[0].__class__).filter(
+                object_pk__in=[force_unicode(obj.pk) for obj in objects]).order_by('id'):
+            links.setdefault(link.object_pk, []).append(link)
+        return links
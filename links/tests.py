@@ -68,6 +68,13 @@ class TestModels(unittest.TestCase):
         self.assertEqual(self.link.link_type, self.default_link)
         self.assertEqual(self.link.__unicode__(), u'google: http://www.google.com/')
 
+    def testLinksForObjects(self):
+        other_mk = Member.objects.create(name='other MK')
+        links = Link.objects.for_objects([self.mk, other_mk])
+        self.assertEqual(links, {unicode(self.mk.pk): [self.link]})
+        self.assertEqual(Link.objects.for_objects([]), {})
+        other_mk.delete()
+
     def tearDown(self):
         self.knesset.delete()
         self.default_link.delete()
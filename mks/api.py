@@ -14,14 +14,18 @@ import tastypie.fields as fields
 from tagging.models import Tag
 from tagging.utils import calculate_cloud
 from apis.resources.base import BaseResource, BaseNonModelResource
-from models import Member, Party, Knesset
+from models import Member, Party, Knesset, Membership
 from agendas.models import Agenda
+from committees.models import CommitteeMeeting
+from laws.models import VoteAction
+from mmm.models import Document
 from video.utils import get_videos_queryset
 from video.api import VideoResource
 from links.models import Link
 from links.api import LinkResource
 from persons.api import RoleResource
-from persons.models import Person, PersonAlias
+from persons.models import Person, PersonAlias, Role
+from video.models import Video
 
 from django.db.models import Count
 
@@ -39,6 +43,7 @@ class PartyResource(BaseResource):
         allowed_methods = ['get']
         excludes = ['end_date', 'start_date']
         include_absolute_url = True
+        conditional_models = (Knesset,)
 
     def get_object_list(self, request):
         knesset = request.GET.get('knesset', 'current')
@@ -203,6 +208,7 @@ class MemberResource(BaseResource):
         list_fields = ['name', 'id', 'img_url', 'is_current', 'average_weekly_presence_hours', 'mmms_count',
                        'bills_stats_first', 'bills_stats_proposed', ]
         include_absolute_url = True
+        conditional_models = (Party, Membership, VoteAction, CommitteeMeeting, Document, Video, Link, Person, Role)
 
     party_name = fields.CharField()
     party_url = fields.CharField()
@@ -274,14 +280,7 @@ class MemberResource(BaseResource):
         return party.get_absolute_url() if party else None
 
     def dehydrate_mmms_count(self, bundle):
-        _cache_key = 'api_v2_member_mmms_' + str(bundle.obj.pk)
-        count = cache.get(_cache_key)
-
-        if count is None:
-            count = bundle.obj.mmm_documents.count()
-            cache.set(_cache_key, count, 24 * 3600)
-
-        return count
+        return len(Document.objects.get_member_document_ids(bundle.obj.pk))
 
     def dehydrate_votes_count(self, bundle):
         _cache_key = 'api_v2_member_votes_' + str(bundle.obj.pk)
@@ -0,0 +1,10 @@
+from knesset.enums import Enum
+
+
+class TimelineKinds(Enum):
+    """the sections of the member page a timeline entry is shown in"""
+    legislation = 'legislation'
+    committee = 'committee'
+    plenum = 'plenum'
+    annotation = 'annotation'
+    other = 'other'
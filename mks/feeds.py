@@ -1,23 +1,26 @@
-from django.contrib.syndication.views import Feed
 from django.utils.translation import ugettext as _
 from django.shortcuts import get_object_or_404
 from actstream import actor_stream
+from auxiliary.feeds import CachedFeed
 from models import Member
 
 # some translation strings we need for the feed
 TRANSLATE_THIS = ( _('voted'), _('posted'), 
                   _('attended'), _('committee meeting'))
 
-class MemberActivityFeed(Feed):
+class MemberActivityFeed(CachedFeed):
     '''
     A feed for each member. The feed accepts one optional url parameter *verbs* that
     contains a comma-sperated list of verbs to be included in the feed
     '''
+    timestamp_field = 'timestamp'
 
-    def get_object (self, request, object_id):
+    def get_object(self, request, object_id):
+        member = get_object_or_404(Member, pk=object_id)
+        # kept on the member (and not on the feed, which is shared by the requests)
         verbs = request.GET.get('verbs', False)
-        self.verbs = verbs.split(',') if verbs else False
-        return get_object_or_404(Member, pk=object_id)
+        member.feed_verbs = verbs.split(',') if verbs else []
+        return member
 
     def title(self, member):
         return _('Member activity feed for %s') % member
@@ -28,13 +31,16 @@ class MemberActivityFeed(Feed):
     def description(self, member):
         return _('Actions of %s, including votes, attended committees and posted articles') % member
 
-    def items(self, member):
+    def items_queryset(self, member):
+        # the generic relations of the stream are fetched in bulk, a query per content type
         stream = actor_stream(member)
-        if stream:
-            if self.verbs:
-                stream = stream.filter(verb__in = self.verbs)
-            return (item for item in stream[:20] if item.target) # remove items with None target, or invalid target
-        return []
+        if member.feed_verbs:
+            stream = stream.filter(verb__in=member.feed_verbs)
+        return stream
+
+    def items(self, member):
+        # remove items with None target, or invalid target
+        return [item for item in super(MemberActivityFeed, self).items(member) if item.target]
 
     def item_title(self, item):
         title = _(item.verb)
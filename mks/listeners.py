@@ -1,10 +1,14 @@
 #encoding: utf-8
+from actstream.models import Action
+from django.contrib.contenttypes.models import ContentType
 from django.db.models.signals import post_save, post_delete
 from planet.models import Feed, Post
-from actstream import action
-from knesset.utils import cannonize, disable_for_loaddata
+from auxiliary.actions import actions_written, send_action
+from auxiliary.conditional import touch, track_changes
+from knesset.utils import cannonize, disable_for_loaddata, defer_during_bulk_import
 from links.models import Link, LinkType
-from models import Member, Knesset
+from mks.managers import action_fields
+from models import Member, Knesset, Party, Membership, MemberTimelineEntry, Award, AwardType
 
 import logging
 logger = logging.getLogger("open-knesset.mks.listeners")
@@ -31,14 +35,50 @@ def record_post_action(sender, created, instance, **kwargs):
             logger.warn('Multiple feeds: %s' % e)
             link = Link.objects.filter(url=instance.feed.url)[0]
         member  = link.content_object
-        action.send(member, verb='posted',
+        send_action(member, verb='posted',
                     target = instance,
                     timestamp=instance.date_modified or instance.date_created)
 post_save.connect(record_post_action, sender=Post)
 
 
+def append_created_actions(signals):
+    MemberTimelineEntry.objects.append_actions(
+        action_fields(kwargs['instance']) for kwargs in signals if kwargs['created'])
+
+@defer_during_bulk_import(append_created_actions, droppable=False)
+def append_created_action(sender, created, instance, raw=False, **kwargs):
+    """adds an action sent unbuffered to the member timelines (fixtures are loaded by rebuild_member_timelines)"""
+    if created and not raw:
+        MemberTimelineEntry.objects.append_actions([action_fields(instance)])
+post_save.connect(append_created_action, sender=Action)
+
+def append_written_actions(sender, actions, **kwargs):
+    MemberTimelineEntry.objects.append_actions(actions)
+actions_written.connect(append_written_actions, sender=Action)
+
+def remove_deleted_action(sender, instance, **kwargs):
+    MemberTimelineEntry.objects.remove_action(instance)
+post_delete.connect(remove_deleted_action, sender=Action)
+
+
 def reset_current_knesset(sender, instance, **kwargs):
     """Make sure current knesset is cleared upon changes to Knesset"""
     Knesset.objects._current_knesset = None
 post_save.connect(reset_current_knesset, sender=Knesset)
 post_delete.connect(reset_current_knesset, sender=Knesset)
+
+track_changes(Member, Party, Membership, Knesset, Award, AwardType)
+
+def touch_links_members(signals):
+    member_ct_id = ContentType.objects.get_for_model(Member).id
+    member_ids = set(kwargs['instance'].object_pk for kwargs in signals
+                     if kwargs['instance'].content_type_id == member_ct_id)
+    if member_ids:
+        touch(Member, member_ids)
+
+@defer_during_bulk_import(touch_links_members, droppable=False)
+def touch_link_member(sender, instance, **kwargs):
+    """the links of a member are shown with the member, as in the meeting pages"""
+    touch_links_members([{'instance': instance}])
+post_save.connect(touch_link_member, sender=Link)
+post_delete.connect(touch_link_member, sender=Link)
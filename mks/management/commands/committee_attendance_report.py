@@ -3,8 +3,9 @@ from collections import namedtuple
 from django.core.management.base import NoArgsCommand
 from logging import getLogger
 
+from committees.models import CommitteeAttendance
 from knesset.technical_services.csv_writer import UnicodeCsvWriter
-from mks.models import Member
+from mks.models import Knesset, Member
 
 logger = getLogger(__name__)
 
@@ -18,11 +19,13 @@ class Command(NoArgsCommand):
     def handle_noargs(self, **options):
         csv_writer = UnicodeCsvWriter()
         report_data = [['mk_pk', 'mk_name', 'is_current', 'current_party', 'total_count', 'monthly_average']]
-        for mk in Member.current_knesset.all():
+        totals = CommitteeAttendance.objects.member_totals(Knesset.objects.current_knesset().start_date)
+        for mk in Member.current_knesset.select_related('current_party'):
+            total_count = totals.get(mk.pk, 0)
             mk_attendance = MemberAttendance(mk_pk=mk.pk, mk_name=mk.name, is_current=mk.is_current,
                                              current_party=mk.current_party.name,
-                                             total_count=mk.total_meetings_count_current_knesset,
-                                             monthly_average=mk.committee_meetings_per_month())
+                                             total_count=total_count,
+                                             monthly_average=mk.committee_meetings_per_month(total_count))
 
             logger.info(u'attendance for {0} {1}'.format(mk.pk, mk.name))
             report_data.append(mk_attendance)
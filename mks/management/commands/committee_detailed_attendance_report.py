@@ -1,10 +1,11 @@
-from collections import namedtuple
+from collections import defaultdict, namedtuple
 
 from django.core.management.base import NoArgsCommand
 from logging import getLogger
 
+from committees.models import Committee, CommitteeAttendance
 from knesset.technical_services.csv_writer import UnicodeCsvWriter
-from mks.models import Member
+from mks.models import Knesset, Member
 
 logger = getLogger(__name__)
 
@@ -20,13 +21,20 @@ class Command(NoArgsCommand):
         csv_writer = UnicodeCsvWriter()
         report_data = [
             ['mk_pk', 'mk_name', 'committee', 'is_current', 'current_party', 'total_count']]
-        for mk in Member.current_knesset.all():
-            member_committees = mk.participated_in_committees_for_current_knesset
-            for committee in member_committees:
+        totals = CommitteeAttendance.objects.member_totals(Knesset.objects.current_knesset().start_date,
+                                                           by_committee=True)
+        committee_names = dict(Committee.objects.values_list('id', 'name'))
+        member_committees = defaultdict(dict)
+        for (mk_pk, committee_id), total_count in totals.items():
+            # the meetings of committees with the same name are counted together
+            committee = committee_names[committee_id]
+            member_committees[mk_pk][committee] = member_committees[mk_pk].get(committee, 0) + total_count
+        for mk in Member.current_knesset.select_related('current_party'):
+            for committee, total_count in member_committees[mk.pk].items():
                 mk_attendance = MemberCommitteeAttendance(mk_pk=mk.pk, mk_name=mk.name, is_current=mk.is_current,
                                                           current_party=mk.current_party.name,
                                                           committee=committee,
-                                                          total_count=mk.total_meetings_count_for_committee(committee))
+                                                          total_count=total_count)
 
                 logger.info(u'attendance for {0} {1}'.format(mk.pk, mk.name))
                 report_data.append(mk_attendance)
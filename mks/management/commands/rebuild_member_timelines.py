@@ -0,0 +1,27 @@
+from optparse import make_option
+
+from actstream.models import Action
+from django.core.management.base import NoArgsCommand
+from django.db import transaction
+
+from auxiliary.conditional import touch, touch_objects
+from mks.models import Member, MemberTimelineEntry
+
+
+class Command(NoArgsCommand):
+    help = "Recreates the member timelines (shown in the member pages) from the activity stream"
+
+    option_list = NoArgsCommand.option_list + (
+        make_option('--members', action='store', dest='members', default='',
+                    help='comma separated ids of the members to rebuild, all members if not given'),
+    )
+
+    def handle_noargs(self, **options):
+        member_ids = [int(member_id) for member_id in options['members'].split(',') if member_id] or None
+        with transaction.atomic():
+            created = MemberTimelineEntry.objects.rebuild(member_ids)
+        # the pages showing the timelines depend on the activity stream, the member pages on their members
+        touch(Action)
+        touch_objects(Member, member_ids or Member.objects.values_list('id', flat=True))
+        if int(options.get('verbosity', 1)) > 0:
+            self.stdout.write('%d timeline entries\n' % created)
@@ -1,8 +1,14 @@
 import difflib
+from collections import defaultdict
+
+from django.contrib.contenttypes.models import ContentType
 from django.core.cache import cache
 from django.db import models, connection
 from django.db.models import Q
 
+from auxiliary.conditional import touch_objects
+from mks.enums import TimelineKinds
+
 
 # from agendas.models import Agenda
 
@@ -137,3 +143,177 @@ class MembershipManager(models.Manager):
             cursor.execute(query, query_parameters)
             results = cursor.fetchall()
             return [c[0] for c in results]
+
+
+LEGISLATION_VERBS = ('proposed', 'joined')
+ANNOTATION_VERB = 'got annotation for protocol part'
+
+# the Action fields a timeline entry is made of
+TIMELINE_ACTION_FIELDS = ('actor_content_type', 'actor_object_id', 'verb', 'description',
+                          'target_content_type', 'target_object_id', 'timestamp', 'public')
+
+# relations of the action targets which their titles and urls are made of
+TIMELINE_TARGET_RELATED = {
+    'committees.committeemeeting': ('committee',),
+    'committees.protocolpart': ('meeting__committee',),
+    'laws.privateproposal': ('bill',),
+}
+
+
+def _describe_target(verb, target):
+    """(title, url, text, committee type) of an action target, as the activity templates show them"""
+    if target is None:
+        return u'', u'', u'', u''
+    if verb in LEGISLATION_VERBS and getattr(target, 'bill', None) is not None:
+        return unicode(target.bill), target.bill.get_absolute_url(), u'', u''
+    if verb == 'voted':
+        return target.title, target.get_absolute_url(), u'', u''
+    if verb == 'posted':
+        return target.title, target.url, u'', u''
+    if verb == 'attended':
+        return unicode(target), target.get_absolute_url(), u'', target.committee.type
+    if verb == ANNOTATION_VERB:
+        return unicode(target.meeting), target.get_absolute_url(), target.body, target.meeting.committee.type
+    url = target.get_absolute_url() if hasattr(target, 'get_absolute_url') else u''
+    return unicode(target), url, u'', u''
+
+
+def _action_attnames():
+    from actstream.models import Action
+    return [Action._meta.get_field(name).attname for name in TIMELINE_ACTION_FIELDS]
+
+
+def action_fields(action):
+    """the dict of the attnames of the TIMELINE_ACTION_FIELDS of an Action"""
+    return dict((attname, getattr(action, attname)) for attname in _action_attnames())
+
+
+def _timeline_kind(verb, committee_type):
+    if verb in LEGISLATION_VERBS:
+        return TimelineKinds.legislation
+    if verb == ANNOTATION_VERB:
+        return TimelineKinds.annotation
+    if verb == 'attended' and committee_type in (TimelineKinds.committee, TimelineKinds.plenum):
+        return committee_type
+    return TimelineKinds.other
+
+
+class MemberTimelineEntryManager(models.Manager):
+    def _action_members(self, actions):
+        """
+        {(actor content type id, actor object id): member id} of the actions of
+        members, and of the annotation actions of persons who are members
+        """
+        from mks.models import Member
+        from persons.models import Person
+        member_ct = ContentType.objects.get_for_model(Member)
+        person_ct = ContentType.objects.get_for_model(Person)
+        member_ids, person_ids = set(), set()
+        for fields in actions:
+            if fields['actor_content_type_id'] == member_ct.id and fields['public']:
+                member_ids.add(int(fields['actor_object_id']))
+            elif fields['actor_content_type_id'] == person_ct.id and fields['verb'] == ANNOTATION_VERB:
+                person_ids.add(int(fields['actor_object_id']))
+        members = {}
+        if member_ids:
+            for member_id in Member.objects.filter(id__in=member_ids).values_list('id', flat=True):
+                members[(member_ct.id, unicode(member_id))] = member_id
+        if person_ids:
+            for person_id, member_id in Person.objects.filter(id__in=person_ids, mk__isnull=False) \
+                    .values_list('id', 'mk'):
+                members[(person_ct.id, unicode(person_id))] = member_id
+        return members
+
+    def _action_targets(self, actions):
+        """{(target content type id, target object id): target} of the actions, loaded one query per type"""
+        object_ids = defaultdict(set)
+        for fields in actions:
+            if fields['target_content_type_id'] is not None:
+                object_ids[fields['target_content_type_id']].add(unicode(fields['target_object_id']))
+        targets = {}
+        for content_type_id, ids in object_ids.items():
+            model = ContentType.objects.get_for_id(content_type_id).model_class()
+            if model is None:
+                continue
+            queryset = model._default_manager.filter(pk__in=ids)
+            related = TIMELINE_TARGET_RELATED.get('%s.%s' % (model._meta.app_label, model._meta.model_name))
+            if related:
+                queryset = queryset.select_related(*related)
+            for target in queryset:
+                targets[(content_type_id, unicode(target.pk))] = target
+        return targets
+
+    def entries_for_actions(self, actions):
+        """
+        The (unsaved) entries of the actions (dicts of the attnames of the
+        TIMELINE_ACTION_FIELDS) which are in a member timeline.
+        """
+        actions = list(actions)
+        members = self._action_members(actions)
+        actions = [fields for fields in actions
+                   if (fields['actor_content_type_id'], unicode(fields['actor_object_id'])) in members]
+        targets = self._action_targets(actions)
+        entries = []
+        for fields in actions:
+            target_key = (fields['target_content_type_id'], unicode(fields['target_object_id']))
+            title, url, text, committee_type = _describe_target(fields['verb'], targets.get(target_key))
+            entries.append(self.model(
+                member_id=members[(fields['actor_content_type_id'], unicode(fields['actor_object_id']))],
+                kind=_timeline_kind(fields['verb'], committee_type),
+                verb=fields['verb'],
+                description=fields['description'] or u'',
+                timestamp=fields['timestamp'],
+                target_content_type_id=fields['target_content_type_id'],
+                target_object_id=fields['target_object_id'],
+                title=title, url=url, text=text, committee_type=committee_type))
+        return entries
+
+    def append_actions(self, actions):
+        """adds the entries of the actions to the timelines, returns the number of entries added"""
+        from mks.models import Member
+        entries = self.entries_for_actions(actions)
+        self.bulk_create(entries, batch_size=500)
+        # the timelines are shown on the member pages
+        touch_objects(Member, set(entry.member_id for entry in entries))
+        return len(entries)
+
+    def remove_action(self, action):
+        """removes the entries of a deleted action"""
+        members = self._action_members([action_fields(action)])
+        if members:
+            from mks.models import Member
+            self.filter(member__in=members.values(), verb=action.verb, timestamp=action.timestamp,
+                        target_content_type=action.target_content_type_id,
+                        target_object_id=action.target_object_id).delete()
+            touch_objects(Member, members.values())
+
+    def rebuild(self, member_ids=None, batch_size=1000):
+        """
+        Recreates the timelines of the members (of all members if None) from
+        the activity stream, returns the number of entries created.
+        """
+        from actstream.models import Action
+        from mks.models import Member
+        from persons.models import Person
+        member_ct = ContentType.objects.get_for_model(Member)
+        person_ct = ContentType.objects.get_for_model(Person)
+        entries = self.all()
+        member_actions = Q(actor_content_type=member_ct)
+        person_actions = Q(actor_content_type=person_ct, verb=ANNOTATION_VERB)
+        if member_ids is not None:
+            member_ids = list(member_ids)
+            person_ids = Person.objects.filter(mk__in=member_ids).values_list('id', flat=True)
+            entries = entries.filter(member__in=member_ids)
+            member_actions &= Q(actor_object_id__in=map(unicode, member_ids))
+            person_actions &= Q(actor_object_id__in=map(unicode, person_ids))
+        actions = Action.objects.filter(member_actions | person_actions).order_by('id')
+        entries.delete()
+        attnames = _action_attnames()
+        created = 0
+        last_id = 0
+        while True:
+            rows = list(actions.filter(id__gt=last_id).values_list('id', *TIMELINE_ACTION_FIELDS)[:batch_size])
+            if not rows:
+                return created
+            last_id = rows[-1][0]
+            created += self.append_actions(dict(zip(attnames, row[1:])) for row in rows)
@@ -12,6 +12,7 @@ from django.core.urlresolvers import reverse
 from django.db.models import Q, Max
 from django.utils.translation import ugettext_lazy as _
 from django.contrib.auth.models import User
+from django.contrib.contenttypes.models import ContentType
 from planet.models import Blog
 
 from knesset import utils
@@ -19,9 +20,11 @@ from laws.enums import BillStages
 
 from links.models import Link
 
+from mks.enums import TimelineKinds
 from mks.managers import (
     PartyManager, KnessetManager, CurrentKnessetMembersManager,
-    CurrentKnessetPartyManager, MembershipManager, CurrentKnessetActiveMembersManager, MemberManager)
+    CurrentKnessetPartyManager, MembershipManager, CurrentKnessetActiveMembersManager, MemberManager,
+    MemberTimelineEntryManager)
 
 GENDER_CHOICES = (
     (u'M', _('Male')),
@@ -358,12 +361,14 @@ class Member(models.Model):
         else:
             return None
 
-    def committee_meetings_per_month(self):
-
+    def committee_meetings_per_month(self, meetings_count=None):
+        """meetings_count - of the current knesset, if it was already counted"""
         service_time = self.service_time()
         if not service_time or not self.id:
             return 0
-        return round(self.total_meetings_count_current_knesset * 30.0 / service_time, 2)
+        if meetings_count is None:
+            meetings_count = self.total_meetings_count_current_knesset
+        return round(meetings_count * 30.0 / service_time, 2)
 
     def committee_meeting_current_knesset(self):
         d = Knesset.objects.current_knesset().start_date
@@ -588,5 +593,37 @@ class Award(models.Model):
         ordering = ('-date_given',)
 
 
+class MemberTimelineEntry(models.Model):
+    """
+    An action of a member (or of their person, for the annotations of their
+    protocol parts) with the title and url of its target, classified by the
+    section of the member page it is shown in. Entries are appended when
+    the actions are written (see listeners.py), so the member page and its
+    'more' views read a page of entries instead of resolving the targets of
+    the activity stream. rebuild_member_timelines recreates them.
+    """
+    member = models.ForeignKey('Member', related_name='timeline')
+    kind = models.CharField(max_length=20, choices=TimelineKinds.as_choices())
+    verb = models.CharField(max_length=255)
+    description = models.TextField(blank=True)
+    timestamp = models.DateTimeField()
+    target_content_type = models.ForeignKey(ContentType, blank=True, null=True)
+    target_object_id = models.CharField(max_length=255, blank=True, null=True)
+    title = models.TextField(blank=True)
+    url = models.CharField(max_length=1000, blank=True)
+    # the body of an annotated protocol part
+    text = models.TextField(blank=True)
+    committee_type = models.CharField(max_length=20, blank=True)
+
+    objects = MemberTimelineEntryManager()
+
+    class Meta:
+        ordering = ('-timestamp', '-id')
+        index_together = (('member', 'timestamp'), ('member', 'kind', 'timestamp'))
+
+    def __unicode__(self):
+        return u'%s %s %s' % (self.member_id, self.verb, self.title)
+
+
 # force signal connections
 from listeners import *
@@ -0,0 +1,80 @@
+import datetime
+import json
+
+from actstream import action
+from actstream.models import Action
+from django.core.cache import cache
+from django.core.urlresolvers import reverse
+from django.test import TestCase
+
+from committees.models import Committee
+from laws.models import Bill, PrivateProposal, Vote, VoteAction
+from mks.enums import TimelineKinds
+from mks.managers import ANNOTATION_VERB
+from mks.models import Knesset, Party, Member, MemberTimelineEntry
+
+
+class MemberTimelineTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        today = datetime.date.today()
+        self.knesset = Knesset.objects.create(number=1, start_date=today - datetime.timedelta(100))
+        self.party = Party.objects.create(name='party 1', knesset=self.knesset)
+        self.mk = Member.objects.create(name='mk 1', current_party=self.party)
+        self.committee = Committee.objects.create(name='c1', type='committee')
+        self.plenum = Committee.objects.create(name='plenum', type='plenum')
+        self.meeting = self.committee.meetings.create(date=today - datetime.timedelta(3), topics='topic')
+        self.plenum_meeting = self.plenum.meetings.create(date=today - datetime.timedelta(4), topics='topic')
+        self.meeting.mks_attended.add(self.mk)
+        self.plenum_meeting.mks_attended.add(self.mk)
+        self.bill = Bill.objects.create(stage='1', title='bill 1')
+        self.proposal = PrivateProposal.objects.create(title='proposal 1', bill=self.bill,
+                                                       date=today - datetime.timedelta(5))
+        self.proposal.proposers.add(self.mk)
+        self.votes = [Vote.objects.create(title='vote %d' % i, time=datetime.datetime.now() - datetime.timedelta(i))
+                      for i in range(1, 13)]
+        for vote in self.votes:
+            VoteAction.objects.create(member=self.mk, vote=vote, type='for', party=self.party)
+        self.part = self.meeting.parts.create(order=1, header='mk 1', body='the body')
+        action.send(self.mk.person.get(), verb=ANNOTATION_VERB, target=self.part)
+
+    def test_entries(self):
+        timeline = self.mk.timeline.all()
+        committee_entry = timeline.get(kind=TimelineKinds.committee)
+        self.assertEqual(committee_entry.url, self.meeting.get_absolute_url())
+        self.assertEqual(timeline.get(kind=TimelineKinds.plenum).url, self.plenum_meeting.get_absolute_url())
+        legislation_entry = timeline.get(kind=TimelineKinds.legislation)
+        self.assertEqual((legislation_entry.verb, legislation_entry.url), ('proposed', self.bill.get_absolute_url()))
+        self.assertEqual(timeline.filter(kind=TimelineKinds.other, verb='voted').count(), len(self.votes))
+        annotation_entry = timeline.get(kind=TimelineKinds.annotation)
+        self.assertEqual((annotation_entry.url, annotation_entry.text), (self.part.get_absolute_url(), 'the body'))
+
+    def test_rebuild(self):
+        entries = set(self.mk.timeline.values_list('kind', 'verb', 'url', 'timestamp'))
+        MemberTimelineEntry.objects.all().delete()
+        self.assertEqual(MemberTimelineEntry.objects.rebuild([self.mk.id]), len(entries))
+        self.assertEqual(set(self.mk.timeline.values_list('kind', 'verb', 'url', 'timestamp')), entries)
+
+    def test_deleted_actions_are_removed(self):
+        Action.objects.filter(verb='voted', target_object_id=self.votes[0].id).delete()
+        self.assertEqual(self.mk.timeline.filter(verb='voted').count(), len(self.votes) - 1)
+
+    def test_member_page(self):
+        res = self.client.get(reverse('member-detail', args=[self.mk.id]))
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual([entry.kind for entry in res.context['committee_actions']], [TimelineKinds.committee])
+        self.assertFalse(res.context['committee_actions_more'])
+        self.assertEqual(len(res.context['actions']), 2)
+        self.assertTrue(res.context['actions_more'])
+        self.assertEqual(len(res.context['protocol_part_annotation_actions']), 1)
+
+    def test_more_pages_follow_the_cursor(self):
+        res = self.client.get(reverse('member-detail', args=[self.mk.id]))
+        shown = len(res.context['actions'])
+        cursor = res.context['actions_cursor']
+        url = reverse('member-more-actions', args=[self.mk.id])
+        while cursor:
+            result = json.loads(self.client.get(url, {'cursor': cursor}).content)
+            shown += result['content'].count('<li>')
+            cursor = result['cursor']
+        self.assertEqual(shown, self.mk.timeline.exclude(kind=TimelineKinds.annotation).count())
@@ -86,6 +86,14 @@ class MemberViewsTestCase(TestCase):
                                 'mks/member_detail.html')
         self.assertEqual(res.context['object'].id, self.mk_1.id)
 
+    def testMemberDetailPresence(self):
+        res = self.client.get(reverse('member-detail', args=[self.mk_1.id]))
+        self.assertIn('average_weekly_presence_hours', res.context['presence'])
+        self.assertIn('average_monthly_committee_presence_percentile', res.context['presence'])
+        self.assertEqual(res.context['committee_presence'],
+                         dict((committee['committee'].id, committee['presence'])
+                              for committee in res.context['committees_presence']))
+
     def testMemberDetailOtherVerbs(self):
         """Tests the member detail view with parameters that make it render
         actions other than the default ones"""
@@ -17,6 +17,7 @@ mksurlpatterns = patterns('mks.views',
     url(r'^member/(?P<pk>\d+)/more_legislation/$', mkv.MemeberMoreLegislationView.as_view(), name='member-more-legislation'),
     url(r'^member/(?P<pk>\d+)/more_committee/$', mkv.MemeberMoreCommitteeView.as_view(), name='member-more-committees'),
     url(r'^member/(?P<pk>\d+)/more_plenum/$', mkv.MemeberMorePlenumView.as_view(), name='member-more-plenums'),
+    url(r'^member/(?P<pk>\d+)/more_annotations/$', mkv.MemeberMoreAnnotationsView.as_view(), name='member-more-annotations'),
     url(r'^member/(?P<pk>\d+)/more_mmm/$', mkv.MemeberMoreMMMView.as_view(), name='member-more-mmm'),
 
     url(r'^member/(?P<object_id>\d+)/rss/$', MemberActivityFeed(), name='member-activity-feed'),
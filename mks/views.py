@@ -13,34 +13,39 @@ from django.views.decorators.csrf import ensure_csrf_cookie
 from django.core.cache import cache
 from django.core.urlresolvers import reverse
 from django.utils.decorators import method_decorator
-from django.contrib.contenttypes.models import ContentType
 from django.shortcuts import get_object_or_404, render_to_response
 from backlinks.pingback.server import default_server
-from actstream import actor_stream
-from actstream.models import Follow
 from hashnav.detail import DetailView
+from hashnav.keyset import KeysetPaginator, KeysetPaginationMixin
 
 from laws.enums import BillStages
 from laws.vote_choices import BILL_AGRR_STAGES
-from models import Member, Party, Knesset
+from enums import TimelineKinds
+from models import Member, Party, Knesset, Membership, Award, AwardType
 from utils import percentile
 from laws.models import MemberVotingStatistics, Bill, VoteAction
-from agendas.models import Agenda
+from agendas.models import Agenda, AgendaVote
+from mmm.models import Document
+from user.models import FollowCount
 
-from persons.models import PersonAlias, Person
+from persons.models import Person, PersonAlias
 
 from video.utils import get_videos_queryset
 from datetime import date, timedelta
 
 import logging
-from auxiliary.mixins import GetMoreView, CsvView
+from auxiliary.mixins import GetMoreView, CsvView, ConditionalDetailMixin
 from auxiliary.serializers import PromiseAwareJSONEncoder
 
-from actstream import Action
-from knesset_data_django.committees import members_by_presence
+from actstream import Follow
+from committees.models import CommitteeMeeting, member_presence
 
 logger = logging.getLogger("open-knesset.mks")
 
+# the timeline kinds of the member's recent actions
+TIMELINE_ACTIONS_KINDS = (TimelineKinds.legislation, TimelineKinds.committee, TimelineKinds.plenum,
+                          TimelineKinds.other)
+
 
 class MemberRedirectView(RedirectView):
     "Redirect to first stats view"
@@ -136,12 +141,7 @@ class MemberListView(ListView):
         return original_context
 
     def _get_by_followers(self, context, qs):
-        mct = ContentType.objects.get_for_model(Member)
-        mk_follows = Follow.objects.filter(content_type=mct).values_list(
-            'object_id', flat=True)
-        mk_follows_dict = {}
-        for mf in mk_follows:
-            mk_follows_dict[mf] = mk_follows_dict.get(mf, 0) + 1
+        mk_follows_dict = FollowCount.objects.counts_for(Member)
         qs = list(qs)
         for x in qs:
             x.extra = mk_follows_dict.get(x.id, 0)
@@ -263,14 +263,17 @@ class MemberCsvView(CsvView):
                      _('Committee Meetings per Month')))
 
 
-class MemberDetailView(DetailView):
+class MemberDetailView(ConditionalDetailMixin, DetailView):
+    # its votes, timeline, follows, links and videos touch the member, see
+    # auxiliary.conditional.track_related_changes
+    conditional_models = (Party, Membership, Agenda, AgendaVote, CommitteeMeeting, Document, Award, AwardType,
+                          Person)
     queryset = Member.objects.exclude(current_party__isnull=True) \
         .select_related('current_party',
                         'current_party__knesset',
                         'voting_statistics',
                         ) \
         .prefetch_related('parties',
-                          'mmm_documents',
                           'awards_and_convictions',
                           'person',
                           'awards_and_convictions__award_type')
@@ -339,6 +342,19 @@ class MemberDetailView(DetailView):
         agendas.sort(key=attrgetter('score'), reverse=True)
         return agendas
 
+    def get_timeline(self, member, kinds, count=MEMBER_INITIAL_DATA):
+        """
+        Returns the first count timeline entries of the kinds, whether there
+        are more, and the cursor of the 'more' page following them.
+        """
+        entries = list(member.timeline.filter(kind__in=kinds)[:count + 1])
+        if len(entries) <= count:
+            return entries, False, None
+        entries = entries[:count]
+        paginator = KeysetPaginator(member.timeline.all(), MemeberMoreActionsView.paginate_by)
+        # the 'more' pages follow the initial entries, which are not a page of their own
+        return entries, True, paginator.get_cursor(entries[-1], 2)
+
     def get_context_data(self, **kwargs):
         context = super(MemberDetailView, self).get_context_data(**kwargs)
         member = context['object']
@@ -405,77 +421,51 @@ class MemberDetailView(DetailView):
                 | Q(sticky=True)
             ).order_by('sticky').order_by('-published')[:5]
 
-            actions = actor_stream(member)
-
-            for a in actions:
-                a.actor = member
-
-            legislation_actions = actor_stream(member).filter(
-                verb__in=('proposed', 'joined'))
-
-            # this ugly code groups all the committee actions according to plenum and committee
-            # it stop iterating when both committee and plenum actions reach the maximum (MEMBER_INITIAL_DATA)
-            # it also stops iterating when reaching 20 iterations
-            committee_actions_more = {'committee': False, 'plenum': False}
-            committee_actions = {'committee': [], 'plenum': []}
-            i = 0
-            for action in actor_stream(member).filter(verb='attended'):
-                i = i + 1
-                if i == 20:
-                    # JESUS what language are we writing here? and is this a way to do a "limit"?
-                    break
-                committee_type = (action and action.target and
-                                  action.target.committee and
-                                  action.target.committee.type)
-                if committee_type in ['plenum', 'committee']:
-                    if len(committee_actions[committee_type]) == self.MEMBER_INITIAL_DATA:
-                        committee_actions_more[committee_type] = True
-                        if committee_actions_more['plenum'] == True and committee_actions_more[
-                            'committee'] == True:
-                            break
-                    else:
-                        committee_actions[committee_type].append(action)
+            actions, actions_more, actions_cursor = self.get_timeline(member, TIMELINE_ACTIONS_KINDS)
+            legislation_actions, legislation_actions_more, legislation_actions_cursor = self.get_timeline(
+                member, [TimelineKinds.legislation])
+            committee_actions, committee_actions_more, committee_actions_cursor = self.get_timeline(
+                member, [TimelineKinds.committee])
+            plenum_actions, plenum_actions_more, plenum_actions_cursor = self.get_timeline(
+                member, [TimelineKinds.plenum])
+            annotation_actions, annotation_actions_more, annotation_actions_cursor = self.get_timeline(
+                member, [TimelineKinds.annotation], MemeberMoreActionsView.paginate_by)
 
             committees_presence = []
             has_protocols_not_published = False
-            committees = member.get_active_committees()
+            committees = list(member.get_active_committees())
+            committee_presence = member_presence(member, committees)
             for committee in committees:
-                committee_member = members_by_presence(committee, ids=[member.id])[0]
                 committees_presence.append({"committee": committee,
-                                            "presence": committee_member.meetings_percentage})
+                                            "presence": committee_presence[committee.id]})
                 if committee.protocol_not_published:
                     has_protocols_not_published = True
 
             committees_presence.sort(cmp=lambda x, y: y["presence"] - x["presence"])
 
-            mmm_documents = member.mmm_documents.order_by('-publication_date')
+            mmm_document_ids = Document.objects.get_member_document_ids(member.id)
 
-            content_type = ContentType.objects.get_for_model(Member)
-            num_followers = Follow.objects.filter(
-                object_id=member.pk,
-                content_type=content_type).count()
-
-            protocol_part_annotation_actions = Action.objects.filter(
-                actor_content_type=ContentType.objects.get_for_model(Person),
-                actor_object_id__in=member.person.values_list('pk', flat=True),
-                verb='got annotation for protocol part'
-            )
+            num_followers = FollowCount.objects.count_for(member)
 
             # since parties are prefetch_releated, will list and slice them
             previous_parties = list(member.parties.all())[1:]
             cached_context = {
                 'watched_member': watched,
                 'num_followers': num_followers,
-                'actions_more': actions.count() > self.MEMBER_INITIAL_DATA,
-                'actions': actions[:self.MEMBER_INITIAL_DATA],
-                'legislation_actions_more': legislation_actions.count() > self.MEMBER_INITIAL_DATA,
-                'legislation_actions': legislation_actions[:self.MEMBER_INITIAL_DATA],
-                'committee_actions_more': committee_actions_more['committee'],
-                'committee_actions': committee_actions['committee'],
-                'plenum_actions_more': committee_actions_more['plenum'],
-                'plenum_actions': committee_actions['plenum'],
-                'mmm_documents_more': mmm_documents.count() > self.MEMBER_INITIAL_DATA,
-                'mmm_documents': mmm_documents[:self.MEMBER_INITIAL_DATA],
+                'actions_more': actions_more,
+                'actions_cursor': actions_cursor,
+                'actions': actions,
+                'legislation_actions_more': legislation_actions_more,
+                'legislation_actions_cursor': legislation_actions_cursor,
+                'legislation_actions': legislation_actions,
+                'committee_actions_more': committee_actions_more,
+                'committee_actions_cursor': committee_actions_cursor,
+                'committee_actions': committee_actions,
+                'plenum_actions_more': plenum_actions_more,
+                'plenum_actions_cursor': plenum_actions_cursor,
+                'plenum_actions': plenum_actions,
+                'mmm_documents_more': len(mmm_document_ids) > self.MEMBER_INITIAL_DATA,
+                'mmm_documents': Document.objects.get_member_documents(member.id, self.MEMBER_INITIAL_DATA),
                 'bills_statistics': bills_statistics,
                 'agendas': agendas,
                 'presence': presence,
@@ -488,8 +478,11 @@ class MemberDetailView(DetailView):
                 'num_related_videos': related_videos.count(),
                 'INITIAL_DATA': self.MEMBER_INITIAL_DATA,
                 'previous_parties': previous_parties,
+                'committee_presence': committee_presence,
                 'committees_presence': committees_presence,
-                'protocol_part_annotation_actions': protocol_part_annotation_actions,
+                'protocol_part_annotation_actions': annotation_actions,
+                'protocol_part_annotation_actions_more': annotation_actions_more,
+                'protocol_part_annotation_actions_cursor': annotation_actions_cursor,
                 'has_protocols_not_published': has_protocols_not_published,
             }
 
@@ -767,8 +760,9 @@ class PartyCsvView(CsvView):
                     ('get_affiliation', _('Affiliation')))
 
 
-class PartyDetailView(DetailView):
+class PartyDetailView(ConditionalDetailMixin, DetailView):
     model = Party
+    conditional_models = (Member, Membership, Agenda, AgendaVote, Follow)
 
     def get_context_data(self, **kwargs):
         context = super(PartyDetailView, self).get_context_data(**kwargs)
@@ -854,52 +848,44 @@ mk_detail = default_server.register_view(MemberDetailView.as_view(), get_mk_entr
                                          mk_is_backlinkable)
 
 
-class MemeberMoreActionsView(GetMoreView):
-    """Get partially rendered member actions content for AJAX calls to 'More'"""
+class MemeberMoreActionsView(KeysetPaginationMixin, GetMoreView):
+    """Get partially rendered member timeline entries for AJAX calls to 'More'"""
 
     paginate_by = 10
     template_name = 'mks/action_partials.html'
+    kinds = TIMELINE_ACTIONS_KINDS
 
     def get_queryset(self):
-        member = get_object_or_404(Member, pk=self.kwargs['pk'])
-        actions = actor_stream(member)
-        return actions
+        self.member = get_object_or_404(Member, pk=self.kwargs['pk'])
+        return self.member.timeline.filter(kind__in=self.kinds)
+
+    def get_context_data(self, **kwargs):
+        context = super(MemeberMoreActionsView, self).get_context_data(**kwargs)
+        context['object'] = self.member
+        return context
 
 
 class MemeberMoreLegislationView(MemeberMoreActionsView):
     """Get partially rendered member legislation actions content for AJAX calls to 'More'"""
-
-    def get_queryset(self):
-        actions = super(MemeberMoreLegislationView, self).get_queryset()
-        return actions.filter(verb__in=('proposed', 'joined'))
+    kinds = [TimelineKinds.legislation]
 
 
 class MemeberMoreCommitteeView(MemeberMoreActionsView):
     """Get partially rendered member committee actions content for AJAX calls to 'More'"""
-
-    def get_queryset(self):
-        qs = super(MemeberMoreCommitteeView, self).get_queryset()
-        action_ids = []
-        for action in qs.filter(verb='attended'):
-            if (action.target and action.target.committee and
-                        action.target.committee.type == 'committee'):
-                action_ids.append(action.id)
-        return qs.filter(id__in=action_ids)
+    kinds = [TimelineKinds.committee]
 
 
 class MemeberMorePlenumView(MemeberMoreActionsView):
     """Get partially rendered member plenum actions content for AJAX calls to 'More'"""
+    kinds = [TimelineKinds.plenum]
 
-    def get_queryset(self):
-        qs = super(MemeberMorePlenumView, self).get_queryset()
-        action_ids = []
-        for action in qs.filter(verb='attended'):
-            if action.target and action.target.committee.type == 'plenum':
-                action_ids.append(action.id)
-        return qs.filter(id__in=action_ids)
+
+class MemeberMoreAnnotationsView(MemeberMoreActionsView):
+    """Get partially rendered annotated protocol parts of the member for AJAX calls to 'More'"""
+    kinds = [TimelineKinds.annotation]
 
 
-class MemeberMoreMMMView(MemeberMoreActionsView):
+class MemeberMoreMMMView(GetMoreView):
     """Get partially rendered member mmm documents content for AJAX calls to
     'More'"""
 
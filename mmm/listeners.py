@@ -0,0 +1,12 @@
+from django.db.models.signals import m2m_changed, post_delete
+from auxiliary.conditional import track_changes
+from models import Document, invalidate_member_documents
+
+
+def invalidate_member_documents_cache(sender, **kwargs):
+    invalidate_member_documents()
+
+m2m_changed.connect(invalidate_member_documents_cache, sender=Document.req_mks.through)
+post_delete.connect(invalidate_member_documents_cache, sender=Document)
+
+track_changes(Document)
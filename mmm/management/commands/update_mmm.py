@@ -1,6 +1,5 @@
 import os
 import json
-from datetime import datetime
 
 from django.core.management.base import NoArgsCommand, CommandError
 
@@ -14,14 +13,8 @@ class Command(NoArgsCommand):
     def handle_noargs(self, **options):
         FIXTURE_FILE = "mmm.json"
 
-        try:
-            f =  open(DATA_ROOT + FIXTURE_FILE, 'rt')
+        with open(DATA_ROOT + FIXTURE_FILE, 'rt') as f:
             j = json.load(f)
-            for m in j['objects']['matches']:
-                # we're promised iso8601
-                m['pub_date'] = datetime.strptime(m['pub_date'], '%Y-%m-%d').date()
 
-            Document.objects.from_json(j)
-
-        finally:
-            f.close();
+        # the iso8601 pub_date strings are parsed by from_json
+        Document.objects.from_json(j)
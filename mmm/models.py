@@ -1,8 +1,10 @@
 import logging
 
+from django.conf import settings
+from django.core.cache import cache
 from django.db import models
-from django.core.exceptions import ObjectDoesNotExist
 
+from auxiliary.conditional import touch
 from mks.models import Member
 from committees.models import Committee
 
@@ -19,10 +21,112 @@ COMM_TYPE = "COMM"
 
 SUPPORTED_SCHEMA_VER = 2
 
+MEMBER_DOCUMENTS_CACHE_KEY = 'mmm_member_documents_%s_%s'
+# bumped to drop the cached documents of all the members at once
+MEMBER_DOCUMENTS_VERSION_CACHE_KEY = 'mmm_member_documents_version'
+
+
+def invalidate_member_documents():
+    try:
+        cache.incr(MEMBER_DOCUMENTS_VERSION_CACHE_KEY)
+    except ValueError:
+        cache.set(MEMBER_DOCUMENTS_VERSION_CACHE_KEY, 1, settings.LONG_CACHE_TIME)
+
+
 class DocumentManager(models.Manager):
 
-    @transaction.commit_manually
-    def from_json(self,  json):
+    DOCUMENT_FIELDS = ('title', 'publication_date', 'author_names')
+
+    def _coalesce_matches(self, matches):
+        """
+        coalesce multiple entity matches by document url, returns
+        ({url: document fields}, {url: set of mk ids}, {url: set of committee ids})
+        """
+        docs = {}
+        mks = {}
+        committees = {}
+        to_python = dict((name, self.model._meta.get_field(name).to_python)
+                         for name in self.DOCUMENT_FIELDS)
+        for m in matches:
+            if m.get('entity_id') and int(m.get('entity_id')) <= 0:
+                continue
+            url = m['url']
+            if url not in docs:
+                # the first match of a url sets the document fields
+                docs[url] = dict(title=to_python['title'](m['title']),
+                                 publication_date=to_python['publication_date'](m['pub_date']),
+                                 author_names=to_python['author_names'](m['authors']))
+                mks[url] = set()
+                committees[url] = set()
+            entity_id = int(m.get('entity_id', 0))
+            if m.get('entity_type') == MK_TYPE:
+                mks[url].add(entity_id)
+            elif m.get('entity_type') == COMM_TYPE:
+                committees[url].add(entity_id)
+            elif m.get('entity_type'):
+                logger.warning("Unrecognized match type: {0}".format(m['entity_type']))
+        return docs, mks, committees
+
+    def _upsert_documents(self, docs):
+        """
+        creates the new documents with one bulk insert and updates only the changed
+        ones, returns ({url: document id}, number of new documents)
+        """
+        existing = {}
+        for row in self.values_list('id', 'url', *self.DOCUMENT_FIELDS).iterator():
+            existing[row[1]] = (row[0], dict(zip(self.DOCUMENT_FIELDS, row[2:])))
+        ids = {}
+        new_docs = []
+        for url, fields in docs.iteritems():
+            if url not in existing:
+                new_docs.append(self.model(url=url, **fields))
+                continue
+            doc_id, old_fields = existing[url]
+            ids[url] = doc_id
+            if fields != old_fields:
+                self.filter(id=doc_id).update(**fields)
+        self.bulk_create(new_docs, batch_size=500)
+        touch(self.model)
+        new_urls = [doc.url for doc in new_docs]
+        for start in range(0, len(new_urls), 500):
+            ids.update((url, doc_id) for doc_id, url in
+                       self.filter(url__in=new_urls[start:start + 500]).values_list('id', 'url'))
+        return ids, len(new_docs)
+
+    def _sync_relation(self, field_name, ids, entities, valid_ids):
+        """
+        sets the related entities of the documents, writing only the
+        through table rows which were added or removed
+        """
+        field = self.model._meta.get_field(field_name)
+        through = field.rel.through
+        document_name, entity_name = field.m2m_field_name(), field.m2m_reverse_field_name()
+        wanted = set()
+        for url, entity_ids in entities.iteritems():
+            unknown = entity_ids - valid_ids
+            if unknown:
+                logger.warning("{0} of {1} not found: {2}".format(field_name, url, sorted(unknown)))
+            wanted.update((ids[url], entity_id) for entity_id in entity_ids & valid_ids)
+        document_ids = set(ids.itervalues())
+        stale = []
+        for row_id, document_id, entity_id in through.objects.values_list(
+                'id', document_name, entity_name).iterator():
+            if document_id not in document_ids:
+                continue
+            if (document_id, entity_id) in wanted:
+                wanted.remove((document_id, entity_id))
+            else:
+                stale.append(row_id)
+        for start in range(0, len(stale), 500):
+            through.objects.filter(id__in=stale[start:start + 500]).delete()
+        document_attname = through._meta.get_field(document_name).attname
+        entity_attname = through._meta.get_field(entity_name).attname
+        through.objects.bulk_create([through(**{document_attname: document_id, entity_attname: entity_id})
+                                     for document_id, entity_id in wanted], batch_size=500)
+        touch(self.model)
+
+    @transaction.atomic
+    def from_json(self, json):
         from itertools import chain
 
         assert json['meta']['schema_version'][0] == SUPPORTED_SCHEMA_VER # current version
@@ -34,67 +138,40 @@ class DocumentManager(models.Manager):
         # as long as update is not nightly. for now - do nothing with it.
         retrieval_date = json['meta']['retrieval_date']
 
-        #########################################################################
-        # coalesce multiple entity matches by document url into single dict entry
-        docs=dict()
-        for m in chain( json['objects']['matches'], json['objects']['documents']):
-            if m.get('entity_id') and  int(m.get('entity_id')) <= 0:
-                continue
-
-            default = dict(url=m['url'],
-                                  title=m['title'],
-                                  publication_date=m['pub_date'],
-                                  author_names=m['authors'],
-                                  req_mks = [],
-                                  req_committee = [])
-
-            doc = docs.get(m['url'],default)
-
-            entity_id =  int(m.get('entity_id',0))
-            if m.get('entity_type') == MK_TYPE:
-                doc['req_mks'] = list(set(doc['req_mks']+[entity_id]))
-            elif m.get('entity_type') == COMM_TYPE :
-                doc['req_committee'] =   list(set(doc['req_committee']+ [entity_id]))
-            elif m.get('entity_type'):
-                logger.warning("Unrecognized match type: {0}".format(m['entity_type']))
-
-            docs[m['url']] = doc
-
+        docs, mks, committees = self._coalesce_matches(
+            chain(json['objects']['matches'], json['objects']['documents']))
 
         ################################################################
         # push all documents to db, update linked entities if they exist
-        logger.info("Pushing mmm documents to db")
-        cnt=0;
-        new_cnt=0;
-        for d in docs.values():
-            cnt+=1
-            # m2m fields, pop and save aside, can't call Document()
-            # with m2m fields directly
-            req_mks = d.pop("req_mks",[])
-            req_committee = d.pop("req_committee",[])
-
-            try:
-                o = self.get(url=d['url'])
-
-            except ObjectDoesNotExist:
-                new_cnt +=1
-                o =  Document(**d)
-                o.save()
-
-            # populate entry entirely with fixture data, clobbers old values
-            for k in d.keys():
-                setattr(o,k,d[k])
-
-            o.req_mks = req_mks
-            o.req_committee =  req_committee
-            o.save()
-
-            if cnt % 500 == 0:
-                transaction.commit()
-                logger.debug("Processed {0} documents so far".format(cnt))
-
-        transaction.commit()
+        logger.info("Pushing {0} mmm documents to db".format(len(docs)))
+        ids, new_cnt = self._upsert_documents(docs)
+        self._sync_relation('req_mks', ids, mks,
+                            set(Member.objects.values_list('id', flat=True)))
+        self._sync_relation('req_committee', ids, committees,
+                            set(Committee.objects.values_list('id', flat=True)))
         logger.info("Added a total of {0} new documents".format(new_cnt))
+        invalidate_member_documents()
+        return new_cnt
+
+    def get_member_document_ids(self, member_id):
+        """
+        the ids of the member's documents, latest first, cached per member
+        until the next import
+        """
+        version = cache.get(MEMBER_DOCUMENTS_VERSION_CACHE_KEY, 0)
+        key = MEMBER_DOCUMENTS_CACHE_KEY % (version, member_id)
+        document_ids = cache.get(key)
+        if document_ids is None:
+            document_ids = list(self.filter(req_mks=member_id).order_by(
+                '-publication_date', '-id').values_list('id', flat=True))
+            cache.set(key, document_ids, settings.LONG_CACHE_TIME)
+        return document_ids
+
+    def get_member_documents(self, member_id, limit=None):
+        """the documents of the member, latest first"""
+        document_ids = self.get_member_document_ids(member_id)[:limit]
+        documents = self.in_bulk(document_ids)
+        return [documents[document_id] for document_id in document_ids if document_id in documents]
 
 
 class Document(models.Model):
@@ -118,3 +195,4 @@ class Document(models.Model):
         return self.title
 
 
+from listeners import *
@@ -107,3 +107,31 @@ class MmmTest(TestCase):
             pass
         else:
             raise AssertionError("Didn't detect bad schema version")
+
+    def test_reimport(self):
+        with open(MMM_FIXTURE) as f:
+            j = json.load(f)
+        mk_match = [m for m in j['objects']['matches'] if m['entity_type'] == "MK"][0]
+        mk = Member.objects.create(id=mk_match['entity_id'], name="mk")
+        other_mk = Member.objects.create(name="other mk")
+
+        self.assertTrue(Document.objects.from_json(j) > 0)
+        doc = Document.objects.get(url=mk_match['url'])
+        doc.req_mks.add(other_mk)
+        Document.objects.filter(pk=doc.pk).update(title='changed')
+        num_docs = Document.objects.count()
+
+        # a re-import creates nothing, and restores the fields and relations of the documents
+        self.assertEqual(Document.objects.from_json(j), 0)
+        self.assertEqual(Document.objects.count(), num_docs)
+        doc = Document.objects.get(url=mk_match['url'])
+        self.assertEqual(doc.title, mk_match['title'])
+        self.assertEqual(list(doc.req_mks.all()), [mk])
+
+        self.assertEqual(Document.objects.get_member_document_ids(mk.id),
+                         list(mk.mmm_documents.order_by('-publication_date', '-id').values_list('id', flat=True)))
+        self.assertIn(doc, Document.objects.get_member_documents(mk.id))
+        self.assertEqual(Document.objects.get_member_document_ids(other_mk.id), [])
+        # the cached documents of a member follow changes of the relation
+        doc.req_mks.add(other_mk)
+        self.assertEqual(Document.objects.get_member_document_ids(other_mk.id), [doc.id])
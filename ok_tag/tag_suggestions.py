@@ -37,31 +37,33 @@ prefixes = [u'ב', u'ו', u'ה', u'מ', u'מה', u'ל', u'']
 _all_tags_names = []
 
 
+def used_tags_names():
+    """the names of the tags of votes, bills and committee meetings"""
+    # Extract only used tags, to avoid irrelevant tags
+    vote_tags = Tag.objects.usage_for_model(Vote)
+    bill_tags = Tag.objects.usage_for_model(Bill)
+    cm_tags = Tag.objects.usage_for_model(CommitteeMeeting)
+    all_tags = list(set(vote_tags).union(bill_tags).union(cm_tags))
+    return [tag.name for tag in all_tags]
+
+
 def all_tags_names():
     '''Lazy intialization of tags list'''
     global _all_tags_names
     if _all_tags_names == []:
-        # Extract only used tags, to avoid irrelevant tags
-        vote_tags = Tag.objects.usage_for_model(Vote)
-        bill_tags = Tag.objects.usage_for_model(Bill)
-        cm_tags = Tag.objects.usage_for_model(CommitteeMeeting)
-        all_tags = list(set(vote_tags).union(bill_tags).union(cm_tags))
-
-        # A list of tags that have been tagged over 10 times in the website
-
-        _all_tags_names = [tag.name for tag in all_tags]
+        _all_tags_names = used_tags_names()
 
     return _all_tags_names
 
 
-def get_tags_in_text(text):
+def get_tags_in_text(text, tags_names=None):
     """Returns a dictionary, the keys are tags found in text, and the values are the number of occurrences in text"""
 
     result_dict = {}
     words = text.split() if text is not None else []
 
     # look for tag in word
-    for tag in all_tags_names():
+    for tag in tags_names if tags_names is not None else all_tags_names():
         # create tag variations according to prefixes
         tag_variations = [(p + tag) for p in prefixes]
 
@@ -78,17 +80,21 @@ def get_tags_in_text(text):
     return result_dict
 
 
-def extract_suggested_tags(current_tags, text_list):
-    '''Returns a sorted list consisting of key/value tuples where the keys are tags found in arguments' text,
-        and the values are the number of occurrences in arguments text.
-        current_tags are removed from final list.
-        The list is sorted from most occuring tags to least occuring tags'''
-
+def count_tags_in_texts(text_list, tags_names=None):
+    """Returns a dictionary of tag name -> number of occurrences in all the given texts"""
     tags_occurrences = {}
 
     # find occurences of tags in text
     for text_to_extract in text_list:
-        sum_add_two_dictionaries(tags_occurrences, get_tags_in_text(text_to_extract))
+        sum_add_two_dictionaries(tags_occurrences, get_tags_in_text(text_to_extract, tags_names))
+
+    return tags_occurrences
+
+
+def sort_suggested_tags(current_tags, tags_occurrences):
+    """Returns the tags_occurrences (as returned from count_tags_in_texts) as a sorted list of
+        key/value tuples, without the current_tags"""
+    tags_occurrences = dict(tags_occurrences)
 
     # remove tags that are already tagged
     for tag in current_tags:
@@ -97,3 +103,11 @@ def extract_suggested_tags(current_tags, text_list):
 
     # sort suggestions
     return sorted(tags_occurrences.iteritems(), key=operator.itemgetter(1), reverse=True)
+
+
+def extract_suggested_tags(current_tags, text_list):
+    '''Returns a sorted list consisting of key/value tuples where the keys are tags found in arguments' text,
+        and the values are the number of occurrences in arguments text.
+        current_tags are removed from final list.
+        The list is sorted from most occuring tags to least occuring tags'''
+    return sort_suggested_tags(current_tags, count_tags_in_texts(text_list))
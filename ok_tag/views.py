@@ -1,5 +1,5 @@
 import tagging
-from actstream import action
+from auxiliary.actions import send_action
 from django.conf import settings
 from django.contrib.auth.decorators import login_required, permission_required
 from django.contrib.contenttypes.models import ContentType
@@ -113,7 +113,7 @@ def _add_tag_to_object(user, app, object_type, object_id, tag):
         tag=tag,
         content_type=ctype,
         object_id=object_id)
-    action.send(user, verb='tagged', target=ti, description='%s' % (tag.name))
+    send_action(user, verb='tagged', target=ti, description='%s' % (tag.name))
     url = reverse('tag-detail', kwargs={'slug': tag.name})
     return HttpResponse("{'id':%d, 'name':'%s', 'url':'%s'}" % (tag.id,
                                                                 tag.name,
@@ -140,7 +140,7 @@ def remove_tag_from_object(request, app, object_type, object_id):
         if len(ti) == 1:
             logger.debug('user %s is deleting tagged item %d' % (request.user.username, ti[0].id))
             ti[0].delete()
-            action.send(request.user, verb='removed-tag', target=ti[0], description='%s' % (tag.name))
+            send_action(request.user, verb='removed-tag', target=ti[0], description='%s' % (tag.name))
         else:
             logger.debug('user %s tried removing tag %d from object, but failed, because len(tagged_items)!=1' % (
                 request.user.username, tag.id))
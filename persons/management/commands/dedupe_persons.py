@@ -0,0 +1,45 @@
+# encoding: utf-8
+import logging
+from optparse import make_option
+
+from django.core.management.base import NoArgsCommand
+from django.db import transaction
+from django.db.models import Count
+
+from persons.models import Person
+
+logger = logging.getLogger("open-knesset.persons.dedupe_persons")
+
+
+class Command(NoArgsCommand):
+    help = "Finds persons with the same cannonized name or alias, or the same mk, and merges them"
+
+    option_list = NoArgsCommand.option_list + (
+        make_option('--dry-run', action='store_true', dest='dry_run',
+                    help="only report the persons which would be merged"),
+    )
+
+    def get_pivot(self, persons):
+        """the person the others are merged into - the mk, or the one who spoke the most"""
+        return max(persons, key=lambda p: (p.mk_id is not None, p.num_parts, -p.id))
+
+    def handle_noargs(self, **options):
+        dry_run = options.get('dry_run', False)
+        merged = 0
+        for cluster in Person.objects.find_duplicates():
+            persons = list(Person.objects.filter(id__in=cluster).annotate(num_parts=Count('protocol_parts')))
+            if len(set(p.mk_id for p in persons if p.mk_id)) > 1:
+                self.stdout.write(u'skipping persons with different mks: %s' % u', '.join(
+                    u'%s (%d)' % (p.name, p.id) for p in persons))
+                continue
+            pivot = self.get_pivot(persons)
+            others = [p for p in persons if p != pivot]
+            self.stdout.write(u'%s (%d) <- %s' % (pivot.name, pivot.id, u', '.join(
+                u'%s (%d, %d parts)' % (p.name, p.id, p.num_parts) for p in others)))
+            if not dry_run:
+                with transaction.atomic():
+                    for other in others:
+                        pivot.merge(other)
+                logger.info('merged %d persons into %s (%d)' % (len(others), pivot.name, pivot.id))
+            merged += len(others)
+        self.stdout.write(u'%s %d persons' % ('would merge' if dry_run else 'merged', merged))
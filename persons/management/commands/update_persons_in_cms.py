@@ -8,12 +8,18 @@ from persons.models import Person,PersonAlias
 from actstream import action, Action
 from django.contrib.contenttypes.models import ContentType
 from annotatetext.models import Annotation
+from knesset.utils import bulk_import
 
 logger = logging.getLogger("open-knesset.persons.create_persons")
 
 class Command(NoArgsCommand):
     
     def handle_noargs(self, **options):
+        # the attendance actions are created in one pass at the end
+        with bulk_import():
+            self.update_persons()
+
+    def update_persons(self):
         protocol_part_content_type = ContentType.objects.get_for_model(ProtocolPart)
         # Find persons in all protocol parts:
         p = Person.objects.all()
@@ -13,3 +13,42 @@ class PersonManager(Manager):
             if create:
                 return self.create(name=name)
             return None
+
+    def find_duplicates(self):
+        """
+        Returns clusters (sets of person ids) of persons which are probably
+        the same person - they share a cannonized name or alias, or an mk
+        """
+        from knesset.utils import cannonize
+        parents = {}
+
+        def find(person_id):
+            while parents[person_id] != person_id:
+                parents[person_id] = parents[parents[person_id]]
+                person_id = parents[person_id]
+            return person_id
+
+        owners = {}
+
+        def add(key, person_id):
+            if key in owners:
+                parents[find(person_id)] = find(owners[key])
+            else:
+                owners[key] = person_id
+
+        for person_id, name, mk_id in self.values_list('id', 'name', 'mk').iterator():
+            parents[person_id] = person_id
+            name = cannonize(name)
+            if name:
+                add(('name', name), person_id)
+            if mk_id:
+                add(('mk', mk_id), person_id)
+        for person_id, alias in self.filter(aliases__isnull=False).values_list('id', 'aliases__name').iterator():
+            alias = cannonize(alias)
+            if alias:
+                add(('name', alias), person_id)
+
+        clusters = {}
+        for person_id in parents:
+            clusters.setdefault(find(person_id), set()).add(person_id)
+        return [cluster for cluster in clusters.values() if len(cluster) > 1]
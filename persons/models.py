@@ -1,11 +1,13 @@
 from django.core.urlresolvers import reverse
-from django.db import models
+from django.contrib.contenttypes.models import ContentType
+from django.db import models, transaction
 from django.utils.translation import ugettext_lazy as _
 from django.core.exceptions import ValidationError
 from django.forms.fields import IntegerField
 from django.dispatch import receiver
 from django.db.models.signals import post_save
 
+from knesset.utils import defer_during_bulk_import
 from mks.models import Member, GENDER_CHOICES
 from links.models import Link
 from .managers import PersonManager
@@ -106,37 +108,35 @@ class Person(models.Model):
                 if not getattr(self, field_name):
                     setattr(self, field_name, val)
 
+    @transaction.atomic
     def merge(self, other):
-        """make other into an alias of self"""
-        roles = other.roles.all()
-        links = Link.objects.for_model(other)
-        parts = other.protocol_parts.all()
-        external_info = other.external_info.all()
-        external_relation = other.external_relation.all()
-        if other.mk:
-            if self.mk and self.mk != other.mk:
-                # something is wrong, we are trying to merge two persons with non matching MKs
-                raise ValidationError('Trying to merge persons with non matching MKs')
-            self.mk = other.mk
-            roles = chain(roles, other.mk.roles.all())
-            links = chain(links, other.mk.links.all())
-        for title in other.titles.all():
-            self.titles.add(title)
-        for role in roles:
-            role.person = self
-            role.save()
-        for link in links:
-            link.content_object = self
-            link.save()
-        for part in parts:
-            part.speaker = self
-            part.save()
-        for i in external_info:
-            i.person = self
-            i.save()
-        for i in external_relation:
-            i.person = self
-            i.save()
+        """
+        make other into an alias of self.
+        every object related to other is re-pointed to self with a single
+        update per relation, without loading the related objects.
+        """
+        if other.mk and self.mk and self.mk != other.mk:
+            # something is wrong, we are trying to merge two persons with non matching MKs
+            raise ValidationError('Trying to merge persons with non matching MKs')
+        self.titles.add(*other.titles.all())
+        person_ct = ContentType.objects.get_for_model(Person)
+        Link.objects.filter(content_type=person_ct, object_pk=unicode(other.pk)).update(object_pk=unicode(self.pk))
+        # aliases self already has would become duplicates
+        existing_aliases = list(self.aliases.values_list('name', flat=True)) + [self.name]
+        other.aliases.filter(name__in=existing_aliases).delete()
+        for related in self._meta.get_all_related_objects():
+            related.model._base_manager.filter(**{related.field.name: other}).update(**{related.field.name: self})
+        for related in self._meta.get_all_related_many_to_many_objects():
+            through = related.field.rel.through
+            if not through._meta.auto_created:
+                # the through model has a foreign key, which was re-pointed above
+                continue
+            person_field = related.field.m2m_reverse_field_name()
+            object_field = related.field.m2m_field_name()
+            rows = through._base_manager.filter(**{person_field: other})
+            rows.filter(**{'%s__in' % object_field: list(through._base_manager.filter(
+                **{person_field: self}).values_list(object_field, flat=True))}).delete()
+            rows.update(**{person_field: self})
 
         # copy all the model's fields
 
@@ -175,14 +175,37 @@ class Person(models.Model):
         PersonAlias.objects.filter(name=alias, person=self).delete()
 
 
+def _copy_member_fields(member, person):
+    for field in member._meta.fields:
+        if field.name != 'id' and hasattr(person, field.name):
+            setattr(person, field.name, getattr(member, field.name))
+
+
+def sync_member_persons(signals):
+    """
+    Syncs the persons of the members saved in a bulk import, creating the
+    missing persons in one insert.
+    """
+    members = Member.objects.in_bulk(set(kwargs['instance'].id for kwargs in signals))
+    persons = dict((person.mk_id, person) for person in Person.objects.filter(mk__in=members.keys()))
+    new_persons = []
+    for member_id, member in members.items():
+        if member_id not in persons:
+            person = Person(mk=member)
+            _copy_member_fields(member, person)
+            new_persons.append(person)
+    Person.objects.bulk_create(new_persons)
+    for person in persons.values():
+        _copy_member_fields(members[person.mk_id], person)
+        person.save()
+
+
 @receiver(post_save, sender=Member)
+@defer_during_bulk_import(sync_member_persons)
 def member_post_save(sender, **kwargs):
     instance = kwargs['instance']
     person = Person.objects.get_or_create(mk=instance)[0]
-    for field in instance._meta.fields:
-        if field.name != 'id' and hasattr(person, field.name):
-            setattr(person, field.name, getattr(instance, field.name))
-
+    _copy_member_fields(instance, person)
     person.save()
 
 
@@ -0,0 +1,145 @@
+# encoding: utf-8
+"""
+Resolves protocol part headers (e.g. u'היו"ר דוד אזולאי:') to persons.
+
+All the persons, aliases and titles are loaded once into word tries, so
+resolving a header doesn't query the db, and headers are cached.
+"""
+import re
+
+from auxiliary.conditional import touch
+from persons.models import Person, PersonAlias, Title
+
+# the key of a trie node holding the value of the words leading to it
+_VALUE = None
+
+
+def get_name_words(name):
+    """normalized words of a name, without punctuation or a (party) suffix"""
+    name = re.sub(ur'\(.*?\)', u' ', name)
+    name = re.sub(ur'["\'`׳״]', u'', name)
+    return re.sub(ur'[^\w\s]', u' ', name, flags=re.UNICODE).split()
+
+
+def _trie_add(trie, words, value):
+    node = trie
+    for word in words:
+        node = node.setdefault(word, {})
+    node[_VALUE] = value
+
+
+def _trie_longest_match(trie, words, start):
+    """returns (value, end) of the longest sequence of words from start found in the trie"""
+    node = trie
+    value, end = None, start
+    for i in range(start, len(words)):
+        node = node.get(words[i])
+        if node is None:
+            break
+        if _VALUE in node:
+            value, end = node[_VALUE], i + 1
+    return value, end
+
+
+class SpeakerResolver(object):
+    """
+    Resolves and assigns the speakers of protocol parts.
+    Create one resolver per run; headers which were not resolved are kept
+    in missing ({meeting id: set of headers}) and can be created as new
+    persons at the end of the run with create_missing_speakers.
+    """
+
+    def __init__(self):
+        self.names = {}
+        self.titles = {}
+        self.missing = {}
+        self._cache = {}
+        for (name,) in Title.objects.values_list('name'):
+            _trie_add(self.titles, get_name_words(name), True)
+        # mk persons are added last, so they win when names collide
+        persons = sorted(Person.objects.values_list('id', 'name', 'mk'),
+                         key=lambda row: (row[2] is not None, -row[0]))
+        aliases = sorted(PersonAlias.objects.values_list('person', 'name', 'person__mk'),
+                         key=lambda row: (row[2] is not None, -row[0]))
+        for person_id, name, mk_id in aliases + persons:
+            self.add_name(name, person_id)
+
+    def add_name(self, name, person_id):
+        words = get_name_words(name)
+        if words:
+            _trie_add(self.names, words, person_id)
+            self._cache.clear()
+
+    def get_name(self, header):
+        """the words of the header, without the titles it starts with"""
+        words = get_name_words(header)
+        start = 0
+        while start < len(words):
+            is_title, end = _trie_longest_match(self.titles, words, start)
+            if not is_title:
+                break
+            start = end
+        return words[start:]
+
+    def resolve(self, header):
+        """returns the id of the person speaking in this header, or None"""
+        if header not in self._cache:
+            words = self.get_name(header)
+            person_id = None
+            for start in range(len(words)):
+                person_id, end = _trie_longest_match(self.names, words, start)
+                if person_id is not None:
+                    break
+            self._cache[header] = person_id
+        return self._cache[header]
+
+    def _speaking_parts(self, meeting_id):
+        from committees.models import ProtocolPart
+        return ProtocolPart.objects.filter(meeting=meeting_id).exclude(type='title')
+
+    def _update_speakers(self, meeting_id, person_headers):
+        for person_id, headers in person_headers.items():
+            self._speaking_parts(meeting_id).filter(header__in=headers).update(speaker=person_id)
+
+    def assign_speakers(self, meeting):
+        """sets the speaker of the meeting parts with one update per speaker"""
+        person_headers = {}
+        missing = set()
+        for header in self._speaking_parts(meeting.pk).exclude(header=None).exclude(header='').order_by(
+                ).values_list('header', flat=True).distinct():
+            person_id = self.resolve(header)
+            if person_id is None:
+                missing.add(header)
+            else:
+                person_headers.setdefault(person_id, []).append(header)
+        self._update_speakers(meeting.pk, person_headers)
+        if missing:
+            self.missing[meeting.pk] = missing
+        else:
+            self.missing.pop(meeting.pk, None)
+
+    def create_missing_speakers(self):
+        """
+        creates a Person for every name in the missing headers with one bulk
+        insert, and assigns them to their parts. Returns the number of persons created.
+        """
+        name_headers = {}
+        for meeting_id, headers in self.missing.items():
+            for header in headers:
+                name = u' '.join(self.get_name(header))
+                if name and len(name) <= Person._meta.get_field('name').max_length:
+                    name_headers.setdefault(name, []).append((meeting_id, header))
+        Person.objects.bulk_create([Person(name=name) for name in name_headers])
+        meeting_person_headers = {}
+        for person_id, name in Person.objects.filter(name__in=name_headers.keys()).order_by('id').values_list(
+                'id', 'name'):
+            self.add_name(name, person_id)
+            for meeting_id, header in name_headers.get(name, ()):
+                meeting_person_headers.setdefault(meeting_id, {}).setdefault(person_id, []).append(header)
+        for meeting_id, person_headers in meeting_person_headers.items():
+            self._update_speakers(meeting_id, person_headers)
+        from committees.models import CommitteeMeeting
+        touch(Person)
+        touch(CommitteeMeeting, meeting_person_headers.keys())
+        self.missing = {}
+        return len(name_headers)
@@ -1,9 +1,11 @@
+# encoding: utf-8
 from datetime import datetime, date
 
 from django.test import TestCase
 from unittest import skip
 
-from .models import Person
+from .models import Person, ExternalRelation, Title
+from .speakers import SpeakerResolver
 from .admin import merge_persons
 from mks.models import Member, Knesset
 
@@ -40,6 +42,31 @@ class PersonTests(TestCase):
         role = roles[0]
         self.assertEquals(role.org, "the org")
 
+    def test_merge_moves_related_objects(self):
+        person = Person.objects.create(name='a name')
+        other = Person.objects.create(name='another name')
+        friend = Person.objects.create(name='a friend')
+        other.add_alias('a name')
+        other.add_alias('an alias')
+        other.external_info.create(source='test', key='key', value='value')
+        ExternalRelation.objects.create(source='test', person=friend, relationship='friend', with_person=other)
+
+        person.merge(other)
+        self.assertFalse(Person.objects.filter(id=other.id).exists())
+        self.assertEqual(person.external_info.get().value, 'value')
+        self.assertEqual(ExternalRelation.objects.get().with_person, person)
+        self.assertEqual(sorted(person.aliases.values_list('name', flat=True)),
+                         ['an alias', 'another name'])
+
+    def test_find_duplicates(self):
+        person = Person.objects.create(name='a name')
+        same_name = Person.objects.create(name='a-name')
+        aliased = Person.objects.create(name='someone')
+        aliased.add_alias('a name')
+        Person.objects.create(name='someone else')
+        self.assertEqual(Person.objects.find_duplicates(),
+                         [set([person.id, same_name.id, aliased.id])])
+
     def test_member_person_sync(self):
         """ Test member/person sync on member save() """
         mk = Member.objects.create(**self.defaults)
@@ -52,3 +79,32 @@ class PersonTests(TestCase):
             self.assertEqual(getattr(mk, field), getattr(person, field))
 
         mk.delete()
+
+
+class SpeakerResolverTests(TestCase):
+    def setUp(self):
+        Title.objects.create(name=u'היו"ר')
+        self.person = Person.objects.create(name=u'דוד אזולאי')
+        self.aliased = Person.objects.create(name=u'משה כהן')
+        self.aliased.add_alias(u'משה כהן-לוי')
+
+    def test_resolve(self):
+        speakers = SpeakerResolver()
+        self.assertEqual(speakers.resolve(u'היו"ר דוד אזולאי (ש"ס):'), self.person.id)
+        self.assertEqual(speakers.resolve(u'משה כהן-לוי:'), self.aliased.id)
+        self.assertIsNone(speakers.resolve(u'היו"ר מישהו אחר:'))
+
+    def test_assign_and_create_speakers(self):
+        from committees.models import Committee, CommitteeMeeting, ProtocolPart
+        committee = Committee.objects.create(name='committee')
+        meeting = CommitteeMeeting.objects.create(committee=committee, date=date(2016, 2, 22))
+        known = ProtocolPart.objects.create(meeting=meeting, order=1, header=u'היו"ר דוד אזולאי:')
+        unknown = ProtocolPart.objects.create(meeting=meeting, order=2, header=u'היו"ר מישהו אחר:')
+
+        speakers = SpeakerResolver()
+        speakers.assign_speakers(meeting)
+        self.assertEqual(ProtocolPart.objects.get(id=known.id).speaker, self.person)
+        self.assertEqual(speakers.missing, {meeting.id: set([unknown.header])})
+
+        self.assertEqual(speakers.create_missing_speakers(), 1)
+        self.assertEqual(ProtocolPart.objects.get(id=unknown.id).speaker.name, u'מישהו אחר')
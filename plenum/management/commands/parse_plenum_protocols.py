@@ -17,15 +17,20 @@ class Command(NoArgsDbLogCommand):
             help="like the download stage but download all the files again"),
         make_option('--reparse',action='store_true',dest='reparse',
             help="like the parse stage but parses all the existing data again"),
+        make_option('--processes',action='store',type='int',dest='processes',default=1,
+            help="number of worker processes for downloading/converting and parsing protocols"),
+        make_option('--create-speakers',action='store_true',dest='create_speakers',
+            help="create persons for the speakers which were not found in the parsed protocols"),
     )
     
     def _handle_noargs(self, **options):
         didSomething=False
         if options.get('download',False) or options.get('redownload',False):
-            Download(options.get('redownload',False), self._logger)
+            Download(options.get('redownload',False), self._logger, options['processes'])
             didSomething=True
         if options.get('parse',False) or options.get('reparse',False):
-            Parse(options.get('reparse',False), self._logger)
+            Parse(options.get('reparse',False), self._logger, processes=options['processes'],
+                  create_speakers=options.get('create_speakers',False))
             didSomething=True
         if not didSomething==True:
             self._log_error('invalid options, try --help for help')
@@ -6,11 +6,12 @@ import os
 import re
 import urllib
 import urllib2
+from multiprocessing import Pool
 
 from BeautifulSoup import BeautifulSoup
 from django.conf import settings
 
-from committees.models import Committee, CommitteeMeeting
+from committees.models import Committee, CommitteeMeeting, get_protocol_text_hash
 from knesset.utils import send_chat_notification
 from simple.utils import doc_to_xml
 
@@ -43,11 +44,15 @@ def _get_committees_index_page(full):
         return ''
 
 
-def _copy(url, to, recopy=False):
-    # logger.debug("copying from "+url+" to "+to)
-    d = os.path.dirname(to)
+def _ensure_dir(filename):
+    d = os.path.dirname(filename)
     if not os.path.exists(d):
         os.makedirs(d)
+
+
+def _copy(url, to, recopy=False):
+    # logger.debug("copying from "+url+" to "+to)
+    _ensure_dir(to)
     if not os.path.exists(to) or recopy:
         urllib.urlretrieve(url, to + ".tmp")
         os.rename(to + '.tmp', to)
@@ -63,20 +68,18 @@ def _antiword(filename):
         return ''
 
 
-def _urlAlreadyDownloaded(url):
-    plenum = Committee.objects.filter(type='plenum')[0]
-    if CommitteeMeeting.objects.filter(committee=plenum, src_url=url).count() > 0:
-        return True
-    else:
-        return False
+def _get_downloaded_urls(plenum):
+    return set(CommitteeMeeting.objects.filter(committee=plenum).values_list('src_url', flat=True))
 
 
-def _updateDb(xmlData, url, year, mon, day):
+def _updateDb(plenum, xmlData, url, year, mon, day):
     logger.debug('update db %s, %s, %s, %s, %s' % (len(xmlData), url, year, mon, day))
-    plenum = Committee.objects.filter(type='plenum')[0]
     cms = CommitteeMeeting.objects.filter(committee=plenum, src_url=url)
     if cms.count() > 0:
         meeting = cms[0]
+        if meeting.protocol_text_hash == get_protocol_text_hash(xmlData):
+            logger.debug('protocol text did not change')
+            return
     else:
         meeting = CommitteeMeeting(
             committee=plenum,
@@ -89,7 +92,19 @@ def _updateDb(xmlData, url, year, mon, day):
     meeting.save()
 
 
-def _downloadLatest(full, redownload):
+def _download_protocol(job):
+    """
+    Downloads a protocol file and converts it to xml.
+    Runs in a worker process, so it must not access the db.
+    """
+    url, filename, redownload, year, mon, day = job
+    _copy(url, filename, recopy=redownload)
+    xmlData = _antiword(filename)
+    os.remove(filename)
+    return url, year, mon, day, xmlData
+
+
+def _get_download_jobs(full, redownload, downloaded_urls):
     html = _get_committees_index_page(full)
     soup = BeautifulSoup(html)
     if full:
@@ -97,6 +112,7 @@ def _downloadLatest(full, redownload):
     else:
         words_of_the_knesset = WORDS_OF_THE_KNESSET
     aelts = soup('a', text=words_of_the_knesset)
+    jobs = []
     for aelt in aelts:
         selt = aelt.findPrevious('span', text=re.compile(DISCUSSIONS_ON_DATE))
         href = aelt.parent.get('href')
@@ -116,24 +132,45 @@ def _downloadLatest(full, redownload):
             year = m.group(3)
             url = url.replace('/heb/..', '')
             logger.debug(url)
-            if not redownload and _urlAlreadyDownloaded(url):
+            if not redownload and url in downloaded_urls:
                 logger.debug('url already downloaded')
+            elif url in [job[0] for job in jobs]:
+                logger.debug('url already in download jobs')
             else:
                 DATA_ROOT = getattr(settings, 'DATA_ROOT')
-                _copy(url.replace('/heb/..', ''),
-                      DATA_ROOT + 'plenum_protocols/' + year + '_' + mon + '_' + day + '_' + filename,
-                      recopy=redownload)
-                xmlData = _antiword(DATA_ROOT + 'plenum_protocols/' + year + '_' + mon + '_' + day + '_' + filename)
-                os.remove(DATA_ROOT + 'plenum_protocols/' + year + '_' + mon + '_' + day + '_' + filename)
+                jobs.append((url,
+                             DATA_ROOT + 'plenum_protocols/' + year + '_' + mon + '_' + day + '_' + filename,
+                             redownload, year, mon, day))
+    return jobs
+
+
+def _downloadLatest(full, redownload, processes=1):
+    plenum = Committee.objects.filter(type='plenum')[0]
+    jobs = _get_download_jobs(full, redownload, _get_downloaded_urls(plenum))
+    if processes > 1 and len(jobs) > 1:
+        # create the download dir before the workers try to create it concurrently
+        _ensure_dir(jobs[0][1])
+        pool = Pool(processes)
+        try:
+            results = pool.imap_unordered(_download_protocol, jobs)
+            for url, year, mon, day, xmlData in results:
                 if xmlData != '':
-                    _updateDb(xmlData, url, year, mon, day)
+                    _updateDb(plenum, xmlData, url, year, mon, day)
+        finally:
+            pool.close()
+            pool.join()
+    else:
+        for job in jobs:
+            url, year, mon, day, xmlData = _download_protocol(job)
+            if xmlData != '':
+                _updateDb(plenum, xmlData, url, year, mon, day)
 
 
-def Download(redownload, _logger):
+def Download(redownload, _logger, processes=1):
     global logger
     logger = _logger
-    _downloadLatest(False, redownload)
-    _downloadLatest(True, redownload)
+    _downloadLatest(False, redownload, processes)
+    _downloadLatest(True, redownload, processes)
 
 
 def download_for_existing_meeting(meeting):
@@ -1,22 +1,102 @@
 # encoding: utf-8
-from django.db.models import Count
-from committees.models import Committee, CommitteeMeeting
-from plenum import create_protocol_parts
 import logging
+from multiprocessing import Pool
+
+from django.db import connection
+from django.db.models import Count
+
+from committees.models import Committee, CommitteeMeeting, ProtocolPartsMetadata, get_protocol_text_hash
+from mks.utils import get_all_mk_names
+from persons.speakers import SpeakerResolver
+
+# mk names and speakers are loaded once per worker process, see _init_worker
+_mk_names = None
+_speakers = None
+
+
+def _init_worker():
+    global _mk_names, _speakers
+    _mk_names = get_all_mk_names()
+    _speakers = SpeakerResolver()
+
+
+def _parse_meeting(meeting_pk):
+    """returns the meeting pk and the headers whose speaker was not found"""
+    (mks, mk_names) = _mk_names
+    meeting = CommitteeMeeting.objects.get(pk=meeting_pk)
+    meeting.create_protocol_parts(delete_existing=True, mks=mks, mk_names=mk_names, speakers=_speakers)
+    return meeting_pk, _speakers.missing.pop(meeting_pk, set())
+
 
-def Parse(reparse, logger, meeting_pks=None):
-    logger.debug('Parse (reparse=%s, meeting_pks=%s)'%(reparse, meeting_pks))
+def _update_missing_hashes(meetings):
+    """protocol_text_hash is set on save, but older meetings might not have it yet"""
+    for pk, protocol_text in meetings.filter(protocol_text_hash=None).values_list('pk', 'protocol_text').iterator():
+        CommitteeMeeting.objects.filter(pk=pk).update(protocol_text_hash=get_protocol_text_hash(protocol_text))
+
+
+def _checkpoint_parsed_meetings(meetings, logger):
+    """
+    Meetings which were parsed before ProtocolPartsMetadata existed already have parts,
+    we only create their metadata (which stores the hash of the parsed text) instead of
+    parsing them again and losing the annotations on the existing parts.
+    """
+    for meeting in meetings.filter(parts_metadata=None).annotate(num_parts=Count('parts')).filter(num_parts__gt=0):
+        logger.debug('creating protocol parts metadata for meeting %s' % (meeting,))
+        ProtocolPartsMetadata.objects.update_for_meeting(meeting)
+
+
+def get_meetings_to_parse(meetings):
+    """
+    Returns the pks of the meetings whose protocol text changed since their parts were created,
+    comparing the protocol text hashes without loading the protocols
+    """
+    return [pk for pk, text_hash, parsed_hash
+            in meetings.values_list('pk', 'protocol_text_hash', 'parts_metadata__protocol_text_hash')
+            if text_hash != parsed_hash]
+
+
+def Parse(reparse, logger, meeting_pks=None, processes=1, create_speakers=False):
+    """
+    create_speakers - create persons for the speakers which were not found,
+    in one batch after all the meetings were parsed
+    """
+    logger.debug('Parse (reparse=%s, meeting_pks=%s, processes=%s)' % (reparse, meeting_pks, processes))
     if meeting_pks is not None:
         meetings = CommitteeMeeting.objects.filter(pk__in=meeting_pks)
     else:
-        plenum=Committee.objects.filter(type='plenum')[0]
-        meetings=CommitteeMeeting.objects.filter(committee=plenum).exclude(protocol_text='')
-    (mks,mk_names)=create_protocol_parts.get_all_mk_names()
-    logger.debug('got mk names: %s, %s'%(mks, mk_names))
-    for meeting in meetings:
-        if reparse or meeting.parts.count() == 0:
-            logger.debug('creating protocol parts for meeting %s'%(meeting,))
-            meeting.create_protocol_parts(delete_existing=reparse,mks=mks,mk_names=mk_names)
+        plenum = Committee.objects.filter(type='plenum')[0]
+        meetings = CommitteeMeeting.objects.filter(committee=plenum).exclude(protocol_text='')
+    if reparse:
+        meeting_pks = list(meetings.values_list('pk', flat=True))
+    else:
+        _update_missing_hashes(meetings)
+        _checkpoint_parsed_meetings(meetings, logger)
+        meeting_pks = get_meetings_to_parse(meetings)
+    logger.debug('creating protocol parts for %s meetings' % len(meeting_pks))
+    missing_speakers = {}
+    if processes > 1 and len(meeting_pks) > 1:
+        # the forked workers must not share the parent's db connection
+        connection.close()
+        pool = Pool(processes, initializer=_init_worker)
+        try:
+            for meeting_pk, missing in pool.imap_unordered(_parse_meeting, meeting_pks):
+                missing_speakers[meeting_pk] = missing
+                logger.debug('created protocol parts for meeting %s' % meeting_pk)
+        finally:
+            pool.close()
+            pool.join()
+    else:
+        _init_worker()
+        for meeting_pk in meeting_pks:
+            meeting_pk, missing = _parse_meeting(meeting_pk)
+            missing_speakers[meeting_pk] = missing
+            logger.debug('created protocol parts for meeting %s' % meeting_pk)
+    if create_speakers:
+        # in a single process the speakers of _init_worker are reused
+        speakers = _speakers if processes <= 1 or len(meeting_pks) <= 1 else SpeakerResolver()
+        speakers.missing = dict((pk, missing) for pk, missing in missing_speakers.items() if missing)
+        logger.debug('created %s speakers' % speakers.create_missing_speakers())
+
 
 def parse_for_existing_meeting(meeting):
     logger = logging.getLogger('open-knesset')
@@ -2,7 +2,7 @@
 
 from django.core.management.base import NoArgsCommand
 from optparse import make_option
-from committees.models import Committee
+from committees.models import Committee, CommitteeMeeting
 from datetime import datetime, timedelta
 
 
@@ -23,9 +23,11 @@ class Command(NoArgsCommand):
             qs = plenum.meetings.all()
         else:
             qs = plenum.meetings.filter(date__gte=datetime.now()-timedelta(days=self.latest_days))
-        for meeting in qs:
-            if int(options.get('verbosity', '1')) > 1:
-                print 'meeting %s'%meeting.pk
-            if options.get('reparse', False):
+        if options.get('reparse', False):
+            for meeting in qs:
+                if int(options.get('verbosity', '1')) > 1:
+                    print 'meeting %s'%meeting.pk
                 meeting.reparse_protocol()
-            meeting.plenum_link_votes()
+        num_links = CommitteeMeeting.objects.plenum_link_votes(qs)
+        if int(options.get('verbosity', '1')) > 1:
+            print 'created %s vote links'%num_links
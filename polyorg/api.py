@@ -19,6 +19,8 @@ class CandidateListResource(BaseResource):
     class Meta(BaseResource.Meta):
         queryset = CandidateList.objects.all()
         allowed_methods = ['get']
-        excludes = ['end_date', 'start_date']
-        list_fields = ["id", "name", "ballot", ]
+        excludes = ['end_date', 'start_date', 'cached_member_ids']
+        list_fields = ["id", "name", "ballot", "head_name", "member_ids"]
+
+    member_ids = fields.ListField(attribute='member_ids', readonly=True)
 
@@ -0,0 +1,21 @@
+from django.db.models.signals import post_save, post_delete
+from knesset.utils import disable_for_loaddata
+from persons.models import Person
+from models import Candidate, CandidateList
+
+
+@disable_for_loaddata
+def refresh_candidate_list(sender, instance, **kwargs):
+    CandidateList.objects.refresh_members([instance.candidates_list_id])
+post_save.connect(refresh_candidate_list, sender=Candidate)
+post_delete.connect(refresh_candidate_list, sender=Candidate)
+
+
+@disable_for_loaddata
+def refresh_person_candidate_lists(sender, instance, **kwargs):
+    """the name or mk of a candidate might have changed"""
+    candidate_list_ids = list(Candidate.objects.filter(person=instance).values_list(
+        'candidates_list', flat=True).distinct())
+    if candidate_list_ids:
+        CandidateList.objects.refresh_members(candidate_list_ids)
+post_save.connect(refresh_person_candidate_lists, sender=Person)
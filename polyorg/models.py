@@ -1,6 +1,84 @@
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.cache import cache
 from django.db import models
+from django.db.models import Sum
 from django.utils.translation import ugettext as _
 
+AGENDA_SCORES_CACHE_KEY = 'polyorg_candidate_list_agenda_scores'
+
+
+def _parse_ids(ids):
+    return [int(x) for x in ids.split(',') if x]
+
+
+class CandidateListManager(models.Manager):
+
+    def refresh_members(self, candidate_list_ids=None):
+        """
+        Materializes the member ids and head name of the candidate lists
+        (all of them if no ids are given), with one query for all the lists.
+        """
+        if candidate_list_ids is None:
+            candidate_list_ids = self.values_list('id', flat=True)
+        candidate_list_ids = list(candidate_list_ids)
+        heads = {}
+        member_ids = defaultdict(list)
+        for candidate_list_id, ordinal, name, mk_id in Candidate.objects.filter(
+                candidates_list__in=candidate_list_ids).order_by('ordinal').values_list(
+                'candidates_list', 'ordinal', 'person__name', 'person__mk'):
+            if ordinal == 1:
+                heads[candidate_list_id] = name
+            if mk_id is not None:
+                member_ids[candidate_list_id].append(mk_id)
+        for candidate_list_id in candidate_list_ids:
+            self.filter(id=candidate_list_id).update(
+                head_name=heads.get(candidate_list_id, ''),
+                cached_member_ids=','.join(str(x) for x in member_ids[candidate_list_id]))
+        self.invalidate_agenda_scores()
+
+    def invalidate_agenda_scores(self):
+        cache.delete(AGENDA_SCORES_CACHE_KEY)
+
+    def get_agenda_scores(self):
+        """
+        Returns {candidate list id: {agenda id: score}} for all the lists and
+        agendas, cached until the candidates, agenda votes or vote actions
+        change. A list scores the agenda's weighted score for its members'
+        votes for, and against it for their votes against (other votes do not
+        count), out of the score of all of them voting with the agenda.
+        Computed with two aggregate queries over the agenda votes. Agendas a
+        list's members never voted on are missing (score 0).
+        """
+        scores = cache.get(AGENDA_SCORES_CACHE_KEY)
+        if scores is None:
+            from agendas.models import AgendaVote
+            # the max score of an agenda, per member
+            agenda_totals = defaultdict(float)
+            for agenda_id, score, importance in AgendaVote.objects.order_by().values_list(
+                    'agenda', 'score', 'importance').iterator():
+                agenda_totals[agenda_id] += abs(score * importance)
+            mk_totals = defaultdict(lambda: defaultdict(float))
+            for row in AgendaVote.objects.filter(vote__actions__type__in=['for', 'against']).order_by().values(
+                    'agenda', 'importance', 'vote__actions__member', 'vote__actions__type').annotate(
+                    score_sum=Sum('score')):
+                sign = 1 if row['vote__actions__type'] == 'for' else -1
+                mk_totals[row['vote__actions__member']][row['agenda']] += sign * row['score_sum'] * row['importance']
+            scores = {}
+            for candidate_list_id, member_ids in self.values_list('id', 'cached_member_ids'):
+                member_ids = _parse_ids(member_ids)
+                list_totals = defaultdict(float)
+                for mk_id in member_ids:
+                    for agenda_id, score in mk_totals.get(mk_id, {}).iteritems():
+                        list_totals[agenda_id] += score
+                scores[candidate_list_id] = dict(
+                    (agenda_id, score / (agenda_totals[agenda_id] * len(member_ids)) * 100)
+                    for agenda_id, score in list_totals.iteritems() if agenda_totals.get(agenda_id))
+            cache.set(AGENDA_SCORES_CACHE_KEY, scores, settings.LONG_CACHE_TIME)
+        return scores
+
+
 class CandidateList(models.Model):
     candidates = models.ManyToManyField('persons.Person', blank=True, null=True, through='Candidate')
     name = models.CharField(_('Name'), max_length = 80)
@@ -16,20 +94,32 @@ class CandidateList(models.Model):
     twitter_account = models.CharField(_('Twitter account'), max_length = 80, null=True, blank=True)
     facebook_url = models.URLField(blank=True, null=True)
     platform = models.TextField(_('Platform'), blank=True, null=True)
+    # materialized by CandidateList.objects.refresh_members when the candidates change
+    head_name = models.CharField(max_length=64, blank=True, editable=False)
+    cached_member_ids = models.CommaSeparatedIntegerField(max_length=1000, blank=True, editable=False)
+
+    objects = CandidateListManager()
 
     def save(self, *args, **kwargs):
         super(CandidateList, self).save()
+        # the materialized fields of this instance might be stale
+        CandidateList.objects.refresh_members([self.id])
+        self.head_name, self.cached_member_ids = CandidateList.objects.filter(id=self.id).values_list(
+            'head_name', 'cached_member_ids')[0]
         if self.surplus_partner:
             self.surplus_partner.surplus_partner = self
 
     def getHeadName(self):
-        return Candidate.objects.get(candidates_list=self, ordinal=1).person.name
+        return self.head_name
 
     @property
     def member_ids(self):
         ''' return a list of all members id in the party '''
-        mks = Candidate.objects.filter(candidates_list=self, person__mk__isnull=False)
-        return mks.values_list('person__mk__id', flat=True)
+        return _parse_ids(self.cached_member_ids)
+
+    def get_agenda_scores(self):
+        """{agenda id: score} of the list"""
+        return CandidateList.objects.get_agenda_scores().get(self.id, {})
 
     @models.permalink
     def get_absolute_url(self):
@@ -62,3 +152,6 @@ class Candidate(models.Model):
 
     def __unicode__(self):
         return self.person.name
+
+
+from listeners import *
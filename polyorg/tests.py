@@ -5,7 +5,13 @@ when you run "manage.py test".
 Replace this with more appropriate tests for your application.
 """
 
+import datetime
+
+from django.core.cache import cache
 from django.test import TestCase
+from agendas.models import Agenda, AgendaVote
+from laws.models import Vote, VoteAction
+from mks.models import Member, Party
 from persons.models import Person
 from models import Candidate, CandidateList
 
@@ -36,3 +42,49 @@ class CreationTest(TestCase):
     def teardown(self):
         for p in self.persons: p.delete()
 
+
+
+class MaterializedMembersTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.mks = [Member.objects.create(name='mk %d' % i) for i in range(2)]
+        self.persons = [Person.objects.create(name=mk.name, mk=mk) for mk in self.mks]
+        self.persons.append(Person.objects.create(name='Guido'))
+        self.cl = CandidateList.objects.create(name="Imagine", ballot="I")
+
+    def test_members(self):
+        for i, p in enumerate(self.persons):
+            Candidate.objects.create(candidates_list=self.cl, person=p, ordinal=i + 1)
+        cl = CandidateList.objects.get(pk=self.cl.pk)
+        self.assertEqual(cl.getHeadName(), 'mk 0')
+        self.assertEqual(cl.member_ids, [mk.id for mk in self.mks])
+        self.persons[0].name = 'Linus'
+        self.persons[0].save()
+        Candidate.objects.filter(person=self.persons[1]).delete()
+        cl = CandidateList.objects.get(pk=self.cl.pk)
+        self.assertEqual(cl.getHeadName(), 'Linus')
+        self.assertEqual(cl.member_ids, [self.mks[0].id])
+
+    def test_agenda_scores(self):
+        for i, p in enumerate(self.persons):
+            Candidate.objects.create(candidates_list=self.cl, person=p, ordinal=i + 1)
+        agenda = Agenda.objects.create(name='agenda', public_owner_name='owner')
+        party = Party.objects.create(name='party')
+        time = datetime.datetime(2012, 1, 1)
+        votes = [Vote.objects.create(title='vote %d' % i, time=time) for i in range(2)]
+        VoteAction.objects.create(vote=votes[0], member=self.mks[0], party=party, type='for')
+        action = VoteAction.objects.create(vote=votes[0], member=self.mks[1], party=party, type='for')
+        VoteAction.objects.create(vote=votes[1], member=self.mks[0], party=party, type='abstain')
+        for vote in votes:
+            AgendaVote.objects.create(agenda=agenda, vote=vote, score=1.0, importance=1.0)
+        # an abstain counts for neither side
+        self.assertEqual(self.cl.get_agenda_scores(), {agenda.id: 50.0})
+        self.assertEqual(agenda.candidate_list_score(self.cl), 50.0)
+        # the scores are cached until the candidates, agenda votes or vote actions change
+        action.type = 'against'
+        action.save()
+        self.assertEqual(self.cl.get_agenda_scores(), {agenda.id: 0.0})
+        Candidate.objects.filter(person=self.persons[1]).delete()
+        self.assertEqual(self.cl.get_agenda_scores(), {agenda.id: 50.0})
+        AgendaVote.objects.filter(vote=votes[1]).delete()
+        self.assertEqual(self.cl.get_agenda_scores(), {agenda.id: 100.0})
@@ -39,18 +39,19 @@ class CandidateListDetailView(DetailView):
         if not context:
             context = super(CandidateListDetailView, self).get_context_data(**kwargs)
             cl = context['object']
-            context['head'] = cl.getHeadName()
+            context['head'] = cl.head_name
             candidates = Candidate.objects.select_related('person',
                     'person__mk').filter(candidates_list=cl,
                                          ordinal__lte=cl.number_of_seats).order_by('ordinal')
             context['candidates'] = [x.person for x in candidates]
             agendas = []
             if cl.member_ids:
+                scores = cl.get_agenda_scores()
                 for a in Agenda.objects.filter(is_public=True).order_by('-num_followers'):
                     agendas.append({'id': a.id,
                                     'name': a.name,
                                     'url': a.get_absolute_url(),
-                                    'score': a.candidate_list_score(cl)})
+                                    'score': scores.get(a.id, 0.0)})
                 context['agendas'] = agendas
             cache.set(cache_key, context, settings.LONG_CACHE_TIME)
         return context
@@ -31,3 +31,6 @@ KNESSET_SYNCED_PROTOCOL_PAGE = 'http://online.knesset.gov.il/eprotocol/PLAYER/PE
 
 KNESSET_PRESENT_MKS_PAGE = 'http://www.knesset.gov.il/presence/heb/PresentList.aspx'
 KNESSET_GOVERNMENT_PAGE = "http://www.knesset.gov.il/govt/heb/GovtByNumber.asp?govt={}"
+
+# plenum meetings held or parsed in the last days are linked to their votes by syncdata
+PLENUM_LINK_VOTES_DAYS = 30
@@ -11,6 +11,7 @@ from django.contrib.contenttypes.models import ContentType
 from django.db.models import Max
 from okscraper_django.management.base_commands import NoArgsDbLogCommand
 
+from knesset.utils import bulk_import
 from laws.models import Vote, VoteAction
 from links.models import Link
 from mks.models import Member, Party, Membership
@@ -43,8 +44,10 @@ class Command(NoArgsDbLogCommand):
         self.load()
 
     def load(self):
-        self.update_members_from_file()
-        self.update_db_from_files()
+        # the listeners' work (vote actions, member persons) is done in one pass at the end
+        with bulk_import():
+            self.update_members_from_file()
+            self.update_db_from_files()
 
     def update_members_from_file(self):
         logger.debug('update_members_from_file')
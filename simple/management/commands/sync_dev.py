@@ -8,6 +8,7 @@ from django.db import transaction
 from django.contrib.auth.models import User
 from user.models import UserProfile
 from actstream.models import Follow
+from knesset.utils import bulk_import
 
 OUT_DB = 'dev'
 
@@ -36,6 +37,11 @@ class Command(NoArgsCommand):
     COMMIT_EVERY = 30
 
     def handle_noargs(self, **options):
+        # the listeners must not create data in the exported db
+        with bulk_import(deferred=False):
+            self.export(**options)
+
+    def export(self, **options):
         call_command('syncdb', database=self.DB, interactive=False,
                      migrate_all=True)
 
@@ -7,14 +7,15 @@ import os
 import re
 
 import time
-import traceback
 import urllib
 import urllib2
 from cStringIO import StringIO
 from optparse import make_option
 
 from django.conf import settings
+from django.core.management.base import CommandError
 from django.contrib.contenttypes.models import ContentType
+from django.db.models import Q
 from okscraper_django.management.base_commands import NoArgsDbLogCommand
 
 from pyth.plugins.rtf15.reader import Rtf15Reader
@@ -30,7 +31,7 @@ from mks.models import Member, WeeklyPresence, Knesset
 from persons.models import Person, PersonAlias
 
 from simple.constants import SPECIAL_COMMITTEES_NAMES, SECOND_AND_THIRD_READING_LAWS_URL, CANONICAL_PARTY_ALIASES, \
-    KNESSET_PROTOCOL_SEARCH_PAGE, KNESSET_SYNCED_PROTOCOL_PAGE, KNESSET_PRESENT_MKS_PAGE
+    KNESSET_PROTOCOL_SEARCH_PAGE, KNESSET_SYNCED_PROTOCOL_PAGE, KNESSET_PRESENT_MKS_PAGE, PLENUM_LINK_VOTES_DAYS
 
 from simple.parsers import mk_roles_parser
 from simple.parsers import parse_laws
@@ -38,6 +39,7 @@ from simple.parsers import parse_remote
 from simple.parsers.parse_gov_legislation_comm import ParseGLC
 
 from simple.parsers import parse_presence
+from simple.stages import Stage, Checkpoint, select_stages, run_stages
 from syncdata_globals import p_explanation, strong_explanation, explanation
 
 ENCODING = 'utf8'
@@ -55,6 +57,62 @@ except:
     SPECIAL_COMMITTEES = {}
 
 
+# the stages of a sync in the order they ran one after the other, with the
+# tables and files they read and write (see simple/stages.py)
+STAGES = (
+    Stage('calculate_votes_importances',
+          reads=('laws.vote', 'laws.voteaction'),
+          writes=('laws.vote.importance',)),
+    Stage('update_laws_data',
+          reads=('laws.vote',),
+          writes=('laws.vote.summary', 'laws.vote.full_text', 'links.link.vote_documents')),
+    Stage('update_presence',
+          reads=('file.presence', 'mks.member', 'mks.weeklypresence'),
+          writes=('mks.weeklypresence', 'mks.member.average_weekly_presence_hours')),
+    Stage('parse_laws',
+          reads=('mks.member.name', 'persons.person', 'persons.personalias', 'laws.law', 'laws.proposal',
+                 'laws.bill'),
+          writes=('laws.law', 'laws.proposal', 'laws.bill', 'laws.vote.cached_bill_ids', 'actstream.action',
+                  'mks.membertimelineentry')),
+    Stage('find_proposals_in_other_data',
+          reads=('laws.law', 'laws.proposal', 'laws.bill', 'laws.vote.title', 'committees.committeemeeting'),
+          writes=('laws.proposal', 'laws.bill', 'laws.vote.cached_bill_ids', 'actstream.action',
+                  'mks.membertimelineentry')),
+    Stage('merge_duplicate_laws',
+          reads=('laws.law', 'laws.proposal', 'laws.bill'),
+          writes=('laws.law', 'laws.proposal', 'laws.bill', 'laws.vote.cached_bill_ids', 'actstream.action',
+                  'mks.membertimelineentry')),
+    Stage('update_mk_role_descriptions',
+          reads=('mks.member',),
+          writes=('mks.member.current_role_descriptions',)),
+    Stage('update_mks_is_current',
+          reads=(),
+          writes=('mks.member.is_current',)),
+    Stage('link_plenum_votes',
+          reads=('committees.committeemeeting', 'committees.protocolpart', 'committees.protocolpartsmetadata',
+                 'laws.vote.meeting_number', 'laws.vote.vote_number', 'links.link.vote_protocol_parts'),
+          writes=('links.link.vote_protocol_parts',)),
+    Stage('correct_votes_matching',
+          reads=('laws.vote.title', 'laws.bill'),
+          writes=('laws.bill', 'laws.vote.cached_bill_ids', 'actstream.action', 'mks.membertimelineentry')),
+)
+
+# the stages of the command options
+PROCESS_STAGES = ['calculate_votes_importances']
+LAWS_STAGES = ['parse_laws', 'find_proposals_in_other_data', 'merge_duplicate_laws', 'correct_votes_matching']
+PRESENCE_STAGES = ['update_presence']
+UPDATE_STAGES = ['update_laws_data',
+                 'update_presence',
+                 'parse_laws',
+                 'find_proposals_in_other_data',
+                 'merge_duplicate_laws',
+                 'update_mk_role_descriptions',
+                 'update_mks_is_current',
+                 'link_plenum_votes',
+                 # 'update_gov_law_decisions',
+                 'correct_votes_matching']
+
+
 class Command(NoArgsDbLogCommand):
     option_list = NoArgsDbLogCommand.option_list + (
         make_option('--all', action='store_true', dest='all',
@@ -69,8 +127,19 @@ class Command(NoArgsDbLogCommand):
                     help="download and parse presence"),
         make_option('--update', action='store_true', dest='update',
                     help="online update of data."),
-        make_option('--update-run-only', action='store', dest='update-run-only',
-                    help="only run update for the provided functions. Should contain comma-seperated list of functions to run.")
+        make_option('--only', action='store', dest='only', default='',
+                    help="only run the provided stages. Should contain comma-seperated list of stages to run."),
+        make_option('--update-run-only', action='store', dest='update-run-only', default='',
+                    help="same as --only, kept for older crontabs"),
+        make_option('--from', action='store', dest='from', default='',
+                    help="only run the provided stage and the stages which run after it"),
+        make_option('--processes', action='store', type='int', dest='processes', default=1,
+                    help="number of stages to run concurrently"),
+        make_option('--resume', action='store_true', dest='resume', default=False,
+                    help="skip the stages which finished in the last run"),
+        make_option('--checkpoint', action='store', dest='checkpoint',
+                    default=os.path.join(DATA_ROOT, 'syncdata-checkpoint.json'),
+                    help="file recording the stages which finished, for --resume"),
     )
     help = "Downloads data from sources, parses it and loads it to the Django DB."
 
@@ -96,56 +165,35 @@ class Command(NoArgsDbLogCommand):
         if all_options:
             process = True
 
-        selected_options = [all_options, process, update, laws, presence]
+        only = [name for name in (options['only'] or options['update-run-only']).split(',') if name]
+        start = options['from'] or None
+
+        selected_options = [all_options, process, update, laws, presence, only, start]
         if not any(selected_options):
             logger.error(
                 "no arguments found. doing nothing. \ntry -h for help.\n--all to run the full syncdata flow.\n--update for an online dynamic update.")
+            return
 
-        if process:
-            logger.info("beginning process phase")
-            self.calculate_votes_importances()
-            # self.calculate_correlations()
+        names = None
+        if any([process, laws, presence, update]):
+            names = ((PROCESS_STAGES if process else []) + (LAWS_STAGES if laws else []) +
+                     (PRESENCE_STAGES if presence else []) + (UPDATE_STAGES if update else []))
+        try:
+            stages = select_stages(STAGES, names, only, start)
+        except ValueError as e:
+            raise CommandError(str(e))
 
-        if laws:
-            self.parse_laws()
-            self.find_proposals_in_other_data()
-            self.merge_duplicate_laws()
-            self.correct_votes_matching()
+        run_stages(stages, self.run_stage, logger, processes=options['processes'],
+                   checkpoint=Checkpoint(options['checkpoint']).load(), resume=options['resume'],
+                   on_error=self.notify_stage_error)
+        logger.info('finished update')
 
-        if presence:
-            self.update_presence()
+    def run_stage(self, name):
+        getattr(self, name)()
 
-        if update:
-            update_run_only = options.get('update-run-only', '')
-            if update_run_only:
-                try:
-                    update_run_only = update_run_only.split(',')
-                except AttributeError as e:
-                    logger.exception("Error in syncdata update:")
-            else:
-                update_run_only = None
-            for func in ['update_laws_data',
-                         'update_presence',
-                         'parse_laws',
-                         'find_proposals_in_other_data',
-                         'merge_duplicate_laws',
-                         'update_mk_role_descriptions',
-                         'update_mks_is_current',
-                         # 'update_gov_law_decisions',
-                         'correct_votes_matching']:
-                # in case update_run_only is none, we run all stages
-                if (update_run_only is None) or (func in update_run_only):
-                    try:
-                        logger.info('update: running %s', func)
-                        self.__getattribute__(func).__call__()
-                    except Exception as e:
-
-                        send_chat_notification(__name__,
-                                               "caught exception in one of the sync data update commands",
-                                               {'exception': traceback.format_exc(), 'func': func})
-                        # No need for manual exception formatting, logger exception takes care of that
-                        logger.exception("Caught Exception in syncdata update phase %s", func)
-            logger.info('finished update')
+    def notify_stage_error(self, name, error):
+        send_chat_notification(__name__, "caught exception in one of the sync data update commands",
+                               {'exception': error, 'func': name})
 
     def read_laws_page(self, index):
 
@@ -383,6 +431,14 @@ class Command(NoArgsDbLogCommand):
         if cm_search_text.find(v_search_text) >= 0:
             cm.votes_mentioned.add(vote)
 
+    def link_plenum_votes(self):
+        """links votes to the plenum protocols held or parsed in the last PLENUM_LINK_VOTES_DAYS days"""
+        since = datetime.date.today() - datetime.timedelta(PLENUM_LINK_VOTES_DAYS)
+        meetings = CommitteeMeeting.objects.filter(committee__type='plenum').filter(
+            Q(date__gte=since) | Q(parts_metadata__updated__gte=since))
+        num_links = CommitteeMeeting.objects.plenum_link_votes(meetings)
+        logger.debug('created %d plenum vote links' % num_links)
+
     def find_votes_in_cms(self):
         for cm in CommitteeMeeting.objects.all():
             for v in Vote.objects.all():
@@ -733,6 +789,7 @@ class Command(NoArgsDbLogCommand):
         kps and pps are dicts computed by find_proposals_in_other_data with canonical names.
         """
 
+        updated_bills = set()
         d = datetime.date.today() - datetime.timedelta(60)  # only look through cms in last 60 days.
         for cm in CommitteeMeeting.objects.filter(date__gt=d, committee__type='committee').exclude(protocol_text=None):
             c = cannonize(cm.protocol_text)
@@ -743,7 +800,8 @@ class Command(NoArgsDbLogCommand):
                         p.committee_meetings.add(cm)
                         if p.bill:
                             p.bill.second_committee_meetings.add(cm)
-                            p.bill.update_stage()
+                            p.bill.update_stage(generate_stream=False)
+                            updated_bills.add(p.bill.id)
                         logger.debug('gov proposal %d found in cm %d' % (p.id, cm.id))
             for kp in kps:
                 if c.find(kp['c1']) >= 0 or c.find(kp['c2']) >= 0:
@@ -752,7 +810,8 @@ class Command(NoArgsDbLogCommand):
                         p.committee_meetings.add(cm)
                         if p.bill:
                             p.bill.second_committee_meetings.add(cm)
-                            p.bill.update_stage()
+                            p.bill.update_stage(generate_stream=False)
+                            updated_bills.add(p.bill.id)
 
             for pp in pps:
                 if c.find(pp['c1']) >= 0 or c.find(pp['c2']) >= 0:
@@ -761,13 +820,16 @@ class Command(NoArgsDbLogCommand):
                         p.committee_meetings.add(cm)
                         if p.bill:
                             p.bill.first_committee_meetings.add(cm)
-                            p.bill.update_stage()
+                            p.bill.update_stage(generate_stream=False)
+                            updated_bills.add(p.bill.id)
+        self.generate_bills_activity_streams(updated_bills)
 
     def find_proposals_in_votes(self, gps, kps, pps):
         """
         Find Private proposals and Knesset proposals in votes. update bills that are connected.
         kps and pps are dicts computed by find_proposals_in_other_data with canonical names.
         """
+        updated_bills = set()
         votes = Vote.objects.filter(title__contains='חוק').values('id', 'title')
 
         for v in votes:
@@ -780,7 +842,8 @@ class Command(NoArgsDbLogCommand):
                     if this_v not in p.votes.all():
                         p.votes.add(this_v)
                         if p.bill:
-                            p.bill.update_votes()
+                            p.bill.update_votes(generate_stream=False)
+                            updated_bills.add(p.bill.id)
                         logger.debug('gov proposal %d found in vote %s' % (p.id, this_v.title))
 
             for kp in kps:
@@ -791,7 +854,8 @@ class Command(NoArgsDbLogCommand):
                         p.votes.add(this_v)
                         # print "add KP %d to Vote %d" % (kp['id'], this_v.id)
                         if p.bill:
-                            p.bill.update_votes()
+                            p.bill.update_votes(generate_stream=False)
+                            updated_bills.add(p.bill.id)
 
             for pp in pps:
                 if v['c'].find(pp['c1']) >= 0:
@@ -801,7 +865,9 @@ class Command(NoArgsDbLogCommand):
                         p.votes.add(this_v)
 
                         if p.bill:
-                            p.bill.update_votes()
+                            p.bill.update_votes(generate_stream=False)
+                            updated_bills.add(p.bill.id)
+        self.generate_bills_activity_streams(updated_bills)
 
     def merge_duplicate_laws(self):
         """Find and merge duplicate laws, and identical bills of each law"""
@@ -822,12 +888,15 @@ class Command(NoArgsDbLogCommand):
                     else:
                         law2.merge(law1)
 
+        updated_bills = set()
         for l in Law.objects.all():
             bills = l.bills.all()
             for (i, b) in enumerate(bills):
                 for i2 in range(i + 1, len(bills)):
                     if cannonize(b.title) == cannonize(bills[i2].title):
-                        b.merge(bills[i2])
+                        b.merge(bills[i2], generate_stream=False)
+                        updated_bills.add(b.id)
+        self.generate_bills_activity_streams(updated_bills)
 
     def correct_votes_matching(self):
         """tries to find votes that are matched to bills in incorrect places
@@ -835,6 +904,7 @@ class Command(NoArgsDbLogCommand):
 
             """
         logger.debug("correct_votes_matching")
+        updated_bills = set()
         for v in Vote.objects.filter(title__contains="אישור החוק"):
             if v.bills_pre_votes.count() == 1:
                 logger.info("vote %d is approval but linked as pre. trying to fix" % v.id)
@@ -854,7 +924,16 @@ class Command(NoArgsDbLogCommand):
                 bill_pre_voted.approval_vote = v
                 v.bills_pre_votes.remove(bill_pre_voted)
                 bill_pre_voted.save()
-                bill_pre_voted.update_stage()
+                bill_pre_voted.update_stage(generate_stream=False)
+                updated_bills.add(bill_pre_voted.id)
+        self.generate_bills_activity_streams(updated_bills)
+
+    def generate_bills_activity_streams(self, bill_ids):
+        """updates the activity streams of the given bills in one batch"""
+        if bill_ids:
+            created, deleted = Bill.objects.generate_activity_streams(Bill.objects.filter(id__in=bill_ids))
+            logger.debug('activity streams of %d bills updated, %d actions created, %d deleted' % (
+                len(bill_ids), created, deleted))
 
     def update_mk_role_descriptions(self):
         mk_govt_roles = mk_roles_parser.parse_mk_govt_roles()
@@ -0,0 +1,220 @@
+"""
+A scheduler of the syncdata stages.
+
+Every stage declares the tables (and files) it reads and writes, as dotted
+names: 'laws.vote' is the whole table, 'laws.vote.summary' one of its
+columns (or a set of its rows no other stage touches). A stage runs after
+the stages declared before it which it conflicts with - one writes what the
+other reads or writes - so the declared order is the order of the stages
+which share data, and the stages which do not share any run concurrently in
+a bounded pool of processes. A stage which saves whole rows reads the whole
+table, as it writes back the columns other stages change.
+
+A checkpoint file records the stages of the last run which finished, so a
+run which failed can be resumed with the stages it did not finish and those
+which run after them.
+"""
+import datetime
+import json
+import os
+import Queue
+import time
+import traceback
+from collections import namedtuple
+from multiprocessing import Process, Queue as ProcessQueue
+
+from django.db import connection
+
+Stage = namedtuple('Stage', 'name reads writes')
+
+
+def _overlap(resource, other):
+    return resource == other or resource.startswith(other + '.') or other.startswith(resource + '.')
+
+
+def _touches(resources, others):
+    return any(_overlap(resource, other) for resource in resources for other in others)
+
+
+def conflicts(first, second):
+    """whether the second stage has to run after the first"""
+    return _touches(first.writes, second.reads + second.writes) or _touches(first.reads, second.writes)
+
+
+def build_dag(stages):
+    """{stage name: the names of the stages it runs after}, the stages are in their declared order"""
+    return dict((stage.name, set(earlier.name for earlier in stages[:i] if conflicts(earlier, stage)))
+                for i, stage in enumerate(stages))
+
+
+def with_descendants(stages, names):
+    """the names and the names of all the stages which run after them"""
+    dag = build_dag(stages)
+    selected = set(names)
+    for stage in stages:
+        if dag[stage.name] & selected:
+            selected.add(stage.name)
+    return selected
+
+
+def select_stages(stages, names=None, only=None, start=None):
+    """
+    The stages with the names (all the stages if None), narrowed to those in
+    only, or to start and the stages which run after it. Raises ValueError
+    for unknown names.
+    """
+    known = set(stage.name for stage in stages)
+    unknown = (set(names or []) | set(only or []) | set([start] if start else [])) - known
+    if unknown:
+        raise ValueError('unknown stages: %s' % ', '.join(sorted(unknown)))
+    selected = set(names) if names is not None else known
+    if only:
+        selected &= set(only)
+    if start:
+        selected &= with_descendants(stages, [start])
+    return [stage for stage in stages if stage.name in selected]
+
+
+def critical_path(stages, seconds):
+    """(the seconds, the names) of the longest chain of dependent stages"""
+    dag = build_dag(stages)
+    longest = {}
+    for stage in stages:
+        previous = max([longest[name] for name in dag[stage.name]] or [(0, [])])
+        longest[stage.name] = (previous[0] + seconds.get(stage.name, 0), previous[1] + [stage.name])
+    return max(longest.values() or [(0, [])])
+
+
+class Checkpoint(object):
+    """the stages of the last run which finished or failed, in a json file"""
+
+    def __init__(self, filename):
+        self.filename = filename
+        self.stages = {}
+
+    def load(self):
+        if os.path.exists(self.filename):
+            with open(self.filename) as f:
+                self.stages = json.load(f)['stages']
+        return self
+
+    def done(self):
+        return set(name for name, stage in self.stages.items() if stage['status'] == 'done')
+
+    def record(self, name, seconds, error=None):
+        self.stages[name] = {
+            'status': 'failed' if error else 'done',
+            'seconds': round(seconds, 2),
+            'finished': datetime.datetime.now().isoformat(),
+        }
+        self.save()
+
+    def save(self):
+        # a run killed while writing leaves the previous checkpoint
+        temp = self.filename + '.tmp'
+        with open(temp, 'w') as f:
+            json.dump({'stages': self.stages}, f, indent=2, sort_keys=True)
+        os.rename(temp, self.filename)
+
+
+# the function running a stage by its name, set before the stage processes fork
+_run = None
+
+# seconds to wait for a result before checking for stage processes which died
+POLL_SECONDS = 1
+
+
+def _run_stage(name):
+    start = time.time()
+    try:
+        _run(name)
+        error = None
+    except Exception:
+        error = traceback.format_exc()
+    return name, time.time() - start, error
+
+
+def _run_stage_process(name, results):
+    results.put(_run_stage(name))
+
+
+def run_stages(stages, run, logger, processes=1, checkpoint=None, resume=False, on_error=None):
+    """
+    Runs the stages, in up to processes stages at a time. run gets the name
+    of a stage and runs it, on_error gets the name and the traceback of a
+    stage which failed. A failed stage does not stop the stages after it,
+    a resumed run runs them again. Returns {stage name: seconds}.
+    """
+    global _run
+    if resume and checkpoint is not None:
+        done = checkpoint.done()
+        rerun = with_descendants(stages, [stage.name for stage in stages if stage.name not in done])
+        skipped = [stage.name for stage in stages if stage.name not in rerun]
+        if skipped:
+            logger.info('resuming, skipping the finished stages %s' % ', '.join(skipped))
+        stages = [stage for stage in stages if stage.name in rerun]
+    elif checkpoint is not None:
+        checkpoint.stages = {}
+    dag = build_dag(stages)
+    seconds = {}
+
+    def finished(name, stage_seconds, error):
+        seconds[name] = stage_seconds
+        if checkpoint is not None:
+            checkpoint.record(name, stage_seconds, error)
+        if error:
+            logger.error('stage %s failed after %.1f seconds:\n%s' % (name, stage_seconds, error))
+            if on_error is not None:
+                on_error(name, error)
+        else:
+            logger.info('stage %s finished in %.1f seconds' % (name, stage_seconds))
+
+    start = time.time()
+    _run = run
+    if processes > 1 and len(stages) > 1:
+        results = ProcessQueue()
+        # a process per stage, so no stage sees the caches an earlier one left
+        running = {}
+        try:
+            waiting = list(stages)
+            while waiting or running:
+                for stage in list(waiting):
+                    if len(running) >= processes:
+                        break
+                    if dag[stage.name] <= set(seconds):
+                        logger.info('running stage %s' % stage.name)
+                        waiting.remove(stage)
+                        # the forked process must not share the parent's db connection
+                        connection.close()
+                        process = Process(target=_run_stage_process, args=(stage.name, results))
+                        process.start()
+                        running[stage.name] = (process, time.time())
+                # a process flushes its result before it exits, so one which
+                # was dead before the wait and sent nothing was killed
+                dead = [name for name, (process, _) in running.items() if not process.is_alive()]
+                try:
+                    # a blocking get would not see ctrl-c nor a killed process
+                    name, stage_seconds, error = results.get(timeout=POLL_SECONDS)
+                except Queue.Empty:
+                    for name in dead:
+                        process, started = running.pop(name)
+                        process.join()
+                        finished(name, time.time() - started,
+                                 'the stage process exited with code %s' % process.exitcode)
+                    continue
+                running.pop(name)[0].join()
+                finished(name, stage_seconds, error)
+        finally:
+            for process, _ in running.values():
+                process.terminate()
+                process.join()
+    else:
+        for stage in stages:
+            logger.info('running stage %s' % stage.name)
+            finished(*_run_stage(stage.name))
+
+    if stages:
+        path_seconds, path = critical_path(stages, seconds)
+        logger.info('ran %d stages in %.1f seconds, their critical path (%s) took %.1f seconds' % (
+            len(stages), time.time() - start, ', '.join(path), path_seconds))
+    return seconds
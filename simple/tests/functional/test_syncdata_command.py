@@ -9,7 +9,9 @@ from django.test import TestCase
 
 from simple.government_bills import pdftools
 from simple.government_bills.parse_government_bill_pdf import GovProposalParser
+from simple.management.commands.syncdata import STAGES, UPDATE_STAGES
 from simple.parsers import parse_knesset_bill_pdf
+from simple.stages import build_dag, select_stages
 
 logger = logging.getLogger(__name__)
 
@@ -42,6 +44,17 @@ class SyncdataTest(TestCase):
             'utf8')
         self.assertEqual(results[3]['title'], expected_title)
 
+    def test_update_stages(self):
+        dag = build_dag(select_stages(STAGES, UPDATE_STAGES))
+        # independent of the laws stages
+        self.assertEqual(dag['update_presence'], set())
+        self.assertEqual(dag['link_plenum_votes'], set())
+        self.assertEqual(dag['update_mk_role_descriptions'], set(['update_presence']))
+        self.assertEqual(dag['update_mks_is_current'], set(['update_presence', 'update_mk_role_descriptions']))
+        self.assertIn('update_laws_data', dag['parse_laws'])
+        self.assertIn('parse_laws', dag['find_proposals_in_other_data'])
+        self.assertIn('merge_duplicate_laws', dag['correct_votes_matching'])
+
     def test_pdftools_version(self):
         if pdftools.PDFTOTEXT is None:
             logger.warning("no pdftotext on the system, skipping parse_government_bill_pdf tests")
@@ -0,0 +1,102 @@
+import logging
+import os
+import shutil
+import tempfile
+import unittest
+
+from simple.stages import Stage, Checkpoint, build_dag, critical_path, run_stages, select_stages
+
+STAGES = [
+    Stage('download', reads=(), writes=('file.data',)),
+    Stage('load', reads=('file.data',), writes=('app.vote',)),
+    Stage('presence', reads=('app.member',), writes=('app.member.hours',)),
+    Stage('summaries', reads=('app.vote',), writes=('app.vote.summary',)),
+    Stage('links', reads=('app.vote.title',), writes=('app.link',)),
+    Stage('current', reads=(), writes=('app.member.is_current',)),
+]
+
+logger = logging.getLogger(__name__)
+
+
+class StagesTest(unittest.TestCase):
+    def test_dag(self):
+        dag = build_dag(STAGES)
+        self.assertEqual(dag['download'], set())
+        self.assertEqual(dag['load'], set(['download']))
+        self.assertEqual(dag['presence'], set())
+        self.assertEqual(dag['summaries'], set(['load']))
+        # a column conflicts with the whole table
+        self.assertEqual(dag['links'], set(['load']))
+        self.assertEqual(dag['current'], set(['presence']))
+
+    def test_select(self):
+        names = lambda stages: [stage.name for stage in stages]
+        self.assertEqual(names(select_stages(STAGES)), names(STAGES))
+        self.assertEqual(names(select_stages(STAGES, ['summaries', 'load'])), ['load', 'summaries'])
+        self.assertEqual(names(select_stages(STAGES, only=['current', 'download'])), ['download', 'current'])
+        self.assertEqual(names(select_stages(STAGES, start='load')), ['load', 'summaries', 'links'])
+        self.assertEqual(names(select_stages(STAGES, ['download', 'load', 'presence'], start='load')), ['load'])
+        self.assertRaises(ValueError, select_stages, STAGES, only=['load', 'unknown'])
+        self.assertRaises(ValueError, select_stages, STAGES, start='unknown')
+
+    def test_critical_path(self):
+        seconds = {'download': 10, 'load': 5, 'presence': 30, 'summaries': 1, 'links': 7, 'current': 2}
+        self.assertEqual(critical_path(STAGES, seconds), (32, ['presence', 'current']))
+        seconds['presence'] = 3
+        self.assertEqual(critical_path(STAGES, seconds), (22, ['download', 'load', 'links']))
+
+
+class RunStagesTest(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.filename = os.path.join(self.dir, 'checkpoint.json')
+        self.ran = []
+        self.failing = set()
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def run_stage(self, name):
+        self.ran.append(name)
+        if name in self.failing:
+            raise Exception('%s failed' % name)
+
+    def test_failure_and_resume(self):
+        self.failing.add('load')
+        errors = []
+        seconds = run_stages(STAGES, self.run_stage, logger, checkpoint=Checkpoint(self.filename).load(),
+                             on_error=lambda name, error: errors.append(name))
+        # a failed stage does not stop the stages after it
+        self.assertEqual(self.ran, [stage.name for stage in STAGES])
+        self.assertEqual(sorted(seconds), sorted(stage.name for stage in STAGES))
+        self.assertEqual(errors, ['load'])
+        checkpoint = Checkpoint(self.filename).load()
+        self.assertEqual(checkpoint.stages['load']['status'], 'failed')
+        self.assertEqual(checkpoint.done(), set(['download', 'presence', 'summaries', 'links', 'current']))
+
+        # the failed stage and the stages after it run again
+        self.ran = []
+        self.failing = set()
+        run_stages(STAGES, self.run_stage, logger, checkpoint=checkpoint, resume=True)
+        self.assertEqual(self.ran, ['load', 'summaries', 'links'])
+        self.assertEqual(Checkpoint(self.filename).load().done(), set(stage.name for stage in STAGES))
+
+        self.ran = []
+        run_stages(STAGES, self.run_stage, logger, checkpoint=Checkpoint(self.filename).load(), resume=True)
+        self.assertEqual(self.ran, [])
+        # a run which does not resume starts a new checkpoint
+        run_stages(STAGES[:1], self.run_stage, logger, checkpoint=Checkpoint(self.filename).load())
+        self.assertEqual(Checkpoint(self.filename).load().done(), set(['download']))
+
+    def test_killed_stage_process(self):
+        def run_stage(name):
+            if name == 'load':
+                # as if the stage process was killed
+                os._exit(1)
+        errors = []
+        seconds = run_stages(STAGES, run_stage, logger, processes=2, checkpoint=Checkpoint(self.filename),
+                             on_error=lambda name, error: errors.append(name))
+        self.assertEqual(sorted(seconds), sorted(stage.name for stage in STAGES))
+        self.assertEqual(errors, ['load'])
+        self.assertEqual(Checkpoint(self.filename).load().done(),
+                         set(['download', 'presence', 'summaries', 'links', 'current']))
@@ -10,6 +10,7 @@
 		this.initial = parseInt(this.options.initial);
 		this.page = parseInt(this.options.page);
 		this.total = parseInt(this.options.total);
+		this.cursor = this.options.cursor;
 		this.callback = this.options.callback ? window[this.options.callback] : null;
 	}
 
@@ -20,14 +21,18 @@
 
             this.$source.button('loading');
 
+            var params = {initial: this.initial, page:this.page+1};
+            if (this.cursor) params.cursor = this.cursor;
+
             $.ajax({
               url: this.options.url,
-              data:{initial: this.initial, page:this.page+1},
+              data:params,
               context:this
             }).done(function(data) {
               $(data.content).appendTo(this.$element);
               this.page = data.current;
               this.total = data.total;
+              this.cursor = data.cursor;
               this.initial = null;
 
               if (data.has_next) {
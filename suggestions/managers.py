@@ -1,12 +1,20 @@
+from datetime import datetime
 import json
 
 from django.contrib.contenttypes.models import ContentType
-from django.db import models
+from django.db import models, transaction
 
 from . import consts
 from .validators import validate_suggestion
 
 
+def _value_key(value):
+    "A hashable key for a suggested value, to tell if two values are equal"
+    if isinstance(value, models.Model):
+        return (type(value), value.pk)
+    return json.dumps(value, sort_keys=True)
+
+
 class SuggestionsManager(models.Manager):
 
     def create_suggestion(self, actions=None, **kwargs):
@@ -75,3 +83,134 @@ class SuggestionsManager(models.Manager):
                              actions__subject_id=subject.pk)
 
         return qs.filter(actions__subject_type=ct)
+
+    @transaction.atomic
+    def bulk_apply(self, suggestions, resolved_by):
+        """Auto apply many pending suggestions in one transaction.
+
+        SET actions are grouped by model, field and value, so each field
+        update is a single UPDATE (the subjects are not saved, so no save
+        signals are sent). ADD/REMOVE actions are grouped by subject and
+        relation. Suggestions with a CREATE action are applied one by one, as
+        their actions depend on each other.
+
+        Conflicting suggestions - setting different values to the same field
+        of a subject, or adding and removing the same object - are detected
+        before anything is written, and are left pending.
+
+        :param suggestions: suggestions or their pks
+        :returns: a summary dict with the pks of the ``applied`` and
+                  ``skipped`` (not pending or without actions) suggestions,
+                  the ``conflicts`` found and the ``changes`` made
+        """
+        pks = [getattr(x, 'pk', x) for x in suggestions]
+        suggestions = list(self.get_pending_suggestions().filter(
+            pk__in=pks).order_by('pk').prefetch_related(
+            'actions__subject', 'actions__action_fields__value_object'))
+        pending = set(x.pk for x in suggestions)
+        summary = {
+            'applied': [],
+            'skipped': [pk for pk in pks if pk not in pending],
+            'conflicts': [],
+            'changes': [],
+        }
+
+        subjects = {}
+        # (model, pk, field name) -> {value key: (value, suggestion pks)}
+        sets = {}
+        # (model, pk, field name) -> {related pk: {action: suggestion pks}}
+        relations = {}
+        creates = []
+        labels = {}
+
+        for suggestion in suggestions:
+            actions = list(suggestion.actions.all())
+            if not actions:
+                summary['skipped'].append(suggestion.pk)
+                continue
+            if any(x.action == consts.CREATE for x in actions):
+                labels[suggestion.pk] = [unicode(x) for x in actions if x.action == consts.CREATE]
+                creates.append((suggestion, actions))
+                continue
+            if any(x.subject is None for x in actions):
+                # the subject was deleted
+                summary['skipped'].append(suggestion.pk)
+                continue
+            labels[suggestion.pk] = [unicode(x) for x in actions]
+
+            for action in actions:
+                subject = action.subject
+                key = (type(subject), subject.pk)
+                subjects[key] = subject
+                for fname, value in action.action_params:
+                    if action.action == consts.SET:
+                        values = sets.setdefault(key + (fname,), {})
+                        values.setdefault(_value_key(value), (value, set()))[1].add(suggestion.pk)
+                        continue
+
+                    field, model, direct, m2m = subject._meta.get_field_by_name(fname)
+                    if not m2m:
+                        raise ValueError("{0} can be auto applied only on m2m".format(
+                            action.get_action_display()))
+                    related = relations.setdefault(key + (fname,), {})
+                    related.setdefault(value.pk, {}).setdefault(action.action, set()).add(suggestion.pk)
+
+        conflicting = set()
+        for (model, pk, fname), values in sets.iteritems():
+            if len(values) > 1:
+                conflicting.update(*[x[1] for x in values.itervalues()])
+                summary['conflicts'].append({
+                    'subject': unicode(subjects[(model, pk)]),
+                    'field': fname,
+                    'suggestions': sorted(set().union(*[x[1] for x in values.itervalues()])),
+                })
+        for (model, pk, fname), related in relations.iteritems():
+            for by_action in related.itervalues():
+                if len(by_action) > 1:
+                    conflicting.update(*by_action.values())
+                    summary['conflicts'].append({
+                        'subject': unicode(subjects[(model, pk)]),
+                        'field': fname,
+                        'suggestions': sorted(set().union(*by_action.values())),
+                    })
+
+        # a field is updated if any of the suggestions setting it is applied
+        updates = {}
+        for (model, pk, fname), values in sets.iteritems():
+            if len(values) > 1:
+                continue
+            ((value_key, (value, suggestion_pks)),) = values.items()
+            if suggestion_pks - conflicting:
+                updates.setdefault((model, fname, value_key), (value, []))[1].append(pk)
+        for (model, fname, value_key), (value, subject_pks) in updates.iteritems():
+            model.objects.filter(pk__in=subject_pks).update(**{fname: value})
+
+        for (model, pk, fname), related in relations.iteritems():
+            changes = {consts.ADD: [], consts.REMOVE: []}
+            for related_pk, by_action in related.iteritems():
+                if len(by_action) > 1:
+                    continue
+                ((action, suggestion_pks),) = by_action.items()
+                if suggestion_pks - conflicting:
+                    changes[action].append(related_pk)
+            manager = getattr(subjects[(model, pk)], fname)
+            if changes[consts.ADD]:
+                manager.add(*changes[consts.ADD])
+            if changes[consts.REMOVE]:
+                manager.remove(*changes[consts.REMOVE])
+
+        for suggestion, actions in creates:
+            # subject's are carried from action to action, see Suggestion.auto_apply
+            subject = None
+            for action in actions:
+                subject = action.auto_apply(subject)
+
+        for suggestion in suggestions:
+            if suggestion.pk in labels and suggestion.pk not in conflicting:
+                summary['applied'].append(suggestion.pk)
+                summary['changes'].extend(labels[suggestion.pk])
+        self.filter(pk__in=summary['applied']).update(
+            resolved_by=resolved_by, resolved_status=consts.FIXED,
+            resolved_at=datetime.now())
+
+        return summary
@@ -151,8 +151,8 @@ class SuggestedAction(models.Model):
             label = unicode(model._meta.verbose_name)
             meta = model._meta
 
-        s_fields = dict((x.name, x) for x in meta.fields)
-        fields = [unicode(s_fields.get(f).verbose_name)
+        # m2m relations (and reverse ones) aren't in meta.fields
+        fields = [unicode(getattr(meta.get_field_by_name(f)[0], 'verbose_name', f))
                   + ': ' + unicode(v) for (f, v) in self.action_params]
         res = u'{0} {1}: {2}'.format(self.get_action_display(), label,
                                      ', '.join(fields))
@@ -212,6 +212,69 @@ class SuggestionsTests(TestCase):
         # cleanup
         Suggestion.objects.all().delete()
 
+    def test_bulk_apply(self):
+        def suggest(subject, action, fields):
+            return Suggestion.objects.create_suggestion(
+                suggested_by=self.regular_user,
+                actions=[{'subject': subject, 'action': action, 'fields': fields}])
+
+        set_site1 = suggest(self.member1, consts.SET, {'website': self.MK_SITE})
+        set_site2 = suggest(self.member2, consts.SET, {'website': self.MK_SITE})
+        set_party = suggest(self.member1, consts.SET, {'current_party': self.party})
+        # the same value twice isn't a conflict
+        set_site_again = suggest(self.member1, consts.SET, {'website': self.MK_SITE})
+        add_member1 = suggest(self.committee, consts.ADD, {'members': self.member1})
+        add_member2 = suggest(self.committee, consts.ADD, {'members': self.member2})
+        # conflicts
+        set_gender_m = suggest(self.member2, consts.SET, {'gender': GENDER_CHOICES[0][0]})
+        set_gender_f = suggest(self.member2, consts.SET, {'gender': GENDER_CHOICES[1][0]})
+        remove_member2 = suggest(self.committee, consts.REMOVE, {'members': self.member2})
+        free_text = Suggestion.objects.create_suggestion(
+            suggested_by=self.regular_user, comment='free text')
+
+        all_suggestions = [set_site1, set_site2, set_party, set_site_again,
+                           add_member1, add_member2, set_gender_m,
+                           set_gender_f, remove_member2, free_text]
+        res = Suggestion.objects.bulk_apply(all_suggestions, self.editor)
+
+        self.assertItemsEqual(res['applied'], [
+            set_site1.pk, set_site2.pk, set_party.pk, set_site_again.pk,
+            add_member1.pk])
+        self.assertItemsEqual(res['skipped'], [free_text.pk])
+        self.assertItemsEqual(
+            [(x['field'], x['suggestions']) for x in res['conflicts']],
+            [('gender', sorted([set_gender_m.pk, set_gender_f.pk])),
+             ('members', sorted([add_member2.pk, remove_member2.pk]))])
+        self.assertEqual(len(res['changes']), 5)
+
+        mk1 = Member.objects.get(pk=self.member1.pk)
+        mk2 = Member.objects.get(pk=self.member2.pk)
+        self.assertEqual(mk1.website, self.MK_SITE)
+        self.assertEqual(mk1.current_party, self.party)
+        self.assertEqual(mk2.website, self.MK_SITE)
+        self.assertIsNone(mk2.gender)
+        self.assertItemsEqual(self.committee.members.all(), [self.member1])
+
+        self.assertItemsEqual(
+            Suggestion.objects.get_pending_suggestions(),
+            [add_member2, set_gender_m, set_gender_f, remove_member2,
+             free_text])
+        self.assertEqual(
+            Suggestion.objects.get(pk=set_site1.pk).resolved_by, self.editor)
+
+        # already resolved suggestions are skipped
+        res = Suggestion.objects.bulk_apply([set_site1, set_gender_f], self.editor)
+        self.assertEqual(res['applied'], [set_gender_f.pk])
+        self.assertEqual(res['skipped'], [set_site1.pk])
+        self.assertEqual(Member.objects.get(pk=self.member2.pk).gender,
+                         GENDER_CHOICES[1][0])
+
+        # cleanup
+        Member.objects.filter(pk__in=[mk1.pk, mk2.pk]).update(
+            website=None, gender=None, current_party=None)
+        self.committee.members.clear()
+        Suggestion.objects.all().delete()
+
     def test_cant_auto_apply_freetext(self):
         suggestion = Suggestion.objects.create_suggestion(
             suggested_by=self.regular_user,
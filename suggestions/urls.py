@@ -1,6 +1,7 @@
 from django.conf.urls import patterns, url
 from .views import (PendingSuggestionsView, PendingSuggestionsCountView,
-                    AutoApplySuggestionView, RejectSuggestionView)
+                    AutoApplySuggestionView, RejectSuggestionView,
+                    BulkApplySuggestionsView)
 
 
 urlpatterns = patterns('',
@@ -12,4 +13,6 @@ urlpatterns = patterns('',
         name='suggestions_auto_apply'),
     url('^reject/(?P<pk>\d+)/$', RejectSuggestionView.as_view(),
         name='suggestions_reject'),
+    url('^bulk_apply/$', BulkApplySuggestionsView.as_view(),
+        name='suggestions_bulk_apply'),
 )
@@ -151,3 +151,29 @@ class RejectSuggestionView(SingleObjectMixin, View):
         return HttpResponse(
             json.dumps(res, ensure_ascii=False, cls=PromiseAwareJSONEncoder),
             mimetype='application/json')
+
+
+class BulkApplySuggestionsView(View):
+    """Auto apply many suggestions at once, pass their pks in the ``pk`` POST
+    argument. Returns the summary of Suggestion.objects.bulk_apply"""
+
+    @method_decorator(permission_required('suggestions.autoapply_suggestion',
+                                          raise_exception=True))
+    def post(self, request, *args, **kwargs):
+        try:
+            pks = [int(x) for x in request.POST.getlist('pk')]
+        except ValueError:
+            pks = None
+
+        if not pks:
+            res = {
+                'success': False,
+                'message': "No suggestions to apply"
+            }
+        else:
+            res = Suggestion.objects.bulk_apply(pks, request.user)
+            res['success'] = True
+
+        return HttpResponse(
+            json.dumps(res, ensure_ascii=False, cls=PromiseAwareJSONEncoder),
+            mimetype='application/json')
@@ -0,0 +1,36 @@
+from django.db.models.signals import post_save, post_delete
+from django.contrib.contenttypes.models import ContentType
+
+from actstream.models import Follow
+
+from knesset.utils import disable_for_loaddata
+from agendas.models import Agenda
+from user.models import FollowCount
+
+
+def update_agenda_num_followers(follow):
+    """Keep the denormalized Agenda.num_followers in sync with the counter"""
+    if follow.content_type_id == ContentType.objects.get_for_model(Agenda).id:
+        num_followers = FollowCount.objects.counts_for(
+            Agenda, [follow.object_id]).get(int(follow.object_id), 0)
+        Agenda.objects.filter(pk=follow.object_id).update(
+            num_followers=num_followers)
+
+
+@disable_for_loaddata
+def increment_follow_count(sender, instance, created, **kwargs):
+    if created:
+        FollowCount.objects.increment(instance.content_type_id,
+                                      instance.object_id)
+        update_agenda_num_followers(instance)
+
+post_save.connect(increment_follow_count, sender=Follow)
+
+
+@disable_for_loaddata
+def decrement_follow_count(sender, instance, **kwargs):
+    FollowCount.objects.increment(instance.content_type_id,
+                                  instance.object_id, delta=-1)
+    update_agenda_num_followers(instance)
+
+post_delete.connect(decrement_follow_count, sender=Follow)
@@ -0,0 +1,15 @@
+from logging import getLogger
+
+from django.core.management.base import NoArgsCommand
+
+from user.models import FollowCount
+
+logger = getLogger(__name__)
+
+
+class Command(NoArgsCommand):
+    help = "Recalculates the followers count of all followed objects"
+
+    def handle_noargs(self, **options):
+        num_counters = FollowCount.objects.rebuild()
+        logger.info(u'Rebuilt followers count for {0} objects'.format(num_counters))
@@ -1,6 +1,7 @@
 # encoding: utf-8
 from django.contrib.auth import get_user_model
-from django.db import models
+from django.db import models, transaction, IntegrityError
+from django.db.models import Count, F
 from django.utils.translation import ugettext_lazy as _
 from django.db.models.signals import post_save
 from django.conf import settings
@@ -109,6 +110,112 @@ class UserProfile(models.Model):
         return self.user.get_full_name() or self.user.username
 
 
+class FollowCountManager(models.Manager):
+    def _content_type(self, model):
+        return ContentType.objects.get_for_model(model)
+
+    def counts_for(self, model, ids=None):
+        """
+        Returns a dict of object_id -> number of followers for objects of
+        the given model. Objects without followers are not in the dict.
+        """
+        qs = self.filter(content_type=self._content_type(model))
+        if ids is not None:
+            qs = qs.filter(object_id__in=list(ids))
+        return dict(qs.values_list('object_id', 'count'))
+
+    def count_for(self, obj):
+        return self.counts_for(obj.__class__, [obj.pk]).get(obj.pk, 0)
+
+    def most_followed(self, model, limit=10, queryset=None):
+        """
+        Returns a list of the most followed objects of the given model,
+        ordered by number of followers. Each object has a num_followers
+        attribute set.
+        queryset can be used to limit the objects (e.g. only public agendas).
+        """
+        counts = self.filter(content_type=self._content_type(model),
+                             count__gt=0).order_by('-count')
+        if queryset is None:
+            queryset = model._default_manager.all()
+        else:
+            # filter the counts by the queryset in the db, so the limit
+            # is applied on the allowed objects only
+            counts = counts.filter(object_id__in=queryset.values('pk'))
+        if limit:
+            counts = counts[:limit]
+        counts = list(counts.values_list('object_id', 'count'))
+        objects = queryset.in_bulk([object_id for object_id, count in counts])
+        res = []
+        for object_id, count in counts:
+            obj = objects.get(object_id)
+            if obj is not None:
+                obj.num_followers = count
+                res.append(obj)
+        return res
+
+    def increment(self, content_type_id, object_id, delta=1):
+        """
+        Atomically add delta to the followers count of an object,
+        creating the counter if needed.
+        """
+        qs = self.filter(content_type_id=content_type_id, object_id=object_id)
+        if delta < 0:
+            # never go below zero, even if the counters got out of sync
+            qs.filter(count__gte=-delta).update(count=F('count') + delta)
+            return
+        with transaction.atomic():
+            if qs.update(count=F('count') + delta):
+                return
+            try:
+                with transaction.atomic():
+                    self.create(content_type_id=content_type_id, object_id=object_id,
+                                count=delta)
+            except IntegrityError:
+                # someone else created the counter in the meantime
+                qs.update(count=F('count') + delta)
+
+    @transaction.atomic
+    def rebuild(self):
+        """
+        Recalculates all the counters from the Follow table.
+        Returns the number of counters created.
+        """
+        self.all().delete()
+        counts = list(Follow.objects.values('content_type', 'object_id')
+                      .annotate(num=Count('id')).order_by())
+        self.bulk_create([FollowCount(content_type_id=row['content_type'],
+                                      object_id=int(row['object_id']),
+                                      count=row['num'])
+                          for row in counts], batch_size=1000)
+        agenda_counts = self.counts_for(Agenda)
+        Agenda.objects.exclude(pk__in=agenda_counts.keys()).update(num_followers=0)
+        for agenda_id, count in agenda_counts.iteritems():
+            Agenda.objects.filter(pk=agenda_id).exclude(num_followers=count) \
+                .update(num_followers=count)
+        return len(counts)
+
+
+class FollowCount(models.Model):
+    """
+    Denormalized number of followers for followed objects (members, parties,
+    bills, agendas, ...). Maintained by the Follow listeners in
+    user/listeners.py and can be rebuilt using the rebuild_follow_counts
+    management command.
+    """
+    content_type = models.ForeignKey(ContentType)
+    object_id = models.PositiveIntegerField()
+    count = models.PositiveIntegerField(default=0, db_index=True)
+
+    objects = FollowCountManager()
+
+    class Meta:
+        unique_together = (('content_type', 'object_id'),)
+
+    def __unicode__(self):
+        return u'%s %s: %d' % (self.content_type, self.object_id, self.count)
+
+
 def handle_user_save(sender, created, instance, **kwargs):
     if created and instance._state.db == 'default':
         UserProfile.objects.create(user=instance)
@@ -116,3 +223,5 @@ def handle_user_save(sender, created, instance, **kwargs):
 
 user_model = get_user_model()
 post_save.connect(handle_user_save, sender=user_model)
+
+from listeners import *
@@ -8,6 +8,7 @@ from mks.models import Member, Knesset
 from laws.models import Bill
 from committees.models import Committee
 from agendas.models import Agenda
+from user.models import FollowCount
 
 class TestProfile(TestCase):
 
@@ -204,3 +205,59 @@ class TestFollowing(TestCase):
         self.meeting_1.delete()
         self.knesset.delete()
 
+
+class TestFollowCount(TestCase):
+
+    def setUp(self):
+        self.knesset = Knesset.objects.create(
+            number=1,
+            start_date=datetime.date.today() - datetime.timedelta(10))
+        self.jacob = User.objects.create_user('jacob', 'jacob@jacobian.org',
+                                              'JKM')
+        self.adrian = User.objects.create_user('adrian', 'adrian@example.com',
+                                               'adrian')
+        self.david = Member.objects.create(name='david', start_date=datetime.date(2010, 1, 1))
+        self.yosef = Member.objects.create(name='yosef', start_date=datetime.date(2010, 1, 1))
+        self.agenda_1 = Agenda.objects.create(name='agenda_1')
+
+    def test_follow_unfollow_updates_counts(self):
+        follow(self.jacob, self.david)
+        follow(self.adrian, self.david)
+        follow(self.jacob, self.yosef)
+        self.assertEqual(FollowCount.objects.counts_for(Member),
+                         {self.david.id: 2, self.yosef.id: 1})
+        unfollow(self.adrian, self.david)
+        self.assertEqual(FollowCount.objects.count_for(self.david), 1)
+
+    def test_agenda_num_followers(self):
+        follow(self.jacob, self.agenda_1)
+        self.assertEqual(Agenda.objects.get(pk=self.agenda_1.pk).num_followers, 1)
+        unfollow(self.jacob, self.agenda_1)
+        self.assertEqual(Agenda.objects.get(pk=self.agenda_1.pk).num_followers, 0)
+
+    def test_most_followed(self):
+        follow(self.jacob, self.yosef)
+        follow(self.adrian, self.yosef)
+        follow(self.jacob, self.david)
+        most_followed = FollowCount.objects.most_followed(Member)
+        self.assertEqual(most_followed, [self.yosef, self.david])
+        self.assertEqual(most_followed[0].num_followers, 2)
+        self.assertEqual(FollowCount.objects.most_followed(Member, limit=1),
+                         [self.yosef])
+
+    def test_rebuild(self):
+        follow(self.jacob, self.david)
+        follow(self.jacob, self.agenda_1)
+        FollowCount.objects.all().delete()
+        Agenda.objects.update(num_followers=5)
+        self.assertEqual(FollowCount.objects.rebuild(), 2)
+        self.assertEqual(FollowCount.objects.count_for(self.david), 1)
+        self.assertEqual(Agenda.objects.get(pk=self.agenda_1.pk).num_followers, 1)
+
+    def tearDown(self):
+        self.jacob.delete()
+        self.adrian.delete()
+        self.david.delete()
+        self.yosef.delete()
+        self.agenda_1.delete()
+        self.knesset.delete()
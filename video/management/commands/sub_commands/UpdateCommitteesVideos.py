@@ -3,9 +3,12 @@
 from video.management.commands.sub_commands import SubCommand
 from committees.models import Committee
 from BeautifulSoup import BeautifulSoup
-import urllib,re,datetime,traceback,sys
-from video.utils import get_videos_queryset
+from django.contrib.contenttypes.models import ContentType
+from multiprocessing.pool import ThreadPool
+import re,datetime,traceback,sys,threading
+from video.utils.fetch import UrlFetcher
 from video.models import Video
+from auxiliary.conditional import touch
 
 class UpdateCommitteesVideos(SubCommand):
 
@@ -17,7 +20,14 @@ class UpdateCommitteesVideos(SubCommand):
     
     KNESSET_BASEHREFPATH='http://www.knesset.gov.il/committees/heb/'
 
-    def __init__(self,command,committees=None):
+    DEFAULT_WORKERS=4
+
+    def __init__(self,command,committees=None,fetcher=None,workers=None):
+        """
+        the pages are fetched by a pool of workers threads, the db is only
+        accessed from the main thread - one query for the existing videos
+        and (at most) one bulk insert per committee.
+        """
         SubCommand.__init__(self,command)
         if self._get_opt('with-history'):
             self._error('download of historical data is not supported yet')
@@ -26,33 +36,90 @@ class UpdateCommitteesVideos(SubCommand):
                 committees=[Committee.objects.get(id=self._get_opt('committee-id'))]
             else:
                 committees=Committee.objects.all()
-        for comm in committees:
-            self._debug('UpdateCommitteesVideos - '+str(comm.id)+': '+comm.name)
-            self._check_timer()
-            broadcasts_url=comm.portal_knesset_broadcasts_url
-            if len(broadcasts_url)==0:
-                self._debug('committee does not have a broadcasts url, trying to find one')
-                broadcasts_url=self._update_committee_broadcasts_url(comm)
-            if len(broadcasts_url)>0:
-                self._debug('got a broadcasts url - '+str(broadcasts_url))
-                self._debug('searching for videos in the broadcasts url')
-                videos=self._get_committee_videos(broadcasts_url)
+        committees=list(committees)
+        self.fetcher=UrlFetcher() if fetcher is None else fetcher
+        self._committees_index_soup=None
+        self._committees_index_lock=threading.Lock()
+        existing_videos=self._get_existing_mms_videos(committees)
+        pool=ThreadPool(workers or self.DEFAULT_WORKERS)
+        try:
+            for comm,broadcasts_url,page,videos in pool.imap(self._fetch_committee,committees):
+                self._debug('UpdateCommitteesVideos - '+str(comm.id)+': '+comm.name)
+                self._check_timer()
+                if len(broadcasts_url)==0:
+                    self._warn('could not find a broadcasts url')
+                    continue
+                if broadcasts_url!=comm.portal_knesset_broadcasts_url:
+                    self._update_committee_portal_knesset_broadcasts_url(comm,broadcasts_url)
+                if page is None:
+                    continue
+                if page.not_modified:
+                    self._debug('broadcasts page was not modified - '+str(broadcasts_url))
+                    continue
                 self._debug('got '+str(len(videos))+' videos')
+                videosFields=[]
                 for video in videos:
-                    self._update_committee_mms_video(comm,video)
-            else:
-                self._warn('could not find a broadcasts url')
+                    key=(unicode(comm.id),video['mmsurl'])
+                    if key in existing_videos:
+                        self._debug('video already exists - '+video['mmsurl'])
+                    else:
+                        existing_videos.add(key)
+                        videosFields.append(self._getMmsVideoFields(video,comm))
+                        self._debug('saving video - '+video['mmsurl'])
+                if len(videosFields)>0:
+                    self._saveVideos(videosFields)
+                # only now the page is known to be processed, so it may be skipped next time
+                self.fetcher.commit(page)
+        finally:
+            pool.terminate()
+            pool.join()
+
+    def _fetch_committee(self,comm):
+        """
+        runs in a worker thread, returns (committee, broadcasts url, broadcasts page, videos)
+        the page is None if it could not be fetched
+        """
+        broadcasts_url=comm.portal_knesset_broadcasts_url
+        if len(broadcasts_url)==0:
+            self._debug('committee does not have a broadcasts url, trying to find one')
+            broadcasts_url=self._find_committee_broadcasts_url(comm)
+        if len(broadcasts_url)==0:
+            return comm,broadcasts_url,None,[]
+        self._debug('searching for videos in the broadcasts url - '+str(broadcasts_url))
+        try:
+            page=self._get_committee_videos_page(broadcasts_url)
+        except Exception as e:
+            self._warn('could not fetch broadcasts url '+str(broadcasts_url)+', exception: '+str(e))
+            return comm,broadcasts_url,None,[]
+        if page.not_modified:
+            return comm,broadcasts_url,page,[]
+        return comm,broadcasts_url,page,self._get_committee_videos(page)
+
+    def _get_existing_mms_videos(self,committees):
+        """(object_pk, embed_link) of all the mms videos of the committees, hidden ones included"""
+        return set(Video.objects.filter(
+            content_type=ContentType.objects.get_for_model(Committee),
+            object_pk__in=[unicode(comm.id) for comm in committees],
+            group='mms'
+        ).values_list('object_pk','embed_link'))
 
     def _get_committees_index_page(self):
         self._debug('fetching committee index page from '+self.PORTAL_KNESSET_COMMITTEES_INDEX_PAGE_URL)
         try:
-            rf=urllib.urlopen(self.PORTAL_KNESSET_COMMITTEES_INDEX_PAGE_URL)
-            return rf.read().decode('windows-1255').encode('utf-8')
+            page=self.fetcher.fetch(self.PORTAL_KNESSET_COMMITTEES_INDEX_PAGE_URL)
+            return page.content.decode('windows-1255').encode('utf-8')
         except Exception as e:
             self._warn('could not fetch committees_index_page, exception: '+str(e))
             traceback.print_exc(file=sys.stdout)
             return ''
         
+    def _get_committees_index_soup(self):
+        """the index page is the same for all committees, so it is fetched once"""
+        with self._committees_index_lock:
+            if self._committees_index_soup is None:
+                self._committees_index_soup=BeautifulSoup(self._get_committees_index_page())
+            return self._committees_index_soup
+
     def _get_committee_mainpage(self,soup,name):
         ret=['','']
         try:
@@ -96,13 +163,12 @@ class UpdateCommitteesVideos(SubCommand):
             return ret
         
     def _get_committee_mainpage_soup(self,href):
-        return BeautifulSoup(urllib.urlopen(href).read())
+        return BeautifulSoup(self.fetcher.fetch(href).content)
               
-    def _update_committee_broadcasts_url(self,comm):
+    def _find_committee_broadcasts_url(self,comm):
         try:
             url=''
-            index=self._get_committees_index_page()
-            soup=BeautifulSoup(index)
+            soup=self._get_committees_index_soup()
             self._debug('fetching committee main page')
             [main,mainpage_href]=self._get_committee_mainpage(soup,comm.name)
             if type(main).__name__=='BeautifulSoup':
@@ -144,9 +210,7 @@ class UpdateCommitteesVideos(SubCommand):
                         if len(url)>0:
                             url=mainpage_href+'/'+url
             else: self._debug('failed to fetch committee main page')
-            if len(url)>6:
-                self._update_committee_portal_knesset_broadcasts_url(comm,url)
-            return url
+            return url if len(url)>6 else ''
         except Exception as e:
             self._warn('exception while trying to get broadcasts url from committee mainpage')
             self._warn('exception = '+str(e))
@@ -157,14 +221,17 @@ class UpdateCommitteesVideos(SubCommand):
         comm.portal_knesset_broadcasts_url=url
         comm.save()
     
-    def _get_committee_videos_soup(self,bcasturl):
-        return BeautifulSoup(urllib.urlopen(bcasturl).read())
+    def _get_committee_videos_page(self,bcasturl):
+        return self.fetcher.fetch(bcasturl,conditional=True)
+
+    def _get_committee_videos_soup(self,page):
+        return BeautifulSoup(page.content)
     
-    def _get_committee_videos(self,bcasturl):
+    def _get_committee_videos(self,page):
         videos=[]
         mmsurls=[]
         try:
-            soup=self._get_committee_videos_soup(bcasturl)
+            soup=self._get_committee_videos_soup(page)
             elts=soup('span',{'onclick':re.compile(".*asf.*")})
             if len(elts)>0:
                 for elt in elts:
@@ -210,14 +277,11 @@ class UpdateCommitteesVideos(SubCommand):
             return videos
         except Exception as e:
             self._warn('exception while trying to get videos from broadcasts url')
-            self._warn('bcasturl = '+str(bcasturl))
+            self._warn('bcasturl = '+str(page.url))
             self._warn('exception = '+str(e))
             traceback.print_exc(file=sys.stdout)
             return videos
     
-    def _get_committee_num_mms_videos(self,comm,group,ignoreHide,embed_link):
-        return get_videos_queryset(comm,group=group,ignoreHide=ignoreHide).filter(embed_link=embed_link).count()
-    
     def _getMmsVideoFields(self,video,comm):
         return {
             'embed_link':video['mmsurl'],
@@ -228,14 +292,6 @@ class UpdateCommitteesVideos(SubCommand):
             'content_object':comm
         }
         
-    def _saveVideo(self,videoFields):
-        v=Video(**videoFields)
-        v.save()
-    
-    def _update_committee_mms_video(self,comm,video):
-        numcurvids=self._get_committee_num_mms_videos(comm, 'mms', True, video['mmsurl'])
-        if numcurvids==0:
-            self._saveVideo(self._getMmsVideoFields(video, comm))
-            self._debug('saved video - '+video['mmsurl'])
-        else:
-            self._debug('video already exists - '+video['mmsurl'])
+    def _saveVideos(self,videosFields):
+        Video.objects.bulk_create([Video(**videoFields) for videoFields in videosFields])
+        touch(Video)
@@ -1,15 +1,23 @@
 # encoding: utf-8
 
+import socket
+import urllib2
+
+from django.contrib.contenttypes.models import ContentType
+from multiprocessing.pool import ThreadPool
 from video.management.commands.sub_commands import SubCommand
+from video.utils.fetch import UrlFetcher
 from video.utils.youtube import GetYoutubeVideos
 from mks.models import Member
 from video.utils.parse_dict import validate_dict
-from video.utils import get_videos_queryset
 from video.models import Video
+from auxiliary.conditional import touch, touch_objects
 
 class UpdateMembersRelatedVideos(SubCommand):
 
-    def __init__(self,command,members=None,only_current_knesset=False,member_ids=[]):
+    DEFAULT_WORKERS=4
+
+    def __init__(self,command,members=None,only_current_knesset=False,member_ids=[],fetcher=None,workers=None):
         SubCommand.__init__(self,command)
         if members is None:
             if len(member_ids)>0:
@@ -19,25 +27,50 @@ class UpdateMembersRelatedVideos(SubCommand):
                 self._debug('only current knesset')
             else:
                 members=Member.objects.all()
+        members=list(members)
+        self.fetcher=UrlFetcher() if fetcher is None else fetcher
         self._debug('updating related videos for '+str(len(members))+' members')
-        for member in members:
-            self._debug(member.name)
-            self._check_timer()
-            relvids=[]
-            for name in member.names:
-                self._debug(name)
-                for video in self._getVideosForMember(name):
-                    if self._verify_related_video(video,name):
-                        relvids.append(video)
-            if len(relvids)>0:
+        existing_videos=self._getMembersExistingVideos(members)
+        pool=ThreadPool(workers or self.DEFAULT_WORKERS)
+        try:
+            for member,relvids in pool.imap(self._getMemberRelatedVideos,members):
+                self._debug(member.name)
+                self._check_timer()
+                videosFields=[]
                 for video in relvids:
-                    self._update_member_related_video(member,video)
+                    key=(unicode(member.id),unicode(video['id']))
+                    if key not in existing_videos:
+                        existing_videos.add(key)
+                        videosFields.append(self._getVideoFields(video,member))
+                if len(videosFields)>0:
+                    self._saveVideos(videosFields)
+        finally:
+            pool.terminate()
+            pool.join()
+
+    def _getMemberRelatedVideos(self,member):
+        """
+        runs in a worker thread, searches youtube for all the names of the member,
+        a name which failed to fetch is skipped so it does not stop the other members
+        """
+        relvids=[]
+        for name in member.names:
+            self._debug(name)
+            try:
+                videos=self._getVideosForMember(name)
+            except (urllib2.URLError,socket.error) as e:
+                self._warn(u'failed to get the videos of %s: %s'%(name,e))
+                continue
+            for video in videos:
+                if self._verify_related_video(video,name):
+                    relvids.append(video)
+        return member,relvids
 
     def _getVideosForMember(self,name):
         return self._getYoutubeVideos(q='"'+name+'"',max_results=15,limit_time='this_month')
 
     def _getYoutubeVideos(self,**kwargs):
-        return GetYoutubeVideos(**kwargs).videos
+        return GetYoutubeVideos(fetcher=self.fetcher,**kwargs).videos
 
     def _verify_related_video(self,video,name):
         if validate_dict(video,['title','description']):
@@ -67,22 +100,15 @@ class UpdateMembersRelatedVideos(SubCommand):
             'content_object':member
         }
 
-    def _isMemberHaveVideo(self,member,video):
-        return self._getMemberExistingVideosCount(
-            ignoreHide=True, member=member,
-            source_id=video['id'],
-            source_type='youtube',
-        )>0
-
-    def _getMemberExistingVideosCount(self,ignoreHide,member,source_id,source_type):
-        qs=get_videos_queryset(member,ignoreHide=ignoreHide)
-        qs=qs.filter(source_id=source_id,source_type=source_type)
-        return qs.count()
-
-    def _saveVideo(self,videoFields):
-        v=Video(**videoFields)
-        v.save()
+    def _getMembersExistingVideos(self,members):
+        """(object_pk, source_id) of all the youtube videos of the members, hidden ones included"""
+        return set(Video.objects.filter(
+            content_type=ContentType.objects.get_for_model(Member),
+            object_pk__in=[unicode(member.id) for member in members],
+            source_type='youtube'
+        ).values_list('object_pk','source_id'))
 
-    def _update_member_related_video(self,member,video):
-        if not self._isMemberHaveVideo(member, video):
-            self._saveVideo(self._getVideoFields(video, member))
+    def _saveVideos(self,videosFields):
+        Video.objects.bulk_create([Video(**videoFields) for videoFields in videosFields])
+        touch(Video)
+        touch_objects(Member, set(videoFields['content_object'].pk for videoFields in videosFields))
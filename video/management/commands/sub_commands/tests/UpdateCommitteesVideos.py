@@ -4,19 +4,20 @@ import datetime
 from django.test import TestCase
 from BeautifulSoup import BeautifulSoup
 from video.management.commands.sub_commands.UpdateCommitteesVideos import UpdateCommitteesVideos
+from video.utils.fetch import FetchResult
 
 class UpdateCommitteesVideos_test(UpdateCommitteesVideos):
 
     def __init__(self,
         testCase,committees,committees_index_page,committee_mainpage_soups,
-        committee_videos_soups,committee_num_mms_videos,
+        committee_videos_pages,existing_mms_videos,
         opts
     ):
         self._committees_index_page=committees_index_page
         self._testCase=testCase
         self._committee_mainpage_soups=committee_mainpage_soups
-        self._committee_videos_soups=committee_videos_soups
-        self._committee_num_mms_videos=committee_num_mms_videos
+        self._committee_videos_pages=committee_videos_pages
+        self._existing_mms_videos=existing_mms_videos
         self._opts=opts
         self.updateCommitteePortalKnessetBroadcastsUrlLog=[]
         self.saveVideoLog=[]
@@ -32,16 +33,15 @@ class UpdateCommitteesVideos_test(UpdateCommitteesVideos):
     def _update_committee_portal_knesset_broadcasts_url(self,comm,url):
         self.updateCommitteePortalKnessetBroadcastsUrlLog.append((comm,url))
 
-    def _get_committee_videos_soup(self,bcasturl):
-        self._testCase.assertIn(bcasturl,self._committee_videos_soups)
-        return self._committee_videos_soups[bcasturl]
+    def _get_committee_videos_page(self,bcasturl):
+        self._testCase.assertIn(bcasturl,self._committee_videos_pages)
+        return self._committee_videos_pages[bcasturl]
 
-    def _get_committee_num_mms_videos(self,comm,group,ignoreHide,embed_link):
-        self._testCase.assertIn((comm.id,group,ignoreHide,embed_link),self._committee_num_mms_videos)
-        return self._committee_num_mms_videos[(comm.id,group,ignoreHide,embed_link)]
+    def _get_existing_mms_videos(self,committees):
+        return set(self._existing_mms_videos)
 
-    def _saveVideo(self,videoFields):
-        self.saveVideoLog.append(videoFields)
+    def _saveVideos(self,videosFields):
+        self.saveVideoLog.extend(videosFields)
 
     def _get_opt(self,opt):
         self._testCase.assertIn(opt,self._opts)
@@ -84,20 +84,15 @@ class testUpdateCommitteesVideos(TestCase):
                 'http://www.knesset.gov.il/committees/heb/vaada.asp?vaada=15':BeautifulSoup(self.COMMITTEE3_MAINPAGE),
                 'http://portal.knesset.gov.il/com13mada/he-il':BeautifulSoup(self.COMMITTEE4_MAINPAGE),
             },
-            committee_videos_soups={
-                'http://portal.knesset.gov.il/Com28avoda/he-IL/CommitteeBroadcast/default.htm':BeautifulSoup(self.COMMITTEE1_VIDEOS),
-                'http://portal.knesset.gov.il/Com10bikoret/he-IL/CommitteeBroadcast/default.htm':BeautifulSoup(self.COMMITTEE2_VIDEOS),
-                'http://www.knesset.gov.il/committees/heb/vaadaonline.asp?vaada=15':BeautifulSoup(self.COMMITTEE3_VIDEOS),
-                'http://portal.knesset.gov.il/Com13mada/he-IL/CommitteeBroadcast/default.htm':BeautifulSoup(self.COMMITTEE4_VIDEOS),
-            },
-            committee_num_mms_videos={
-                (1, 'mms', True, u'mms://212.235.5.241/committeeArchive/work/work_2011122195347.asf'):0,
-                (1, 'mms', True, u'mms://212.235.5.241/committeeArchive/work/work_2011122095048.asf'):0,
-                (2, 'mms', True, u'mms://212.235.5.241/committeeArchive/bikoret/bikoret_201112218497.asf'):1,
-                (2, 'mms', True, u'mms://212.235.5.241/committeeArchive/bikoret/bikoret_20111220104810.asf'):0,
-                (3, 'mms', True, u'mms://212.235.5.241/committeeArchive/samim/samim_20111226113358.asf'):0,
-                (4, 'mms', True, u'mms://212.235.5.241/committeeArchive/science/science_20121295433.asf'):0,
+            committee_videos_pages={
+                'http://portal.knesset.gov.il/Com28avoda/he-IL/CommitteeBroadcast/default.htm':FetchResult('http://portal.knesset.gov.il/Com28avoda/he-IL/CommitteeBroadcast/default.htm',self.COMMITTEE1_VIDEOS),
+                'http://portal.knesset.gov.il/Com10bikoret/he-IL/CommitteeBroadcast/default.htm':FetchResult('http://portal.knesset.gov.il/Com10bikoret/he-IL/CommitteeBroadcast/default.htm',self.COMMITTEE2_VIDEOS),
+                'http://www.knesset.gov.il/committees/heb/vaadaonline.asp?vaada=15':FetchResult('http://www.knesset.gov.il/committees/heb/vaadaonline.asp?vaada=15',self.COMMITTEE3_VIDEOS),
+                'http://portal.knesset.gov.il/Com13mada/he-IL/CommitteeBroadcast/default.htm':FetchResult('http://portal.knesset.gov.il/Com13mada/he-IL/CommitteeBroadcast/default.htm',self.COMMITTEE4_VIDEOS),
             },
+            existing_mms_videos=set([
+                (u'2', u'mms://212.235.5.241/committeeArchive/bikoret/bikoret_201112218497.asf'),
+            ]),
             opts={
                 'with-history':False,
             }
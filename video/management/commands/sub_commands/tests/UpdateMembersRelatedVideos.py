@@ -1,15 +1,18 @@
 #encoding: utf-8
 
+import json
+import urllib2
+
 from django.test import TestCase
 
 from video.management.commands.sub_commands.UpdateMembersRelatedVideos import UpdateMembersRelatedVideos
 
 class UpdateMembersRelatedVideos_test(UpdateMembersRelatedVideos):
-    def __init__(self,members,testCase,getYoutubeVideosReturn,membersExistingVideoCounts):
+    def __init__(self,members,testCase,getYoutubeVideosReturn,membersExistingVideos):
         self.testCase=testCase
         self.getYoutubeVideosReturn=getYoutubeVideosReturn
         self.saveVideoLog=[]
-        self.membersExistingVideoCounts=membersExistingVideoCounts
+        self.membersExistingVideos=membersExistingVideos
         UpdateMembersRelatedVideos.__init__(self,None,members)
 
     def _getYoutubeVideos(self,**kwargs):
@@ -17,22 +20,69 @@ class UpdateMembersRelatedVideos_test(UpdateMembersRelatedVideos):
         self.testCase.assertIn(kwargs['q'], self.getYoutubeVideosReturn)
         return self.getYoutubeVideosReturn[kwargs['q']]
 
-    def _getMemberExistingVideosCount(self,ignoreHide,member,source_id,source_type):
-        querysetCountParams=(ignoreHide,member,source_id,source_type)
-        self.testCase.assertIn(querysetCountParams, self.membersExistingVideoCounts)
-        return self.membersExistingVideoCounts[querysetCountParams]
+    def _getMembersExistingVideos(self,members):
+        return set(self.membersExistingVideos)
 
-    def _saveVideo(self,videoFields):
-        self.saveVideoLog.append(videoFields)
+    def _saveVideos(self,videosFields):
+        self.saveVideoLog.extend(videosFields)
 
     def _log(self,*args,**kwargs): pass
 
     def _check_timer(self,*args,**kwargs): pass
 
 
+class UpdateMembersRelatedVideosFetcher_test(UpdateMembersRelatedVideos):
+    def __init__(self,members,fetcher):
+        self.saveVideoLog=[]
+        self.warnings=[]
+        UpdateMembersRelatedVideos.__init__(self,None,members,fetcher=fetcher)
+
+    def _getMembersExistingVideos(self,members):
+        return set()
+
+    def _saveVideos(self,videosFields):
+        self.saveVideoLog.extend(videosFields)
+
+    def _log(self,msgtype,msg):
+        if msgtype=='warn':
+            self.warnings.append(msg)
+
+    def _check_timer(self,*args,**kwargs): pass
+
+
+class FetchResult_test():
+
+    def __init__(self,content):
+        self.content=content
+
+
+class Fetcher_test():
+    """returns a youtube feed with a video titled by the query, fails for the failing names"""
+
+    def __init__(self,failing):
+        self.failing=failing
+
+    def fetch(self,url):
+        if any(urllib2.quote(name) in url for name in self.failing):
+            raise urllib2.HTTPError(url,500,'Internal Server Error',None,None)
+        name=urllib2.unquote(url.split('q=%22')[1].split('%22')[0])
+        return FetchResult_test(json.dumps({'feed':{'entry':[{
+            'id':{'$t':name},
+            'title':{'$t':name,'type':'text'},
+            'content':{'$t':'','type':'text'},
+            'published':{'$t':'2015-01-01T00:00:00.000Z'},
+            'link':[{'href':'http://youtube/'+name,'type':'text/html','rel':'alternate'}],
+            'media$group':{
+                'media$content':[{'url':'http://youtube/embed','isDefault':'true'}],
+                'media$thumbnail':[{'url':'big'},{'url':'small'}],
+            },
+        }]}}))
+
+
 class Member_test():
 
-    def __init__(self,names=[]):
+    def __init__(self,mid,names=[]):
+        self.id=mid
         self.name=names[0]
         self.names=names
 
@@ -58,8 +108,8 @@ class testUpdateMembersRelatedVideos(TestCase):
         heName=u'ח"כ כלשהו'
         heName2=u'עוד חברכ'
         members=[
-            Member_test(['tester testee','testee tester']),
-            Member_test([heName,heName2])
+            Member_test(1,['tester testee','testee tester']),
+            Member_test(2,[heName,heName2])
         ]
         getYoutubeVideosReturn={
             '"tester testee"':[
@@ -74,13 +124,10 @@ class testUpdateMembersRelatedVideos(TestCase):
                 getVideo(5,u'בדיקה אחת שתיים שלוש',u'ארבע חמש שש'),
             ]
         }
-        membersExistingVideoCounts={
-            (True,members[0],1,'youtube'):0,
-            (True,members[0],2,'youtube'):1,
-            (True,members[0],3,'youtube'):0,
-            (True,members[1],4,'youtube'):0,
-        }
-        obj=UpdateMembersRelatedVideos_test(members, self, getYoutubeVideosReturn, membersExistingVideoCounts)
+        membersExistingVideos=set([
+            (u'1',u'2'),
+        ])
+        obj=UpdateMembersRelatedVideos_test(members, self, getYoutubeVideosReturn, membersExistingVideos)
         # this assertion fails due to change that does not take description into account when searching for related videos
         # it is too complicated, I don't know what's going on here so disabled for now
         # it works, I promise!
@@ -89,3 +136,14 @@ class testUpdateMembersRelatedVideos(TestCase):
         #      getVideoFields(3, 'xxx', 'something something tester testee something something', members[0]),
         #      getVideoFields(4, heName2, '', members[1]),
         #])
+
+    def testFailedFetchSkipsTheName(self):
+        members=[
+            Member_test(1,['tester']),
+            Member_test(2,['failing','testee']),
+        ]
+        obj=UpdateMembersRelatedVideosFetcher_test(members,Fetcher_test(['failing']))
+        self.assertEqual(sorted((fields['content_object'].id,fields['source_id']) for fields in obj.saveVideoLog),
+                         [(1,'tester'),(2,'testee')])
+        self.assertEqual(len(obj.warnings),1)
+        self.assertIn('failing',obj.warnings[0])
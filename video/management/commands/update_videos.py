@@ -5,6 +5,7 @@ from django.conf import settings
 from django.core.management.base import NoArgsCommand
 from optparse import make_option
 from sub_commands import SubCommand, Timer, Logger, TimeoutException, SubCommandErrorException
+from video.utils.fetch import UrlCache, UrlFetcher
 from video.management.commands.sub_commands.UpdateMembersAboutVideo import UpdateMembersAboutVideo
 from video.management.commands.sub_commands.UpdateMembersRelatedVideos import UpdateMembersRelatedVideos
 from video.management.commands.sub_commands.UpdateCommitteesVideos import UpdateCommitteesVideos
@@ -48,8 +49,14 @@ class Command(NoArgsCommand,SubCommand):
             help='limit the total amount of data stored (in mb)'),
         make_option('--get-youtube-token', action='store_true', dest='get-youtube-token',
             help='get a youtube authsub token'),
+        make_option('--workers', action='store', type='int', dest='workers', default=4,
+            help='number of pages fetched concurrently (default 4)'),
+        make_option('--no-url-cache', action='store_true', dest='no-url-cache',
+            help="fetch all pages, even if they were not modified since the last run"),
     )
 
+    URL_CACHE_FILENAME = 'update_videos_url_cache.json'
+
     def _set_opts(self,options):
         self._opts={
             'all':options.get('all', False),
@@ -64,6 +71,8 @@ class Command(NoArgsCommand,SubCommand):
             'download-mb-quota':options.get('download-mb-quota',None),
             'get-youtube-token':options.get('get-youtube-token',False),
             'member-ids':options.get('member-ids',None),
+            'workers':options.get('workers',4),
+            'no-url-cache':options.get('no-url-cache',False),
         }
         
     def _init_opts(self):
@@ -102,6 +111,14 @@ class Command(NoArgsCommand,SubCommand):
             self.timer=Timer(options.get('time-limit', None)*60)
         self.logger=Logger(options.get('verbosity',1))
 
+    def _get_fetcher(self):
+        """the validators of the fetched pages are kept between runs in the data root"""
+        if self._opts['no-url-cache']:
+            cache=UrlCache()
+        else:
+            cache=UrlCache(os.path.join(self.DATA_ROOT, self.URL_CACHE_FILENAME))
+        return UrlFetcher(cache)
+
     def _run_subCommands(self):        
         if self._opts['download']:
             self._info("beginning download phase")
@@ -115,23 +132,31 @@ class Command(NoArgsCommand,SubCommand):
             
         if self._opts['update']:
             self._info("beginning update phase")
-            if not self._opts['only-committees']:
-                if self._opts['member-ids'] is not None:
-                    member_ids=[int(id) for id in self._opts['member-ids'].split(',')]
-                else:
-                    member_ids=[]
-                self._check_timer()
-                UpdateMembersAboutVideo(self, only_current_knesset=self._opts['current-knesset'], member_ids=member_ids)
-                self._check_timer()
-                UpdateMembersRelatedVideos(self, only_current_knesset=self._opts['current-knesset'], member_ids=member_ids)
-            if not self._opts['only-members']:
-                self._check_timer()
-                UpdateCommitteesVideos(self)
+            fetcher=self._get_fetcher()
+            try:
+                self._run_update(fetcher)
+            finally:
+                fetcher.cache.save()
                 
         if self._opts['get-youtube-token']:
             self._info('getting youtube token')
             GetYoutubeToken(self)
 
+    def _run_update(self,fetcher):
+        if not self._opts['only-committees']:
+            if self._opts['member-ids'] is not None:
+                member_ids=[int(id) for id in self._opts['member-ids'].split(',')]
+            else:
+                member_ids=[]
+            self._check_timer()
+            UpdateMembersAboutVideo(self, only_current_knesset=self._opts['current-knesset'], member_ids=member_ids)
+            self._check_timer()
+            UpdateMembersRelatedVideos(self, only_current_knesset=self._opts['current-knesset'], member_ids=member_ids,
+                                       fetcher=fetcher, workers=self._opts['workers'])
+        if not self._opts['only-members']:
+            self._check_timer()
+            UpdateCommitteesVideos(self, fetcher=fetcher, workers=self._opts['workers'])
+
     def handle_noargs(self, **options):
         self._init_subCommand(options)
         self._set_opts(options)
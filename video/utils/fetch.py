@@ -0,0 +1,109 @@
+# encoding: utf-8
+"""
+Fetching of the pages the videos are scraped from.
+
+UrlFetcher sends the ETag / Last-Modified validators it got for a url the
+last time, so a page which did not change is not downloaded (and not parsed)
+again. The validators are kept in a UrlCache, which is persisted as a json file.
+
+The fetcher is passed to the sub commands, so a test can use one which is
+backed by a local fixture server (or by anything which has a fetch method).
+"""
+import json
+import os
+import threading
+import urllib2
+
+
+class UrlCache(object):
+    """the validators of the fetched urls - {url: {'etag': .., 'last_modified': ..}}"""
+
+    def __init__(self, filename=None):
+        self.filename = filename
+        self._lock = threading.Lock()
+        self._validators = {}
+        if filename is not None and os.path.exists(filename):
+            with open(filename) as f:
+                try:
+                    self._validators = json.load(f)
+                except ValueError:
+                    # a broken cache only means that everything is fetched again
+                    self._validators = {}
+
+    def get(self, url):
+        with self._lock:
+            return dict(self._validators.get(url, {}))
+
+    def set(self, url, etag=None, last_modified=None):
+        with self._lock:
+            if etag is None and last_modified is None:
+                self._validators.pop(url, None)
+            else:
+                self._validators[url] = {'etag': etag, 'last_modified': last_modified}
+
+    def save(self):
+        if self.filename is None:
+            return
+        with self._lock:
+            data = json.dumps(self._validators)
+        dirname = os.path.dirname(self.filename)
+        if dirname and not os.path.exists(dirname):
+            os.makedirs(dirname)
+        tmp_filename = self.filename + '.tmp'
+        with open(tmp_filename, 'w') as f:
+            f.write(data)
+        os.rename(tmp_filename, self.filename)
+
+
+class FetchResult(object):
+
+    def __init__(self, url, content=None, etag=None, last_modified=None, not_modified=False):
+        self.url = url
+        self.content = content
+        self.etag = etag
+        self.last_modified = last_modified
+        self.not_modified = not_modified
+
+
+class UrlFetcher(object):
+    """
+    Fetches urls with urllib2, it is safe to use from several threads.
+    The validators of a conditional fetch are not stored until commit is called
+    with its result, so a page is fetched again if it was not processed.
+    """
+
+    def __init__(self, cache=None, timeout=60):
+        self.cache = cache
+        self.timeout = timeout
+
+    def _open(self, request):
+        return urllib2.urlopen(request, timeout=self.timeout)
+
+    def fetch(self, url, conditional=False):
+        """
+        Returns a FetchResult, with not_modified set if conditional is given
+        and the page did not change since the validators were committed.
+        """
+        request = urllib2.Request(url)
+        if conditional and self.cache is not None:
+            validators = self.cache.get(url)
+            if validators.get('etag'):
+                request.add_header('If-None-Match', validators['etag'])
+            if validators.get('last_modified'):
+                request.add_header('If-Modified-Since', validators['last_modified'])
+        try:
+            response = self._open(request)
+        except urllib2.HTTPError as e:
+            if e.code == 304:
+                return FetchResult(url, not_modified=True)
+            raise
+        try:
+            headers = response.info()
+            return FetchResult(url, response.read(), headers.getheader('ETag'),
+                               headers.getheader('Last-Modified'))
+        finally:
+            response.close()
+
+    def commit(self, result):
+        if self.cache is not None and not result.not_modified:
+            self.cache.set(result.url, result.etag, result.last_modified)
@@ -3,6 +3,7 @@
 from youtube import testYoutube
 from parse_dict import testParseDict
 from mms import testMms
+from fetch import testUrlFetcher
 
 from django.test import TestCase
 import collections
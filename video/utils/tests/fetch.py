@@ -0,0 +1,58 @@
+#encoding: utf-8
+
+import os, shutil, tempfile, threading
+from BaseHTTPServer import HTTPServer, BaseHTTPRequestHandler
+from django.test import TestCase
+from video.utils.fetch import UrlCache, UrlFetcher
+
+class _FixtureHandler(BaseHTTPRequestHandler):
+
+    ETAG='"v1"'
+
+    def do_GET(self):
+        if self.headers.getheader('If-None-Match')==self.ETAG:
+            self.send_response(304)
+            self.end_headers()
+        else:
+            self.send_response(200)
+            self.send_header('ETag',self.ETAG)
+            self.end_headers()
+            self.wfile.write('the page')
+
+    def log_message(self,*args):
+        pass
+
+class testUrlFetcher(TestCase):
+
+    def setUp(self):
+        self.server=HTTPServer(('127.0.0.1',0),_FixtureHandler)
+        thread=threading.Thread(target=self.server.serve_forever)
+        thread.daemon=True
+        thread.start()
+        self.url='http://127.0.0.1:%s/page'%self.server.server_port
+        self.tmpdir=tempfile.mkdtemp()
+        self.filename=os.path.join(self.tmpdir,'cache.json')
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        shutil.rmtree(self.tmpdir)
+
+    def testConditionalFetch(self):
+        fetcher=UrlFetcher(UrlCache(self.filename))
+        result=fetcher.fetch(self.url,conditional=True)
+        self.assertFalse(result.not_modified)
+        self.assertEqual(result.content,'the page')
+        # the validators are only sent after the result was committed
+        self.assertEqual(fetcher.fetch(self.url,conditional=True).content,'the page')
+        fetcher.commit(result)
+        self.assertTrue(fetcher.fetch(self.url,conditional=True).not_modified)
+        self.assertEqual(fetcher.fetch(self.url).content,'the page')
+
+    def testPersistedCache(self):
+        fetcher=UrlFetcher(UrlCache(self.filename))
+        fetcher.commit(fetcher.fetch(self.url,conditional=True))
+        fetcher.cache.save()
+        fetcher=UrlFetcher(UrlCache(self.filename))
+        self.assertEqual(fetcher.cache.get(self.url),{'etag':'"v1"','last_modified':None})
+        self.assertTrue(fetcher.fetch(self.url,conditional=True).not_modified)
@@ -12,7 +12,7 @@ class GetYoutubeVideos:
     def __init__(
         self,q=None,max_results=20,author=None,orderby='published',
         videos_json=None,youtube_id_url=None,
-        limit_time='all_time'
+        limit_time='all_time',fetcher=None
     ):
         """
             perform search on youtube
@@ -24,10 +24,12 @@ class GetYoutubeVideos:
                         relevance, published, viewCount, rating
             limit_time: (string) limit to videos uploaded in a certain timeframe
                         possible values: today, this_week, this_month, all_time
+            fetcher: (UrlFetcher) fetches the urls, they are read with urllib if not given
         """
+        self._fetcher=fetcher
         self.videos=[]
         if videos_json is None and youtube_id_url is not None:
-            videos_json=urllib.urlopen(youtube_id_url+'?alt=json').read()
+            videos_json=self._read(youtube_id_url+'?alt=json')
         if videos_json is None and q is not None:
             params={
                 'q':q,
@@ -38,7 +40,7 @@ class GetYoutubeVideos:
             if author is not None: params['author']=author
             if limit_time is not None: params['time']=limit_time
             url=build_url(self.GDATA_YOUTUBE_VIDEOS_URL,params)
-            videos_json=urllib.urlopen(url).read()
+            videos_json=self._read(url)
         if videos_json is not None and len(videos_json)>0:
             try:
                 videos_json=videos_json[videos_json.find('{'):videos_json.rfind('}')+1]
@@ -62,6 +64,12 @@ class GetYoutubeVideos:
                 video=self._parse_youtube_entry(yentry)
                 self.videos.append(video)
 
+    def _read(self,url):
+        if self._fetcher is None:
+            return urllib.urlopen(url).read()
+        else:
+            return self._fetcher.fetch(url).content
+
     def _parse_youtube_entry(self,yentry):
         video={
             'id':parse_dict(yentry,{'id':'$t'}),